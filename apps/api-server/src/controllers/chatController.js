@@ -1,7 +1,7 @@
 const ChatLog = require('../models/ChatLog');
 const SessionSummary = require('../models/SessionSummary');
 const { getResponse } = require('../services/aiService');
-const { analyzeMessage } = require('../services/mlService');
+const { analyzeMessage, summarizeSession: summarizeWithML } = require('../services/mlService');
 
 // @desc    Send a message to the AI bot
 // @route   POST /api/chat
@@ -82,15 +82,33 @@ const summarizeSession = async (req, res) => {
             .sort({ timestamp: -1 })
             .limit(10);
 
-        // Mock ML service call for summary (replace with actual API call later)
-        const summaryData = {
-            summary: "Student expressed concerns about academic pressure and sleep. Discussed breathing techniques.",
-            mainConcerns: ["Academic Stress", "Insomnia"],
-            copingStrategies: ["4-7-8 Breathing", "Sleep Hygiene"],
-            riskLevel: "low",
-            actionItems: ["Practice breathing before bed", "Review study schedule"],
-            isAiGenerated: true
-        };
+        const turns = chats.reverse().map(c => ({ sender: c.sender, message: c.message }));
+
+        let summaryData;
+        try {
+            const mlSummary = await summarizeWithML(turns, sessionId);
+            // An empty generation would fail the required summary field; use the fallback instead
+            if (typeof mlSummary.summary !== 'string' || !mlSummary.summary.trim()) {
+                throw new Error('ML service returned an empty summary');
+            }
+            summaryData = {
+                summary: mlSummary.summary,
+                mainConcerns: mlSummary.mainConcerns,
+                copingStrategies: mlSummary.copingStrategies,
+                riskLevel: mlSummary.riskLevel,
+                isAiGenerated: true
+            };
+        } catch (mlError) {
+            // Fallback summary if ML service is down, summarizer not loaded or summary empty
+            summaryData = {
+                summary: "Student expressed concerns about academic pressure and sleep. Discussed breathing techniques.",
+                mainConcerns: ["Academic Stress", "Insomnia"],
+                copingStrategies: ["4-7-8 Breathing", "Sleep Hygiene"],
+                riskLevel: "low",
+                actionItems: ["Practice breathing before bed", "Review study schedule"],
+                isAiGenerated: true
+            };
+        }
 
         const sessionSummary = await SessionSummary.create({
             userId: req.user._id,
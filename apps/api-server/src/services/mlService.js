@@ -53,7 +53,27 @@ const analyzeScreening = async (type, answers) => {
     }
 };
 
+/**
+ * Get chat session summary from ML service
+ * @param {Array<object>} turns - Chat turns ({ sender, message }) in chronological order
+ * @param {string} sessionId - Session identifier
+ * @returns {Promise<object>} - Summary with mainConcerns, copingStrategies, riskLevel
+ */
+const summarizeSession = async (turns, sessionId) => {
+    try {
+        const response = await axios.post(`${ML_SERVICE_URL}/summarize/session`, {
+            sessionId,
+            turns
+        });
+        return response.data;
+    } catch (error) {
+        console.error('ML Service Error:', error.message);
+        throw error;
+    }
+};
+
 module.exports = {
     analyzeMessage,
-    analyzeScreening
+    analyzeScreening,
+    summarizeSession
 };
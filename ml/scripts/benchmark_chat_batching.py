@@ -0,0 +1,147 @@
+"""
+Benchmark static vs dynamic padding for chat model training.
+
+Static: every example padded to the longest message in the split, random
+batches, no dataloader workers (the trainers' previous setup).
+Dynamic: per-batch padding over length-grouped batches, zero-copy views
+of the token cache, multi-worker loading.
+
+Reports padding efficiency for a full epoch of each, and times training
+steps (forward + backward + optimizer) on DistilBERT to get real
+tokens/sec and an estimated epoch wall-clock time.
+
+Usage:
+    python benchmark_chat_batching.py --steps 50
+    python benchmark_chat_batching.py --steps 0 --output reports/chat_batching.json
+"""
+
+import json
+import time
+import argparse
+import numpy as np
+from pathlib import Path
+
+from chat_data import (
+    ChatDataset, DynamicPaddingCollator, LengthGroupedSampler, find_chats_source,
+    load_chats, load_tokenized, split_indices, RISK_LABEL_MAP, TOKENIZER_NAME, MAX_LENGTH, PAD_TO_MULTIPLE_OF
+)
+
+
+def padding_stats(lengths, batches, static_length=None):
+    """Real vs padded token counts over a list of index batches"""
+    real = int(lengths.sum())
+    padded = 0
+    for batch in batches:
+        if static_length:
+            width = static_length
+        else:
+            width = -(-int(lengths[batch].max()) // PAD_TO_MULTIPLE_OF) * PAD_TO_MULTIPLE_OF
+        padded += width * len(batch)
+    return {'real_tokens': real, 'padded_tokens': padded, 'padding_efficiency': real / padded}
+
+
+def epoch_batches(order, batch_size):
+    order = np.asarray(order)
+    return [order[start:start + batch_size] for start in range(0, len(order), batch_size)]
+
+
+def time_training(dataset, sampler, collator, batch_size, workers, steps, warmup=3):
+    """Seconds and real tokens for `steps` optimizer steps after warmup"""
+    import torch
+    from transformers import DistilBertForSequenceClassification
+
+    torch.manual_seed(0)
+    model = DistilBertForSequenceClassification.from_pretrained(TOKENIZER_NAME, num_labels=len(RISK_LABEL_MAP))
+    model.train()
+    optimizer = torch.optim.AdamW(model.parameters(), lr=5e-5)
+    loader = torch.utils.data.DataLoader(
+        dataset, batch_size=batch_size, sampler=sampler, collate_fn=collator,
+        num_workers=workers, persistent_workers=workers > 0
+    )
+
+    tokens, start = 0, None
+    for step, batch in enumerate(loader):
+        if step == warmup:
+            start = time.perf_counter()
+        if step >= warmup + steps:
+            break
+        loss = model(**batch).loss
+        loss.backward()
+        optimizer.step()
+        optimizer.zero_grad()
+        if step >= warmup:
+            tokens += int(batch['attention_mask'].sum())
+    return time.perf_counter() - start, tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark chat training batching')
+    parser.add_argument('--input', default=None, help='Chat CSV or shard directory (default: data/raw)')
+    parser.add_argument('--batch-size', type=int, default=16, help='Training batch size')
+    parser.add_argument('--workers', type=int, default=2, help='Dataloader workers for the dynamic setup')
+    parser.add_argument('--steps', type=int, default=30, help='Timed training steps per setup (0 = padding only)')
+    parser.add_argument('--output', default=None, help='Optional JSON results path')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+
+    args = parser.parse_args()
+
+    from transformers import DistilBertTokenizer
+
+    ml_dir = Path(__file__).parent.parent
+    source = Path(args.input) if args.input else find_chats_source(ml_dir / 'data' / 'raw')
+    df = load_chats(source)
+    labels = df['risk_level'].map(RISK_LABEL_MAP).to_numpy()
+    train_idx, _ = split_indices(labels)
+
+    tokenizer = DistilBertTokenizer.from_pretrained(TOKENIZER_NAME)
+    corpus = load_tokenized(df['message'].tolist(), tokenizer, MAX_LENGTH)
+    lengths = corpus.lengths[train_idx]
+    static_length = int(lengths.max())
+    print(f"{len(train_idx)} training messages, mean {lengths.mean():.1f} tokens, longest {static_length}")
+
+    rng = np.random.default_rng(args.seed)
+    static_sampler = rng.permutation(len(train_idx)).tolist()
+    dynamic_sampler = LengthGroupedSampler(lengths, args.batch_size, args.seed)
+    n_batches = -(-len(train_idx) // args.batch_size)
+
+    results = {'n_train': len(train_idx), 'batch_size': args.batch_size, 'workers': args.workers}
+    results['static'] = padding_stats(lengths, epoch_batches(static_sampler, args.batch_size), static_length)
+    results['dynamic'] = padding_stats(lengths, epoch_batches(list(dynamic_sampler), args.batch_size))
+
+    if args.steps > 0:
+        setups = {
+            'static': (ChatDataset(corpus, train_idx, labels[train_idx], pad_to=static_length),
+                       static_sampler, None, 0),
+            'dynamic': (ChatDataset(corpus, train_idx, labels[train_idx]),
+                        dynamic_sampler, DynamicPaddingCollator(corpus.pad_token_id), args.workers),
+        }
+        for name, (dataset, sampler, collator, workers) in setups.items():
+            print(f"Timing {args.steps} steps ({name})...")
+            seconds, tokens = time_training(dataset, sampler, collator, args.batch_size, workers, args.steps)
+            results[name].update({
+                'step_seconds': seconds / args.steps,
+                'tokens_per_sec': tokens / seconds,
+                'estimated_epoch_seconds': seconds / args.steps * n_batches,
+            })
+
+    print(f"\n{'Setup':<10} {'Pad efficiency':>15} {'Tokens/s':>12} {'Epoch (est.)':>14}")
+    for name in ('static', 'dynamic'):
+        row = results[name]
+        tokens_per_sec = f"{row['tokens_per_sec']:,.0f}" if 'tokens_per_sec' in row else '-'
+        epoch = f"{row['estimated_epoch_seconds']:.0f}s" if 'estimated_epoch_seconds' in row else '-'
+        print(f"{name:<10} {row['padding_efficiency']:>14.1%} {tokens_per_sec:>12} {epoch:>14}")
+    if args.steps > 0:
+        speedup = results['static']['estimated_epoch_seconds'] / results['dynamic']['estimated_epoch_seconds']
+        results['speedup'] = speedup
+        print(f"Speedup: {speedup:.1f}x")
+
+    if args.output:
+        output_path = Path(args.output)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(output_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to: {output_path}")
+
+
+if __name__ == '__main__':
+    main()
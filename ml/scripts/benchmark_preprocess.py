@@ -0,0 +1,100 @@
+"""
+Benchmark vectorized vs row-wise screening preprocessing.
+
+Times answer parsing, feature extraction and severity labelling on a
+synthetic screening frame, checks both paths agree, and reports rows/sec.
+
+Usage:
+    python benchmark_preprocess.py --n-rows 1000000 --reference-rows 100000
+"""
+
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+from preprocess import (
+    extract_features, create_severity_labels,
+    extract_features_rowwise, create_severity_labels_rowwise
+)
+
+
+def make_screenings(n_rows, seed=42):
+    """Random PHQ-9/GAD-7 rows in the raw export format"""
+    rng = np.random.default_rng(seed)
+    is_phq9 = rng.random(n_rows) < 0.5
+    answers = rng.integers(0, 4, size=(n_rows, 9))
+    n_questions = np.where(is_phq9, 9, 7)
+    answers[~is_phq9, 7:] = 0
+
+    answer_strings = [
+        str(row[:n].tolist()) for row, n in zip(answers, n_questions)
+    ]
+    return pd.DataFrame({
+        'user_hash': [f"bench_{i:07d}" for i in range(n_rows)],
+        'type': np.where(is_phq9, 'PHQ9', 'GAD7'),
+        'score': answers.sum(axis=1),
+        'answers': answer_strings,
+        'risk_level': 'unknown',
+    })
+
+
+def time_pipeline(extract, label, df):
+    start = time.perf_counter()
+    result = label(extract(df))
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark preprocessing implementations')
+    parser.add_argument('--n-rows', type=int, default=1000000, help='Rows for the vectorized path')
+    parser.add_argument('--reference-rows', type=int, default=100000,
+                        help='Rows for the row-wise path (it is timed on a prefix and extrapolated)')
+    parser.add_argument('--output', default=None, help='Optional JSON results path')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+
+    args = parser.parse_args()
+
+    print(f"Generating {args.n_rows} synthetic screenings...")
+    df = make_screenings(args.n_rows, args.seed)
+    reference_df = df.iloc[:min(args.reference_rows, args.n_rows)].copy()
+
+    print(f"Row-wise pipeline on {len(reference_df)} rows...")
+    reference, reference_time = time_pipeline(extract_features_rowwise, create_severity_labels_rowwise, reference_df)
+
+    print(f"Vectorized pipeline on {len(reference_df)} rows...")
+    vectorized, vectorized_small_time = time_pipeline(extract_features, create_severity_labels, reference_df)
+    pd.testing.assert_frame_equal(reference[vectorized.columns], vectorized.reset_index(drop=True), check_dtype=False)
+    print("  ✅ Outputs match")
+
+    print(f"Vectorized pipeline on {len(df)} rows...")
+    _, vectorized_time = time_pipeline(extract_features, create_severity_labels, df)
+
+    reference_rate = len(reference_df) / reference_time
+    vectorized_rate = len(df) / vectorized_time
+    results = {
+        'n_rows': len(df),
+        'reference_rows': len(reference_df),
+        'rowwise_rows_per_sec': reference_rate,
+        'vectorized_rows_per_sec': vectorized_rate,
+        'speedup_same_rows': reference_time / vectorized_small_time,
+        'rowwise_estimated_seconds': len(df) / reference_rate,
+        'vectorized_seconds': vectorized_time,
+    }
+
+    print(f"\nRow-wise:   {reference_rate:>12,.0f} rows/s (est. {results['rowwise_estimated_seconds']:.1f}s for {len(df)} rows)")
+    print(f"Vectorized: {vectorized_rate:>12,.0f} rows/s ({vectorized_time:.2f}s for {len(df)} rows)")
+    print(f"Speedup (same {len(reference_df)} rows): {results['speedup_same_rows']:.1f}x")
+
+    if args.output:
+        output_path = Path(args.output)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(output_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to: {output_path}")
+
+
+if __name__ == '__main__':
+    main()
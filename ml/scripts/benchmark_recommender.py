@@ -0,0 +1,129 @@
+"""
+Benchmark recommender matrix building and multi-threaded LightFM training.
+
+Builds the interaction, weight and feature matrices for a synthetic
+interaction set with the vectorized path (recommender_data.py) and, on a
+smaller reference slice, with the previous lightfm.data.Dataset path
+(DataFrame.iterrows + build_interactions + per-user feature lists).
+Then times LightFM epochs with 1 thread and with the host's thread count.
+
+Usage:
+    python benchmark_recommender.py --n-interactions 1000000 --reference-rows 100000
+    python benchmark_recommender.py --n-interactions 1000000 --epochs 0
+"""
+
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+from recommender_data import RecommenderData, default_num_threads, synthetic_interactions
+
+MEAN_INTERACTIONS = 5
+
+
+def build_vectorized(users, items, ratings, user_risk, item_categories):
+    return RecommenderData.build(
+        users, items, ratings,
+        user_features=(np.arange(len(user_risk)), [f"risk_{r}" for r in user_risk]),
+        item_features=(np.arange(len(item_categories)), [f"cat_{c}" for c in item_categories])
+    )
+
+
+def build_reference(users, items, ratings, user_risk, item_categories):
+    """The row-wise lightfm.data.Dataset path train_recommender.py used before"""
+    from lightfm.data import Dataset
+
+    df = pd.DataFrame({'user_id': users, 'item_id': items, 'rating': ratings})
+    dataset = Dataset()
+    dataset.fit(
+        users=df['user_id'].unique(),
+        items=df['item_id'].unique(),
+        user_features=[f"risk_{r}" for r in np.unique(user_risk)],
+        item_features=[f"cat_{c}" for c in np.unique(item_categories)]
+    )
+    interactions, weights = dataset.build_interactions(
+        (x['user_id'], x['item_id'], x['rating']) for _, x in df.iterrows()
+    )
+    user_mapping, _, item_mapping, _ = dataset.mapping()
+    user_features = dataset.build_user_features(
+        (u, [f"risk_{risk}"]) for u, risk in enumerate(user_risk) if u in user_mapping
+    )
+    item_features = dataset.build_item_features(
+        (i, [f"cat_{cat}"]) for i, cat in enumerate(item_categories) if i in item_mapping
+    )
+    return interactions, weights, user_features, item_features
+
+
+def time_fit(data, num_threads, epochs):
+    from lightfm import LightFM
+
+    model = LightFM(loss='warp', no_components=30, random_state=0)
+    start = time.perf_counter()
+    model.fit(data.interactions, user_features=data.user_features, item_features=data.item_features,
+              sample_weight=data.weights, epochs=epochs, num_threads=num_threads)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark recommender data building and training')
+    parser.add_argument('--n-interactions', type=int, default=1000000, help='Synthetic interactions')
+    parser.add_argument('--n-items', type=int, default=2000, help='Synthetic items')
+    parser.add_argument('--reference-rows', type=int, default=100000,
+                        help='Interactions for the row-wise Dataset path (0 = skip)')
+    parser.add_argument('--epochs', type=int, default=1, help='LightFM epochs per thread setting (0 = skip)')
+    parser.add_argument('--threads', type=int, default=None, help='Parallel thread count (default: host)')
+    parser.add_argument('--output', default=None, help='Optional JSON results path')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+
+    args = parser.parse_args()
+
+    n_users = max(1, args.n_interactions // MEAN_INTERACTIONS)
+    users, items, ratings, user_risk, item_categories = synthetic_interactions(
+        n_users, args.n_items, MEAN_INTERACTIONS, seed=args.seed
+    )
+    print(f"{len(users):,} interactions, {n_users:,} users, {args.n_items:,} items")
+    results = {'n_interactions': len(users), 'n_users': n_users, 'n_items': args.n_items}
+
+    start = time.perf_counter()
+    data = build_vectorized(users, items, ratings, user_risk, item_categories)
+    seconds = time.perf_counter() - start
+    results['vectorized'] = {'seconds': seconds, 'rows_per_sec': len(users) / seconds}
+    print(f"Vectorized build: {seconds:.2f}s ({len(users) / seconds:,.0f} interactions/s)")
+
+    if args.reference_rows:
+        n = min(args.reference_rows, len(users))
+        reference_users = users[:n]
+        start = time.perf_counter()
+        build_reference(reference_users, items[:n], ratings[:n], user_risk[:reference_users.max() + 1],
+                        item_categories)
+        seconds = time.perf_counter() - start
+        results['reference'] = {'rows': n, 'seconds': seconds, 'rows_per_sec': n / seconds}
+        results['build_speedup'] = results['vectorized']['rows_per_sec'] / results['reference']['rows_per_sec']
+        print(f"Dataset build ({n:,} rows): {seconds:.2f}s ({n / seconds:,.0f} interactions/s)")
+        print(f"Build speedup: {results['build_speedup']:.1f}x")
+
+    if args.epochs:
+        threads = args.threads or default_num_threads()
+        results['fit'] = {}
+        for num_threads in sorted({1, threads}):
+            seconds = time_fit(data, num_threads, args.epochs)
+            results['fit'][num_threads] = {'seconds_per_epoch': seconds / args.epochs}
+            print(f"Fit, {num_threads} thread(s): {seconds / args.epochs:.2f}s/epoch")
+        if threads > 1:
+            speedup = results['fit'][1]['seconds_per_epoch'] / results['fit'][threads]['seconds_per_epoch']
+            results['fit_speedup'] = speedup
+            print(f"Thread speedup: {speedup:.1f}x")
+
+    if args.output:
+        output_path = Path(args.output)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(output_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to: {output_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,453 @@
+"""
+Benchmark vector index configurations for the RAG knowledge base.
+
+Features:
+    - Exact ground truth from brute-force cosine search
+    - Sweeps IVF_FLAT (nlist/nprobe) and HNSW (M/ef) parameters
+    - Local backend (NumPy IVF, hnswlib HNSW) and Milvus when reachable
+    - Reports recall@k, QPS, build time and index memory
+    - Writes JSON and markdown reports
+
+Usage:
+    python benchmark_vector_index.py --n-vectors 100000 --k 10
+    python benchmark_vector_index.py --corpus kb --milvus
+"""
+
+import os
+import json
+import time
+import argparse
+import numpy as np
+from pathlib import Path
+
+try:
+    import hnswlib
+    HNSWLIB_AVAILABLE = True
+except ImportError:
+    HNSWLIB_AVAILABLE = False
+
+DEFAULT_NLISTS = [64, 128, 256, 1024]
+DEFAULT_NPROBES = [1, 4, 8, 16, 32]
+DEFAULT_HNSW_M = [8, 16, 32]
+DEFAULT_HNSW_EF = [16, 32, 64, 128]
+HNSW_EF_CONSTRUCTION = 200
+
+
+def normalize(vectors):
+    """L2-normalize rows so inner product equals cosine similarity"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32)
+
+
+def make_synthetic_corpus(n_vectors, n_queries, dim, n_clusters=256, seed=42):
+    """
+    Generate clustered embeddings that mimic sentence-embedding geometry.
+
+    Pure Gaussian noise makes every index look equally good (or bad), so
+    vectors are drawn around random topic centroids instead.
+    """
+    rng = np.random.default_rng(seed)
+    centroids = rng.standard_normal((n_clusters, dim)).astype(np.float32)
+
+    def sample(n):
+        assignment = rng.integers(0, n_clusters, size=n)
+        noise = rng.standard_normal((n, dim)).astype(np.float32) * 1.5
+        return normalize(centroids[assignment] + noise)
+
+    return sample(n_vectors), sample(n_queries)
+
+
+def load_kb_corpus(kb_dir, model_name, n_queries, chunk_size=400, seed=42):
+    """
+    Embed the knowledge base documents with sentence-transformers.
+
+    Documents are split into fixed-size character chunks (the same unit the
+    RAG ingestion stores in Milvus). Queries are perturbed chunk embeddings,
+    so ground truth is never trivially the query itself.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    chunks = []
+    for path in sorted(Path(kb_dir).rglob('*.json')):
+        with open(path, 'r') as f:
+            doc = json.load(f)
+        content = doc.get('content', '')
+        for start in range(0, len(content), chunk_size):
+            chunks.append(f"{doc.get('title', '')}\n{content[start:start + chunk_size]}")
+
+    if not chunks:
+        raise FileNotFoundError(f"No knowledge base documents found in {kb_dir}")
+
+    print(f"Embedding {len(chunks)} KB chunks with {model_name}...")
+    model = SentenceTransformer(model_name)
+    base = normalize(model.encode(chunks, batch_size=64, convert_to_numpy=True))
+
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(base), size=n_queries)
+    queries = normalize(base[picks] + rng.standard_normal((n_queries, base.shape[1])).astype(np.float32) * 0.05)
+    return base, queries
+
+
+def brute_force_topk(base, queries, k, block_size=1024):
+    """Exact top-k by inner product, computed in query blocks"""
+    result = np.empty((len(queries), k), dtype=np.int64)
+    for start in range(0, len(queries), block_size):
+        scores = queries[start:start + block_size] @ base.T
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+        result[start:start + block_size] = np.take_along_axis(top, order, axis=1)
+    return result
+
+
+def recall_at_k(found, truth):
+    """Fraction of true neighbours retrieved, averaged over queries"""
+    k = truth.shape[1]
+    hits = sum(len(np.intersect1d(f[f >= 0], t, assume_unique=True)) for f, t in zip(found, truth))
+    return hits / (len(truth) * k)
+
+
+class FlatIndex:
+    """Exact inner-product search (baseline, equivalent to Milvus FLAT)"""
+
+    def __init__(self, base):
+        self.base = base
+
+    def search(self, queries, k):
+        return brute_force_topk(self.base, queries, k)
+
+    @property
+    def nbytes(self):
+        return self.base.nbytes
+
+
+class IVFFlatIndex:
+    """
+    NumPy IVF_FLAT: spherical k-means coarse quantizer + inverted lists.
+
+    Mirrors Milvus IVF_FLAT semantics (nlist clusters, nprobe lists scanned
+    per query) so the sweep predicts recall without a running Milvus.
+    """
+
+    def __init__(self, base, nlist, n_iter=10, train_size=50000, seed=42):
+        rng = np.random.default_rng(seed)
+        nlist = min(nlist, len(base))
+        sample = base[rng.choice(len(base), size=min(train_size, len(base)), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+
+        for _ in range(n_iter):
+            assignment = self._assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            counts = np.bincount(assignment, minlength=nlist)
+            empty = counts == 0
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+            centroids = normalize(sums)
+
+        self.centroids = centroids
+        assignment = self._assign(base, centroids)
+        order = np.argsort(assignment, kind='stable')
+        self.ids = order.astype(np.int64)
+        self.vectors = base[order]
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=nlist))])
+        self.nprobe = 1
+
+    @staticmethod
+    def _assign(vectors, centroids, block_size=8192):
+        assignment = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), block_size):
+            assignment[start:start + block_size] = np.argmax(vectors[start:start + block_size] @ centroids.T, axis=1)
+        return assignment
+
+    def search(self, queries, k):
+        nprobe = min(self.nprobe, len(self.centroids))
+        probes = np.argpartition(-(queries @ self.centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+        result = np.full((len(queries), k), -1, dtype=np.int64)
+
+        for q, lists in enumerate(probes):
+            candidates = np.concatenate([np.arange(self.offsets[l], self.offsets[l + 1]) for l in lists])
+            if len(candidates) == 0:
+                continue
+            scores = self.vectors[candidates] @ queries[q]
+            top = min(k, len(candidates))
+            best = np.argpartition(-scores, top - 1)[:top]
+            best = best[np.argsort(-scores[best])]
+            result[q, :top] = self.ids[candidates[best]]
+        return result
+
+    @property
+    def nbytes(self):
+        return self.vectors.nbytes + self.centroids.nbytes + self.ids.nbytes + self.offsets.nbytes
+
+
+class HNSWIndex:
+    """hnswlib HNSW graph (same algorithm and parameters as Milvus HNSW)"""
+
+    def __init__(self, base, m, ef_construction=HNSW_EF_CONSTRUCTION):
+        self.index = hnswlib.Index(space='ip', dim=base.shape[1])
+        self.index.init_index(max_elements=len(base), M=m, ef_construction=ef_construction)
+        self.index.set_num_threads(os.cpu_count() or 1)
+        self.index.add_items(base, np.arange(len(base)))
+        self.m = m
+        self.n, self.dim = base.shape
+
+    def set_ef(self, ef):
+        self.index.set_ef(ef)
+
+    def search(self, queries, k):
+        labels, _ = self.index.knn_query(queries, k=k)
+        return labels.astype(np.int64)
+
+    @property
+    def nbytes(self):
+        # Vectors + level-0 links (2*M) + upper-level links amortised to ~M/ln(M)
+        links_per_element = 2 * self.m + self.m / max(np.log(self.m), 1.0)
+        return int(self.n * (self.dim * 4 + links_per_element * 4 + 16))
+
+
+def time_search(index, queries, k):
+    """Run one pass over all queries; returns (results, QPS)"""
+    start = time.perf_counter()
+    found = index.search(queries, k)
+    elapsed = time.perf_counter() - start
+    return found, len(queries) / elapsed
+
+
+def run_local_sweep(base, queries, truth, k, nlists, nprobes, hnsw_ms, hnsw_efs):
+    """Sweep local index configurations and collect result rows"""
+    rows = []
+
+    start = time.perf_counter()
+    flat = FlatIndex(base)
+    build = time.perf_counter() - start
+    found, qps = time_search(flat, queries, k)
+    rows.append({
+        'backend': 'local', 'index_type': 'FLAT', 'params': {},
+        'recall_at_k': recall_at_k(found, truth), 'qps': qps,
+        'build_time_s': build, 'memory_mb': flat.nbytes / 1e6
+    })
+
+    for nlist in nlists:
+        if nlist > len(base):
+            continue
+        print(f"  IVF_FLAT nlist={nlist}...")
+        start = time.perf_counter()
+        ivf = IVFFlatIndex(base, nlist)
+        build = time.perf_counter() - start
+        for nprobe in nprobes:
+            if nprobe > nlist:
+                continue
+            ivf.nprobe = nprobe
+            found, qps = time_search(ivf, queries, k)
+            rows.append({
+                'backend': 'local', 'index_type': 'IVF_FLAT',
+                'params': {'nlist': nlist, 'nprobe': nprobe},
+                'recall_at_k': recall_at_k(found, truth), 'qps': qps,
+                'build_time_s': build, 'memory_mb': ivf.nbytes / 1e6
+            })
+
+    if not HNSWLIB_AVAILABLE:
+        print("⚠️ hnswlib not installed. Skipping local HNSW sweep (pip install hnswlib).")
+        return rows
+
+    for m in hnsw_ms:
+        print(f"  HNSW M={m}...")
+        start = time.perf_counter()
+        hnsw = HNSWIndex(base, m)
+        build = time.perf_counter() - start
+        for ef in hnsw_efs:
+            if ef < k:
+                continue
+            hnsw.set_ef(ef)
+            found, qps = time_search(hnsw, queries, k)
+            rows.append({
+                'backend': 'local', 'index_type': 'HNSW',
+                'params': {'M': m, 'efConstruction': HNSW_EF_CONSTRUCTION, 'ef': ef},
+                'recall_at_k': recall_at_k(found, truth), 'qps': qps,
+                'build_time_s': build, 'memory_mb': hnsw.nbytes / 1e6
+            })
+
+    return rows
+
+
+def run_milvus_sweep(base, queries, truth, k, nlists, nprobes, hnsw_ms, hnsw_efs,
+                     collection_name='index_benchmark'):
+    """
+    Sweep the same configurations on a live Milvus instance.
+
+    Uses a scratch collection that is dropped afterwards. Returns an empty
+    list if Milvus is unreachable.
+    """
+    try:
+        from pymilvus import connections, utility, FieldSchema, CollectionSchema, DataType, Collection
+        connections.connect(
+            alias="default",
+            host=os.getenv('MILVUS_HOST', 'localhost'),
+            port=os.getenv('MILVUS_PORT', '19530')
+        )
+    except Exception as e:
+        print(f"⚠️ Milvus not available: {e}")
+        return []
+
+    if utility.has_collection(collection_name):
+        utility.drop_collection(collection_name)
+
+    schema = CollectionSchema(fields=[
+        FieldSchema(name="id", dtype=DataType.INT64, is_primary=True),
+        FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=base.shape[1]),
+    ], description="Index benchmark scratch collection")
+    collection = Collection(name=collection_name, schema=schema)
+
+    print(f"  Inserting {len(base)} vectors into Milvus...")
+    for start in range(0, len(base), 10000):
+        end = min(start + 10000, len(base))
+        collection.insert([list(range(start, end)), base[start:end].tolist()])
+    collection.flush()
+
+    configs = [('IVF_FLAT', {'nlist': nlist}, 'nprobe', nprobes) for nlist in nlists]
+    configs += [('HNSW', {'M': m, 'efConstruction': HNSW_EF_CONSTRUCTION}, 'ef', hnsw_efs) for m in hnsw_ms]
+
+    rows = []
+    try:
+        for index_type, build_params, search_key, search_values in configs:
+            print(f"  Milvus {index_type} {build_params}...")
+            collection.release()
+            collection.drop_index()
+            start = time.perf_counter()
+            collection.create_index(field_name="embedding", index_params={
+                "metric_type": "COSINE", "index_type": index_type, "params": build_params
+            })
+            utility.wait_for_index_building_complete(collection_name)
+            collection.load()
+            build = time.perf_counter() - start
+
+            for value in search_values:
+                if (search_key == 'nprobe' and value > build_params['nlist']) or (search_key == 'ef' and value < k):
+                    continue
+                start = time.perf_counter()
+                hits = collection.search(
+                    data=queries.tolist(), anns_field="embedding", limit=k,
+                    param={"metric_type": "COSINE", "params": {search_key: value}}
+                )
+                qps = len(queries) / (time.perf_counter() - start)
+                found = np.full((len(queries), k), -1, dtype=np.int64)
+                for q, hit in enumerate(hits):
+                    ids = hit.ids[:k]
+                    found[q, :len(ids)] = ids
+                rows.append({
+                    'backend': 'milvus', 'index_type': index_type,
+                    'params': {**build_params, search_key: value},
+                    'recall_at_k': recall_at_k(found, truth), 'qps': qps,
+                    'build_time_s': build, 'memory_mb': None
+                })
+    finally:
+        utility.drop_collection(collection_name)
+
+    return rows
+
+
+def write_reports(results, output_dir):
+    """Write JSON results and a markdown table"""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    json_path = output_dir / 'vector_index_benchmark.json'
+    with open(json_path, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    meta = results['config']
+    lines = [
+        "# Vector Index Benchmark",
+        "",
+        f"Corpus: {meta['corpus']} ({meta['n_vectors']} vectors, dim {meta['dim']}, "
+        f"{meta['n_queries']} queries, k={meta['k']})",
+        "",
+        "| Backend | Index | Params | Recall@k | QPS | Build (s) | Memory (MB) |",
+        "|---|---|---|---|---|---|---|",
+    ]
+    for row in results['results']:
+        params = ", ".join(f"{key}={value}" for key, value in row['params'].items()) or "-"
+        memory = f"{row['memory_mb']:.1f}" if row['memory_mb'] is not None else "n/a"
+        lines.append(
+            f"| {row['backend']} | {row['index_type']} | {params} | {row['recall_at_k']:.4f} | "
+            f"{row['qps']:.0f} | {row['build_time_s']:.2f} | {memory} |"
+        )
+
+    md_path = output_dir / 'vector_index_benchmark.md'
+    with open(md_path, 'w') as f:
+        f.write("\n".join(lines) + "\n")
+
+    print(f"Results saved to: {json_path}")
+    print(f"Table saved to: {md_path}")
+
+
+def parse_int_list(value):
+    return [int(v) for v in value.split(',') if v]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark vector index configurations')
+    parser.add_argument('--corpus', choices=['synthetic', 'kb'], default='synthetic', help='Corpus source')
+    parser.add_argument('--kb-dir', default=None, help='Knowledge base directory (for --corpus kb)')
+    parser.add_argument('--model', default='BAAI/bge-small-en-v1.5', help='Embedding model (for --corpus kb)')
+    parser.add_argument('--n-vectors', type=int, default=100000, help='Synthetic corpus size')
+    parser.add_argument('--n-queries', type=int, default=1000, help='Number of queries')
+    parser.add_argument('--dim', type=int, default=384, help='Synthetic embedding dimension')
+    parser.add_argument('--k', type=int, default=10, help='Neighbours per query')
+    parser.add_argument('--nlist', type=parse_int_list, default=DEFAULT_NLISTS, help='Comma-separated IVF nlist values')
+    parser.add_argument('--nprobe', type=parse_int_list, default=DEFAULT_NPROBES, help='Comma-separated IVF nprobe values')
+    parser.add_argument('--hnsw-m', type=parse_int_list, default=DEFAULT_HNSW_M, help='Comma-separated HNSW M values')
+    parser.add_argument('--hnsw-ef', type=parse_int_list, default=DEFAULT_HNSW_EF, help='Comma-separated HNSW ef values')
+    parser.add_argument('--milvus', action='store_true', help='Also sweep a live Milvus instance')
+    parser.add_argument('--output-dir', default=None, help='Report directory (default: ml/reports)')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+
+    args = parser.parse_args()
+
+    script_dir = Path(__file__).parent
+    output_dir = Path(args.output_dir) if args.output_dir else script_dir.parent / 'reports'
+
+    if args.corpus == 'kb':
+        kb_dir = args.kb_dir or script_dir.parent / 'data' / 'knowledge_base'
+        base, queries = load_kb_corpus(kb_dir, args.model, args.n_queries, seed=args.seed)
+    else:
+        print(f"Generating {args.n_vectors} synthetic vectors (dim={args.dim})...")
+        base, queries = make_synthetic_corpus(args.n_vectors, args.n_queries, args.dim, seed=args.seed)
+
+    k = min(args.k, len(base))
+    print(f"Computing brute-force ground truth (k={k})...")
+    truth = brute_force_topk(base, queries, k)
+
+    print("\nLocal index sweep:")
+    rows = run_local_sweep(base, queries, truth, k, args.nlist, args.nprobe, args.hnsw_m, args.hnsw_ef)
+
+    if args.milvus:
+        from dotenv import load_dotenv
+        load_dotenv()
+        print("\nMilvus index sweep:")
+        rows += run_milvus_sweep(base, queries, truth, k, args.nlist, args.nprobe, args.hnsw_m, args.hnsw_ef)
+
+    results = {
+        'config': {
+            'corpus': args.corpus,
+            'n_vectors': int(len(base)),
+            'n_queries': int(len(queries)),
+            'dim': int(base.shape[1]),
+            'k': k,
+        },
+        'results': rows
+    }
+
+    print()
+    write_reports(results, output_dir)
+
+    print(f"\n{'Backend':<8} {'Index':<9} {'Params':<38} {'Recall':>7} {'QPS':>9}")
+    for row in rows:
+        params = ", ".join(f"{key}={value}" for key, value in row['params'].items())
+        print(f"{row['backend']:<8} {row['index_type']:<9} {params:<38} {row['recall_at_k']:>7.4f} {row['qps']:>9.0f}")
+
+    print("\n✅ Benchmark complete!")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Build the content-based (TF-IDF) resource index for cold-start recommendations.
+
+Features:
+    - Reads the Resource catalog exported by export_data.py (resources.jsonl)
+    - Fits the TF-IDF vectorizer and stores L2-normalized item vectors
+      (serving/content_recommender.py)
+    - Prints the top resources for a few example profiles as a sanity check
+
+Usage:
+    python build_content_index.py
+    python build_content_index.py --input ../data/raw/resources.jsonl --output ../models/content_index
+"""
+
+import sys
+import time
+import argparse
+import pandas as pd
+from pathlib import Path
+
+ML_DIR = Path(__file__).resolve().parent.parent
+
+# Index is shared with the serving image
+sys.path.append(str(ML_DIR / 'serving'))
+from content_recommender import ContentIndex
+
+EXAMPLE_PROFILES = [
+    ({'PHQ9': 'severe'}, None),
+    ({'GAD7': 'moderate'}, 'academic_stress'),
+    ({}, 'sleep'),
+]
+
+
+def load_resources(path):
+    df = pd.read_json(path, lines=True)
+    if 'tags' not in df:
+        df['tags'] = [[] for _ in range(len(df))]
+    df['tags'] = [list(tags) if isinstance(tags, (list, tuple)) else [] for tags in df['tags']]
+    return df.fillna('').to_dict('records')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the TF-IDF resource index')
+    parser.add_argument('--input', default=str(ML_DIR / 'data' / 'raw' / 'resources.jsonl'))
+    parser.add_argument('--output', default=str(ML_DIR / 'models' / 'content_index'))
+    parser.add_argument('--max-features', type=int, default=50000, help='Vocabulary size cap')
+
+    args = parser.parse_args()
+
+    if not Path(args.input).exists():
+        print(f"❌ Resource catalog not found at {args.input} (run export_data.py)")
+        return
+
+    resources = load_resources(args.input)
+    start = time.perf_counter()
+    index = ContentIndex.build(resources, max_features=args.max_features)
+    index.save(args.output)
+    print(f"✅ Indexed {index.n_items} resources, {index.item_vectors.shape[1]} terms "
+          f"in {time.perf_counter() - start:.2f}s -> {args.output}")
+
+    titles = {resource['resource_id']: resource['title'] for resource in resources}
+    for screenings, intent in EXAMPLE_PROFILES:
+        top = index.recommend(screenings, intent, k=3)
+        print(f"\n  {screenings or ''} {intent or ''}")
+        for resource_id, score in top:
+            print(f"    {score:.3f}  {titles.get(resource_id, resource_id)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,467 @@
+"""
+Chat corpus loading and shared tokenization cache for the transformer trainers.
+
+Features:
+    - Reads synthetic_chats.csv or a sharded corpus directory
+      (part-*.parquet / part-*.jsonl from generate_synthetic_chats.py --sharded)
+    - Tokenizes each message once, unpadded, and stores input ids and
+      attention masks as flat int32 files plus int64 offsets
+    - Cache entries are keyed by a hash of the corpus, the tokenizer
+      (class, vocab, lowercasing) and max_length, so the risk detector,
+      intent classifier and any evaluation tooling share one entry
+    - Entries are memory-mapped on read: no re-tokenizing, no copy into RAM,
+      and concurrent trainers share the page cache
+    - Entries are built in a temp directory and renamed into place, so
+      trainers started in parallel never see a partial entry
+    - Training input pipeline: rows are zero-copy tensor views over the
+      memory-mapped ids, padded per batch by DynamicPaddingCollator, with
+      length-grouped batches (LengthGroupedSampler) so short messages are
+      not padded to the longest one in the split
+
+Usage:
+    python chat_data.py --input data/raw/synthetic_chats.csv
+    python chat_data.py --input data/raw/synthetic_chats --tokenizer distilbert-base-uncased
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from sklearn.model_selection import train_test_split
+
+try:
+    import torch
+    TORCH_AVAILABLE = True
+except ImportError:
+    TORCH_AVAILABLE = False
+
+try:
+    from transformers import Trainer
+    TRANSFORMERS_AVAILABLE = True
+except ImportError:
+    TRANSFORMERS_AVAILABLE = False
+
+ML_DIR = Path(__file__).resolve().parent.parent
+TOKEN_CACHE_DIR = ML_DIR / 'data' / 'tokenized'
+
+TOKENIZER_NAME = 'distilbert-base-uncased'
+MAX_LENGTH = 128
+TOKENIZE_BATCH_SIZE = 10000
+
+# Hex digits of the cache key used as the entry directory name
+KEY_LENGTH = 16
+
+# Batches are formed from length-sorted windows of this many batches
+MEGA_BATCH_MULT = 50
+PAD_TO_MULTIPLE_OF = 8
+
+RISK_LABEL_MAP = {
+    'no-risk': 0,
+    'low': 1,
+    'medium': 2,
+    'high': 3,
+    'emergency': 4
+}
+
+
+def find_chats_source(raw_dir):
+    """synthetic_chats.csv if present, else the sharded synthetic_chats/ directory"""
+    raw_dir = Path(raw_dir)
+    csv_path = raw_dir / 'synthetic_chats.csv'
+    if csv_path.exists():
+        return csv_path
+    shard_dir = raw_dir / 'synthetic_chats'
+    if chat_shards(shard_dir):
+        return shard_dir
+    return csv_path
+
+
+def chat_shards(shard_dir):
+    shard_dir = Path(shard_dir)
+    if not shard_dir.is_dir():
+        return []
+    return sorted(path for path in shard_dir.glob('part-*') if path.suffix in ('.parquet', '.jsonl'))
+
+
+def load_chats(source, columns=('message', 'risk_level', 'intent')):
+    """Load a chat corpus from a CSV file or a shard directory"""
+    source = Path(source)
+    if source.is_dir():
+        frames = []
+        for path in chat_shards(source):
+            if path.suffix == '.parquet':
+                frames.append(pd.read_parquet(path, columns=list(columns)))
+            else:
+                frames.append(pd.read_json(path, lines=True)[list(columns)])
+        if not frames:
+            raise FileNotFoundError(f"No chat shards found in {source}")
+        return pd.concat(frames, ignore_index=True)
+    return pd.read_csv(source, usecols=list(columns))
+
+
+def split_indices(labels, test_size=0.2, seed=42):
+    """
+    Stratified train/validation row indices.
+
+    Same partition as calling train_test_split on the texts and labels
+    directly, so trainers and evaluation agree on the validation set.
+    """
+    labels = np.asarray(labels)
+    return train_test_split(np.arange(len(labels)), test_size=test_size, stratify=labels, random_state=seed)
+
+
+def corpus_hash(messages):
+    digest = hashlib.sha256()
+    for message in messages:
+        digest.update(str(message).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def tokenizer_hash(tokenizer):
+    """Identity of a tokenizer by what determines its output, not where it was loaded from"""
+    payload = {
+        'class': type(tokenizer).__name__,
+        'vocab': sorted(tokenizer.get_vocab().items()),
+        'do_lower_case': getattr(tokenizer, 'do_lower_case', None),
+    }
+    return hashlib.sha256(json.dumps(payload).encode()).hexdigest()
+
+
+def cache_key(messages, tokenizer, max_length=MAX_LENGTH):
+    payload = f"{corpus_hash(messages)}:{tokenizer_hash(tokenizer)}:{max_length}"
+    return hashlib.sha256(payload.encode()).hexdigest()[:KEY_LENGTH]
+
+
+class TokenizedCorpus:
+    """
+    Memory-mapped, unpadded token ids and attention masks for a corpus.
+
+    Message i spans input_ids[offsets[i]:offsets[i + 1]]. The token files
+    are mapped copy-on-write, so row slices are writable views that
+    torch.from_numpy can wrap without copying, while the files on disk are
+    never modified.
+    """
+
+    def __init__(self, entry_dir):
+        self.entry_dir = Path(entry_dir)
+        with open(self.entry_dir / 'meta.json') as f:
+            self.meta = json.load(f)
+        self.offsets = np.load(self.entry_dir / 'offsets.npy', mmap_mode='r')
+        n_tokens = int(self.offsets[-1])
+        self.input_ids = np.memmap(self.entry_dir / 'input_ids.bin', dtype=np.int32, mode='c', shape=(n_tokens,))
+        self.attention_mask = np.memmap(self.entry_dir / 'attention_mask.bin', dtype=np.int32, mode='c',
+                                        shape=(n_tokens,))
+        self.lengths = np.diff(self.offsets)
+
+    def __getstate__(self):
+        # Spawned dataloader workers re-map the files instead of receiving a pickled copy
+        return {'entry_dir': str(self.entry_dir)}
+
+    def __setstate__(self, state):
+        self.__init__(state['entry_dir'])
+
+    @property
+    def pad_token_id(self):
+        return self.meta['pad_token_id']
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def __getitem__(self, idx):
+        start, end = self.offsets[idx], self.offsets[idx + 1]
+        return self.input_ids[start:end], self.attention_mask[start:end]
+
+    def padded(self, indices, length=None):
+        """
+        Padded int64 (input_ids, attention_mask) matrices for a set of rows.
+
+        Args:
+            indices: Row indices
+            length: Pad/truncate to this length (default: longest row)
+        """
+        rows = [self[idx] for idx in np.asarray(indices)]
+        return pad_batch([ids for ids, _ in rows], [mask for _, mask in rows], self.pad_token_id, length)
+
+
+def truncate_row(ids, max_length):
+    """Cut a row to max_length tokens, keeping its final ([SEP]) token like the tokenizer does"""
+    if len(ids) <= max_length:
+        return ids
+    return np.concatenate([ids[:max_length - 1], ids[-1:]])
+
+
+def pad_batch(ids_rows, mask_rows, pad_token_id=0, length=None, pad_to_multiple_of=None, max_length=None):
+    """
+    Pad variable-length rows into int64 (input_ids, attention_mask) matrices.
+
+    Args:
+        ids_rows / mask_rows: Sequences of 1-D arrays
+        length: Pad/truncate to this length (default: longest row)
+        pad_to_multiple_of: Round the padded length up to a multiple of this
+        max_length: Sequence-length cap; longer rows are truncated with
+            truncate_row
+    """
+    if max_length:
+        ids_rows = [truncate_row(ids, max_length) for ids in ids_rows]
+        mask_rows = [mask[:max_length] for mask in mask_rows]
+    if length is None:
+        length = max((len(ids) for ids in ids_rows), default=0)
+        if pad_to_multiple_of:
+            length = -(-length // pad_to_multiple_of) * pad_to_multiple_of
+        if max_length:
+            length = min(length, max_length)
+    input_ids = np.full((len(ids_rows), length), pad_token_id, dtype=np.int64)
+    attention_mask = np.zeros((len(ids_rows), length), dtype=np.int64)
+    for row, (ids, mask) in enumerate(zip(ids_rows, mask_rows)):
+        n = min(len(ids), length)
+        input_ids[row, :n] = ids[:n]
+        attention_mask[row, :n] = mask[:n]
+    return input_ids, attention_mask
+
+
+def length_grouped_indices(lengths, batch_size, rng, mega_batch_mult=MEGA_BATCH_MULT):
+    """
+    Shuffled index order whose consecutive batch_size runs have similar lengths.
+
+    Indices are shuffled, cut into windows of mega_batch_mult batches and
+    sorted by length (descending) within each window; the resulting batches
+    are shuffled, except that the batch holding the longest row goes first
+    so an out-of-memory batch size fails on the first step.
+    """
+    lengths = np.asarray(lengths)
+    order = rng.permutation(len(lengths))
+    window = batch_size * mega_batch_mult
+    for start in range(0, len(order), window):
+        chunk = order[start:start + window]
+        order[start:start + window] = chunk[np.argsort(-lengths[chunk], kind='stable')]
+
+    batches = [order[start:start + batch_size] for start in range(0, len(order), batch_size)]
+    if not batches:
+        return order
+    longest = int(np.argmax([lengths[batch[0]] for batch in batches]))
+    rest = [batches[i] for i in rng.permutation(len(batches)) if i != longest]
+    return np.concatenate([batches[longest]] + rest)
+
+
+class LengthGroupedSampler:
+    """Sampler yielding length_grouped_indices, reshuffled every epoch"""
+
+    def __init__(self, lengths, batch_size, seed=42, mega_batch_mult=MEGA_BATCH_MULT):
+        self.lengths = np.asarray(lengths)
+        self.batch_size = batch_size
+        self.seed = seed
+        self.mega_batch_mult = mega_batch_mult
+        self.epoch = 0
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def __iter__(self):
+        rng = np.random.default_rng([self.seed, self.epoch])
+        self.epoch += 1
+        return iter(length_grouped_indices(self.lengths, self.batch_size, rng, self.mega_batch_mult).tolist())
+
+    def __len__(self):
+        return len(self.lengths)
+
+
+class DynamicPaddingCollator:
+    """
+    Pads each batch to its own longest row (rounded up to pad_to_multiple_of),
+    optionally capping rows at max_length tokens.
+    """
+
+    def __init__(self, pad_token_id=0, pad_to_multiple_of=PAD_TO_MULTIPLE_OF, max_length=None):
+        self.pad_token_id = pad_token_id
+        self.pad_to_multiple_of = pad_to_multiple_of
+        self.max_length = max_length
+
+    def __call__(self, features):
+        input_ids, attention_mask = pad_batch(
+            [feature['input_ids'].numpy() for feature in features],
+            [feature['attention_mask'].numpy() for feature in features],
+            self.pad_token_id, pad_to_multiple_of=self.pad_to_multiple_of, max_length=self.max_length
+        )
+        batch = {'input_ids': torch.from_numpy(input_ids), 'attention_mask': torch.from_numpy(attention_mask)}
+        for key in features[0]:
+            if key not in batch:
+                batch[key] = torch.tensor([int(feature[key]) for feature in features])
+        return batch
+
+
+def build_token_cache(messages, tokenizer, entry_dir, max_length=MAX_LENGTH, batch_size=TOKENIZE_BATCH_SIZE):
+    """Tokenize messages in batches, streaming ids and masks to flat int32 files"""
+    entry_dir = Path(entry_dir)
+    entry_dir.mkdir(parents=True, exist_ok=True)
+    offsets = [0]
+
+    with open(entry_dir / 'input_ids.bin', 'wb') as ids_file, \
+            open(entry_dir / 'attention_mask.bin', 'wb') as mask_file:
+        for start in range(0, len(messages), batch_size):
+            batch = [str(message) for message in messages[start:start + batch_size]]
+            encodings = tokenizer(batch, truncation=True, padding=False, max_length=max_length)
+            for ids, mask in zip(encodings['input_ids'], encodings['attention_mask']):
+                ids_file.write(np.asarray(ids, dtype=np.int32).tobytes())
+                mask_file.write(np.asarray(mask, dtype=np.int32).tobytes())
+                offsets.append(offsets[-1] + len(ids))
+
+    np.save(entry_dir / 'offsets.npy', np.asarray(offsets, dtype=np.int64))
+    with open(entry_dir / 'meta.json', 'w') as f:
+        json.dump({
+            'n_messages': len(messages),
+            'n_tokens': offsets[-1],
+            'max_length': max_length,
+            'tokenizer': getattr(tokenizer, 'name_or_path', type(tokenizer).__name__),
+            'pad_token_id': getattr(tokenizer, 'pad_token_id', None) or 0,
+        }, f, indent=2)
+
+
+def load_tokenized(messages, tokenizer, max_length=MAX_LENGTH, cache_dir=TOKEN_CACHE_DIR):
+    """
+    Tokenized corpus for messages, from the cache or built and cached now.
+
+    Args:
+        messages: Sequence of message strings (row order is preserved)
+        tokenizer: Hugging Face tokenizer (or anything with __call__ and get_vocab)
+        max_length: Truncation length
+        cache_dir: Directory holding cache entries
+
+    Returns:
+        TokenizedCorpus
+    """
+    if len(messages) == 0:
+        raise ValueError("Cannot tokenize an empty corpus")
+
+    messages = list(messages)
+    cache_dir = Path(cache_dir)
+    entry_dir = cache_dir / cache_key(messages, tokenizer, max_length)
+    if (entry_dir / 'meta.json').exists():
+        print(f"✅ Using cached tokens: {entry_dir}")
+        return TokenizedCorpus(entry_dir)
+
+    print(f"Tokenizing {len(messages)} messages (cache miss)...")
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(prefix=f'.{entry_dir.name}-', dir=cache_dir))
+    try:
+        build_token_cache(messages, tokenizer, tmp_dir, max_length)
+        try:
+            os.replace(tmp_dir, entry_dir)
+        except OSError:
+            # Another trainer finished the same entry first
+            if not (entry_dir / 'meta.json').exists():
+                raise
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    print(f"✅ Cached tokens: {entry_dir}")
+    return TokenizedCorpus(entry_dir)
+
+
+class ChatDataset:
+    """
+    Map-style torch dataset over rows of a TokenizedCorpus.
+
+    By default items are unpadded zero-copy views of the memory-mapped
+    token ids, to be padded per batch by DynamicPaddingCollator. With
+    pad_to, every item is padded to that length instead (the static
+    padding the trainers used before).
+
+    labels is one array (items get 'labels') or a dict of arrays for
+    multi-task training (items get one key per entry).
+    """
+
+    def __init__(self, corpus, indices, labels, pad_to=None):
+        if not TORCH_AVAILABLE:
+            raise ImportError("torch is required for ChatDataset")
+        self.corpus = corpus
+        self.indices = np.asarray(indices)
+        if not isinstance(labels, dict):
+            labels = {'labels': labels}
+        self.labels = {name: np.asarray(values) for name, values in labels.items()}
+        self.pad_to = pad_to
+
+    @property
+    def lengths(self):
+        return self.corpus.lengths[self.indices]
+
+    def __getitem__(self, idx):
+        if self.pad_to:
+            input_ids, attention_mask = (rows[0] for rows in self.corpus.padded([self.indices[idx]], self.pad_to))
+        else:
+            input_ids, attention_mask = self.corpus[self.indices[idx]]
+        item = {'input_ids': torch.from_numpy(input_ids), 'attention_mask': torch.from_numpy(attention_mask)}
+        for name, values in self.labels.items():
+            item[name] = torch.tensor(values[idx])
+        return item
+
+    def __len__(self):
+        return len(self.indices)
+
+
+if TRANSFORMERS_AVAILABLE:
+    class ChatTrainer(Trainer):
+        """
+        Trainer using the dataset's known token lengths for group_by_length.
+
+        The stock sampler would iterate the whole dataset to measure lengths;
+        ChatDataset already has them from the token cache offsets.
+
+        A length cap on the DynamicPaddingCollator (--cpu-perf) only applies
+        to training batches: evaluation and prediction see full-length
+        inputs, so validation metrics and the emergency-recall gate match
+        what serving sees.
+        """
+
+        def _get_train_sampler(self, *args, **kwargs):
+            if self.args.group_by_length and hasattr(self.train_dataset, 'lengths'):
+                batch_size = self.args.train_batch_size * self.args.gradient_accumulation_steps
+                return LengthGroupedSampler(self.train_dataset.lengths, batch_size, self.args.seed)
+            return super()._get_train_sampler(*args, **kwargs)
+
+        def _uncapped_dataloader(self, get_dataloader, dataset):
+            collator = self.data_collator
+            if isinstance(collator, DynamicPaddingCollator) and collator.max_length:
+                self.data_collator = DynamicPaddingCollator(collator.pad_token_id, collator.pad_to_multiple_of)
+            try:
+                return get_dataloader(dataset)
+            finally:
+                self.data_collator = collator
+
+        def get_eval_dataloader(self, eval_dataset=None):
+            return self._uncapped_dataloader(super().get_eval_dataloader, eval_dataset)
+
+        def get_test_dataloader(self, test_dataset):
+            return self._uncapped_dataloader(super().get_test_dataloader, test_dataset)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pre-tokenize the chat corpus into the shared cache')
+    parser.add_argument('--input', default='data/raw/synthetic_chats.csv', help='Chat CSV or shard directory')
+    parser.add_argument('--tokenizer', default=TOKENIZER_NAME, help='Hugging Face tokenizer name or path')
+    parser.add_argument('--max-length', type=int, default=MAX_LENGTH, help='Truncation length')
+    parser.add_argument('--cache-dir', default=str(TOKEN_CACHE_DIR), help='Token cache directory')
+
+    args = parser.parse_args()
+
+    from transformers import DistilBertTokenizer
+
+    source = ML_DIR / args.input
+    df = load_chats(source, columns=('message',))
+    print(f"Loaded {len(df)} chat samples from {source}")
+
+    tokenizer = DistilBertTokenizer.from_pretrained(args.tokenizer)
+    corpus = load_tokenized(df['message'].tolist(), tokenizer, args.max_length, args.cache_dir)
+
+    lengths = corpus.lengths
+    print(f"Tokens: {int(lengths.sum())} "
+          f"(mean {lengths.mean():.1f}, p95 {np.percentile(lengths, 95):.0f}, max {lengths.max()} per message)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+"""
+CPU performance mode for the chat transformer trainers.
+
+Features:
+    - Explicit intra-op / inter-op thread counts (defaults to the CPUs this
+      process may run on, so it respects run_pipeline.py's stage_cpus)
+    - bf16 autocast where the CPU has native bf16 (AVX512-BF16 / AMX)
+    - Optional torch.compile
+    - Sequence-length cap for training batches from a percentile of the
+      corpus token lengths (rows above it are truncated per batch, keeping
+      [SEP]); evaluation stays uncapped, see chat_data.ChatTrainer
+    - Gradient accumulation to reach an effective batch size
+    - Benchmark: a fixed number of training steps per configuration,
+      reporting samples/sec against the fp32 eager baseline
+
+Settings live in params.yaml (cpu_perf section); the trainers apply them
+with --cpu-perf and run the benchmark with --benchmark.
+"""
+
+import os
+import json
+import time
+import numpy as np
+from pathlib import Path
+
+import torch
+
+from chat_data import DynamicPaddingCollator, LengthGroupedSampler, PAD_TO_MULTIPLE_OF
+
+DEFAULT_CPU_PERF = {
+    'num_threads': 0,            # 0 = CPUs available to this process
+    'interop_threads': 1,
+    'bf16': 'auto',              # true / false / auto (only where natively supported)
+    'compile': False,
+    'length_percentile': 99,     # sequence-length cap; 0 disables
+    'effective_batch_size': 32,
+}
+
+BENCHMARK_STEPS = 20
+BENCHMARK_WARMUP = 3
+
+
+def cpu_perf_config(config):
+    """params.yaml cpu_perf section merged over the defaults"""
+    return {**DEFAULT_CPU_PERF, **(config.get('cpu_perf') or {})}
+
+
+def available_cpus():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def bf16_supported():
+    """True if the CPU executes bf16 matmuls natively (AVX512-BF16 or AMX)"""
+    for check in ('_is_amx_tile_supported', '_is_avx512_bf16_supported'):
+        try:
+            if getattr(torch.cpu, check)():
+                return True
+        except (AttributeError, RuntimeError):
+            continue
+    return False
+
+
+def resolve_bf16(setting):
+    if setting == 'auto':
+        return bf16_supported()
+    return bool(setting)
+
+
+def configure_threads(num_threads=0, interop_threads=1):
+    """
+    Set torch thread pools; returns the intra-op thread count used.
+
+    Inter-op threads can only be set once per process, before any parallel
+    work, so a failure there is ignored.
+    """
+    num_threads = num_threads or available_cpus()
+    torch.set_num_threads(num_threads)
+    try:
+        torch.set_num_interop_threads(interop_threads)
+    except RuntimeError:
+        pass
+    return num_threads
+
+
+def length_cap(lengths, percentile, multiple=PAD_TO_MULTIPLE_OF):
+    """
+    Sequence-length cap covering `percentile` % of messages, rounded up to
+    a multiple of `multiple` (None if percentile is 0 or nothing is cut).
+    """
+    lengths = np.asarray(lengths)
+    if not percentile or len(lengths) == 0:
+        return None
+    cap = int(np.ceil(np.percentile(lengths, percentile) / multiple) * multiple)
+    return cap if cap < lengths.max() else None
+
+
+def accumulation_steps(effective_batch_size, batch_size):
+    return max(1, int(round((effective_batch_size or batch_size) / batch_size)))
+
+
+def cpu_training_setup(perf_config, lengths, batch_size):
+    """
+    Apply thread settings and work out the CPU training configuration.
+
+    Args:
+        perf_config: cpu_perf_config() output
+        lengths: Token lengths of the training split
+        batch_size: Per-step batch size
+
+    Returns:
+        (TrainingArguments overrides, sequence-length cap or None)
+    """
+    threads = configure_threads(perf_config['num_threads'], perf_config['interop_threads'])
+    bf16 = resolve_bf16(perf_config['bf16'])
+    cap = length_cap(lengths, perf_config['length_percentile'])
+    steps = accumulation_steps(perf_config['effective_batch_size'], batch_size)
+
+    coverage = np.mean(np.asarray(lengths) <= cap) if cap else 1.0
+    print(f"CPU mode: {threads} threads, bf16={'on' if bf16 else 'off'}, "
+          f"compile={'on' if perf_config['compile'] else 'off'}, "
+          f"length cap={cap or 'none'} ({coverage:.1%} of messages untruncated), "
+          f"grad accumulation={steps} (effective batch {steps * batch_size})")
+
+    overrides = {
+        'bf16': bf16,
+        'torch_compile': bool(perf_config['compile']),
+        'gradient_accumulation_steps': steps,
+    }
+    return overrides, cap
+
+
+def benchmark_configurations(perf_config):
+    """Cumulative configurations: baseline, then each setting switched on in turn"""
+    threads = perf_config['num_threads'] or available_cpus()
+    configs = [
+        {'name': 'fp32 eager (baseline)', 'threads': None, 'bf16': False, 'cap': False, 'compile': False},
+        {'name': f'+ {threads} threads', 'threads': threads, 'bf16': False, 'cap': False, 'compile': False},
+        {'name': '+ length cap', 'threads': threads, 'bf16': False, 'cap': True, 'compile': False},
+    ]
+    if resolve_bf16(perf_config['bf16']):
+        configs.append({**configs[-1], 'name': '+ bf16 autocast', 'bf16': True})
+    if perf_config['compile']:
+        configs.append({**configs[-1], 'name': '+ torch.compile', 'compile': True})
+    return configs
+
+
+def run_benchmark(make_model, dataset, pad_token_id, batch_size, perf_config, steps=BENCHMARK_STEPS,
+                  warmup=BENCHMARK_WARMUP, output_path=None):
+    """
+    Time `steps` training steps (forward, backward, AdamW) per configuration.
+
+    Args:
+        make_model: Callable returning a fresh model whose forward returns
+            an object or dict with a loss
+        dataset: ChatDataset for the training split
+
+    Returns:
+        List of result dicts with samples_per_sec and speedup
+    """
+    default_threads = torch.get_num_threads()
+    cap = length_cap(dataset.lengths, perf_config['length_percentile'])
+    results = []
+
+    for config in benchmark_configurations(perf_config):
+        torch.set_num_threads(config['threads'] or default_threads)
+        torch.manual_seed(0)
+        model = make_model()
+        model.train()
+        if config['compile']:
+            model = torch.compile(model)
+        optimizer = torch.optim.AdamW(model.parameters(), lr=5e-5)
+        loader = torch.utils.data.DataLoader(
+            dataset, batch_size=batch_size,
+            sampler=LengthGroupedSampler(dataset.lengths, batch_size, seed=0),
+            collate_fn=DynamicPaddingCollator(pad_token_id, max_length=cap if config['cap'] else None)
+        )
+
+        samples, start = 0, None
+        for step, batch in enumerate(loader):
+            if step == warmup:
+                start = time.perf_counter()
+            if step >= warmup + steps:
+                break
+            with torch.autocast(device_type='cpu', dtype=torch.bfloat16, enabled=config['bf16']):
+                outputs = model(**batch)
+            loss = outputs['loss'] if isinstance(outputs, dict) else outputs.loss
+            loss.backward()
+            optimizer.step()
+            optimizer.zero_grad()
+            if step >= warmup:
+                samples += len(batch['input_ids'])
+        if start is None:
+            raise ValueError(f"Training split too small for {warmup + steps} benchmark steps")
+
+        elapsed = time.perf_counter() - start
+        results.append({
+            'config': config['name'],
+            'samples_per_sec': samples / elapsed,
+            'seconds': elapsed,
+            'steps': steps,
+        })
+        print(f"  {config['name']:<24} {samples / elapsed:>8.1f} samples/s")
+
+    baseline = results[0]['samples_per_sec']
+    for result in results:
+        result['speedup'] = result['samples_per_sec'] / baseline
+
+    print(f"\n{'Configuration':<24} {'Samples/s':>10} {'Speedup':>8}")
+    for result in results:
+        print(f"{result['config']:<24} {result['samples_per_sec']:>10.1f} {result['speedup']:>7.2f}x")
+
+    if output_path:
+        output_path = Path(output_path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(output_path, 'w') as f:
+            json.dump({'batch_size': batch_size, 'length_cap': cap, 'results': results}, f, indent=2)
+        print(f"Results saved to: {output_path}")
+
+    torch.set_num_threads(default_threads)
+    return results
@@ -3,8 +3,20 @@ Evaluate trained screening models on test set.
 
 Computes comprehensive metrics and generates visualizations.
 
+Inference benchmark (screening models and every chat-model backend found:
+multi-task, risk detector, intent classifier):
+    - Warm-up calls, then repeated timed calls per batch size (1, 8, 32, 256)
+    - Per-row latency percentiles (p50/p95/p99), mean batch latency and
+      throughput, written to eval_metrics.json next to the accuracy
+      metrics so the DVC evaluate stage tracks both
+    - --chat-only benchmarks just the chat models into chat_benchmark.json
+      (the DVC benchmark_chat stage), so the screening evaluation does not
+      depend on the chat models being trained
+
 Usage:
     python evaluate.py --model-dir ../models --output-dir ../metrics
+    python evaluate.py --repeats 50 --batch-sizes 1 8 32 256 --skip-chat
+    python evaluate.py --chat-only
 """
 
 import os
@@ -23,6 +35,16 @@ from sklearn.metrics import (
 )
 import time
 
+from processed_data import read_processed
+
+BENCHMARK_BATCH_SIZES = (1, 8, 32, 256)
+BENCHMARK_WARMUP = 3
+BENCHMARK_REPEATS = 20
+LATENCY_PERCENTILES = (50, 95, 99)
+
+# Chat backends as serving loads them (serving/app.py)
+CHAT_BACKENDS = ('chat_multitask', 'risk_detector', 'intent_classifier')
+
 
 def load_model(model_path):
     """Load trained model"""
@@ -35,7 +57,7 @@ def load_test_data(data_type='PHQ9'):
     processed_dir = script_dir.parent / 'data' / 'processed'
     file_suffix = 'phq9' if data_type == 'PHQ9' else 'gad7'
     
-    test_df = pd.read_csv(processed_dir / f'test_{file_suffix}.csv')
+    test_df = read_processed(processed_dir / f'test_{file_suffix}')
     
     y_test = test_df['severity_label']
     X_test = test_df.drop(['severity_label'], axis=1, errors='ignore')
@@ -43,6 +65,110 @@ def load_test_data(data_type='PHQ9'):
     return X_test, y_test
 
 
+def take_rows(rows, n):
+    """First n rows of a DataFrame or list, cycling when there are fewer"""
+    idx = np.resize(np.arange(len(rows)), n)
+    if isinstance(rows, pd.DataFrame):
+        return rows.iloc[idx].reset_index(drop=True)
+    return [rows[i] for i in idx]
+
+
+def benchmark_inference(predict_fn, rows, batch_sizes=BENCHMARK_BATCH_SIZES, warmup=BENCHMARK_WARMUP,
+                        repeats=BENCHMARK_REPEATS):
+    """
+    Time predict_fn per batch size: warm-up calls, then `repeats` timed calls.
+
+    Returns:
+        {batch size (str): per_row_ms_p50/p95/p99, batch_ms_mean, rows_per_sec}
+    """
+    results = {}
+    for batch_size in batch_sizes:
+        batch = take_rows(rows, batch_size)
+        for _ in range(warmup):
+            predict_fn(batch)
+
+        seconds = np.empty(repeats)
+        for i in range(repeats):
+            start = time.perf_counter()
+            predict_fn(batch)
+            seconds[i] = time.perf_counter() - start
+
+        per_row_ms = seconds / batch_size * 1000
+        results[str(batch_size)] = {
+            **{f'per_row_ms_p{q}': float(np.percentile(per_row_ms, q)) for q in LATENCY_PERCENTILES},
+            'batch_ms_mean': float(seconds.mean() * 1000),
+            'rows_per_sec': float(batch_size * repeats / seconds.sum()),
+        }
+    return results
+
+
+def print_benchmark(benchmark):
+    print(f"  {'Batch':>6} {'p50 ms/row':>11} {'p95 ms/row':>11} {'p99 ms/row':>11} {'Rows/s':>10}")
+    for batch_size, row in benchmark.items():
+        print(f"  {batch_size:>6} {row['per_row_ms_p50']:>11.3f} {row['per_row_ms_p95']:>11.3f} "
+              f"{row['per_row_ms_p99']:>11.3f} {row['rows_per_sec']:>10,.0f}")
+
+
+def sequence_classifier(model_dir):
+    """Batch predict function for a single-task DistilBERT model, tokenized as serving does"""
+    import torch
+    from transformers import DistilBertForSequenceClassification, DistilBertTokenizer
+
+    tokenizer = DistilBertTokenizer.from_pretrained(model_dir)
+    model = DistilBertForSequenceClassification.from_pretrained(model_dir)
+    model.eval()
+
+    def predict(messages):
+        inputs = tokenizer(messages, return_tensors="pt", truncation=True, padding=True)
+        with torch.inference_mode():
+            return torch.softmax(model(**inputs).logits, dim=1)
+    return predict
+
+
+def load_chat_backend(name, model_dir):
+    """Batch predict function for one chat backend"""
+    if name == 'chat_multitask':
+        sys.path.append(str(Path(__file__).resolve().parent.parent / 'serving'))
+        from multitask import MultiTaskPredictor
+        return MultiTaskPredictor(model_dir).predict_batch
+    return sequence_classifier(model_dir)
+
+
+def load_chat_messages(n=max(BENCHMARK_BATCH_SIZES)):
+    """Up to n validation-split chat messages (None if no chat data)"""
+    from chat_data import RISK_LABEL_MAP, find_chats_source, load_chats, split_indices
+
+    source = find_chats_source(Path(__file__).parent.parent / 'data' / 'raw')
+    if not source.exists():
+        return None
+    df = load_chats(source)
+    _, val_idx = split_indices(df['risk_level'].map(RISK_LABEL_MAP))
+    return df['message'].iloc[val_idx[:n]].tolist()
+
+
+def benchmark_chat_models(model_dir, **benchmark_kwargs):
+    """Benchmark every chat backend present under model_dir"""
+    backends = [name for name in CHAT_BACKENDS if (model_dir / name).exists()]
+    if not backends:
+        print("No chat models found, skipping chat benchmark")
+        return {}
+    messages = load_chat_messages()
+    if not messages:
+        print("⚠️  No chat data found (run generate_synthetic_chats.py), skipping chat benchmark")
+        return {}
+
+    results = {}
+    for name in backends:
+        try:
+            predict_fn = load_chat_backend(name, model_dir / name)
+            print(f"\nBenchmarking {name}...")
+            results[name] = {'benchmark': benchmark_inference(predict_fn, messages, **benchmark_kwargs)}
+            print_benchmark(results[name]['benchmark'])
+        except Exception as e:
+            print(f"Error benchmarking {name}: {e}")
+    return results
+
+
 def plot_confusion_matrix(cm, labels, save_path):
     """Plot and save confusion matrix"""
     plt.figure(figsize=(8, 6))
@@ -56,7 +182,7 @@ def plot_confusion_matrix(cm, labels, save_path):
     print(f"Confusion matrix saved to: {save_path}")
 
 
-def evaluate_model(model, X_test, y_test, model_type='PHQ9'):
+def evaluate_model(model, X_test, y_test, model_type='PHQ9', **benchmark_kwargs):
     """
     Evaluate model performance.
     
@@ -65,11 +191,13 @@ def evaluate_model(model, X_test, y_test, model_type='PHQ9'):
     """
     print(f"\nEvaluating {model_type} model...")
     
-    # Measure inference latency
-    start = time.time()
     y_pred = model.predict(X_test)
     y_pred_proba = model.predict_proba(X_test)
-    latency = (time.time() - start) / len(X_test)
+    
+    # Benchmark inference (serving calls predict_proba)
+    benchmark = benchmark_inference(model.predict_proba, X_test, **benchmark_kwargs)
+    single = benchmark.get('1') or next(iter(benchmark.values()))
+    latency = single['per_row_ms_p50'] / 1000
     
     # Metrics
     accuracy = accuracy_score(y_test, y_pred)
@@ -102,6 +230,7 @@ def evaluate_model(model, X_test, y_test, model_type='PHQ9'):
         'recall_macro': float(recall_macro),
         'brier_score': float(brier),
         'inference_latency_ms': float(latency * 1000),
+        'benchmark': benchmark,
         'n_test_samples': len(X_test),
         'confusion_matrix': cm.tolist(),
         'per_class_metrics': {}
@@ -124,7 +253,8 @@ def evaluate_model(model, X_test, y_test, model_type='PHQ9'):
     print(f"  Precision (macro): {precision_macro:.4f}")
     print(f"  Recall (macro): {recall_macro:.4f}")
     print(f"  Brier Score: {brier:.4f}")
-    print(f"  Latency (avg): {latency*1000:.2f} ms")
+    print(f"  Latency (p50, single row): {latency*1000:.2f} ms")
+    print_benchmark(benchmark)
     
     # Check thresholds
     print(f"\nThreshold Checks:")
@@ -161,13 +291,29 @@ def main():
     parser = argparse.ArgumentParser(description='Evaluate screening models')
     parser.add_argument('--model-dir', default='../models', help='Model directory')
     parser.add_argument('--output-dir', default='../metrics', help='Output directory for metrics')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=list(BENCHMARK_BATCH_SIZES),
+                        help='Benchmark batch sizes')
+    parser.add_argument('--warmup', type=int, default=BENCHMARK_WARMUP, help='Untimed calls per batch size')
+    parser.add_argument('--repeats', type=int, default=BENCHMARK_REPEATS, help='Timed calls per batch size')
+    parser.add_argument('--skip-chat', action='store_true', help='Skip the chat model benchmark')
+    parser.add_argument('--chat-only', action='store_true',
+                        help='Only benchmark the chat models (written to chat_benchmark.json)')
     
     args = parser.parse_args()
+    benchmark_kwargs = dict(batch_sizes=args.batch_sizes, warmup=args.warmup, repeats=args.repeats)
     
     model_dir = Path(args.model_dir)
     output_dir = Path(args.output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
     
+    if args.chat_only:
+        chat_metrics = benchmark_chat_models(model_dir, **benchmark_kwargs)
+        metrics_file = output_dir / 'chat_benchmark.json'
+        with open(metrics_file, 'w') as f:
+            json.dump(chat_metrics, f, indent=2)
+        print(f"\n✅ Chat benchmark saved to: {metrics_file.absolute()}")
+        return
+    
     all_metrics = {}
     
     # Evaluate PHQ-9 model
@@ -176,7 +322,7 @@ def main():
         try:
             model_phq9 = load_model(phq9_model_path)
             X_test_phq9, y_test_phq9 = load_test_data('PHQ9')
-            metrics_phq9 = evaluate_model(model_phq9, X_test_phq9, y_test_phq9, 'PHQ9')
+            metrics_phq9 = evaluate_model(model_phq9, X_test_phq9, y_test_phq9, 'PHQ9', **benchmark_kwargs)
             all_metrics['PHQ9'] = metrics_phq9
             
             # Plot confusion matrix
@@ -198,7 +344,7 @@ def main():
         try:
             model_gad7 = load_model(gad7_model_path)
             X_test_gad7, y_test_gad7 = load_test_data('GAD7')
-            metrics_gad7 = evaluate_model(model_gad7, X_test_gad7, y_test_gad7, 'GAD7')
+            metrics_gad7 = evaluate_model(model_gad7, X_test_gad7, y_test_gad7, 'GAD7', **benchmark_kwargs)
             all_metrics['GAD7'] = metrics_gad7
             
             # Plot confusion matrix
@@ -214,6 +360,10 @@ def main():
     else:
         print(f"GAD-7 model not found at {gad7_model_path}")
     
+    # Benchmark chat models
+    if not args.skip_chat:
+        all_metrics['chat_models'] = benchmark_chat_models(model_dir, **benchmark_kwargs)
+    
     # Save metrics
     metrics_file = output_dir / 'eval_metrics.json'
     with open(metrics_file, 'w') as f:
@@ -227,8 +377,14 @@ def main():
     print("EVALUATION SUMMARY")
     print(f"{'='*60}")
     for model_type, metrics in all_metrics.items():
+        if 'f1_macro' not in metrics:
+            continue
         status = "✅ PASSED" if metrics['thresholds_met'] else "⚠️  NEEDS IMPROVEMENT"
         print(f"{model_type}: {status} (F1={metrics['f1_macro']:.4f})")
+    for name, metrics in all_metrics.get('chat_models', {}).items():
+        single = metrics['benchmark'].get('1')
+        if single:
+            print(f"{name}: p50 {single['per_row_ms_p50']:.1f} ms (batch 1)")
     print(f"{'='*60}")
 
 
@@ -3,35 +3,92 @@ Export screening and chat data from MongoDB to CSV/JSONL for ML training.
 
 Usage:
     python export_data.py --output-dir ../data/raw --consent-only
+    python export_data.py --output-dir ../data/raw --stream --format parquet
+    python export_data.py --output-dir ../data/raw --stream --incremental
 
 Features:
     - Filters by user consent
     - Anonymizes user IDs
-    - Masks PII using Presidio
+    - Masks PII using Presidio (parallel, prefiltered and cached; see pii_masking.py)
     - Exports screenings to CSV, chats to JSONL
+    - Streaming mode: consent is joined server-side with $lookup, documents
+      are read through a batched cursor and written to Parquet or JSONL
+      shards as they arrive, so memory stays flat regardless of collection
+      size. Screening answers are stored as a typed list<int8> column.
+      Shards land in dated partitions (screenings/date=YYYY-MM-DD/).
+    - Incremental mode: only records created after the persisted watermark
+      (export_watermark.json) are exported, into new part files next to the
+      existing ones; preprocess.py --incremental picks up just those.
+    - Streaming mode also exports RecommendationFeedback events
+      (recommendation_feedback/) for train_recommender.py
+    - Exports the Resource catalog (resources.jsonl, no user data) for
+      build_content_index.py
 """
 
 import os
 import sys
+import json
 import argparse
 import hashlib
 import pandas as pd
-from datetime import datetime
+import pyarrow as pa
+import pyarrow.parquet as pq
+from datetime import datetime, timezone
 from pathlib import Path
 from dotenv import load_dotenv
 from pymongo import MongoClient
 from presidio_analyzer import AnalyzerEngine
 from presidio_anonymizer import AnonymizerEngine
 
+from pii_masking import MaskingEngine
+
 # Load environment
 load_dotenv()
 
 # MongoDB connection
 MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/student-mental-health')
 
-# PII detection
-analyzer = AnalyzerEngine()
-anonymizer = AnonymizerEngine()
+# PII detection (created on first use by mask_pii)
+analyzer = None
+anonymizer = None
+
+# Streaming mode: documents per cursor round trip and rows per output shard
+CURSOR_BATCH_SIZE = 5000
+ROWS_PER_SHARD = 500000
+
+SHARD_FORMATS = {
+    'parquet': '.parquet',
+    'jsonl': '.jsonl',
+}
+
+SCREENING_SCHEMA = pa.schema([
+    ('user_hash', pa.string()),
+    ('type', pa.string()),
+    ('score', pa.int16()),
+    ('answers', pa.list_(pa.int8())),
+    ('risk_level', pa.string()),
+    ('timestamp', pa.timestamp('ms')),
+])
+
+# Export cutoff per collection, persisted between runs
+WATERMARK_FILE = 'export_watermark.json'
+
+CHAT_SCHEMA = pa.schema([
+    ('user_hash', pa.string()),
+    ('message', pa.string()),
+    ('sender', pa.string()),
+    ('timestamp', pa.timestamp('ms')),
+])
+
+FEEDBACK_SCHEMA = pa.schema([
+    ('user_hash', pa.string()),
+    ('resource_id', pa.string()),
+    ('action', pa.string()),
+    ('rating', pa.int8()),
+    ('time_spent', pa.int32()),
+    ('context', pa.string()),
+    ('timestamp', pa.timestamp('ms')),
+])
 
 
 def hash_id(user_id):
@@ -41,8 +98,11 @@ def hash_id(user_id):
 
 def mask_pii(text):
     """Mask PII in text using Presidio"""
+    global analyzer, anonymizer
     if not text or not isinstance(text, str):
         return text
+    if analyzer is None:
+        analyzer, anonymizer = AnalyzerEngine(), AnonymizerEngine()
     
     try:
         results = analyzer.analyze(text=text, language='en')
@@ -94,8 +154,8 @@ def export_screenings(db, output_dir, consent_only=True):
     return df
 
 
-def export_chat_logs(db, output_dir, consent_only=True):
-    """Export chat messages to JSONL"""
+def export_chat_logs(db, output_dir, consent_only=True, masker=None):
+    """Export chat messages to JSONL (masker: MaskingEngine, default serial mask_pii)"""
     print("Exporting chat logs...")
     
     # Get users with ML consent
@@ -113,11 +173,12 @@ def export_chat_logs(db, output_dir, consent_only=True):
         return
     
     # Transform and mask PII
+    masked_messages = mask_messages([msg['message'] for msg in messages], masker)
     records = []
-    for msg in messages:
+    for msg, masked in zip(messages, masked_messages):
         record = {
             'user_hash': hash_id(msg['userId']),
-            'message': mask_pii(msg['message']),
+            'message': masked,
             'sender': msg['sender'],
             'timestamp': msg['timestamp'].isoformat() if isinstance(msg['timestamp'], datetime) else str(msg['timestamp'])
         }
@@ -133,6 +194,410 @@ def export_chat_logs(db, output_dir, consent_only=True):
     return df
 
 
+def consent_stages(consent_field, consent_only=True):
+    """
+    Aggregation stages keeping only documents whose user granted consent.
+    
+    The join runs inside MongoDB (one indexed _id lookup per document), so
+    the consented user ids never have to be pulled into Python.
+    """
+    if not consent_only:
+        return []
+    
+    return [
+        {'$lookup': {
+            'from': 'users',
+            'let': {'uid': '$userId'},
+            'pipeline': [
+                {'$match': {'$expr': {'$eq': ['$_id', '$$uid']}, consent_field: True}},
+                {'$project': {'_id': 1}}
+            ],
+            'as': 'consent'
+        }},
+        {'$match': {'consent': {'$ne': []}}}
+    ]
+
+
+def time_window_stages(field, since=None, until=None):
+    """Match documents with since < field <= until (either bound optional)"""
+    bounds = {}
+    if since is not None:
+        bounds['$gt'] = since
+    if until is not None:
+        bounds['$lte'] = until
+    return [{'$match': {field: bounds}}] if bounds else []
+
+
+def screening_pipeline(consent_only=True, since=None, until=None):
+    """Aggregation pipeline returning export-ready screening documents"""
+    return (
+        time_window_stages('createdAt', since, until) +
+        consent_stages('mlDataConsent.screening.granted', consent_only)
+    ) + [
+        {'$project': {
+            '_id': 0,
+            'userId': 1,
+            'type': 1,
+            'score': 1,
+            # ScreeningResult stores [{qid, answer}]; plain numbers pass through
+            'answers': {'$map': {
+                'input': {'$ifNull': ['$answers', []]},
+                'as': 'a',
+                'in': {'$ifNull': ['$$a.answer', '$$a']}
+            }},
+            'riskLevel': {'$ifNull': ['$riskLevel', 'unknown']},
+            'createdAt': 1
+        }}
+    ]
+
+
+def chat_pipeline(consent_only=True, since=None, until=None):
+    """Aggregation pipeline returning export-ready chat documents"""
+    return (
+        time_window_stages('timestamp', since, until) +
+        consent_stages('mlDataConsent.chatLogs.granted', consent_only)
+    ) + [
+        {'$project': {'_id': 0, 'userId': 1, 'message': 1, 'sender': 1, 'timestamp': 1}}
+    ]
+
+
+def feedback_pipeline(consent_only=True, since=None, until=None):
+    """Aggregation pipeline returning export-ready recommendation feedback documents"""
+    return (
+        time_window_stages('timestamp', since, until) +
+        consent_stages('mlDataConsent.recommendations.granted', consent_only)
+    ) + [
+        {'$project': {
+            '_id': 0, 'userId': 1, 'resourceId': 1, 'action': 1, 'rating': 1,
+            'timeSpent': 1, 'context': 1, 'timestamp': 1
+        }}
+    ]
+
+
+class ShardWriter:
+    """
+    Incremental writer for numbered output shards.
+    
+    Records are appended in batches and rolled over into a new
+    <prefix>-NNNNN file every rows_per_shard rows. Parquet shards keep the
+    typed schema; JSONL shards are validated against it before writing.
+    """
+    
+    def __init__(self, output_dir, schema, fmt='parquet', rows_per_shard=ROWS_PER_SHARD, prefix='part'):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.schema = schema
+        self.fmt = fmt
+        self.rows_per_shard = rows_per_shard
+        self.prefix = prefix
+        self.rows = 0
+        self.paths = []
+        self._shard_rows = 0
+        self._writer = None
+    
+    def _open_shard(self):
+        path = self.output_dir / f'{self.prefix}-{len(self.paths):05d}{SHARD_FORMATS[self.fmt]}'
+        if self.fmt == 'parquet':
+            self._writer = pq.ParquetWriter(path, self.schema, compression='zstd')
+        else:
+            self._writer = open(path, 'w')
+        self.paths.append(path)
+        self._shard_rows = 0
+    
+    def _close_shard(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+    
+    def write(self, records):
+        """Append a list of record dicts"""
+        table = pa.Table.from_pylist(records, schema=self.schema)
+        offset = 0
+        while offset < len(table):
+            if self._writer is None or self._shard_rows >= self.rows_per_shard:
+                self._close_shard()
+                self._open_shard()
+            
+            part = table.slice(offset, min(self.rows_per_shard - self._shard_rows, len(table) - offset))
+            if self.fmt == 'parquet':
+                self._writer.write_table(part)
+            else:
+                for row in part.to_pylist():
+                    self._writer.write(json.dumps(row, default=lambda value: value.isoformat()) + '\n')
+            
+            self._shard_rows += len(part)
+            offset += len(part)
+        self.rows += len(table)
+    
+    def close(self):
+        self._close_shard()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+
+def partition_name(timestamp):
+    """Hive-style date partition for a record timestamp"""
+    if timestamp is None:
+        return 'date=unknown'
+    return f"date={timestamp:%Y-%m-%d}"
+
+
+def clear_shards(output_dir):
+    """Remove all part files (and emptied partitions) below an export directory"""
+    output_dir = Path(output_dir)
+    if not output_dir.exists():
+        return
+    for ext in SHARD_FORMATS.values():
+        for old in output_dir.rglob(f'part-*{ext}'):
+            old.unlink()
+    for partition in output_dir.glob('date=*'):
+        if partition.is_dir() and not any(partition.iterdir()):
+            partition.rmdir()
+
+
+class PartitionedShardWriter:
+    """
+    Route records into date=YYYY-MM-DD/ partitions by their timestamp.
+    
+    Each partition gets its own ShardWriter whose file names carry the run
+    id, so an incremental run adds files next to earlier ones instead of
+    overwriting them.
+    """
+    
+    def __init__(self, output_dir, schema, fmt='parquet', rows_per_shard=ROWS_PER_SHARD, run_id=None):
+        self.output_dir = Path(output_dir)
+        self.schema = schema
+        self.fmt = fmt
+        self.rows_per_shard = rows_per_shard
+        self.prefix = f'part-{run_id}' if run_id else 'part'
+        self.rows = 0
+        self._writers = {}
+    
+    @property
+    def paths(self):
+        return [path for writer in self._writers.values() for path in writer.paths]
+    
+    def write(self, records):
+        by_partition = {}
+        for record in records:
+            by_partition.setdefault(partition_name(record['timestamp']), []).append(record)
+        
+        for name, partition_records in by_partition.items():
+            if name not in self._writers:
+                self._writers[name] = ShardWriter(
+                    self.output_dir / name, self.schema, self.fmt, self.rows_per_shard, self.prefix
+                )
+            self._writers[name].write(partition_records)
+        self.rows += len(records)
+    
+    def close(self):
+        for writer in self._writers.values():
+            writer.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load_watermark(output_dir):
+    """Per-collection export cutoffs from earlier runs"""
+    path = Path(output_dir) / WATERMARK_FILE
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return {key: datetime.fromisoformat(value) for key, value in json.load(f).items()}
+
+
+def save_watermark(output_dir, collection, cutoff):
+    """Persist one collection's cutoff; written atomically after a successful export"""
+    path = Path(output_dir) / WATERMARK_FILE
+    watermark = {key: value.isoformat() for key, value in load_watermark(output_dir).items()}
+    watermark[collection] = cutoff.isoformat()
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(watermark, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def export_cutoff():
+    """Upper bound for this run (naive UTC, as pymongo returns dates)"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def stream_to_shards(cursor, to_records, writer, batch_size=CURSOR_BATCH_SIZE):
+    """Drain a cursor into a ShardWriter, converting one batch of documents at a time"""
+    batch = []
+    for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            writer.write(to_records(batch))
+            batch = []
+            print(f"  {writer.rows} records written")
+    if batch:
+        writer.write(to_records(batch))
+    return writer.rows
+
+
+def mask_messages(messages, masker=None):
+    """Mask a batch of messages with a MaskingEngine, or serially with mask_pii"""
+    if masker is None:
+        return [mask_pii(message) for message in messages]
+    return masker.mask(messages)
+
+
+def screening_records(docs):
+    return [
+        {
+            'user_hash': hash_id(doc['userId']),
+            'type': doc['type'],
+            'score': doc['score'],
+            'answers': doc['answers'],
+            'risk_level': doc['riskLevel'],
+            'timestamp': doc.get('createdAt')
+        }
+        for doc in docs
+    ]
+
+
+def chat_records(docs, masker=None):
+    masked_messages = mask_messages([doc['message'] for doc in docs], masker)
+    return [
+        {
+            'user_hash': hash_id(doc['userId']),
+            'message': masked,
+            'sender': doc['sender'],
+            'timestamp': doc.get('timestamp')
+        }
+        for doc, masked in zip(docs, masked_messages)
+    ]
+
+
+def feedback_records(docs):
+    return [
+        {
+            'user_hash': hash_id(doc['userId']),
+            'resource_id': str(doc['resourceId']),
+            'action': doc['action'],
+            'rating': doc.get('rating'),
+            'time_spent': int(doc.get('timeSpent') or 0),
+            'context': doc.get('context', 'dashboard'),
+            'timestamp': doc.get('timestamp')
+        }
+        for doc in docs
+    ]
+
+
+def export_collection_stream(collection, pipeline, to_records, schema, output_dir, name,
+                             fmt='parquet', batch_size=CURSOR_BATCH_SIZE,
+                             rows_per_shard=ROWS_PER_SHARD, incremental=False):
+    """
+    Stream one collection into output_dir/<name>/date=*/part-*.
+    
+    A full export replaces all earlier shards; an incremental one only reads
+    documents newer than the stored watermark. The watermark advances to
+    this run's cutoff once the shards are closed, so a failed run is simply
+    retried from the old watermark.
+    """
+    cutoff = export_cutoff()
+    since = load_watermark(output_dir).get(name) if incremental else None
+    shard_dir = Path(output_dir) / name
+    
+    if since is None:
+        clear_shards(shard_dir)
+        print(f"  Full export up to {cutoff:%Y-%m-%d %H:%M:%S}")
+    else:
+        print(f"  Exporting records after {since:%Y-%m-%d %H:%M:%S}")
+    
+    cursor = collection.aggregate(pipeline(since, cutoff), allowDiskUse=True, batchSize=batch_size)
+    run_id = f"{cutoff:%Y%m%dT%H%M%S}"
+    with PartitionedShardWriter(shard_dir, schema, fmt, rows_per_shard, run_id) as writer:
+        n_rows = stream_to_shards(cursor, to_records, writer, batch_size)
+    
+    save_watermark(output_dir, name, cutoff)
+    return n_rows, writer.paths
+
+
+def export_resources(db, output_dir):
+    """Export the resource catalog (titles, descriptions, categories, tags) to resources.jsonl"""
+    print("Exporting resources...")
+    cursor = db.resources.find({}, {'title': 1, 'description': 1, 'category': 1, 'type': 1, 'tags': 1})
+    records = [
+        {
+            'resource_id': str(doc['_id']),
+            'title': doc.get('title', ''),
+            'description': doc.get('description', ''),
+            'category': doc.get('category', ''),
+            'type': doc.get('type', ''),
+            'tags': list(doc.get('tags') or []),
+        }
+        for doc in cursor
+    ]
+    
+    output_path = Path(output_dir) / 'resources.jsonl'
+    tmp_path = output_path.with_suffix('.tmp')
+    with open(tmp_path, 'w') as f:
+        for record in records:
+            f.write(json.dumps(record) + '\n')
+    os.replace(tmp_path, output_path)
+    print(f"Saved {len(records)} resources to {output_path}")
+    return len(records)
+
+
+def export_screenings_stream(db, output_dir, consent_only=True, fmt='parquet',
+                             batch_size=CURSOR_BATCH_SIZE, rows_per_shard=ROWS_PER_SHARD,
+                             incremental=False):
+    """Stream screening results into output_dir/screenings/date=*/part-*.{parquet,jsonl}"""
+    print("Streaming screening data...")
+    n_rows, paths = export_collection_stream(
+        db.screeningresults,
+        lambda since, until: screening_pipeline(consent_only, since, until),
+        screening_records, SCREENING_SCHEMA, output_dir, 'screenings',
+        fmt, batch_size, rows_per_shard, incremental
+    )
+    print(f"Saved {n_rows} screening records ({len(paths)} new shards)")
+    return n_rows
+
+
+def export_chat_logs_stream(db, output_dir, consent_only=True, fmt='parquet',
+                            batch_size=CURSOR_BATCH_SIZE, rows_per_shard=ROWS_PER_SHARD,
+                            incremental=False, masker=None):
+    """Stream PII-masked chat messages into output_dir/chat_logs/date=*/part-*.{parquet,jsonl}"""
+    print("Streaming chat logs...")
+    n_rows, paths = export_collection_stream(
+        db.chatlogs,
+        lambda since, until: chat_pipeline(consent_only, since, until),
+        lambda docs: chat_records(docs, masker), CHAT_SCHEMA, output_dir, 'chat_logs',
+        fmt, batch_size, rows_per_shard, incremental
+    )
+    print(f"Saved {n_rows} chat messages ({len(paths)} new shards)")
+    if masker is not None:
+        report = masker.report()
+        print(f"  PII masking: {report['messages_per_sec']:,.0f} msgs/s "
+              f"({report['prefiltered']} prefiltered, {report['cache_hits']} cache hits)")
+    return n_rows
+
+
+def export_feedback_stream(db, output_dir, consent_only=True, fmt='parquet',
+                           batch_size=CURSOR_BATCH_SIZE, rows_per_shard=ROWS_PER_SHARD,
+                           incremental=False):
+    """Stream recommendation feedback into output_dir/recommendation_feedback/date=*/part-*"""
+    print("Streaming recommendation feedback...")
+    n_rows, paths = export_collection_stream(
+        db.recommendationfeedbacks,
+        lambda since, until: feedback_pipeline(consent_only, since, until),
+        feedback_records, FEEDBACK_SCHEMA, output_dir, 'recommendation_feedback',
+        fmt, batch_size, rows_per_shard, incremental
+    )
+    print(f"Saved {n_rows} feedback events ({len(paths)} new shards)")
+    return n_rows
+
+
 def main():
     parser = argparse.ArgumentParser(description='Export ML training data from MongoDB')
     parser.add_argument('--output-dir', default='../data/raw', help='Output directory')
@@ -140,8 +605,27 @@ def main():
                        help='Only export data from users who consented')
     parser.add_argument('--skip-screenings', action='store_true', help='Skip screening export')
     parser.add_argument('--skip-chats', action='store_true', help='Skip chat export')
+    parser.add_argument('--skip-feedback', action='store_true',
+                       help='Skip recommendation feedback export (streaming mode)')
+    parser.add_argument('--skip-resources', action='store_true', help='Skip resource catalog export')
+    parser.add_argument('--stream', action='store_true',
+                       help='Stream through batched cursors into typed shards')
+    parser.add_argument('--format', choices=list(SHARD_FORMATS), default='parquet',
+                       help='Shard format (streaming mode)')
+    parser.add_argument('--batch-size', type=int, default=CURSOR_BATCH_SIZE,
+                       help='Documents per cursor batch (streaming mode)')
+    parser.add_argument('--rows-per-shard', type=int, default=ROWS_PER_SHARD,
+                       help='Rows per output shard (streaming mode)')
+    parser.add_argument('--incremental', action='store_true',
+                       help='Only export records newer than the stored watermark (streaming mode)')
+    parser.add_argument('--pii-workers', type=int, default=None,
+                       help='PII masking worker processes (default: all CPUs, 0: in-process)')
+    parser.add_argument('--serial-pii', action='store_true',
+                       help='Mask messages one at a time with mask_pii (no pool/prefilter/cache)')
     
     args = parser.parse_args()
+    if args.incremental and not args.stream:
+        parser.error('--incremental requires --stream')
     
     # Create output directory
     output_dir = Path(args.output_dir)
@@ -152,16 +636,37 @@ def main():
     client = MongoClient(MONGO_URI)
     db = client.get_database()
     
-    # Export data
-    if not args.skip_screenings:
-        export_screenings(db, output_dir, args.consent_only)
+    masker = None
+    if not args.skip_chats and not args.serial_pii:
+        masker = MaskingEngine(workers=args.pii_workers)
     
-    if not args.skip_chats:
-        export_chat_logs(db, output_dir, args.consent_only)
+    try:
+        # Export data
+        if args.stream:
+            stream_args = dict(consent_only=args.consent_only, fmt=args.format,
+                               batch_size=args.batch_size, rows_per_shard=args.rows_per_shard,
+                               incremental=args.incremental)
+            if not args.skip_screenings:
+                export_screenings_stream(db, output_dir, **stream_args)
+            if not args.skip_chats:
+                export_chat_logs_stream(db, output_dir, masker=masker, **stream_args)
+            if not args.skip_feedback:
+                export_feedback_stream(db, output_dir, **stream_args)
+        else:
+            if not args.skip_screenings:
+                export_screenings(db, output_dir, args.consent_only)
+            
+            if not args.skip_chats:
+                export_chat_logs(db, output_dir, args.consent_only, masker)
+        
+        if not args.skip_resources:
+            export_resources(db, output_dir)
+    finally:
+        if masker is not None:
+            masker.close()
     
     print("\n✅ Export complete!")
     print(f"Data saved to: {output_dir.absolute()}")
 
-
 if __name__ == '__main__':
     main()
@@ -8,15 +8,27 @@ Creates realistic mental health conversation examples across 5 risk levels:
 - low: Mild symptoms, stress
 - no-risk: General questions, normal conversation
 
+Sharded mode (--sharded) generates independent seeded shards in a process
+pool and writes each one to its own JSONL or Parquet file as it finishes,
+so corpus size is not limited by RAM. It also applies length augmentation
+(neutral context sentences, same-risk follow-ups) and keyboard typos.
+
 Usage:
     python generate_synthetic_chats.py --n-samples 5000
+    python generate_synthetic_chats.py --sharded --n-samples 5000000 --output data/raw/synthetic_chats --format parquet
 """
 
+import os
+import json
+import time
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
 from pathlib import Path
 import argparse
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 
 # Sample templates for each risk level
 EMERGENCY_MESSAGES = [
@@ -93,21 +105,80 @@ INTENT_MAPPING = {
     'no-risk': 'faq'
 }
 
+DEFAULT_DISTRIBUTION = {
+    'no-risk': 0.40,
+    'low': 0.30,
+    'medium': 0.15,
+    'high': 0.10,
+    'emergency': 0.05
+}
+
+RISK_TEMPLATES = {
+    'emergency': EMERGENCY_MESSAGES,
+    'high': HIGH_RISK_MESSAGES,
+    'medium': MEDIUM_RISK_MESSAGES,
+    'low': LOW_RISK_MESSAGES,
+    'no-risk': NO_RISK_MESSAGES,
+}
+
+# No-risk messages are split across these intents
+NO_RISK_INTENTS = {'faq': 0.6, 'resource_request': 0.2, 'booking_request': 0.2}
+
+VARIATIONS = [
+    lambda s: s,
+    lambda s: s.lower(),
+    lambda s: s + " Please help.",
+    lambda s: "I need to talk. " + s,
+    lambda s: s + " I don't know what to do.",
+    lambda s: f"Feeling: {s}",
+    lambda s: s.replace("I'm", "I am"),
+    lambda s: s.replace(".", "..."),
+    lambda s: s + " Can anyone help?",
+    lambda s: "Honestly, " + s.lower(),
+]
+
+# Length augmentation: risk-neutral context that real messages wrap around
+# the actual concern, so it never changes the label
+CONTEXT_OPENERS = [
+    "hey", "hi", "so", "um", "ok so", "sorry to bother you but", "not sure if this is the right place but",
+    "this is hard to type but", "can I ask something?", "I don't usually do this but",
+]
+CONTEXT_SENTENCES = [
+    "It's been a long week.",
+    "Classes have been a lot lately.",
+    "I don't really know how to say this.",
+    "My roommate is asleep so I'm typing this quietly.",
+    "I've been meaning to reach out for a while.",
+    "I just got back from the library.",
+    "Sorry if this is a lot.",
+    "I'm not great at explaining things.",
+    "I tried talking to my family about it but it didn't go well.",
+    "Things have been weird since the semester started.",
+]
+
+# Mean number of extra context sentences and chance of a same-risk follow-up
+CONTEXT_SENTENCES_MEAN = 0.8
+FOLLOW_UP_RATE = 0.2
+
+# Typo augmentation: neighbouring keys on a QWERTY keyboard
+KEYBOARD_NEIGHBOURS = {
+    'q': 'wa', 'w': 'qes', 'e': 'wrd', 'r': 'etf', 't': 'ryg', 'y': 'tuh', 'u': 'yij', 'i': 'uok',
+    'o': 'ipl', 'p': 'ol', 'a': 'qsz', 's': 'awdz', 'd': 'sefx', 'f': 'drgc', 'g': 'fthv',
+    'h': 'gyjb', 'j': 'hukn', 'k': 'jilm', 'l': 'kop', 'z': 'asx', 'x': 'zsdc', 'c': 'xdfv',
+    'v': 'cfgb', 'b': 'vghn', 'n': 'bhjm', 'm': 'njk',
+}
+
+# Average typos per 100 characters
+TYPO_RATE = 1.0
+
+SHARD_SIZE = 100000
+SHARD_FORMATS = {'jsonl': '.jsonl', 'parquet': '.parquet'}
+
+
 def generate_variations(template_messages, n_samples):
     """Generate variations of template messages"""
     messages = []
-    variations = [
-        lambda s: s,
-        lambda s: s.lower(),
-        lambda s: s + " Please help.",
-        lambda s: "I need to talk. " + s,
-        lambda s: s + " I don't know what to do.",
-        lambda s: f"Feeling: {s}",
-        lambda s: s.replace("I'm", "I am"),
-        lambda s: s.replace(".", "..."),
-        lambda s: s + " Can anyone help?",
-        lambda s: "Honestly, " + s.lower(),
-    ]
+    variations = VARIATIONS
     
     while len(messages) < n_samples:
         template = np.random.choice(template_messages)
@@ -130,13 +201,7 @@ def generate_chat_dataset(n_samples=5000, distribution=None):
     """
     if distribution is None:
         # Default distribution (more normal messages, fewer emergencies)
-        distribution = {
-            'no-risk': 0.40,
-            'low': 0.30,
-            'medium': 0.15,
-            'high': 0.10,
-            'emergency': 0.05
-        }
+        distribution = DEFAULT_DISTRIBUTION
     
     # Calculate samples per category
     samples_per_category = {
@@ -216,14 +281,203 @@ def generate_chat_dataset(n_samples=5000, distribution=None):
     return df
 
 
+def category_counts(n_samples, distribution):
+    """Rows per risk level, rounding remainder assigned to no-risk as above"""
+    counts = {risk: int(n_samples * prop) for risk, prop in distribution.items()}
+    counts['no-risk'] += n_samples - sum(counts.values())
+    return counts
+
+
+def add_typos(rng, message, rate):
+    """
+    Introduce keyboard typos: on average `rate` edits per 100 characters,
+    each a neighbour-key substitution, dropped, doubled or swapped letter.
+    """
+    n_edits = rng.poisson(rate * len(message) / 100)
+    if n_edits == 0:
+        return message
+    
+    chars = list(message)
+    for _ in range(n_edits):
+        if len(chars) < 2:
+            break
+        pos = int(rng.integers(0, len(chars) - 1))
+        char = chars[pos]
+        kind = rng.integers(0, 4)
+        if kind == 0 and char.lower() in KEYBOARD_NEIGHBOURS:
+            neighbours = KEYBOARD_NEIGHBOURS[char.lower()]
+            chars[pos] = neighbours[rng.integers(0, len(neighbours))]
+        elif kind == 1 and char.isalpha():
+            del chars[pos]
+        elif kind == 2 and char.isalpha():
+            chars.insert(pos, char)
+        elif char.isalpha() and chars[pos + 1].isalpha():
+            chars[pos], chars[pos + 1] = chars[pos + 1], chars[pos]
+    return ''.join(chars)
+
+
+def augment_length(rng, message, templates):
+    """Wrap a message in neutral context and sometimes a same-risk follow-up"""
+    parts = []
+    if rng.random() < 0.3:
+        parts.append(CONTEXT_OPENERS[rng.integers(0, len(CONTEXT_OPENERS))])
+    n_context = rng.poisson(CONTEXT_SENTENCES_MEAN)
+    parts.extend(CONTEXT_SENTENCES[i] for i in rng.choice(len(CONTEXT_SENTENCES), size=min(n_context, 3), replace=False))
+    parts.append(message)
+    if rng.random() < FOLLOW_UP_RATE:
+        parts.append(templates[rng.integers(0, len(templates))])
+    return " ".join(parts)
+
+
+def generate_shard_records(rng, n_samples, distribution, augment=True, typo_rate=TYPO_RATE, now=None):
+    """
+    Build one shard of chat records with a local generator.
+    
+    Same templates, variations and intents as generate_chat_dataset;
+    messages are optionally lengthened and given typos.
+    
+    Returns:
+        Dict of column lists, rows in shuffled order
+    """
+    now = now or datetime.now()
+    messages, risks, intents = [], [], []
+    intent_names = list(NO_RISK_INTENTS)
+    intent_probs = list(NO_RISK_INTENTS.values())
+    
+    for risk, count in category_counts(n_samples, distribution).items():
+        templates = RISK_TEMPLATES[risk]
+        template_idx = rng.integers(0, len(templates), size=count)
+        variation_idx = rng.integers(0, len(VARIATIONS), size=count)
+        for t, v in zip(template_idx, variation_idx):
+            message = VARIATIONS[v](templates[t])
+            if augment:
+                message = augment_length(rng, message, templates)
+            if typo_rate > 0:
+                message = add_typos(rng, message, typo_rate)
+            messages.append(message)
+        
+        risks.extend([risk] * count)
+        if risk == 'no-risk':
+            intents.extend(rng.choice(intent_names, size=count, p=intent_probs).tolist())
+        else:
+            intents.extend([INTENT_MAPPING[risk]] * count)
+    
+    order = rng.permutation(len(messages))
+    seconds_ago = rng.integers(0, 365 * 24 * 3600, size=len(messages))
+    timestamps = np.datetime64(now, 's') - seconds_ago.astype('timedelta64[s]')
+    return {
+        'message': [messages[i] for i in order],
+        'risk_level': [risks[i] for i in order],
+        'intent': [intents[i] for i in order],
+        'timestamp': timestamps,
+    }
+
+
+def write_shard(shard_idx, n_samples, seed_seq, output_dir, fmt='jsonl', distribution=None,
+                augment=True, typo_rate=TYPO_RATE, now=None):
+    """
+    Generate and write one shard (runs in a worker process).
+    
+    Returns:
+        (shard_idx, risk_level counts)
+    """
+    rng = np.random.default_rng(seed_seq)
+    records = generate_shard_records(rng, n_samples, distribution or DEFAULT_DISTRIBUTION, augment, typo_rate, now)
+    path = Path(output_dir) / f'part-{shard_idx:05d}{SHARD_FORMATS[fmt]}'
+    
+    if fmt == 'parquet':
+        pq.write_table(pa.table(records), path, compression='zstd')
+    else:
+        timestamps = np.datetime_as_string(records['timestamp'])
+        with open(path, 'w') as f:
+            for message, risk, intent, timestamp in zip(records['message'], records['risk_level'],
+                                                        records['intent'], timestamps):
+                f.write(json.dumps({'message': message, 'risk_level': risk,
+                                    'intent': intent, 'timestamp': timestamp}) + '\n')
+    
+    return shard_idx, pd.Series(records['risk_level']).value_counts().to_dict()
+
+
+def generate_sharded(n_samples, output_dir, fmt='jsonl', shard_size=SHARD_SIZE, workers=None,
+                     seed=42, augment=True, typo_rate=TYPO_RATE):
+    """
+    Generate a corpus as independent seeded shards in a process pool.
+    
+    Shard i always gets the i-th stream spawned from the seed, so output does
+    not depend on the number of workers. At most 2 * workers shards are in
+    flight, so memory is bounded by the shard size.
+    """
+    workers = workers or os.cpu_count() or 1
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    for ext in SHARD_FORMATS.values():
+        for old in output_dir.glob(f'part-*{ext}'):
+            old.unlink()
+    
+    n_shards = max(1, -(-n_samples // shard_size))
+    streams = np.random.SeedSequence(seed).spawn(n_shards)
+    now = datetime.now().replace(microsecond=0)
+    totals = {}
+    
+    def collect(done):
+        for future in done:
+            shard_idx, counts = future.result()
+            for risk, count in counts.items():
+                totals[risk] = totals.get(risk, 0) + count
+            print(f"  Shard {shard_idx + 1}/{n_shards} done ({sum(totals.values())} messages)")
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for shard_idx, stream in enumerate(streams):
+            n_rows = min(shard_size, n_samples - shard_idx * shard_size)
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending.add(executor.submit(
+                write_shard, shard_idx, n_rows, stream, output_dir, fmt,
+                None, augment, typo_rate, now
+            ))
+        collect(pending)
+    
+    return pd.Series(totals)
+
+
 def main():
     parser = argparse.ArgumentParser(description='Generate synthetic chat messages')
     parser.add_argument('--n-samples', type=int, default=5000, help='Number of samples to generate')
     parser.add_argument('--output', default='data/raw/synthetic_chats.csv', help='Output file')
     parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    parser.add_argument('--sharded', action='store_true',
+                        help='Write seeded shards from a process pool (--output is a directory)')
+    parser.add_argument('--format', choices=list(SHARD_FORMATS), default='jsonl', help='Shard format (sharded mode)')
+    parser.add_argument('--shard-size', type=int, default=SHARD_SIZE, help='Messages per shard (sharded mode)')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (sharded mode, default: all CPUs)')
+    parser.add_argument('--no-augment', action='store_true', help='Disable length augmentation (sharded mode)')
+    parser.add_argument('--typo-rate', type=float, default=TYPO_RATE,
+                        help='Average typos per 100 characters, 0 disables (sharded mode)')
     
     args = parser.parse_args()
     
+    if args.sharded:
+        output_dir = Path(args.output)
+        if output_dir.suffix:
+            output_dir = output_dir.with_suffix('')
+        output_dir = Path(__file__).parent.parent / output_dir
+        
+        print(f"Generating {args.n_samples} synthetic chat messages in shards of {args.shard_size}...")
+        start = time.perf_counter()
+        totals = generate_sharded(
+            args.n_samples, output_dir, args.format, args.shard_size, args.workers,
+            args.seed, not args.no_augment, args.typo_rate
+        )
+        elapsed = time.perf_counter() - start
+        
+        print(f"\n✅ Generated {int(totals.sum())} messages in {elapsed:.1f}s ({totals.sum() / elapsed:,.0f} msgs/s)")
+        print(f"Saved to: {output_dir.absolute()}")
+        print(f"\nRisk Level Distribution:")
+        print(totals.sort_values(ascending=False))
+        return
+    
     # Set seed
     np.random.seed(args.seed)
     
@@ -3,12 +3,25 @@ Generate synthetic screening data for ML training.
 
 Uses clinical guidelines to create realistic PHQ-9 and GAD-7 responses with noise.
 
+The --vectorized mode draws whole answer matrices per chunk (Dirichlet
+weights + multinomial allocation of each target score, clipped to the
+per-severity answer cap) and writes each chunk before drawing the next, so
+10M+ rows fit in bounded memory. Chunks get independent streams spawned
+from --seed, so output is deterministic for a given seed and chunk size
+(timestamps count back from --reference-date, default today).
+Writing .parquet stores answers as a typed list<int8> column.
+
 Usage:
     python generate_synthetic_data.py --n-samples 5000 --output data/raw/synthetic_screenings.csv
+    python generate_synthetic_data.py --vectorized --n-samples 10000000 --output data/raw/synthetic_screenings.parquet
 """
 
+import time
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
 from pathlib import Path
 import argparse
 from datetime import datetime, timedelta
@@ -29,6 +42,36 @@ GAD7_THRESHOLDS = {
     'severe': (15, 21)
 }
 
+PHQ9_SEVERITY_DISTRIBUTION = {
+    'none': 0.30,
+    'mild': 0.30,
+    'moderate': 0.20,
+    'moderately-severe': 0.15,
+    'severe': 0.05
+}
+
+GAD7_SEVERITY_DISTRIBUTION = {
+    'none': 0.35,
+    'mild': 0.30,
+    'moderate': 0.25,
+    'severe': 0.10
+}
+
+SCREENING_SPECS = {
+    'PHQ9': {'questions': 9, 'thresholds': PHQ9_THRESHOLDS, 'distribution': PHQ9_SEVERITY_DISTRIBUTION},
+    'GAD7': {'questions': 7, 'thresholds': GAD7_THRESHOLDS, 'distribution': GAD7_SEVERITY_DISTRIBUTION},
+}
+
+# Vectorized mode: highest answer per question by severity, as in the
+# loop-based generators (none: 0-1, mild: 0-2, otherwise 0-3)
+SEVERITY_ANSWER_CAPS = {'none': 1, 'mild': 2}
+
+# Dirichlet concentration used to spread a target score over questions
+# (higher = more even answers)
+ANSWER_DIRICHLET_ALPHA = 2.0
+
+CHUNK_SIZE = 1000000
+
 
 def generate_phq9_answers(severity_level):
     """
@@ -135,13 +178,7 @@ def generate_synthetic_dataset(n_samples=5000, phq9_ratio=0.5):
     
     # Generate PHQ-9 samples
     print(f"Generating {n_phq9} PHQ-9 samples...")
-    severity_distribution = {
-        'none': 0.30,
-        'mild': 0.30,
-        'moderate': 0.20,
-        'moderately-severe': 0.15,
-        'severe': 0.05
-    }
+    severity_distribution = PHQ9_SEVERITY_DISTRIBUTION
     
     for i in range(n_phq9):
         severity = np.random.choice(
@@ -164,12 +201,7 @@ def generate_synthetic_dataset(n_samples=5000, phq9_ratio=0.5):
     
     # Generate GAD-7 samples
     print(f"Generating {n_gad7} GAD-7 samples...")
-    severity_distribution_gad = {
-        'none': 0.35,
-        'mild': 0.30,
-        'moderate': 0.25,
-        'severe': 0.10
-    }
+    severity_distribution_gad = GAD7_SEVERITY_DISTRIBUTION
     
     for i in range(n_gad7):
         severity = np.random.choice(
@@ -198,15 +230,190 @@ def generate_synthetic_dataset(n_samples=5000, phq9_ratio=0.5):
     return df
 
 
+def allocate_answers(rng, targets, caps, n_questions):
+    """
+    Spread target scores over questions in one shot.
+    
+    Each row gets Dirichlet weights and a multinomial draw of its target
+    score; answers above the row's cap are clipped and the overflow is
+    redrawn over the remaining capacity, then any last remainder is filled
+    greedily. Every row sums exactly to its target (targets never exceed
+    n_questions * cap).
+    
+    Returns:
+        int8 matrix of shape (len(targets), n_questions)
+    """
+    weights = rng.gamma(ANSWER_DIRICHLET_ALPHA, size=(len(targets), n_questions))
+    weights /= weights.sum(axis=1, keepdims=True)
+    answers = np.minimum(rng.multinomial(targets, weights), caps[:, None])
+    
+    overflow = targets - answers.sum(axis=1)
+    rows = np.flatnonzero(overflow)
+    if len(rows):
+        spare = caps[rows, None] - answers[rows]
+        extra = rng.multinomial(overflow[rows], spare / spare.sum(axis=1, keepdims=True))
+        answers[rows] += np.minimum(extra, spare)
+        
+        # Greedy exact fill of whatever the second draw clipped
+        remainder = targets[rows] - answers[rows].sum(axis=1)
+        spare = caps[rows, None] - answers[rows]
+        before = np.cumsum(spare, axis=1) - spare
+        answers[rows] += np.clip(remainder[:, None] - before, 0, spare)
+    
+    return answers.astype(np.int8)
+
+
+def generate_answer_matrix(rng, screening_type, n_rows):
+    """
+    Draw severities, target scores and answers for n_rows screenings.
+    
+    Returns:
+        (answers, severity_names) with answers an int8 matrix
+    """
+    spec = SCREENING_SPECS[screening_type]
+    severities = list(spec['distribution'])
+    low = np.array([spec['thresholds'][name][0] for name in severities])
+    high = np.array([spec['thresholds'][name][1] for name in severities])
+    caps = np.array([SEVERITY_ANSWER_CAPS.get(name, 3) for name in severities])
+    
+    severity_idx = rng.choice(len(severities), size=n_rows, p=list(spec['distribution'].values()))
+    targets = rng.integers(low[severity_idx], high[severity_idx] + 1)
+    answers = allocate_answers(rng, targets, caps[severity_idx], spec['questions'])
+    return answers, np.array(severities, dtype=object)[severity_idx]
+
+
+def format_answer_strings(answers):
+    """
+    Render an answer matrix as "[a, b, c]" strings without a per-row loop.
+    
+    All rows have the same width, so the strings are laid out as a uint8
+    character matrix and viewed as fixed-width byte strings.
+    """
+    n_rows, n_questions = answers.shape
+    width = 3 * n_questions
+    chars = np.full((n_rows, width), ord(' '), dtype=np.uint8)
+    chars[:, 0] = ord('[')
+    chars[:, 1::3] = answers + ord('0')
+    chars[:, 2:width - 1:3] = ord(',')
+    chars[:, -1] = ord(']')
+    return chars.view(f'S{width}').ravel().astype(str)
+
+
+def answer_list_array(answers):
+    """Answer matrix as an Arrow list<int8> array, built from flat values and offsets"""
+    n_rows, n_questions = answers.shape
+    offsets = np.arange(0, (n_rows + 1) * n_questions, n_questions, dtype=np.int32)
+    return pa.ListArray.from_arrays(offsets, pa.array(answers.ravel(), type=pa.int8()))
+
+
+def generate_chunk(rng, start, n_rows, n_samples, phq9_ratio, now, as_lists=False):
+    """
+    Generate rows [start, start + n_rows) of the vectorized dataset as an Arrow table.
+    
+    The PHQ-9/GAD-7 split and the per-type user_hash counters follow the
+    global row position, so chunks can be generated independently.
+    """
+    n_phq9 = int(n_samples * phq9_ratio)
+    phq9_before = min(start, n_phq9)
+    n_phq9_chunk = min(start + n_rows, n_phq9) - phq9_before
+    counts = {'PHQ9': (phq9_before, n_phq9_chunk), 'GAD7': (start - phq9_before, n_rows - n_phq9_chunk)}
+    
+    tables = []
+    for screening_type, (offset, count) in counts.items():
+        if count == 0:
+            continue
+        answers, severities = generate_answer_matrix(rng, screening_type, count)
+        ids = np.char.zfill(np.arange(offset, offset + count).astype(str), 5)
+        days = rng.integers(0, 365, size=count).astype('timedelta64[D]')
+        tables.append(pa.table({
+            'user_hash': np.char.add(f"synth_{screening_type.lower()}_", ids),
+            'type': pa.array([screening_type] * count),
+            'score': answers.sum(axis=1, dtype=np.int16),
+            'answers': answer_list_array(answers) if as_lists else format_answer_strings(answers),
+            'risk_level': severities,
+            'timestamp': (np.datetime64(now) - days).astype('datetime64[us]')
+        }))
+    
+    table = pa.concat_tables(tables)
+    return table.take(rng.permutation(len(table)))
+
+
+def generate_synthetic_dataset_chunked(n_samples, output_path, phq9_ratio=0.5, seed=42,
+                                       chunk_size=CHUNK_SIZE, reference_date=None):
+    """
+    Vectorized generation written chunk by chunk.
+    
+    Each chunk uses its own generator spawned from the seed, so output only
+    depends on seed and chunk size. CSV keeps the "[a, b, c]" answer
+    strings; Parquet stores answers as list<int8>.
+    
+    Returns:
+        Row counts per (type, risk_level)
+    """
+    output_path = Path(output_path)
+    as_lists = output_path.suffix == '.parquet'
+    n_chunks = max(1, -(-n_samples // chunk_size))
+    streams = np.random.SeedSequence(seed).spawn(n_chunks)
+    now = pd.Timestamp(reference_date) if reference_date else pd.Timestamp.now().floor('s')
+    
+    breakdown = {}
+    writer = None
+    try:
+        for chunk_idx, stream in enumerate(streams):
+            start = chunk_idx * chunk_size
+            n_rows = min(chunk_size, n_samples - start)
+            if n_rows <= 0:
+                break
+            
+            table = generate_chunk(np.random.default_rng(stream), start, n_rows, n_samples, phq9_ratio, now, as_lists)
+            if writer is None:
+                writer = (pq.ParquetWriter(output_path, table.schema, compression='zstd') if as_lists
+                          else pa_csv.CSVWriter(output_path, table.schema))
+            writer.write_table(table)
+            
+            groups = table.group_by(['type', 'risk_level']).aggregate([([], 'count_all')])
+            for screening_type, risk_level, count in zip(*groups.to_pydict().values()):
+                key = (screening_type, risk_level)
+                breakdown[key] = breakdown.get(key, 0) + count
+            print(f"  Chunk {chunk_idx + 1}/{n_chunks}: {start + n_rows} rows")
+    finally:
+        if writer is not None:
+            writer.close()
+    
+    return pd.Series(breakdown).rename_axis(['type', 'risk_level'])
+
+
 def main():
     parser = argparse.ArgumentParser(description='Generate synthetic screening data')
     parser.add_argument('--n-samples', type=int, default=5000, help='Number of samples to generate')
     parser.add_argument('--phq9-ratio', type=float, default=0.5, help='Ratio of PHQ-9 samples')
     parser.add_argument('--output', default='data/raw/synthetic_screenings.csv', help='Output file path')
     parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    parser.add_argument('--vectorized', action='store_true',
+                        help='Batch generator written in chunks (for millions of rows)')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Rows per chunk (vectorized mode)')
+    parser.add_argument('--reference-date', default=None,
+                        help='Date timestamps count back from (vectorized mode, default: now)')
     
     args = parser.parse_args()
     
+    if args.vectorized:
+        output_path = Path(args.output)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        print(f"Generating {args.n_samples} synthetic screening samples (vectorized)...")
+        start = time.perf_counter()
+        breakdown = generate_synthetic_dataset_chunked(
+            args.n_samples, output_path, args.phq9_ratio, args.seed, args.chunk_size, args.reference_date
+        )
+        elapsed = time.perf_counter() - start
+        
+        print(f"\n✅ Generated {int(breakdown.sum())} samples in {elapsed:.1f}s "
+              f"({breakdown.sum() / elapsed:,.0f} rows/s)")
+        print(f"Saved to: {output_path.absolute()}")
+        print(f"\nBreakdown:")
+        print(breakdown.sort_index())
+        return
+    
     # Set seed
     np.random.seed(args.seed)
     
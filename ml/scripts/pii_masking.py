@@ -0,0 +1,386 @@
+"""
+Parallel, cached PII masking for chat exports.
+
+Features:
+    - Process pool; each worker builds and warms up its own Presidio analyzer once
+    - Batched analysis (BatchAnalyzerEngine, i.e. spaCy nlp.pipe per batch)
+    - Prefilter: only messages made of nothing but stop words (no digits,
+      @, URLs, capitals or date/time words either) skip Presidio; every
+      other word could be a lowercase name or place the NER tags
+    - Content-hash LRU cache: duplicate messages are masked once
+    - Reports messages/sec and compares output against the serial path
+
+Usage:
+    python pii_masking.py --input data/raw/synthetic_chats.csv --workers 4
+    python pii_masking.py --input data/raw/chat_logs --compare 2000
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import argparse
+import pandas as pd
+from pathlib import Path
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from presidio_analyzer import AnalyzerEngine, BatchAnalyzerEngine
+    from presidio_analyzer.nlp_engine import NlpEngineProvider
+    from presidio_anonymizer import AnonymizerEngine
+    PRESIDIO_AVAILABLE = True
+except ImportError:
+    PRESIDIO_AVAILABLE = False
+
+LANGUAGE = 'en'
+BATCH_SIZE = 64
+CACHE_SIZE = 200000
+
+# Anything Presidio's default recognizers or the spaCy NER could plausibly
+# match: digits (phone, card, SSN, IP, dates), e-mail/URL markers,
+# capitalized words other than the pronoun "I", and lowercase date/time
+# expressions the NER tags as DATE_TIME. Lowercase names and places
+# ("i talked to john") are tagged too, so any word outside the stop-word
+# list below also sends the message to Presidio.
+_DATE_TIME_WORDS = (
+    r"today|tonight|yesterday|tomorrow|morning|afternoon|evening|night|noon|midnight|"
+    r"weekend|week|month|year|hour|minute|day|ago|decade|semester|summer|winter|spring|autumn|"
+    r"monday|tuesday|wednesday|thursday|friday|saturday|sunday|"
+    r"january|february|march|april|may|june|july|august|september|october|november|december"
+)
+_PII_MARKER_PATTERN = re.compile(r"\d|@|://|www\.|\.(?:com|org|net|edu|io|in|co)\b|\b(?!I\b)[A-Z]")
+_DATE_TIME_PATTERN = re.compile(rf"\b(?:{_DATE_TIME_WORDS})s?\b", re.IGNORECASE)
+_WORD_PATTERN = re.compile(r"[^\W\d_]+(?:'[^\W\d_]+)?")
+
+# Function words that are never names, places or nationalities
+# (words that double as names, e.g. "will" or "may", are left out)
+_STOP_WORDS = frozenset("""
+    i me my mine myself we us our ours you your yours yourself he him his she her hers it its they them their
+    a an the this that these those
+    am is are was were be been being do does did doing have has had having
+    can could shall should would must might
+    not no nor yes yeah ok okay so too very just only also even still really
+    and or but if because as than then when while where why how what who whom which
+    of at by for with about against between into through during before after above below
+    to from up down in out on off over under again further once here there
+    all any both each few more most other some such own same
+    i'm i've i'll i'd you're it's that's don't doesn't didn't can't won't isn't aren't wasn't
+    feel feeling felt know think want need like get got go going
+""".split())
+
+
+def may_contain_pii(text):
+    """
+    Cheap check whether a message needs to go through Presidio.
+
+    Never stricter than the serial path in practice: a message is only
+    skipped when it has no markers and every word is a stop word.
+    """
+    if _PII_MARKER_PATTERN.search(text) or _DATE_TIME_PATTERN.search(text):
+        return True
+    return any(word.lower() not in _STOP_WORDS for word in _WORD_PATTERN.findall(text))
+
+
+def content_key(text):
+    return hashlib.sha1(text.encode('utf-8')).digest()
+
+
+def build_analyzer(spacy_model=None):
+    """Presidio analyzer with the default spaCy model, or a given model name/path"""
+    if spacy_model is None:
+        return AnalyzerEngine()
+    provider = NlpEngineProvider(nlp_configuration={
+        'nlp_engine_name': 'spacy',
+        'models': [{'lang_code': LANGUAGE, 'model_name': spacy_model}]
+    })
+    return AnalyzerEngine(nlp_engine=provider.create_engine())
+
+
+class PresidioMasker:
+    """Analyzer + anonymizer pair living in one process"""
+
+    def __init__(self, spacy_model=None):
+        self.analyzer = build_analyzer(spacy_model)
+        self.batch_analyzer = BatchAnalyzerEngine(analyzer_engine=self.analyzer)
+        self.anonymizer = AnonymizerEngine()
+
+    def warm_up(self):
+        """Run one message through the whole pipeline so model loading is not timed"""
+        self.mask_one("Warm-up message from Alex at alex@example.com, 555-0100.")
+
+    def mask_one(self, text):
+        """Serial path, identical to export_data.mask_pii"""
+        if not text or not isinstance(text, str):
+            return text
+
+        try:
+            results = self.analyzer.analyze(text=text, language=LANGUAGE)
+            return self.anonymizer.anonymize(text=text, analyzer_results=results).text
+        except Exception as e:
+            print(f"PII masking error: {e}")
+            return text
+
+    def mask_batch(self, texts, batch_size=BATCH_SIZE):
+        """Batched path; falls back to mask_one if batch analysis fails"""
+        try:
+            all_results = self.batch_analyzer.analyze_iterator(texts, language=LANGUAGE, batch_size=batch_size)
+        except Exception as e:
+            print(f"PII batch analysis error: {e}")
+            return [self.mask_one(text) for text in texts]
+
+        masked = []
+        for text, results in zip(texts, all_results):
+            try:
+                masked.append(self.anonymizer.anonymize(text=text, analyzer_results=results).text)
+            except Exception as e:
+                print(f"PII masking error: {e}")
+                masked.append(text)
+        return masked
+
+
+# Per-process masker, created by the pool initializer
+_worker_masker = None
+
+
+def _init_worker(spacy_model):
+    global _worker_masker
+    _worker_masker = PresidioMasker(spacy_model)
+    _worker_masker.warm_up()
+
+
+def _mask_in_worker(texts, batch_size):
+    return _worker_masker.mask_batch(texts, batch_size)
+
+
+class MaskingEngine:
+    """
+    Mask PII in many messages at once.
+
+    Args:
+        workers: Worker processes (0 masks in the calling process)
+        batch_size: Messages per analyzer batch / per pool task
+        prefilter: Skip messages that cannot contain PII
+        cache_size: Entries in the content-hash cache (0 disables it)
+        spacy_model: spaCy model name or path (default: Presidio's default)
+    """
+
+    def __init__(self, workers=None, batch_size=BATCH_SIZE, prefilter=True,
+                 cache_size=CACHE_SIZE, spacy_model=None):
+        if not PRESIDIO_AVAILABLE:
+            raise ImportError("presidio-analyzer and presidio-anonymizer are required for PII masking")
+
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.batch_size = batch_size
+        self.prefilter = prefilter
+        self.cache_size = cache_size
+        self.spacy_model = spacy_model
+        self._cache = OrderedDict()
+        self._executor = None
+        self._local = None
+        self.stats = {'messages': 0, 'prefiltered': 0, 'cache_hits': 0, 'analyzed': 0, 'seconds': 0.0}
+
+    def start(self):
+        """Create the worker pool (or local masker) and warm it up"""
+        if self.workers > 0 and self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_init_worker, initargs=(self.spacy_model,)
+            )
+            # Spin up the workers (each loads its model in the initializer) before any timing
+            list(self._executor.map(_mask_in_worker, [[""]] * self.workers, [1] * self.workers))
+        elif self.workers == 0 and self._local is None:
+            self._local = PresidioMasker(self.spacy_model)
+            self._local.warm_up()
+        return self
+
+    def _cache_get(self, key):
+        value = self._cache.get(key)
+        if value is not None:
+            self._cache.move_to_end(key)
+        return value
+
+    def _cache_put(self, key, value):
+        if self.cache_size <= 0:
+            return
+        self._cache[key] = value
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _analyze(self, texts):
+        """Mask unique texts through the pool, batch_size messages per task"""
+        if self.workers == 0:
+            return self._local.mask_batch(texts, self.batch_size)
+
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        masked = []
+        for batch_result in self._executor.map(_mask_in_worker, batches, [self.batch_size] * len(batches)):
+            masked.extend(batch_result)
+        return masked
+
+    def mask(self, texts):
+        """
+        Mask a list of messages.
+
+        Returns:
+            Masked messages in input order; non-string or empty values are
+            returned unchanged, like mask_pii
+        """
+        self.start()
+        start = time.perf_counter()
+        results = list(texts)
+
+        pending = OrderedDict()
+        for idx, text in enumerate(results):
+            if not text or not isinstance(text, str):
+                continue
+            if self.prefilter and not may_contain_pii(text):
+                self.stats['prefiltered'] += 1
+                continue
+
+            key = content_key(text)
+            cached = self._cache_get(key)
+            if cached is not None:
+                results[idx] = cached
+                self.stats['cache_hits'] += 1
+            elif key in pending:
+                pending[key][1].append(idx)
+                self.stats['cache_hits'] += 1
+            else:
+                pending[key] = (text, [idx])
+
+        if pending:
+            masked = self._analyze([text for text, _ in pending.values()])
+            for (key, (_, indices)), value in zip(pending.items(), masked):
+                self._cache_put(key, value)
+                for idx in indices:
+                    results[idx] = value
+            self.stats['analyzed'] += len(pending)
+
+        self.stats['messages'] += len(results)
+        self.stats['seconds'] += time.perf_counter() - start
+        return results
+
+    def report(self):
+        """Stats so far, including messages/sec"""
+        stats = dict(self.stats)
+        stats['messages_per_sec'] = stats['messages'] / stats['seconds'] if stats['seconds'] else 0.0
+        return stats
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load_messages(path, limit=None):
+    """Messages from a CSV/JSONL file or a directory of export shards"""
+    path = Path(path)
+    if path.is_dir():
+        parts = sorted(p for p in path.rglob('part-*') if p.suffix in ('.parquet', '.jsonl'))
+        frames = [
+            pd.read_parquet(p, columns=['message']) if p.suffix == '.parquet' else pd.read_json(p, lines=True)
+            for p in parts
+        ]
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame({'message': []})
+    elif path.suffix == '.jsonl':
+        df = pd.read_json(path, lines=True)
+    else:
+        df = pd.read_csv(path)
+
+    messages = df['message'].tolist()
+    return messages[:limit] if limit else messages
+
+
+def compare_with_serial(messages, engine_output, spacy_model=None):
+    """
+    Mask messages one at a time with the serial path and diff the results.
+
+    Returns:
+        Dict with serial throughput, agreement rate and a few mismatches
+    """
+    masker = PresidioMasker(spacy_model)
+    masker.warm_up()
+
+    start = time.perf_counter()
+    serial_output = [masker.mask_one(text) for text in messages]
+    elapsed = time.perf_counter() - start
+
+    mismatches = [
+        {'input': text, 'serial': expected, 'engine': actual}
+        for text, expected, actual in zip(messages, serial_output, engine_output)
+        if expected != actual
+    ]
+    return {
+        'messages': len(messages),
+        'serial_messages_per_sec': len(messages) / elapsed if elapsed else 0.0,
+        'agreement': 1 - len(mismatches) / max(len(messages), 1),
+        'mismatches': len(mismatches),
+        'examples': mismatches[:10]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark parallel cached PII masking')
+    parser.add_argument('--input', default='data/raw/synthetic_chats.csv',
+                        help='CSV/JSONL file or export shard directory with a message column')
+    parser.add_argument('--limit', type=int, default=None, help='Only mask the first N messages')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (0: in-process)')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Messages per analyzer batch')
+    parser.add_argument('--no-prefilter', action='store_true', help='Send every message to Presidio')
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE, help='Content-hash cache entries (0: off)')
+    parser.add_argument('--spacy-model', default=None, help='spaCy model name or path for the analyzer')
+    parser.add_argument('--compare', type=int, default=0,
+                        help='Also mask the first N messages serially and check the outputs match')
+    parser.add_argument('--output', default=None, help='Optional JSON report path')
+
+    args = parser.parse_args()
+
+    if not PRESIDIO_AVAILABLE:
+        print("❌ presidio-analyzer / presidio-anonymizer not installed")
+        return
+
+    messages = load_messages(args.input, args.limit)
+    print(f"Loaded {len(messages)} messages from {args.input}")
+
+    with MaskingEngine(args.workers, args.batch_size, not args.no_prefilter,
+                       args.cache_size, args.spacy_model) as engine:
+        masked = engine.mask(messages)
+        report = engine.report()
+
+    print(f"\nEngine ({engine.workers} workers): {report['messages_per_sec']:,.0f} msgs/s")
+    print(f"  Prefiltered: {report['prefiltered']}, cache hits: {report['cache_hits']}, "
+          f"analyzed: {report['analyzed']}")
+
+    if args.compare:
+        n_compare = min(args.compare, len(messages))
+        print(f"\nMasking {n_compare} messages serially for comparison...")
+        comparison = compare_with_serial(messages[:n_compare], masked[:n_compare], args.spacy_model)
+        report['comparison'] = comparison
+        print(f"Serial: {comparison['serial_messages_per_sec']:,.0f} msgs/s")
+        print(f"Speedup: {report['messages_per_sec'] / max(comparison['serial_messages_per_sec'], 1e-9):.1f}x")
+        if comparison['mismatches']:
+            print(f"⚠️  {comparison['mismatches']} outputs differ from the serial path "
+                  f"(agreement {comparison['agreement']:.2%})")
+            for example in comparison['examples'][:3]:
+                print(f"    {example}")
+        else:
+            print("✅ Outputs match the serial path")
+
+    if args.output:
+        output_path = Path(args.output)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(output_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report saved to: {output_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Nightly batch: precompute top-N recommendations for every known user.
+
+Features:
+    - Scores users in blocks (one matrix product per block) against the
+      representations serving uses (serving/recommender.py)
+    - Items each user already interacted with are excluded
+    - Writes a compact array store: uint16/int32 item indices and float16
+      scores, (n_users, N) each, plus top_n.json tagged with the model it
+      was built from; serving memory-maps it and ignores a stale store
+
+Usage:
+    python precompute_recommendations.py
+    python precompute_recommendations.py --top-n 50 --output ../models/recommender_top_n
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+
+ML_DIR = Path(__file__).resolve().parent.parent
+
+# Recommender is shared with the serving image
+sys.path.append(str(ML_DIR / 'serving'))
+from recommender import Recommender, TopNStore, model_fingerprint, PRECOMPUTE_BATCH_SIZE
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompute top-N recommendations for all users')
+    parser.add_argument('--model-dir', default=str(ML_DIR / 'models' / 'recommender'))
+    parser.add_argument('--output', default=str(ML_DIR / 'models' / 'recommender_top_n'))
+    parser.add_argument('--top-n', type=int, default=100, help='Recommendations stored per user')
+    parser.add_argument('--batch-size', type=int, default=PRECOMPUTE_BATCH_SIZE, help='Users per block')
+
+    args = parser.parse_args()
+
+    model_dir = Path(args.model_dir)
+    if not (model_dir / 'model.pkl').exists():
+        print(f"❌ No recommender model at {model_dir}")
+        return
+
+    recommender = Recommender.load(model_dir)
+    print(f"Scoring {len(recommender.user_ids):,} users x {recommender.n_items:,} items...")
+
+    start = time.perf_counter()
+    items, scores = recommender.precompute_top_n(args.top_n, args.batch_size)
+    elapsed = time.perf_counter() - start
+    TopNStore.save(args.output, items, scores, model_fingerprint(model_dir))
+
+    size_mb = (items.nbytes + scores.nbytes) / 1e6
+    print(f"✅ Top-{items.shape[1]} for {len(items):,} users in {elapsed:.1f}s "
+          f"({len(items) / max(elapsed, 1e-9):,.0f} users/s), {size_mb:.1f} MB -> {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,20 +2,76 @@
 Preprocess screening data for ML training.
 
 Steps:
-    1. Load raw screening CSV
-    2. Parse answer arrays
-    3. Extract features (answer patterns, variance, etc.)
-    4. Compute target labels from scores
+    1. Load raw screenings (export shards, or CSV)
+    2. Parse answer arrays (bulk, into an int8 matrix)
+    3. Extract features (answer patterns, variance, etc.) with NumPy reductions
+    4. Compute target labels from scores (searchsorted against severity bounds)
     5. Train/test split (stratified)
-    6. Save to processed/
+    6. Save to processed/ (Arrow IPC by default; Parquet or CSV on request)
+
+Raw input is read from data/raw/screenings/ (Parquet or JSONL shards from
+export_data.py --stream) if present, otherwise from screenings.csv or
+synthetic_screenings.csv.
+
+Streaming mode (--stream) reads the raw input in chunks, extracts features in
+a process pool and writes output shards as each chunk finishes. The split is
+done by hashing user_hash, so it needs a single pass and keeps every user on
+one side of the split.
+
+Incremental mode (--incremental) folds only raw partitions that earlier
+runs have not seen into the existing processed files, using the same hash
+split. Consumed partitions are recorded in data/processed/preprocess_state.json;
+if earlier partitions disappeared (a full re-export) or the split changed,
+it falls back to a full streaming rebuild.
+
+Usage:
+    python preprocess.py
+    python preprocess.py --stream --chunksize 200000 --workers 4
+    python preprocess.py --incremental
+    python preprocess.py --format csv
 """
 
+import os
+import shutil
+import argparse
 import pandas as pd
 import numpy as np
 import json
+import pyarrow as pa
+import pyarrow.parquet as pq
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 from sklearn.model_selection import train_test_split
 
+from processed_data import (
+    FORMATS, ProcessedWriter, find_processed, read_processed_table,
+    read_table, replace_processed, write_processed
+)
+
+
+# Upper score bound of each severity band (labels are band indices)
+# PHQ-9: 0-4 (none), 5-9 (mild), 10-14 (moderate), 15-19 (moderately severe), 20-27 (severe)
+# GAD-7: 0-4 (none), 5-9 (mild), 10-14 (moderate), 15-21 (severe)
+PHQ9_SEVERITY_BOUNDS = np.array([4, 9, 14, 19])
+GAD7_SEVERITY_BOUNDS = np.array([4, 9, 14])
+
+# Padding value for questions a screening does not have (GAD-7 in a 9-wide matrix)
+MISSING_ANSWER = -1
+
+# Output file suffix and number of questions per screening type
+SCREENING_TYPES = {'PHQ9': 'phq9', 'GAD7': 'gad7'}
+QUESTION_COUNTS = {'PHQ9': 9, 'GAD7': 7}
+
+# Resolution of the user_hash bucket used for the streaming split
+SPLIT_BUCKETS = 10000
+
+# Raw partitions already folded into data/processed (incremental mode)
+STATE_FILE = 'preprocess_state.json'
+
+# Characters dropped before tokenizing answer strings (brackets, quotes and
+# any whitespace json.loads would skip)
+_ANSWER_STRIP_TABLE = str.maketrans('', '', '[] \t\n\r\'"')
+
 
 def parse_answers(answer_str):
     """Parse answer string back to list of integers"""
@@ -27,8 +83,187 @@ def parse_answers(answer_str):
         return []
 
 
+def parse_answer_matrix(answer_series):
+    """
+    Parse answer strings like "[1, 2, 0]" in bulk.
+    
+    All rows are joined into one byte buffer and tokenized with NumPy, so the
+    cost is a few passes over the raw bytes instead of a json.loads per row.
+    
+    Returns:
+        (answers, valid): int8 matrix of shape (n_rows, max_questions) padded
+        with MISSING_ANSWER, and a boolean mask of rows that parsed to a
+        non-empty list of integers 0-127
+    
+    Unlike json.loads, negative, fractional and larger values invalidate
+    their row: they are not valid answers and don't fit the int8 matrix
+    (-1 is the padding). extract_features reports how many rows it drops.
+    """
+    n_rows = len(answer_series)
+    if n_rows == 0:
+        return np.empty((0, 0), dtype=np.int8), np.zeros(0, dtype=bool)
+    
+    text = ';'.join(answer_series.fillna('').astype(str).tolist()).translate(_ANSWER_STRIP_TABLE)
+    buf = np.frombuffer(text.encode('ascii', errors='replace'), dtype=np.uint8)
+    
+    # Tokens are separated by ',' within a row and ';' between rows
+    is_row_sep = buf == ord(';')
+    is_sep = is_row_sep | (buf == ord(','))
+    sep_positions = np.flatnonzero(is_sep)
+    token_starts = np.concatenate([[0], sep_positions + 1])
+    token_ends = np.concatenate([sep_positions, [len(buf)]])
+    n_tokens = len(token_starts)
+    
+    # Row and column of every token
+    starts_row = np.concatenate([[True], is_row_sep[sep_positions]])
+    token_row = np.cumsum(starts_row) - 1
+    token_col = np.arange(n_tokens) - np.flatnonzero(starts_row)[token_row]
+    
+    # Token values: each digit weighted by its position from the token end
+    byte_token = np.cumsum(is_sep)
+    is_digit = (buf >= ord('0')) & (buf <= ord('9'))
+    digit_idx = np.flatnonzero(is_digit)
+    digit_token = byte_token[digit_idx]
+    place = token_ends[digit_token] - digit_idx - 1
+    values = np.bincount(
+        digit_token,
+        weights=(buf[digit_idx] - ord('0')) * np.power(10.0, np.minimum(place, 18)),
+        minlength=n_tokens
+    )
+    
+    # A row is valid if it has at least one token and every token is a
+    # small non-negative integer
+    has_junk = np.bincount(byte_token[~is_digit & ~is_sep], minlength=n_tokens) > 0
+    token_ok = (token_ends > token_starts) & ~has_junk & (values <= np.iinfo(np.int8).max)
+    valid = np.bincount(token_row[~token_ok], minlength=n_rows) == 0
+    
+    width = int(token_col.max()) + 1
+    answers = np.full((n_rows, width), MISSING_ANSWER, dtype=np.int8)
+    answers[token_row[token_ok], token_col[token_ok]] = values[token_ok]
+    return answers, valid
+
+
+def list_answer_matrix(answer_series):
+    """
+    Build the answer matrix from list-valued answers (typed export shards).
+    
+    The lists are viewed as one Arrow list array, so the matrix is filled
+    from its flat values and offsets without a per-row loop.
+    
+    Returns:
+        Same (answers, valid) pair as parse_answer_matrix
+    """
+    n_rows = len(answer_series)
+    lists = pa.array(answer_series, type=pa.list_(pa.int8()), from_pandas=True)
+    offsets = lists.offsets.to_numpy()
+    values = lists.flatten().fill_null(MISSING_ANSWER).to_numpy(zero_copy_only=False)
+    
+    lengths = np.diff(offsets)
+    token_row = np.repeat(np.arange(n_rows), lengths)
+    token_col = np.arange(len(values)) - np.repeat(offsets[:-1], lengths)
+    
+    valid = lists.is_valid().to_numpy(zero_copy_only=False) & (lengths > 0)
+    valid &= np.bincount(token_row[values < 0], minlength=n_rows) == 0
+    
+    width = int(lengths.max()) if n_rows else 0
+    answers = np.full((n_rows, width), MISSING_ANSWER, dtype=np.int8)
+    answers[token_row, token_col] = values
+    return answers, valid
+
+
+def answer_matrix(answer_series):
+    """Answer matrix from either answer strings (CSV) or answer lists (shards)"""
+    dtype = answer_series.dtype
+    if isinstance(dtype, pd.ArrowDtype) and pa.types.is_list(dtype.pyarrow_dtype):
+        return list_answer_matrix(answer_series)
+    
+    first = answer_series.first_valid_index()
+    if first is not None and isinstance(answer_series[first], (list, np.ndarray)):
+        return list_answer_matrix(answer_series)
+    return parse_answer_matrix(answer_series)
+
+
 def extract_features(df):
-    """Extract features from screening answers"""
+    """
+    Extract features from screening answers.
+    
+    Answers are parsed once into a fixed-width int8 matrix; derived features
+    are masked NumPy reductions over that matrix.
+    
+    The result keeps the index of the input rows it came from.
+    """
+    answers, valid = answer_matrix(df['answers'])
+    n_dropped = int((~valid).sum())
+    if n_dropped:
+        print(f"⚠️  Dropped {n_dropped} of {len(valid)} screenings with missing or invalid answers "
+              f"(expected a non-empty list of integers 0-127)")
+    df = df.loc[valid]
+    answers = answers[valid]
+    
+    mask = answers != MISSING_ANSWER
+    counts = mask.sum(axis=1)
+    values = np.where(mask, answers, 0).astype(np.int16)
+    
+    sum_score = values.sum(axis=1)
+    mean_score = sum_score / counts
+    std_score = np.sqrt((np.where(mask, values - mean_score[:, None], 0.0) ** 2).sum(axis=1) / counts)
+    max_score = np.max(answers, axis=1, where=mask, initial=np.iinfo(np.int8).min)
+    min_score = np.min(answers, axis=1, where=mask, initial=np.iinfo(np.int8).max)
+    
+    features = {
+        'score': df['score'].to_numpy(),
+        'type': df['type'].to_numpy(),
+    }
+    
+    # Individual answer features (PHQ-9 has 9 questions, GAD-7 has 7)
+    for i in range(answers.shape[1]):
+        column = answers[:, i]
+        if mask[:, i].all():
+            features[f'q{i+1}'] = column
+        else:
+            features[f'q{i+1}'] = np.where(mask[:, i], column, np.nan).astype(np.float32)
+    
+    # Derived features
+    features['sum_score'] = sum_score
+    features['mean_score'] = mean_score
+    features['std_score'] = std_score
+    features['max_score'] = max_score
+    features['min_score'] = min_score
+    features['range_score'] = max_score - min_score
+    features['num_zeros'] = (answers == 0).sum(axis=1)
+    features['num_threes'] = (answers == 3).sum(axis=1)
+    
+    # Target label (risk level)
+    features['risk_level'] = df['risk_level'].to_numpy()
+    
+    return pd.DataFrame(features, index=df.index)
+
+
+def create_severity_labels(df):
+    """
+    Map scores to severity labels using clinical guidelines.
+    
+    A score's label is the number of band upper bounds below it, i.e. a
+    searchsorted into PHQ9_SEVERITY_BOUNDS / GAD7_SEVERITY_BOUNDS.
+    """
+    scores = df['score'].to_numpy()
+    is_phq9 = (df['type'] == 'PHQ9').to_numpy()
+    
+    df['severity_label'] = np.where(
+        is_phq9,
+        np.searchsorted(PHQ9_SEVERITY_BOUNDS, scores, side='left'),
+        np.searchsorted(GAD7_SEVERITY_BOUNDS, scores, side='left')
+    )
+    
+    return df
+
+
+def extract_features_rowwise(df):
+    """
+    Original per-row feature extraction.
+    
+    Kept as the reference for parity tests and benchmark_preprocess.py.
+    """
     features_list = []
     
     for idx, row in df.iterrows():
@@ -37,17 +272,14 @@ def extract_features(df):
         if len(answers) == 0:
             continue
         
-        # Basic features
         features = {
             'score': row['score'],
             'type': row['type'],
         }
         
-        # Individual answer features (PHQ-9 has 9 questions, GAD-7 has 7)
         for i, ans in enumerate(answers):
             features[f'q{i+1}'] = ans
         
-        # Derived features
         features['sum_score'] = sum(answers)
         features['mean_score'] = np.mean(answers)
         features['std_score'] = np.std(answers)
@@ -57,7 +289,6 @@ def extract_features(df):
         features['num_zeros'] = sum(1 for a in answers if a == 0)
         features['num_threes'] = sum(1 for a in answers if a == 3)
         
-        # Target label (risk level)
         features['risk_level'] = row['risk_level']
         
         features_list.append(features)
@@ -65,12 +296,11 @@ def extract_features(df):
     return pd.DataFrame(features_list)
 
 
-def create_severity_labels(df):
+def create_severity_labels_rowwise(df):
     """
-    Map scores to severity labels using clinical guidelines.
+    Original row-wise severity labelling.
     
-    PHQ-9: 0-4 (none), 5-9 (mild), 10-14 (moderate), 15-19 (moderately severe), 20-27 (severe)
-    GAD-7: 0-4 (none), 5-9 (mild), 10-14 (moderate), 15-21 (severe)
+    Kept as the reference for parity tests and benchmark_preprocess.py.
     """
     def label_phq9(score):
         if score <= 4:
@@ -102,7 +332,278 @@ def create_severity_labels(df):
     return df
 
 
+def hash_split(user_hashes, test_size=0.2):
+    """
+    Deterministic train/test assignment by user.
+    
+    Each user_hash maps to a fixed bucket, so the split needs no global view
+    of the data, is stable across runs and chunkings, and never puts one
+    user's screenings on both sides. Users are independent of severity, so
+    class proportions match the stratified split in expectation.
+    
+    Returns:
+        Boolean array, True for test rows
+    """
+    hashes = pd.util.hash_pandas_object(pd.Series(user_hashes).astype(str), index=False).to_numpy()
+    return (hashes % SPLIT_BUCKETS) < int(test_size * SPLIT_BUCKETS)
+
+
+def feature_columns(screening_type):
+    """
+    Output column order for one screening type.
+    
+    Only the questions the screening actually has are kept, so every column
+    is dense and fits the typed int8/float32 schema.
+    """
+    return (
+        ['score'] + [f'q{i+1}' for i in range(QUESTION_COUNTS[screening_type])] +
+        ['sum_score', 'mean_score', 'std_score', 'max_score', 'min_score',
+         'range_score', 'num_zeros', 'num_threes', 'severity_label']
+    )
+
+
+def find_screenings_source(raw_dir):
+    """
+    Locate raw screening input.
+    
+    Returns the export shard directory if it holds any part files, otherwise
+    the first existing CSV, otherwise None.
+    """
+    shard_dir = Path(raw_dir) / 'screenings'
+    if raw_shards(shard_dir):
+        return shard_dir
+    
+    for name in ('screenings.csv', 'synthetic_screenings.csv'):
+        path = Path(raw_dir) / name
+        if path.exists():
+            return path
+    return None
+
+
+def raw_shards(shard_dir):
+    """Parquet/JSONL part files under an export directory, in name order"""
+    shard_dir = Path(shard_dir)
+    if not shard_dir.is_dir():
+        return []
+    return sorted(
+        path for path in shard_dir.rglob('part-*')
+        if path.suffix in ('.parquet', '.jsonl')
+    )
+
+
+def iter_screening_chunks(source, chunksize=200000):
+    """
+    Yield raw screening DataFrames of at most chunksize rows.
+    
+    source is a CSV file, an export shard directory, or a list of part files.
+    """
+    if isinstance(source, (list, tuple)):
+        parts = source
+    elif Path(source).is_dir():
+        parts = raw_shards(source)
+    else:
+        yield from pd.read_csv(source, chunksize=chunksize)
+        return
+    
+    for part in parts:
+        if part.suffix == '.parquet':
+            for batch in pq.ParquetFile(part).iter_batches(batch_size=chunksize):
+                yield batch.to_pandas()
+        else:
+            yield from pd.read_json(part, lines=True, chunksize=chunksize)
+
+
+def load_screenings(source):
+    """Load all raw screenings into one DataFrame"""
+    source = Path(source)
+    if not source.is_dir():
+        return pd.read_csv(source)
+    
+    frames = list(iter_screening_chunks(source, chunksize=1000000))
+    if not frames:
+        return pd.DataFrame(columns=['user_hash', 'type', 'score', 'answers', 'risk_level'])
+    return pd.concat(frames, ignore_index=True)
+
+
+def process_chunk(chunk_idx, chunk, shard_dir, test_size=0.2):
+    """
+    Extract features for one raw chunk and write its shards.
+    
+    Runs in a worker process. Writes one Arrow file per (split, type) to
+    shard_dir/<split>_<type>/part-<chunk_idx>.arrow and returns row counts.
+    """
+    df_features = create_severity_labels(extract_features(chunk))
+    is_test = hash_split(chunk.loc[df_features.index, 'user_hash'], test_size)
+    
+    counts = {}
+    for screening_type, suffix in SCREENING_TYPES.items():
+        is_type = (df_features['type'] == screening_type).to_numpy()
+        for split, mask in (('train', is_type & ~is_test), ('test', is_type & is_test)):
+            shard = df_features.loc[mask, feature_columns(screening_type)]
+            write_processed(shard, Path(shard_dir) / f'{split}_{suffix}' / f'part-{chunk_idx:05d}', 'arrow')
+            counts[f'{split}_{suffix}'] = len(shard)
+    
+    return chunk_idx, len(chunk), counts
+
+
+def merge_shards(shard_dir, processed_dir, fmt='arrow', append=False):
+    """
+    Append shards into train_/test_<type> files in chunk order.
+    
+    With append=True the existing processed rows (in any format) are copied
+    ahead of the new shards. Each file is written under a temporary name and
+    moved into place, so readers never see a half-written split.
+    """
+    for screening_type, suffix in SCREENING_TYPES.items():
+        columns = feature_columns(screening_type)
+        for split in ('train', 'test'):
+            name = f'{split}_{suffix}'
+            stem = Path(processed_dir) / name
+            tmp_stem = Path(processed_dir) / f'{name}.tmp'
+            previous = read_processed_table(stem) if append else None
+            parts = sorted((Path(shard_dir) / name).glob('part-*.arrow'))
+            
+            with ProcessedWriter(tmp_stem, fmt, columns) as writer:
+                if previous is not None:
+                    writer.write(previous.select(columns).cast(writer.schema))
+                for part in parts:
+                    writer.write(read_table(part))
+            replace_processed(tmp_stem, stem, fmt)
+
+
+def preprocess_streaming(screenings_file, processed_dir, chunksize=200000, workers=None,
+                         test_size=0.2, keep_shards=False, fmt='arrow', parts=None, append=False):
+    """
+    Out-of-core preprocessing.
+    
+    At most 2 * workers chunks are in flight, so memory is bounded by the
+    chunk size rather than the input size. parts restricts the input to the
+    given raw part files; append adds the result to existing processed data.
+    """
+    workers = workers or os.cpu_count() or 1
+    shard_dir = Path(processed_dir) / 'shards'
+    if shard_dir.exists():
+        shutil.rmtree(shard_dir)
+    shard_dir.mkdir(parents=True)
+    
+    totals = {}
+    n_rows = 0
+    
+    def collect(done):
+        nonlocal n_rows
+        for future in done:
+            chunk_idx, chunk_rows, counts = future.result()
+            n_rows += chunk_rows
+            for key, count in counts.items():
+                totals[key] = totals.get(key, 0) + count
+            print(f"  Chunk {chunk_idx}: {chunk_rows} rows ({n_rows} total)")
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        source = parts if parts is not None else screenings_file
+        for chunk_idx, chunk in enumerate(iter_screening_chunks(source, chunksize)):
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending.add(executor.submit(process_chunk, chunk_idx, chunk, shard_dir, test_size))
+        collect(pending)
+    
+    print("Merging shards...")
+    merge_shards(shard_dir, processed_dir, fmt, append)
+    if not keep_shards:
+        shutil.rmtree(shard_dir)
+    
+    print(f"Processed {n_rows} records")
+    for suffix in SCREENING_TYPES.values():
+        print(f"{suffix.upper()} train: {totals.get(f'train_{suffix}', 0)}, test: {totals.get(f'test_{suffix}', 0)}")
+
+
+def partition_names(source):
+    """Raw part files of a shard directory, relative to it"""
+    return [part.relative_to(source).as_posix() for part in raw_shards(source)]
+
+
+def load_state(processed_dir):
+    state_path = Path(processed_dir) / STATE_FILE
+    if not state_path.exists():
+        return {}
+    with open(state_path) as f:
+        return json.load(f)
+
+
+def save_state(processed_dir, source, test_size):
+    """Record which raw partitions the processed files contain"""
+    state_path = Path(processed_dir) / STATE_FILE
+    if not Path(source).is_dir():
+        # CSV input has no partitions to track
+        state_path.unlink(missing_ok=True)
+        return
+    
+    state = {'test_size': test_size, 'partitions': partition_names(source)}
+    tmp_path = state_path.with_suffix('.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, state_path)
+
+
+def preprocess_incremental(source, processed_dir, chunksize=200000, workers=None, test_size=0.2, fmt='arrow'):
+    """
+    Append only raw partitions that are not yet in the processed files.
+    
+    Returns:
+        False if incremental processing is not possible and a full rebuild
+        is needed, True otherwise
+    """
+    if not Path(source).is_dir():
+        print("⚠️  Incremental mode needs partitioned export shards, not a CSV")
+        return False
+    
+    state = load_state(processed_dir)
+    names = partition_names(source)
+    consumed = set(state.get('partitions', []))
+    outputs_exist = all(
+        find_processed(Path(processed_dir) / f'{split}_{suffix}') is not None
+        for suffix in SCREENING_TYPES.values() for split in ('train', 'test')
+    )
+    
+    if not state or not outputs_exist:
+        print("⚠️  No previous incremental run found")
+        return False
+    if state.get('test_size') != test_size:
+        print(f"⚠️  Test size changed ({state.get('test_size')} -> {test_size})")
+        return False
+    if not consumed.issubset(names):
+        print("⚠️  Previously processed partitions are gone (full re-export?)")
+        return False
+    
+    new_parts = [Path(source) / name for name in names if name not in consumed]
+    if not new_parts:
+        print("No new partitions to process")
+        return True
+    
+    print(f"Processing {len(new_parts)} new partitions ({len(consumed)} already processed)...")
+    preprocess_streaming(
+        source, processed_dir, chunksize=chunksize, workers=workers,
+        test_size=test_size, fmt=fmt, parts=new_parts, append=True
+    )
+    save_state(processed_dir, source, test_size)
+    return True
+
+
 def main():
+    parser = argparse.ArgumentParser(description='Preprocess screening data for ML training')
+    parser.add_argument('--stream', action='store_true', help='Chunked out-of-core mode with parallel workers')
+    parser.add_argument('--chunksize', type=int, default=200000, help='Rows per chunk (streaming mode)')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (streaming mode, default: all CPUs)')
+    parser.add_argument('--test-size', type=float, default=0.2, help='Test fraction')
+    parser.add_argument('--keep-shards', action='store_true', help='Keep per-chunk shards (streaming mode)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only process raw partitions added since the last run and append them')
+    parser.add_argument('--format', choices=list(FORMATS), default='arrow',
+                        help='Output format (arrow: memory-mapped typed columns, csv: export)')
+    
+    args = parser.parse_args()
+    
     # Paths - resolve relative to script location
     script_dir = Path(__file__).parent
     raw_dir = script_dir.parent / 'data' / 'raw'
@@ -111,18 +612,36 @@ def main():
     
     # Load raw data
     print("Loading raw screening data...")
-    screenings_file = raw_dir / 'screenings.csv'
-    if not screenings_file.exists():
-        # Try synthetic data
-        screenings_file = raw_dir / 'synthetic_screenings.csv'
+    screenings_file = find_screenings_source(raw_dir)
     
-    if not screenings_file.exists():
+    if screenings_file is None:
         print(f"❌ No screening data found in {raw_dir}")
         print("Run generate_synthetic_data.py first!")
         return
     
-    df = pd.read_csv(screenings_file)
-    print(f"Loaded {len(df)} records")
+    if args.incremental:
+        done = preprocess_incremental(
+            screenings_file, processed_dir, chunksize=args.chunksize,
+            workers=args.workers, test_size=args.test_size, fmt=args.format
+        )
+        if done:
+            print(f"\n✅ Preprocessing complete! Data saved to {processed_dir.absolute()}")
+            return
+        print("Running a full streaming rebuild instead...")
+    
+    if args.stream or args.incremental:
+        print(f"Streaming {screenings_file} in chunks of {args.chunksize}...")
+        preprocess_streaming(
+            screenings_file, processed_dir,
+            chunksize=args.chunksize, workers=args.workers,
+            test_size=args.test_size, keep_shards=args.keep_shards, fmt=args.format
+        )
+        save_state(processed_dir, screenings_file, args.test_size)
+        print(f"\n✅ Preprocessing complete! Data saved to {processed_dir.absolute()}")
+        return
+    
+    df = load_screenings(screenings_file)
+    print(f"Loaded {len(df)} records from {screenings_file}")
     
     # Extract features
     print("Extracting features...")
@@ -141,41 +660,45 @@ def main():
     
     # Train/test split for each type (stratified by severity)
     if len(df_phq9) > 0:
-        X_phq9 = df_phq9.drop(['type', 'risk_level', 'severity_label'], axis=1)
+        X_phq9 = df_phq9[feature_columns('PHQ9')].drop(['severity_label'], axis=1)
         y_phq9 = df_phq9['severity_label']
         
         if len(df_phq9) >= 10:  # Minimum for split
             X_train_phq9, X_test_phq9, y_train_phq9, y_test_phq9 = train_test_split(
-                X_phq9, y_phq9, test_size=0.2, stratify=y_phq9, random_state=42
+                X_phq9, y_phq9, test_size=args.test_size, stratify=y_phq9, random_state=42
             )
             
             # Save
             train_phq9 = pd.concat([X_train_phq9, y_train_phq9], axis=1)
             test_phq9 = pd.concat([X_test_phq9, y_test_phq9], axis=1)
             
-            train_phq9.to_csv(processed_dir / 'train_phq9.csv', index=False)
-            test_phq9.to_csv(processed_dir / 'test_phq9.csv', index=False)
+            write_processed(train_phq9, processed_dir / 'train_phq9', args.format)
+            write_processed(test_phq9, processed_dir / 'test_phq9', args.format)
             
             print(f"PHQ-9 train: {len(train_phq9)}, test: {len(test_phq9)}")
     
     if len(df_gad7) > 0:
-        X_gad7 = df_gad7.drop(['type', 'risk_level', 'severity_label'], axis=1)
+        X_gad7 = df_gad7[feature_columns('GAD7')].drop(['severity_label'], axis=1)
         y_gad7 = df_gad7['severity_label']
         
         if len(df_gad7) >= 10:
             X_train_gad7, X_test_gad7, y_train_gad7, y_test_gad7 = train_test_split(
-                X_gad7, y_gad7, test_size=0.2, stratify=y_gad7, random_state=42
+                X_gad7, y_gad7, test_size=args.test_size, stratify=y_gad7, random_state=42
             )
             
             # Save
             train_gad7 = pd.concat([X_train_gad7, y_train_gad7], axis=1)
             test_gad7 = pd.concat([X_test_gad7, y_test_gad7], axis=1)
             
-            train_gad7.to_csv(processed_dir / 'train_gad7.csv', index=False)
-            test_gad7.to_csv(processed_dir / 'test_gad7.csv', index=False)
+            write_processed(train_gad7, processed_dir / 'train_gad7', args.format)
+            write_processed(test_gad7, processed_dir / 'test_gad7', args.format)
             
             print(f"GAD-7 train: {len(train_gad7)}, test: {len(test_gad7)}")
     
+    # The stratified split is not the hash split, so later incremental runs
+    # must start from a full streaming rebuild
+    (processed_dir / STATE_FILE).unlink(missing_ok=True)
+    
     print(f"\n✅ Preprocessing complete! Data saved to {processed_dir.absolute()}")
 
 
@@ -0,0 +1,205 @@
+"""
+Typed columnar storage for processed screening data.
+
+Features:
+    - Explicit compact schema (int8 answers/counts/labels, float32 stats)
+    - Arrow IPC (default): uncompressed, memory-mapped on read, so loading
+      is near-instant and concurrent readers share the page cache
+    - Parquet: compressed, for archiving and external tools
+    - CSV: export option, readable by anything
+
+Files are addressed by stem (e.g. data/processed/train_phq9); the reader
+picks whichever format exists, preferring Arrow.
+"""
+
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pathlib import Path
+
+FORMATS = {
+    'arrow': '.arrow',
+    'parquet': '.parquet',
+    'csv': '.csv',
+}
+
+# Read preference when several formats exist for the same stem
+READ_ORDER = ['arrow', 'parquet', 'csv']
+
+COLUMN_TYPES = {
+    'score': pa.int8(),
+    'sum_score': pa.int8(),
+    'mean_score': pa.float32(),
+    'std_score': pa.float32(),
+    'max_score': pa.int8(),
+    'min_score': pa.int8(),
+    'range_score': pa.int8(),
+    'num_zeros': pa.int8(),
+    'num_threes': pa.int8(),
+    'severity_label': pa.int8(),
+}
+
+
+def column_type(name):
+    """Arrow type for a processed column (q1..qN answers are int8)"""
+    if name[:1] == 'q' and name[1:].isdigit():
+        return pa.int8()
+    return COLUMN_TYPES[name]
+
+
+def schema_for(columns):
+    return pa.schema([(name, column_type(name)) for name in columns])
+
+
+def processed_path(stem, fmt):
+    return Path(str(stem) + FORMATS[fmt])
+
+
+def to_table(df):
+    """Convert a processed DataFrame to an Arrow table with the compact schema"""
+    schema = schema_for(df.columns)
+    arrays = [
+        pa.array(df[name].to_numpy(dtype=field.type.to_pandas_dtype()), type=field.type)
+        for name, field in zip(df.columns, schema)
+    ]
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def remove_other_formats(stem, fmt):
+    """Delete copies of a split in other formats so readers never see stale data"""
+    for other in FORMATS:
+        if other != fmt:
+            processed_path(stem, other).unlink(missing_ok=True)
+
+
+def write_processed(df, stem, fmt='arrow'):
+    """
+    Write a processed split.
+
+    Args:
+        df: Features plus severity_label, no missing values
+        stem: Output path without extension
+        fmt: 'arrow', 'parquet' or 'csv'
+
+    Returns:
+        Path written
+    """
+    path = processed_path(stem, fmt)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    remove_other_formats(stem, fmt)
+
+    if fmt == 'csv':
+        df.to_csv(path, index=False)
+        return path
+
+    table = to_table(df)
+    if fmt == 'arrow':
+        with pa.OSFile(str(path), 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+    else:
+        pq.write_table(table, path, compression='zstd')
+    return path
+
+
+class ProcessedWriter:
+    """
+    Incremental writer for one processed split.
+
+    Used by the streaming pipeline to append chunk results without holding
+    the whole split in memory.
+    """
+
+    def __init__(self, stem, fmt, columns):
+        self.fmt = fmt
+        self.path = processed_path(stem, fmt)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        remove_other_formats(stem, fmt)
+        self.schema = schema_for(columns)
+        self.rows = 0
+        self._sink = None
+        self._writer = None
+
+        if fmt == 'arrow':
+            self._sink = pa.OSFile(str(self.path), 'wb')
+            self._writer = pa.ipc.new_file(self._sink, self.schema)
+        elif fmt == 'parquet':
+            self._writer = pq.ParquetWriter(self.path, self.schema, compression='zstd')
+        else:
+            pd.DataFrame(columns=list(columns)).to_csv(self.path, index=False)
+
+    def write(self, data):
+        """Append a DataFrame, or an Arrow table already in the schema"""
+        if self.fmt == 'csv':
+            if isinstance(data, pa.Table):
+                data = data.to_pandas()
+            data.to_csv(self.path, mode='a', header=False, index=False)
+        else:
+            self._writer.write_table(data if isinstance(data, pa.Table) else to_table(data))
+        self.rows += len(data)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        if self._sink is not None:
+            self._sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_table(path):
+    """Read an Arrow IPC or Parquet file; Arrow files are memory-mapped"""
+    path = Path(path)
+    if path.suffix == FORMATS['arrow']:
+        source = pa.memory_map(str(path), 'r')
+        return pa.ipc.open_file(source).read_all()
+    return pq.read_table(path, memory_map=True)
+
+
+def find_processed(stem):
+    """Path of the preferred existing format for a stem, or None"""
+    for fmt in READ_ORDER:
+        path = processed_path(stem, fmt)
+        if path.exists():
+            return path
+    return None
+
+
+def read_processed_table(stem):
+    """Load a processed split as an Arrow table (memory-mapped), or None"""
+    path = find_processed(stem)
+    if path is None:
+        return None
+    if path.suffix == FORMATS['csv']:
+        return to_table(pd.read_csv(path))
+    return read_table(path)
+
+
+def replace_processed(tmp_stem, stem, fmt):
+    """Atomically move a finished split into place and drop stale formats"""
+    os.replace(processed_path(tmp_stem, fmt), processed_path(stem, fmt))
+    remove_other_formats(stem, fmt)
+
+
+def read_processed(stem):
+    """
+    Load a processed split as a DataFrame.
+
+    Arrow columns without nulls are converted zero-copy, so the DataFrame
+    is backed by the memory-mapped file.
+
+    Raises:
+        FileNotFoundError: if no format exists for the stem
+    """
+    path = find_processed(stem)
+    if path is None:
+        raise FileNotFoundError(f"No processed data found for {stem} ({', '.join(FORMATS.values())})")
+
+    if path.suffix == FORMATS['csv']:
+        return pd.read_csv(path)
+    return read_table(path).to_pandas(split_blocks=True)
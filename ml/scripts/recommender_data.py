@@ -0,0 +1,377 @@
+"""
+Interaction and feature matrices for the LightFM recommender.
+
+Features:
+    - Reads RecommendationFeedback exports (export_data.py --stream, under
+      data/raw/recommendation_feedback/) or a single CSV/Parquet/JSONL file
+    - Feedback actions become interaction weights in one vectorized pass
+      (explicit ratings override the action weight, dismissals are dropped)
+    - User/item ids are factorized once; the interaction and weight
+      matrices are built directly as COO arrays, with repeated user-item
+      events summed (no per-row Python, no lightfm.data.Dataset)
+    - Feature matrices are identity + one-hot features, row-normalized,
+      matching lightfm.data.Dataset's defaults
+    - Optional user features from the latest screening risk level per type
+    - Vectorized synthetic interactions for training without real data and
+      for benchmarks at 1M+ interactions
+    - Mappings, feature matrices and the interaction matrix are saved next
+      to the model (mappings.json, *_features.npz, interactions.npz) for
+      serving (serving/recommender.py), each file replaced atomically
+    - New events can be appended in place (add_events): unseen users and
+      items get new identity features without rebuilding existing rows,
+      for update_recommender.py
+
+Usage:
+    python recommender_data.py --input data/raw/recommendation_feedback
+"""
+
+import os
+import json
+import argparse
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from pathlib import Path
+
+ML_DIR = Path(__file__).resolve().parent.parent
+
+FEEDBACK_DIR = 'recommendation_feedback'
+FEEDBACK_COLUMNS = ['user_hash', 'resource_id', 'action', 'rating', 'timestamp']
+
+# Interaction weight per feedback action ('rated' uses the rating itself)
+ACTION_WEIGHTS = {
+    'viewed': 1.0,
+    'clicked': 2.0,
+    'saved': 4.0,
+    'rated': 3.0,
+    'dismissed': 0.0,
+}
+
+# 'rated' events below this rating (1-5 stars) are dislikes, not interactions
+MIN_POSITIVE_RATING = 4
+
+MAPPINGS_FILE = 'mappings.json'
+USER_FEATURES_FILE = 'user_features.npz'
+ITEM_FEATURES_FILE = 'item_features.npz'
+INTERACTIONS_FILE = 'interactions.npz'
+
+
+def default_num_threads():
+    """Threads for LightFM: OMP_NUM_THREADS if set (run_pipeline.py sets it), else usable CPUs"""
+    if os.getenv('OMP_NUM_THREADS', '').isdigit():
+        return max(1, int(os.environ['OMP_NUM_THREADS']))
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def find_feedback_source(raw_dir):
+    """Feedback export shard directory if it holds part files, else recommendation_feedback.csv, else None"""
+    shard_dir = Path(raw_dir) / FEEDBACK_DIR
+    if feedback_shards(shard_dir):
+        return shard_dir
+    csv_path = Path(raw_dir) / f'{FEEDBACK_DIR}.csv'
+    return csv_path if csv_path.exists() else None
+
+
+def feedback_shards(shard_dir):
+    shard_dir = Path(shard_dir)
+    if not shard_dir.is_dir():
+        return []
+    return sorted(path for path in shard_dir.rglob('part-*') if path.suffix in ('.parquet', '.jsonl'))
+
+
+def _read_table(path, columns):
+    path = Path(path)
+    if path.suffix == '.parquet':
+        return pd.read_parquet(path, columns=columns)
+    if path.suffix == '.jsonl':
+        return pd.read_json(path, lines=True)[columns]
+    return pd.read_csv(path, usecols=columns)
+
+
+def load_feedback(source, columns=FEEDBACK_COLUMNS):
+    """Load feedback events from an export shard directory or a single file"""
+    source = Path(source)
+    paths = feedback_shards(source) if source.is_dir() else [source]
+    if not paths:
+        raise FileNotFoundError(f"No feedback shards found in {source}")
+    return pd.concat([_read_table(path, list(columns)) for path in paths], ignore_index=True)
+
+
+def feedback_weights(actions, ratings=None):
+    """
+    Interaction weight per event: the action weight, or for 'rated' events
+    the rating itself.
+
+    Ratings below MIN_POSITIVE_RATING get weight 0 (dropped like
+    dismissals); ratings on other actions are ignored, so they never lower
+    an engagement weight.
+    """
+    actions = pd.Series(actions)
+    weights = actions.map(ACTION_WEIGHTS).fillna(0.0).to_numpy(dtype=np.float32)
+    if ratings is not None:
+        ratings = pd.to_numeric(pd.Series(ratings), errors='coerce').to_numpy(dtype=np.float32)
+        rated = ~np.isnan(ratings) & (actions.to_numpy() == 'rated')
+        weights[rated] = np.where(ratings[rated] >= MIN_POSITIVE_RATING, ratings[rated], 0.0)
+    return weights
+
+
+def feedback_interactions(df):
+    """(user ids, item ids, weights) from feedback events, dismissals and unknown actions dropped"""
+    weights = feedback_weights(df['action'], df['rating'] if 'rating' in df else None)
+    keep = weights > 0
+    return (df['user_hash'].to_numpy()[keep].astype(str), df['resource_id'].to_numpy()[keep].astype(str),
+            weights[keep])
+
+
+def screening_user_features(screenings):
+    """
+    One feature per (user, screening type): the latest risk level.
+
+    Returns:
+        DataFrame with user_hash and feature columns (e.g. "PHQ9_moderate")
+    """
+    if 'timestamp' in screenings:
+        screenings = screenings.sort_values('timestamp', kind='stable')
+    latest = screenings.drop_duplicates(['user_hash', 'type'], keep='last')
+    return pd.DataFrame({
+        'user_hash': latest['user_hash'].astype(str).to_numpy(),
+        'feature': (latest['type'].astype(str) + '_' + latest['risk_level'].astype(str)).to_numpy(),
+    })
+
+
+def synthetic_interactions(n_users=100, n_items=50, mean_interactions=5, seed=None):
+    """
+    Synthetic users, items and ratings (vectorized).
+
+    High-risk users rate crisis/anxiety items highly, low-risk users rate
+    general items highly, everything else gets a low rating.
+
+    Returns:
+        (user ids, item ids, ratings, user risk per user, item category per item)
+    """
+    rng = np.random.default_rng(seed)
+    user_risk = rng.choice([0, 1], size=n_users, p=[0.7, 0.3])
+    item_categories = rng.choice([0, 1], size=n_items, p=[0.6, 0.4])
+
+    counts = rng.integers(1, 2 * mean_interactions, size=n_users)
+    users = np.repeat(np.arange(n_users), counts)
+    items = rng.integers(0, n_items, size=len(users))
+
+    risk, category = user_risk[users], item_categories[items]
+    ratings = rng.integers(1, 4, size=len(users))                       # mismatch: 1-3
+    ratings = np.where((risk == 1) & (category == 1), rng.integers(4, 6, size=len(users)), ratings)
+    ratings = np.where((risk == 0) & (category == 0), rng.integers(3, 6, size=len(users)), ratings)
+    return users, items, ratings.astype(np.float32), user_risk, item_categories
+
+
+def feature_matrix(n_rows, row_features=None, feature_names=None, identity=True, normalize=True):
+    """
+    Sparse (n_rows, [n_rows +] n_features) feature matrix.
+
+    Args:
+        row_features: (row indices, feature names) arrays; rows may repeat
+        feature_names: Fixed feature vocabulary (default: sorted unique names)
+        identity: Prepend a per-row indicator feature (LightFM's default)
+        normalize: Scale each row to sum to 1 (LightFM's default)
+
+    Returns:
+        (csr matrix, feature names in column order, identity part excluded)
+    """
+    blocks = [sp.identity(n_rows, dtype=np.float32, format='csr')] if identity else []
+    names = []
+    if row_features is not None:
+        rows, values = row_features
+        values = np.asarray(values).astype(str)
+        names = sorted(set(values)) if feature_names is None else list(feature_names)
+        codes = pd.Categorical(values, categories=names).codes
+        keep = codes >= 0
+        blocks.append(sp.csr_matrix(
+            (np.ones(keep.sum(), dtype=np.float32), (np.asarray(rows)[keep], codes[keep])),
+            shape=(n_rows, len(names))
+        ))
+    if not blocks:
+        raise ValueError("Feature matrix needs identity features or row features")
+
+    matrix = sp.hstack(blocks, format='csr', dtype=np.float32)
+    matrix.sum_duplicates()
+    if normalize:
+        row_sums = np.asarray(matrix.sum(axis=1)).ravel()
+        matrix = sp.diags(1 / np.maximum(row_sums, 1e-12)).astype(np.float32) @ matrix
+    return matrix.tocsr(), names
+
+
+def replace_file(path, write):
+    """Write path via a temp file in the same directory and os.replace it into place"""
+    path = Path(path)
+    tmp_path = path.with_name(f'.{path.name}.tmp')
+    with open(tmp_path, 'wb') as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def extend_identity_features(matrix, n_new):
+    """
+    Feature matrix with n_new extra rows, each with only its own identity feature.
+
+    Identity columns come first (one per existing row), so the new identity
+    columns are inserted after them and the named feature columns shift
+    right; existing rows keep their values.
+    """
+    if n_new == 0:
+        return matrix
+    n_rows, n_cols = matrix.shape
+    matrix = matrix.tocsc()
+    old_rows = sp.hstack([matrix[:, :n_rows], sp.csc_matrix((n_rows, n_new), dtype=np.float32),
+                          matrix[:, n_rows:]])
+    new_rows = sp.hstack([sp.csr_matrix((n_new, n_rows), dtype=np.float32),
+                          sp.identity(n_new, dtype=np.float32),
+                          sp.csr_matrix((n_new, n_cols - n_rows), dtype=np.float32)])
+    return sp.vstack([old_rows, new_rows], format='csr', dtype=np.float32)
+
+
+class RecommenderData:
+    """
+    Everything LightFM needs for one training run.
+
+    Attributes:
+        interactions: COO (n_users, n_items) float32 matrix of 1s
+        weights: COO matrix of summed event weights, same sparsity
+        user_features / item_features: CSR feature matrices
+        user_ids / item_ids: External id per row / column
+        user_feature_names / item_feature_names: Non-identity feature columns
+    """
+
+    def __init__(self, interactions, weights, user_features, item_features, user_ids, item_ids,
+                 user_feature_names=(), item_feature_names=()):
+        self.interactions = interactions
+        self.weights = weights
+        self.user_features = user_features
+        self.item_features = item_features
+        self.user_ids = np.asarray(user_ids).astype(str)
+        self.item_ids = np.asarray(item_ids).astype(str)
+        self.user_feature_names = list(user_feature_names)
+        self.item_feature_names = list(item_feature_names)
+
+    @classmethod
+    def build(cls, users, items, weights, user_features=None, item_features=None):
+        """
+        Build matrices from parallel event arrays.
+
+        Args:
+            users, items: External ids per event
+            weights: Weight per event (repeated user-item pairs are summed)
+            user_features, item_features: Optional (ids, feature names)
+                arrays; ids not seen in the events are ignored
+        """
+        user_codes, user_ids = pd.factorize(np.asarray(users), sort=True)
+        item_codes, item_ids = pd.factorize(np.asarray(items), sort=True)
+        shape = (len(user_ids), len(item_ids))
+
+        weights = sp.coo_matrix((np.asarray(weights, dtype=np.float32), (user_codes, item_codes)), shape=shape)
+        weights.sum_duplicates()
+        interactions = sp.coo_matrix((np.ones_like(weights.data), (weights.row, weights.col)), shape=shape)
+
+        def features(ids, pairs):
+            if pairs is None:
+                return feature_matrix(len(ids))
+            external, names = pairs
+            rows = pd.Index(ids).get_indexer(np.asarray(external))
+            keep = rows >= 0
+            return feature_matrix(len(ids), (rows[keep], np.asarray(names)[keep]))
+
+        user_matrix, user_names = features(user_ids, user_features)
+        item_matrix, item_names = features(item_ids, item_features)
+        return cls(interactions, weights, user_matrix, item_matrix, user_ids, item_ids, user_names, item_names)
+
+    @classmethod
+    def load(cls, model_dir):
+        """Matrices saved next to a model (weights are not saved, so they equal the interactions)"""
+        model_dir = Path(model_dir)
+        with open(model_dir / MAPPINGS_FILE) as f:
+            mappings = json.load(f)
+        interactions = sp.load_npz(model_dir / INTERACTIONS_FILE).tocoo()
+        return cls(
+            interactions, interactions.copy(),
+            sp.load_npz(model_dir / USER_FEATURES_FILE).tocsr(),
+            sp.load_npz(model_dir / ITEM_FEATURES_FILE).tocsr(),
+            mappings['user_ids'], mappings['item_ids'],
+            mappings['user_feature_names'], mappings['item_feature_names']
+        )
+
+    @property
+    def shape(self):
+        return self.interactions.shape
+
+    def add_events(self, users, items, weights):
+        """
+        Append new events, extending the id mappings for unseen users and items.
+
+        Returns:
+            (interactions, weights) COO matrices of just the new events,
+            shaped like the extended interaction matrix
+        """
+        users, items = np.asarray(users).astype(str), np.asarray(items).astype(str)
+        new_users = pd.unique(users[~np.isin(users, self.user_ids)])
+        new_items = pd.unique(items[~np.isin(items, self.item_ids)])
+
+        self.user_features = extend_identity_features(self.user_features, len(new_users))
+        self.item_features = extend_identity_features(self.item_features, len(new_items))
+        self.user_ids = np.concatenate([self.user_ids, new_users.astype(str)])
+        self.item_ids = np.concatenate([self.item_ids, new_items.astype(str)])
+        shape = (len(self.user_ids), len(self.item_ids))
+
+        rows = pd.Index(self.user_ids).get_indexer(users)
+        cols = pd.Index(self.item_ids).get_indexer(items)
+        new_weights = sp.coo_matrix((np.asarray(weights, dtype=np.float32), (rows, cols)), shape=shape)
+        new_weights.sum_duplicates()
+        new_interactions = sp.coo_matrix((np.ones_like(new_weights.data), (new_weights.row, new_weights.col)),
+                                         shape=shape)
+
+        def grow(matrix):
+            matrix = matrix.tocsr()
+            matrix.resize(shape)
+            return matrix
+
+        merged = grow(self.interactions) + new_interactions.tocsr()
+        merged.data[:] = 1.0
+        self.interactions = merged.tocoo()
+        self.weights = (grow(self.weights) + new_weights.tocsr()).tocoo()
+        return new_interactions, new_weights
+
+    def save(self, model_dir):
+        """Write mappings.json, the feature matrices and the interactions to model_dir"""
+        model_dir = Path(model_dir)
+        model_dir.mkdir(parents=True, exist_ok=True)
+        replace_file(model_dir / USER_FEATURES_FILE, lambda f: sp.save_npz(f, self.user_features))
+        replace_file(model_dir / ITEM_FEATURES_FILE, lambda f: sp.save_npz(f, self.item_features))
+        replace_file(model_dir / INTERACTIONS_FILE, lambda f: sp.save_npz(f, self.interactions.tocsr()))
+        mappings = json.dumps({
+            'user_ids': self.user_ids.tolist(),
+            'item_ids': self.item_ids.tolist(),
+            'user_feature_names': self.user_feature_names,
+            'item_feature_names': self.item_feature_names,
+        })
+        replace_file(model_dir / MAPPINGS_FILE, lambda f: f.write(mappings.encode('utf-8')))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build recommender matrices from a feedback export')
+    parser.add_argument('--input', default=None, help='Feedback shard directory or file (default: data/raw)')
+    args = parser.parse_args()
+
+    source = Path(args.input) if args.input else find_feedback_source(ML_DIR / 'data' / 'raw')
+    if source is None:
+        print("❌ No recommendation feedback export found")
+        return
+
+    df = load_feedback(source)
+    data = RecommenderData.build(*feedback_interactions(df))
+    print(f"✅ {len(df)} feedback events -> {data.shape[0]} users x {data.shape[1]} items, "
+          f"{data.interactions.nnz} interactions")
+
+
+if __name__ == '__main__':
+    main()
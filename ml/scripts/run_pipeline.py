@@ -0,0 +1,394 @@
+"""
+Run the ML pipeline stages from dvc.yaml as a parallel DAG.
+
+Features:
+    - Stage graph from dvc.yaml: a stage depends on whichever stages
+      produce its deps (files or anything inside an output directory)
+    - Independent stages (e.g. the screening, risk, intent, recommender and
+      summarizer trainers) run concurrently within a CPU budget
+      (params.yaml pipeline.cpu_budget / pipeline.stage_cpus); each stage
+      gets OMP/MKL thread limits matching its share
+    - Skips stages whose command, dependency contents and params are
+      unchanged since their last successful run and whose outputs exist;
+      always_changed stages (e.g. export_data) always run
+    - Records each finished stage as soon as it completes, so an
+      interrupted run doesn't redo the stages that already succeeded
+    - Per-stage logs in logs/pipeline/ and a timing report
+
+Usage:
+    python run_pipeline.py
+    python run_pipeline.py --exclude export_data --cpus 8
+    python run_pipeline.py train_risk_detector train_intent_classifier --force
+    python run_pipeline.py --dry-run
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import subprocess
+import yaml
+from pathlib import Path
+
+ML_DIR = Path(__file__).resolve().parent.parent
+
+# Relative to the directory holding dvc.yaml (paths in dvc.yaml are too)
+STATE_FILE = Path('.pipeline') / 'state.json'
+LOG_DIR = Path('logs') / 'pipeline'
+REPORT_FILE = Path('reports') / 'pipeline_timing.json'
+
+DEFAULT_STAGE_CPUS = 1
+HASH_BLOCK_SIZE = 1 << 20
+THREAD_ENV_VARS = ['OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'NUMEXPR_NUM_THREADS']
+
+
+def _entry_path(entry):
+    """dvc.yaml outs/deps entries are either a path or {path: options}"""
+    return entry if isinstance(entry, str) else next(iter(entry))
+
+
+def _param_keys(entries):
+    """params entries: "section.key" (params.yaml) or {file: [keys]}"""
+    keys = []
+    for entry in entries or []:
+        if isinstance(entry, str):
+            keys.append(('params.yaml', entry))
+        else:
+            for params_file, file_keys in entry.items():
+                keys.extend((params_file, key) for key in file_keys)
+    return keys
+
+
+def load_stages(dvc_path):
+    """
+    Parse dvc.yaml into stage dicts.
+
+    Returns:
+        Ordered dict name -> {cmd, deps, outs, params, always_changed}
+    """
+    with open(dvc_path) as f:
+        config = yaml.safe_load(f)
+
+    stages = {}
+    for name, spec in config['stages'].items():
+        outs = [_entry_path(entry) for entry in spec.get('outs', [])]
+        outs += [_entry_path(entry) for entry in spec.get('metrics', [])]
+        stages[name] = {
+            'cmd': spec['cmd'],
+            'deps': [_entry_path(entry) for entry in spec.get('deps', [])],
+            'outs': outs,
+            'params': _param_keys(spec.get('params')),
+            'always_changed': bool(spec.get('always_changed', False)),
+        }
+    return stages
+
+
+def _produces(out, dep):
+    out, dep = Path(out), Path(dep)
+    return dep == out or out in dep.parents
+
+
+def build_graph(stages):
+    """Upstream stage names for each stage (edges from outs to deps)"""
+    upstream = {name: set() for name in stages}
+    for name, stage in stages.items():
+        for dep in stage['deps']:
+            for other, other_stage in stages.items():
+                if other != name and any(_produces(out, dep) for out in other_stage['outs']):
+                    upstream[name].add(other)
+    return upstream
+
+
+def select_stages(stages, upstream, targets=None, exclude=()):
+    """Targets plus everything they need, minus excluded stages"""
+    if not targets:
+        selected = set(stages)
+    else:
+        selected, todo = set(), list(targets)
+        while todo:
+            name = todo.pop()
+            if name not in stages:
+                raise KeyError(f"Unknown stage: {name}")
+            if name not in selected:
+                selected.add(name)
+                todo.extend(upstream[name])
+    return [name for name in stages if name in selected and name not in exclude]
+
+
+def topological_order(names, upstream):
+    """Stage names ordered so every stage follows its upstream stages"""
+    order, done = [], set()
+    remaining = list(names)
+    while remaining:
+        ready = [name for name in remaining if not (upstream[name] & set(remaining)) - done]
+        if not ready:
+            raise ValueError(f"Cycle between stages: {', '.join(remaining)}")
+        for name in ready:
+            order.append(name)
+            done.add(name)
+            remaining.remove(name)
+    return order
+
+
+class FileHasher:
+    """Content hashes, reused while a file's size and mtime are unchanged"""
+
+    def __init__(self, root, cache=None):
+        self.root = Path(root)
+        self.cache = cache or {}
+
+    def file_hash(self, path):
+        stat = path.stat()
+        key = str(path)
+        cached = self.cache.get(key)
+        if cached and cached['size'] == stat.st_size and cached['mtime_ns'] == stat.st_mtime_ns:
+            return cached['hash']
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+                digest.update(block)
+        self.cache[key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'hash': digest.hexdigest()}
+        return digest.hexdigest()
+
+    def path_hash(self, path):
+        """Hash of a file, or of every file below a directory; 'missing' if absent"""
+        path = self.root / path
+        if path.is_file():
+            return self.file_hash(path)
+        if path.is_dir():
+            digest = hashlib.sha256()
+            for child in sorted(p for p in path.rglob('*') if p.is_file()):
+                digest.update(str(child.relative_to(path)).encode())
+                digest.update(self.file_hash(child).encode())
+            return digest.hexdigest()
+        return 'missing'
+
+
+def _lookup_param(params_cache, root, params_file, key):
+    if params_file not in params_cache:
+        path = Path(root) / params_file
+        params_cache[params_file] = yaml.safe_load(open(path)) if path.exists() else {}
+    value = params_cache[params_file]
+    for part in key.split('.'):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+def stage_hash(stage, hasher, params_cache):
+    """Hash of a stage's command, dependency contents and parameter values"""
+    payload = {
+        'cmd': stage['cmd'],
+        'deps': {dep: hasher.path_hash(dep) for dep in stage['deps']},
+        'params': {f"{params_file}:{key}": _lookup_param(params_cache, hasher.root, params_file, key)
+                   for params_file, key in stage['params']},
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def load_state(root):
+    state_path = Path(root) / STATE_FILE
+    if state_path.exists():
+        with open(state_path) as f:
+            return json.load(f)
+    return {'stages': {}, 'files': {}}
+
+
+def save_state(root, state):
+    state_path = Path(root) / STATE_FILE
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = state_path.with_suffix('.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, state_path)
+
+
+def load_pipeline_config(root, cpus=None):
+    """CPU budget and per-stage CPUs from params.yaml (pipeline section)"""
+    config = _lookup_param({}, root, 'params.yaml', 'pipeline') or {}
+    budget = cpus or config.get('cpu_budget') or os.cpu_count() or 1
+    return budget, config.get('stage_cpus') or {}
+
+
+def stage_env(cpus):
+    """Environment limiting a stage's native thread pools to its CPU share"""
+    env = dict(os.environ)
+    for var in THREAD_ENV_VARS:
+        env[var] = str(cpus)
+    return env
+
+
+def run_pipeline(stages, names, upstream, budget, stage_cpus, root=ML_DIR, force=False, dry_run=False,
+                 poll_interval=0.2):
+    """
+    Schedule the selected stages.
+
+    A stage starts once all of its selected upstream stages succeeded (or
+    were skipped) and its CPUs fit in the free budget; a stage asking for
+    more than the whole budget runs alone. Failures block only downstream
+    stages.
+
+    Returns:
+        List of per-stage result dicts
+    """
+    root = Path(root)
+    state = load_state(root)
+    hasher = FileHasher(root, state.get('files'))
+    selected = set(names)
+    pending = topological_order(names, upstream)
+    running = {}
+    results = {}
+    digests = {}
+    pipeline_start = time.perf_counter()
+    if not dry_run:
+        (root / LOG_DIR).mkdir(parents=True, exist_ok=True)
+
+    def cpus_for(name):
+        return min(stage_cpus.get(name, DEFAULT_STAGE_CPUS), budget)
+
+    def save():
+        if not dry_run:
+            state['files'] = hasher.cache
+            save_state(root, state)
+
+    def finish(name, status, **extra):
+        results[name] = {'stage': name, 'status': status, 'cpus': cpus_for(name), **extra}
+        print(f"  {status.upper():8s} {name}" + (f" ({extra['seconds']:.1f}s)" if 'seconds' in extra else ""))
+
+    while pending or running:
+        # Stages whose upstream failed can never run
+        for name in list(pending):
+            failed = [up for up in upstream[name] & selected
+                      if results.get(up, {}).get('status') in ('failed', 'blocked')]
+            if failed:
+                pending.remove(name)
+                finish(name, 'blocked', reason=f"upstream failed: {', '.join(sorted(failed))}")
+
+        used = sum(info['cpus'] for info in running.values())
+        for name in list(pending):
+            if any(up not in results for up in upstream[name] & selected):
+                continue
+
+            stage = stages[name]
+            if name not in digests:
+                digests[name] = stage_hash(stage, hasher, {})
+            digest = digests[name]
+            outs_exist = all((root / out).exists() for out in stage['outs'])
+            cached = outs_exist and state['stages'].get(name, {}).get('hash') == digest
+            if not force and not stage['always_changed'] and cached:
+                pending.remove(name)
+                finish(name, 'cached', seconds=0.0)
+                continue
+
+            cpus = cpus_for(name)
+            if running and used + cpus > budget:
+                continue
+
+            pending.remove(name)
+            if dry_run:
+                finish(name, 'would run', cmd=stage['cmd'])
+                continue
+
+            log_path = LOG_DIR / f'{name}.log'
+            log_file = open(root / log_path, 'w')
+            process = subprocess.Popen(
+                stage['cmd'], shell=True, cwd=root, env=stage_env(cpus),
+                stdout=log_file, stderr=subprocess.STDOUT
+            )
+            running[name] = {
+                'process': process, 'log_file': log_file, 'log': str(log_path),
+                'cpus': cpus, 'digest': digest, 'start': time.perf_counter()
+            }
+            used += cpus
+            print(f"  START    {name} [{cpus} cpu] -> {running[name]['log']}")
+
+        for name, info in list(running.items()):
+            returncode = info['process'].poll()
+            if returncode is None:
+                continue
+
+            info['log_file'].close()
+            del running[name]
+            end = time.perf_counter()
+            timing = {
+                'seconds': end - info['start'],
+                'started_at': info['start'] - pipeline_start,
+                'log': info['log'],
+            }
+            if returncode == 0:
+                # The hash was taken at launch, i.e. of the inputs this run actually used
+                state['stages'][name] = {'hash': info['digest'], 'completed': time.time()}
+                finish(name, 'ran', **timing)
+            else:
+                state['stages'].pop(name, None)
+                finish(name, 'failed', returncode=returncode, **timing)
+            save()
+
+        if running:
+            time.sleep(poll_interval)
+
+    save()
+
+    wall = time.perf_counter() - pipeline_start
+    return [results[name] for name in names if name in results], wall
+
+
+def print_report(results, wall, budget):
+    """Timing table plus the speedup over running the same stages serially"""
+    serial = sum(result.get('seconds', 0.0) for result in results)
+    print(f"\n{'Stage':28s} {'Status':10s} {'CPUs':>4s} {'Start':>8s} {'Seconds':>9s}")
+    print("-" * 63)
+    for result in results:
+        start = f"{result['started_at']:.1f}" if 'started_at' in result else '-'
+        seconds = f"{result['seconds']:.1f}" if 'seconds' in result else '-'
+        print(f"{result['stage']:28s} {result['status']:10s} {result['cpus']:>4d} {start:>8s} {seconds:>9s}")
+    print("-" * 63)
+    print(f"Wall time: {wall:.1f}s, serial stage time: {serial:.1f}s "
+          f"(x{serial / wall if wall else 0:.2f}), CPU budget: {budget}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run dvc.yaml stages as a parallel DAG with hash caching')
+    parser.add_argument('stages', nargs='*', help='Target stages (default: all); upstream stages are included')
+    parser.add_argument('--exclude', nargs='*', default=[], help='Stages to leave out (e.g. export_data)')
+    parser.add_argument('--cpus', type=int, default=None, help='CPU budget (default: params.yaml or all cores)')
+    parser.add_argument('--force', action='store_true', help='Run stages even if their hashes are unchanged')
+    parser.add_argument('--dry-run', action='store_true', help='Show what would run without running it')
+    parser.add_argument('--dvc-file', default=str(ML_DIR / 'dvc.yaml'), help='Pipeline definition')
+    parser.add_argument('--report', default=None, help='JSON timing report path (default: reports/pipeline_timing.json)')
+
+    args = parser.parse_args()
+
+    root = Path(args.dvc_file).resolve().parent
+    stages = load_stages(args.dvc_file)
+    upstream = build_graph(stages)
+    names = select_stages(stages, upstream, args.stages, args.exclude)
+    budget, stage_cpus = load_pipeline_config(root, args.cpus)
+
+    print(f"Running {len(names)} stages with a budget of {budget} CPUs")
+    for name in topological_order(names, upstream):
+        needs = sorted(upstream[name] & set(names))
+        print(f"  {name}" + (f" <- {', '.join(needs)}" if needs else ""))
+    print()
+
+    results, wall = run_pipeline(stages, names, upstream, budget, stage_cpus, root, args.force, args.dry_run)
+    print_report(results, wall, budget)
+
+    if not args.dry_run:
+        report_path = Path(args.report) if args.report else root / REPORT_FILE
+        report_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(report_path, 'w') as f:
+            json.dump({'wall_seconds': wall, 'cpu_budget': budget, 'stages': results}, f, indent=2)
+        print(f"Report saved to: {report_path}")
+
+    failed = [result['stage'] for result in results if result['status'] in ('failed', 'blocked')]
+    if failed:
+        print(f"\n❌ {len(failed)} stage(s) did not complete: {', '.join(failed)}")
+        sys.exit(1)
+    print("\n✅ Pipeline complete!")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,306 @@
+"""
+Parallel hyperparameter search for the LightGBM screening classifiers.
+
+Features:
+    - Successive halving: many random configurations get a small boosting
+      budget, the best 1/eta move on to eta times the rounds, and so on
+    - Early stopping inside every trial (lgb.cv), so budgets are upper bounds
+    - Stratified k-fold CV on the training split only (test stays held out)
+    - The binned lgb.Dataset is built once, saved in LightGBM's binary
+      format and loaded once per worker process, then reused by every trial
+    - Trials run in a process pool, threads split between workers
+    - Best parameters per screening type are written to the tuned section
+      of params.yaml (train_screening.py applies them over train)
+    - Reports wall-clock time and trials per minute
+
+Usage:
+    python screening_search.py
+    python screening_search.py --types PHQ9 --trials 81 --workers 4
+    python screening_search.py --dry-run
+"""
+
+import os
+import json
+import time
+import argparse
+import tempfile
+import numpy as np
+import yaml
+import lightgbm as lgb
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.model_selection import StratifiedKFold
+
+from processed_data import read_processed
+
+ML_DIR = Path(__file__).resolve().parent.parent
+PARAMS_PATH = ML_DIR / 'params.yaml'
+TUNED_SECTION = 'tuned'
+
+DEFAULT_SEARCH = {
+    'n_trials': 27,
+    'eta': 3,
+    'min_rounds': 50,
+    'cv_folds': 5,
+    'early_stopping_rounds': 20,
+    'workers': 0,  # 0 = one per CPU
+    'seed': 42,
+}
+
+# Binning is fixed when the Dataset is built, so these stay out of the search
+DATASET_PARAMS = {'max_bin': 255, 'feature_pre_filter': False, 'verbose': -1}
+
+# Searched parameters use LGBMClassifier names (LightGBM accepts them as aliases in lgb.cv)
+TUNED_KEYS = [
+    'learning_rate', 'n_estimators', 'max_depth', 'num_leaves', 'min_child_samples',
+    'colsample_bytree', 'subsample', 'subsample_freq', 'reg_lambda',
+]
+
+_worker_state = {}
+
+
+def sample_params(rng):
+    """One random configuration from the search space"""
+    max_depth = int(rng.choice([-1, 3, 4, 5, 6, 8]))
+    max_leaves = 2 ** max_depth if max_depth > 0 else 128
+    return {
+        'learning_rate': float(np.exp(rng.uniform(np.log(0.01), np.log(0.3)))),
+        'max_depth': max_depth,
+        'num_leaves': int(min(max_leaves, np.exp(rng.uniform(np.log(8), np.log(128))))),
+        'min_child_samples': int(np.exp(rng.uniform(np.log(5), np.log(100)))),
+        'colsample_bytree': float(rng.uniform(0.5, 1.0)),
+        'subsample': float(rng.uniform(0.5, 1.0)),
+        'subsample_freq': 1,
+        'reg_lambda': float(np.exp(rng.uniform(np.log(1e-3), np.log(10.0)))),
+    }
+
+
+def halving_schedule(n_trials, eta, min_rounds):
+    """
+    (configurations, boosting-round budget) per rung.
+
+    e.g. 27 trials, eta 3, 50 rounds -> [(27, 50), (9, 150), (3, 450), (1, 1350)]
+    """
+    rungs = []
+    n, rounds = n_trials, min_rounds
+    while True:
+        rungs.append((n, rounds))
+        if n == 1:
+            return rungs
+        n, rounds = max(1, n // eta), rounds * eta
+
+
+def build_binary_dataset(X, y, path):
+    """Bin the training data once and save it in LightGBM's binary format"""
+    dataset = lgb.Dataset(X, label=y, params=DATASET_PARAMS, free_raw_data=False)
+    dataset.save_binary(str(path))
+    return path
+
+
+def _init_worker(binary_path, folds, num_threads):
+    dataset = lgb.Dataset(str(binary_path), params=DATASET_PARAMS)
+    dataset.construct()
+    _worker_state.update(dataset=dataset, folds=folds, num_threads=num_threads)
+
+
+def run_trial(trial_id, params, num_class, num_boost_round, early_stopping_rounds, seed):
+    """
+    Cross-validate one configuration on the worker's binned Dataset.
+
+    Returns:
+        Dict with trial_id, params, score (mean multi_logloss at the best
+        iteration), best_iteration and seconds
+    """
+    start = time.perf_counter()
+    trial_params = {
+        **params,
+        **DATASET_PARAMS,
+        'objective': 'multiclass',
+        'num_class': num_class,
+        'metric': 'multi_logloss',
+        'num_threads': _worker_state['num_threads'],
+        'seed': seed,
+    }
+    history = lgb.cv(
+        trial_params,
+        _worker_state['dataset'],
+        num_boost_round=num_boost_round,
+        folds=_worker_state['folds'],
+        callbacks=[lgb.early_stopping(early_stopping_rounds, verbose=False)],
+    )
+    losses = next(values for key, values in history.items() if key.endswith('multi_logloss-mean'))
+    return {
+        'trial_id': trial_id,
+        'params': params,
+        'score': float(losses[-1]),
+        'best_iteration': len(losses),
+        'rounds': num_boost_round,
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def successive_halving(X, y, search_config, label=''):
+    """
+    Search hyperparameters for one screening type.
+
+    Returns:
+        (best result dict, summary dict with wall time and trial counts)
+    """
+    config = {**DEFAULT_SEARCH, **search_config}
+    workers = config['workers'] or os.cpu_count() or 1
+    num_threads = max(1, (os.cpu_count() or 1) // workers)
+    rng = np.random.default_rng(config['seed'])
+    num_class = int(np.max(y)) + 1
+
+    skf = StratifiedKFold(n_splits=config['cv_folds'], shuffle=True, random_state=config['seed'])
+    folds = list(skf.split(np.zeros(len(y)), y))
+
+    candidates = [(trial_id, sample_params(rng)) for trial_id in range(config['n_trials'])]
+    schedule = halving_schedule(config['n_trials'], config['eta'], config['min_rounds'])
+    evaluations = []
+    start = time.perf_counter()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        binary_path = build_binary_dataset(X, y, Path(tmp_dir) / 'train.bin')
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(binary_path, folds, num_threads)) as executor:
+            for rung, (n_keep, rounds) in enumerate(schedule):
+                candidates = candidates[:n_keep]
+                futures = [
+                    executor.submit(run_trial, trial_id, params, num_class, rounds,
+                                    config['early_stopping_rounds'], config['seed'])
+                    for trial_id, params in candidates
+                ]
+                results = sorted((future.result() for future in futures), key=lambda r: r['score'])
+                evaluations.extend(results)
+                print(f"  {label} rung {rung}: {len(results)} trials x {rounds} rounds, "
+                      f"best logloss {results[0]['score']:.4f}")
+                candidates = [(result['trial_id'], result['params']) for result in results]
+
+    wall = time.perf_counter() - start
+    best = results[0]
+    summary = {
+        'configurations': config['n_trials'],
+        'trials': len(evaluations),
+        'wall_seconds': wall,
+        'trials_per_minute': len(evaluations) / wall * 60,
+        'workers': workers,
+        'threads_per_trial': num_threads,
+        'best_score': best['score'],
+    }
+    return best, summary
+
+
+def tuned_params(best):
+    """Best trial as train-section parameters (n_estimators from early stopping)"""
+    params = {**best['params'], 'n_estimators': best['best_iteration']}
+    return {key: params[key] for key in TUNED_KEYS if key in params}
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return f"{value:.6g}"
+    return str(value)
+
+
+def write_tuned_params(tuned, params_path=PARAMS_PATH):
+    """
+    Write per-type tuned parameters into params.yaml.
+
+    Entries are merged over the existing tuned section, so types not
+    searched in this run keep their parameters. Only the tuned section is
+    rewritten (line-based), so comments and formatting elsewhere in the
+    file are preserved.
+    """
+    params_path = Path(params_path)
+    text = params_path.read_text()
+    tuned = {**((yaml.safe_load(text) or {}).get(TUNED_SECTION) or {}), **tuned}
+    lines = text.splitlines()
+
+    # Drop an existing tuned section (header, its indented lines and its comment)
+    kept, skipping = [], False
+    for line in lines:
+        if line.startswith(f'{TUNED_SECTION}:'):
+            skipping = True
+            if kept and kept[-1].startswith('# scripts/screening_search.py'):
+                kept.pop()
+            continue
+        if skipping and (not line.strip() or line.startswith((' ', '\t'))):
+            continue
+        skipping = False
+        kept.append(line)
+
+    while kept and not kept[-1].strip():
+        kept.pop()
+    kept += ['', '# scripts/screening_search.py: best parameters per screening type', f'{TUNED_SECTION}:']
+    for model_type, params in tuned.items():
+        kept.append(f'  {model_type}:')
+        kept += [f'    {key}: {_format_value(value)}' for key, value in params.items()]
+
+    tmp_path = params_path.with_suffix('.tmp')
+    tmp_path.write_text('\n'.join(kept) + '\n')
+    os.replace(tmp_path, params_path)
+
+
+def load_train_split(model_type):
+    file_suffix = 'phq9' if model_type == 'PHQ9' else 'gad7'
+    train_df = read_processed(ML_DIR / 'data' / 'processed' / f'train_{file_suffix}')
+    y = train_df['severity_label'].to_numpy()
+    X = train_df.drop(['severity_label'], axis=1, errors='ignore')
+    return X, y
+
+
+def run_search(types, search_config, params_path=PARAMS_PATH, write=True, report_path=None):
+    """Search every screening type and (optionally) write the results to params.yaml"""
+    tuned, report = {}, {}
+    for model_type in types:
+        try:
+            X, y = load_train_split(model_type)
+        except FileNotFoundError:
+            print(f"⚠️  {model_type} data not found. Skipping search.")
+            continue
+
+        print(f"\nSearching {model_type} ({len(y)} rows, {X.shape[1]} features)...")
+        best, summary = successive_halving(X, y, search_config, model_type)
+        tuned[model_type] = tuned_params(best)
+        report[model_type] = {**summary, 'params': tuned[model_type]}
+        print(f"✅ {model_type}: logloss {best['score']:.4f}, {summary['trials']} trials in "
+              f"{summary['wall_seconds']:.1f}s ({summary['trials_per_minute']:.1f} trials/min)")
+        print(f"   {tuned[model_type]}")
+
+    if tuned and write:
+        write_tuned_params(tuned, params_path)
+        print(f"\nBest parameters written to {params_path} ({TUNED_SECTION} section)")
+    if report_path:
+        report_path = Path(report_path)
+        report_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Search report saved to: {report_path}")
+    return tuned
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Hyperparameter search for the screening classifiers')
+    parser.add_argument('--types', nargs='+', default=['PHQ9', 'GAD7'], choices=['PHQ9', 'GAD7'])
+    parser.add_argument('--trials', type=int, default=None, help='Initial configurations (default: params.yaml)')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: params.yaml)')
+    parser.add_argument('--params', default=str(PARAMS_PATH), help='params.yaml to read and update')
+    parser.add_argument('--report', default=str(ML_DIR / 'reports' / 'screening_search.json'),
+                        help='JSON search report path')
+    parser.add_argument('--dry-run', action='store_true', help='Do not write params.yaml')
+
+    args = parser.parse_args()
+
+    with open(args.params) as f:
+        search_config = (yaml.safe_load(f) or {}).get('search') or {}
+    if args.trials:
+        search_config['n_trials'] = args.trials
+    if args.workers:
+        search_config['workers'] = args.workers
+
+    run_search(args.types, search_config, args.params, write=not args.dry_run, report_path=args.report)
+
+
+if __name__ == '__main__':
+    main()
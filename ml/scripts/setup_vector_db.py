@@ -5,8 +5,12 @@ Creates collection for mental health knowledge base with embeddings.
 
 Usage:
     python setup_vector_db.py --collection mental_health_kb --dim 384
+    python setup_vector_db.py --index-type HNSW --hnsw-m 16
+
+Index parameters should be picked from benchmark_vector_index.py results.
 """
 
+import os
 import argparse
 from pymilvus import (
     connections,
@@ -18,13 +22,15 @@ from pymilvus import (
 )
 
 
-def create_collection(collection_name, embedding_dim=384):
+def create_collection(collection_name, embedding_dim=384, index_type='IVF_FLAT', index_build_params=None):
     """
     Create Milvus collection for knowledge base.
     
     Args:
         collection_name: Name of collection
         embedding_dim: Dimension of embeddings (384 for bge-small, 1536 for OpenAI)
+        index_type: Milvus index type ('IVF_FLAT' or 'HNSW')
+        index_build_params: Index build parameters (e.g. {"nlist": 128})
     """
     # Define schema
     fields = [
@@ -53,8 +59,8 @@ def create_collection(collection_name, embedding_dim=384):
     # Create index for fast similarity search
     index_params = {
         "metric_type": "COSINE",
-        "index_type": "IVF_FLAT",
-        "params": {"nlist": 128}
+        "index_type": index_type,
+        "params": index_build_params or {"nlist": 128}
     }
     
     collection.create_index(
@@ -93,10 +99,13 @@ def main():
     parser.add_argument('--collection', default='mental_health_kb', help='Collection name')
     parser.add_argument('--dim', type=int, default=384, help='Embedding dimension')
     parser.add_argument('--test', action='store_true', help='Test connection only')
+    parser.add_argument('--index-type', choices=['IVF_FLAT', 'HNSW'], default='IVF_FLAT', help='Index type')
+    parser.add_argument('--nlist', type=int, default=128, help='IVF_FLAT number of clusters')
+    parser.add_argument('--hnsw-m', type=int, default=16, help='HNSW max links per node')
+    parser.add_argument('--hnsw-ef-construction', type=int, default=200, help='HNSW build-time candidate list size')
     
     args = parser.parse_args()
     
-    import os
     from dotenv import load_dotenv
     load_dotenv()
     
@@ -112,7 +121,12 @@ def main():
     print(f"\nCreating collection: {args.collection}")
     print(f"Embedding dimension: {args.dim}")
     
-    collection = create_collection(args.collection, args.dim)
+    if args.index_type == 'HNSW':
+        index_build_params = {"M": args.hnsw_m, "efConstruction": args.hnsw_ef_construction}
+    else:
+        index_build_params = {"nlist": args.nlist}
+    
+    collection = create_collection(args.collection, args.dim, args.index_type, index_build_params)
     
     # Load collection (required for operations)
     collection.load()
@@ -120,7 +134,7 @@ def main():
     print(f"\n✅ Setup complete!")
     print(f"Collection: {args.collection}")
     print(f"Fields: id, embedding({args.dim}), content, title, category")
-    print(f"Index: IVF_FLAT with cosine similarity")
+    print(f"Index: {args.index_type} {index_build_params} with cosine similarity")
 
 
 if __name__ == '__main__':
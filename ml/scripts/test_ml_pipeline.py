@@ -109,8 +109,8 @@ def main():
     print("\n[5/5] Checking artifacts...")
     required_files = [
         ml_dir / 'data' / 'raw' / 'synthetic_screenings.csv',
-        ml_dir / 'data' / 'processed' / 'train_phq9.csv',
-        ml_dir / 'data' / 'processed' / 'test_phq9.csv',
+        ml_dir / 'data' / 'processed' / 'train_phq9.arrow',
+        ml_dir / 'data' / 'processed' / 'test_phq9.arrow',
         ml_dir / 'models' / 'screening_phq9.pkl',
         ml_dir / 'metrics' / 'eval_metrics.json'
     ]
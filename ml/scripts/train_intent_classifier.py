@@ -4,31 +4,40 @@ Train DistilBERT intent classifier for chat messages.
 Features:
     - Fine-tunes DistilBERT for intent classification
     - 6 intent categories (crisis, escalate, support, faq, resource, booking)
+    - CPU performance mode (--cpu-perf, params.yaml cpu_perf) and a
+      per-configuration throughput benchmark (--benchmark)
     - MLflow tracking
     - Saves model and tokenizer
 
 Usage:
     python train_intent_classifier.py
+    python train_intent_classifier.py --cpu-perf
+    python train_intent_classifier.py --benchmark --benchmark-steps 20
 """
 
 import os
+import argparse
 import torch
 import yaml
 import mlflow
 import numpy as np
-import pandas as pd
 from pathlib import Path
 from datetime import datetime
-from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, precision_recall_fscore_support
 from transformers import (
     DistilBertTokenizer,
     DistilBertForSequenceClassification,
-    Trainer,
     TrainingArguments
 )
 from dotenv import load_dotenv
 
+from cpu_perf import cpu_perf_config, cpu_training_setup, run_benchmark
+from chat_data import (
+    ChatDataset, ChatTrainer, DynamicPaddingCollator,
+    find_chats_source, load_chats, load_tokenized, split_indices,
+    TOKENIZER_NAME, MAX_LENGTH
+)
+
 # Load environment
 load_dotenv()
 
@@ -73,19 +82,6 @@ def load_config():
     with open(config_path, 'r') as f:
         return yaml.safe_load(f)
 
-class ChatDataset(torch.utils.data.Dataset):
-    def __init__(self, encodings, labels):
-        self.encodings = encodings
-        self.labels = labels
-
-    def __getitem__(self, idx):
-        item = {key: torch.tensor(val[idx]) for key, val in self.encodings.items()}
-        item['labels'] = torch.tensor(self.labels[idx])
-        return item
-
-    def __len__(self):
-        return len(self.labels)
-
 def compute_metrics(pred):
     labels = pred.label_ids
     preds = pred.predictions.argmax(-1)
@@ -99,19 +95,32 @@ def compute_metrics(pred):
     }
 
 def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--cpu-perf', action='store_true',
+                        help='Train with the params.yaml cpu_perf settings (threads, bf16, length cap, ...)')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='Time training steps per CPU configuration instead of training')
+    parser.add_argument('--benchmark-steps', type=int, default=20, help='Timed steps per configuration')
+
+    args = parser.parse_args()
+
     print("="*60)
     print("INTENT CLASSIFIER TRAINING (DistilBERT)")
     print("="*60)
     
+    config = load_config()
+    chat_config = config.get('chat_training', {})
+    perf_config = cpu_perf_config(config)
+    
     # Load data
     script_dir = Path(__file__).parent
-    data_path = script_dir.parent / 'data' / 'raw' / 'synthetic_chats.csv'
+    data_path = find_chats_source(script_dir.parent / 'data' / 'raw')
     
     if not data_path.exists():
         print(f"❌ Data not found at {data_path}")
         return
 
-    df = pd.read_csv(data_path)
+    df = load_chats(data_path)
     print(f"Loaded {len(df)} chat samples")
     
     # Map labels to integers
@@ -122,27 +131,33 @@ def main():
     df['label'] = df['intent'].map(label_map)
     
     # Split data
-    train_texts, val_texts, train_labels, val_labels = train_test_split(
-        df['message'].tolist(),
-        df['label'].tolist(),
-        test_size=0.2,
-        stratify=df['label'],
-        random_state=42
-    )
-    
-    # Tokenization
-    print("Tokenizing data...")
-    tokenizer = DistilBertTokenizer.from_pretrained('distilbert-base-uncased')
+    train_idx, val_idx = split_indices(df['label'], test_size=0.2, seed=42)
+    labels = df['label'].to_numpy()
     
-    train_encodings = tokenizer(train_texts, truncation=True, padding=True, max_length=128)
-    val_encodings = tokenizer(val_texts, truncation=True, padding=True, max_length=128)
+    # Tokenization (shared, memory-mapped cache); batches are padded dynamically
+    tokenizer = DistilBertTokenizer.from_pretrained(TOKENIZER_NAME)
+    corpus = load_tokenized(df['message'].tolist(), tokenizer, MAX_LENGTH)
     
-    train_dataset = ChatDataset(train_encodings, train_labels)
-    val_dataset = ChatDataset(val_encodings, val_labels)
+    train_dataset = ChatDataset(corpus, train_idx, labels[train_idx])
+    val_dataset = ChatDataset(corpus, val_idx, labels[val_idx])
     
+    batch_size = chat_config.get('batch_size', 16)
+    if args.benchmark:
+        print(f"\nBenchmarking {args.benchmark_steps} training steps per CPU configuration...")
+        make_model = lambda: DistilBertForSequenceClassification.from_pretrained(
+            TOKENIZER_NAME, num_labels=len(label_map)
+        )
+        run_benchmark(make_model, train_dataset, corpus.pad_token_id, batch_size, perf_config, args.benchmark_steps,
+                      output_path=script_dir.parent / 'reports' / 'cpu_benchmark_intent_classifier.json')
+        return
+
+    perf_overrides, length_cap = {}, None
+    if args.cpu_perf:
+        perf_overrides, length_cap = cpu_training_setup(perf_config, train_dataset.lengths, batch_size)
+
     # Model initialization
     model = DistilBertForSequenceClassification.from_pretrained(
-        'distilbert-base-uncased',
+        TOKENIZER_NAME,
         num_labels=len(label_map)
     )
     
@@ -150,8 +165,8 @@ def main():
     training_args = TrainingArguments(
         output_dir='./results_intent',
         num_train_epochs=3,
-        per_device_train_batch_size=16,
-        per_device_eval_batch_size=64,
+        per_device_train_batch_size=batch_size,
+        per_device_eval_batch_size=chat_config.get('eval_batch_size', 64),
         warmup_steps=500,
         weight_decay=0.01,
         logging_dir='./logs_intent',
@@ -159,15 +174,20 @@ def main():
         evaluation_strategy="epoch",
         save_strategy="epoch",
         load_best_model_at_end=True,
-        report_to="mlflow" if USE_MLFLOW else "none"
+        group_by_length=chat_config.get('group_by_length', True),
+        dataloader_num_workers=chat_config.get('dataloader_workers', 2),
+        dataloader_pin_memory=torch.cuda.is_available(),
+        report_to="mlflow" if USE_MLFLOW else "none",
+        **perf_overrides
     )
     
     # Initialize Trainer
-    trainer = Trainer(
+    trainer = ChatTrainer(
         model=model,
         args=training_args,
         train_dataset=train_dataset,
         eval_dataset=val_dataset,
+        data_collator=DynamicPaddingCollator(corpus.pad_token_id, max_length=length_cap),
         compute_metrics=compute_metrics
     )
     
@@ -0,0 +1,284 @@
+"""
+Train one DistilBERT encoder for both risk detection and intent classification.
+
+Features:
+    - Single fine-tuning pass over synthetic_chats.csv, which carries both
+      risk_level and intent for every message (half the compute of running
+      train_risk_detector.py and train_intent_classifier.py)
+    - Shared encoder, separate risk and intent heads, weighted sum of the
+      two losses (params.yaml multitask.*)
+    - Class-weighted risk loss for the rare emergency class
+    - Emergency recall gate: the model is not saved if validation recall on
+      the 'emergency' class is below multitask.emergency_recall_min
+    - Shared token cache, dynamic padding and length-grouped batches
+      (chat_data.py)
+    - CPU performance mode (--cpu-perf, params.yaml cpu_perf) and a
+      per-configuration throughput benchmark (--benchmark)
+    - MLflow tracking
+    - Saves encoder, heads and label maps as one artifact for serving
+
+Usage:
+    python train_multitask.py
+    python train_multitask.py --cpu-perf
+    python train_multitask.py --benchmark --benchmark-steps 20
+"""
+
+import os
+import argparse
+import sys
+import json
+import torch
+import yaml
+import numpy as np
+from pathlib import Path
+from datetime import datetime
+from sklearn.metrics import accuracy_score, precision_recall_fscore_support, confusion_matrix
+from sklearn.utils.class_weight import compute_class_weight
+from transformers import DistilBertTokenizer, TrainingArguments
+from dotenv import load_dotenv
+
+from cpu_perf import cpu_perf_config, cpu_training_setup, run_benchmark
+from chat_data import (
+    ChatDataset, ChatTrainer, DynamicPaddingCollator,
+    find_chats_source, load_chats, load_tokenized, split_indices,
+    TOKENIZER_NAME, MAX_LENGTH, RISK_LABEL_MAP
+)
+
+# Model definition is shared with the serving image
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'serving'))
+from multitask import MultiTaskChatModel
+
+# Load environment
+load_dotenv()
+
+# Setup MLflow
+MLFLOW_URI = os.getenv('MLFLOW_TRACKING_URI', 'http://localhost:5002')
+USE_MLFLOW = True
+
+EMERGENCY_CLASS = RISK_LABEL_MAP['emergency']
+
+class DummyMLflow:
+    def set_tracking_uri(self, uri): pass
+    def set_experiment(self, name): pass
+    def start_run(self, run_name=None):
+        from contextlib import nullcontext
+        return nullcontext()
+    def log_params(self, params): pass
+    def log_param(self, key, value): pass
+    def log_metric(self, key, value): pass
+    def log_metrics(self, metrics): pass
+    def log_artifact(self, local_path): pass
+    def log_artifacts(self, local_dir, artifact_path=None): pass
+    def active_run(self):
+        class Info:
+            run_id = "dummy_run_id"
+        class Run:
+            info = Info()
+        return Run()
+
+try:
+    import mlflow
+    mlflow.set_tracking_uri(MLFLOW_URI)
+    # Test connection
+    mlflow.search_experiments()
+except Exception as e:
+    print(f"⚠️ MLflow not available: {e}")
+    print("Running in standalone mode (no experiment tracking)")
+    USE_MLFLOW = False
+    mlflow = DummyMLflow()
+
+def load_config():
+    script_dir = Path(__file__).parent
+    config_path = script_dir.parent / 'params.yaml'
+    with open(config_path, 'r') as f:
+        return yaml.safe_load(f)
+
+def task_metrics(prefix, labels, preds, num_labels):
+    precision, recall, f1, _ = precision_recall_fscore_support(labels, preds, average='weighted', zero_division=0)
+    metrics = {
+        f'{prefix}_accuracy': accuracy_score(labels, preds),
+        f'{prefix}_f1': f1,
+        f'{prefix}_precision': precision,
+        f'{prefix}_recall': recall
+    }
+
+    cm = confusion_matrix(labels, preds, labels=list(range(num_labels)))
+    support = cm.sum(axis=1)
+    per_class_recall = np.divide(cm.diagonal(), support, out=np.zeros(num_labels), where=support > 0)
+    for i, recall_score in enumerate(per_class_recall):
+        metrics[f'{prefix}_recall_class_{i}'] = recall_score
+    return metrics
+
+def make_compute_metrics(num_intents):
+    def compute_metrics(pred):
+        risk_logits, intent_logits = pred.predictions
+        risk_labels, intent_labels = pred.label_ids
+
+        metrics = task_metrics('risk', risk_labels, risk_logits.argmax(-1), len(RISK_LABEL_MAP))
+        metrics.update(task_metrics('intent', intent_labels, intent_logits.argmax(-1), num_intents))
+        metrics['emergency_recall'] = metrics[f'risk_recall_class_{EMERGENCY_CLASS}']
+        return metrics
+    return compute_metrics
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--cpu-perf', action='store_true',
+                        help='Train with the params.yaml cpu_perf settings (threads, bf16, length cap, ...)')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='Time training steps per CPU configuration instead of training')
+    parser.add_argument('--benchmark-steps', type=int, default=20, help='Timed steps per configuration')
+
+    args = parser.parse_args()
+
+    print("="*60)
+    print("MULTI-TASK RISK + INTENT TRAINING (DistilBERT)")
+    print("="*60)
+
+    config = load_config()
+    chat_config = config.get('chat_training', {})
+    perf_config = cpu_perf_config(config)
+    task_config = config.get('multitask', {})
+    emergency_recall_min = task_config.get('emergency_recall_min', 0.9)
+
+    # Load data
+    script_dir = Path(__file__).parent
+    data_path = find_chats_source(script_dir.parent / 'data' / 'raw')
+
+    if not data_path.exists():
+        print(f"❌ Data not found at {data_path}")
+        return
+
+    df = load_chats(data_path)
+    print(f"Loaded {len(df)} chat samples")
+
+    # Map labels to integers (same maps as the single-task trainers)
+    intents = df['intent'].unique().tolist()
+    intent_label_map = {intent: i for i, intent in enumerate(intents)}
+    print(f"Intents: {intent_label_map}")
+
+    risk_labels = df['risk_level'].map(RISK_LABEL_MAP).to_numpy()
+    intent_labels = df['intent'].map(intent_label_map).to_numpy()
+
+    # Split data (stratified on risk, same split as train_risk_detector.py)
+    train_idx, val_idx = split_indices(risk_labels, test_size=0.2, seed=42)
+
+    # Tokenization (shared, memory-mapped cache); batches are padded dynamically
+    tokenizer = DistilBertTokenizer.from_pretrained(TOKENIZER_NAME)
+    corpus = load_tokenized(df['message'].tolist(), tokenizer, MAX_LENGTH)
+
+    def dataset(indices):
+        return ChatDataset(corpus, indices, {
+            'risk_labels': risk_labels[indices],
+            'intent_labels': intent_labels[indices]
+        })
+
+    train_dataset = dataset(train_idx)
+    val_dataset = dataset(val_idx)
+
+    # Class weights for the imbalanced risk labels
+    risk_class_weights = None
+    if task_config.get('risk_class_weighted', True):
+        present = np.unique(risk_labels[train_idx])
+        weights = np.ones(len(RISK_LABEL_MAP))
+        weights[present] = compute_class_weight('balanced', classes=present, y=risk_labels[train_idx])
+        risk_class_weights = weights.tolist()
+        print(f"Risk class weights: {np.round(weights, 2).tolist()}")
+
+    # Model initialization
+    def make_model():
+        return MultiTaskChatModel.from_encoder_name(
+            TOKENIZER_NAME,
+            num_risk_labels=len(RISK_LABEL_MAP),
+            num_intent_labels=len(intent_label_map),
+            risk_loss_weight=task_config.get('risk_loss_weight', 1.0),
+            intent_loss_weight=task_config.get('intent_loss_weight', 0.5),
+            risk_class_weights=risk_class_weights
+        )
+
+    batch_size = chat_config.get('batch_size', 16)
+    if args.benchmark:
+        print(f"\nBenchmarking {args.benchmark_steps} training steps per CPU configuration...")
+        run_benchmark(make_model, train_dataset, corpus.pad_token_id, batch_size, perf_config,
+                      args.benchmark_steps, output_path=script_dir.parent / 'reports' / 'cpu_benchmark_multitask.json')
+        return
+
+    perf_overrides, length_cap = {}, None
+    if args.cpu_perf:
+        perf_overrides, length_cap = cpu_training_setup(perf_config, train_dataset.lengths, batch_size)
+
+    model = make_model()
+
+    # Training arguments
+    training_args = TrainingArguments(
+        output_dir='./results_multitask',
+        num_train_epochs=3,
+        per_device_train_batch_size=batch_size,
+        per_device_eval_batch_size=chat_config.get('eval_batch_size', 64),
+        warmup_steps=500,
+        weight_decay=0.01,
+        logging_dir='./logs_multitask',
+        logging_steps=10,
+        evaluation_strategy="epoch",
+        save_strategy="epoch",
+        load_best_model_at_end=True,
+        metric_for_best_model='emergency_recall',
+        greater_is_better=True,
+        label_names=['risk_labels', 'intent_labels'],
+        group_by_length=chat_config.get('group_by_length', True),
+        dataloader_num_workers=chat_config.get('dataloader_workers', 2),
+        dataloader_pin_memory=torch.cuda.is_available(),
+        report_to="mlflow" if USE_MLFLOW else "none",
+        **perf_overrides
+    )
+
+    # Initialize Trainer
+    trainer = ChatTrainer(
+        model=model,
+        args=training_args,
+        train_dataset=train_dataset,
+        eval_dataset=val_dataset,
+        data_collator=DynamicPaddingCollator(corpus.pad_token_id, max_length=length_cap),
+        compute_metrics=make_compute_metrics(len(intent_label_map))
+    )
+
+    # MLflow tracking
+    mlflow.set_experiment("chat-multitask")
+
+    with mlflow.start_run(run_name=f"distilbert_multitask_{datetime.now().strftime('%Y%m%d_%H%M%S')}"):
+        mlflow.log_params({
+            'risk_loss_weight': model.risk_loss_weight,
+            'intent_loss_weight': model.intent_loss_weight,
+            'emergency_recall_min': emergency_recall_min
+        })
+
+        print("\nStarting training...")
+        trainer.train()
+
+        print("\nEvaluating...")
+        eval_results = trainer.evaluate()
+        print(f"Eval Results: {eval_results}")
+
+        # Emergency recall gate
+        emergency_recall = eval_results['eval_emergency_recall']
+        print(f"\nEmergency recall: {emergency_recall:.4f} (minimum {emergency_recall_min})")
+        if emergency_recall < emergency_recall_min:
+            print("❌ Emergency recall below the gate, model NOT saved")
+            sys.exit(1)
+
+        # Save model
+        models_dir = script_dir.parent / 'models' / 'chat_multitask'
+
+        print(f"\nSaving model to {models_dir}...")
+        model.save(models_dir, RISK_LABEL_MAP, intent_label_map, MAX_LENGTH)
+        tokenizer.save_pretrained(models_dir)
+
+        with open(models_dir / 'metrics.json', 'w') as f:
+            json.dump(eval_results, f, indent=2)
+
+        # Log artifacts
+        mlflow.log_artifacts(str(models_dir), artifact_path="model")
+
+        print("\n✅ Training complete!")
+
+if __name__ == '__main__':
+    main()
@@ -6,13 +6,26 @@ Features:
     - Uses user features (screening scores, demographics)
     - Uses item features (resource tags, categories)
     - Handles cold start for new users
+    - Trains on RecommendationFeedback exports (export_data.py --stream)
+      when present, synthetic interactions otherwise
+    - Vectorized COO interaction/feature matrices (recommender_data.py)
+    - LightFM threads scale to the host (params.yaml recommender.num_threads)
+    - Held-out evaluation: the newest feedback events (random events for
+      synthetic data) are held out and scored with vectorized
+      precision/recall/NDCG/MAP@k and coverage (recommender_eval.py); the
+      saved model is then refit on all events
+    - Resets the incremental update watermark to the newest event trained on
     - MLflow tracking
 
 Usage:
     python train_recommender.py
+    python train_recommender.py --interactions ../data/raw/recommendation_feedback
+    python train_recommender.py --synthetic --synthetic-users 100000 --synthetic-items 2000
 """
 
 import os
+import time
+import argparse
 import yaml
 import mlflow
 import numpy as np
@@ -20,10 +33,16 @@ import pandas as pd
 from pathlib import Path
 from datetime import datetime
 from lightfm import LightFM
-from lightfm.data import Dataset
-from lightfm.evaluation import precision_at_k, auc_score
 from dotenv import load_dotenv
 
+from preprocess import find_screenings_source, iter_screening_chunks
+from recommender_data import (
+    MIN_POSITIVE_RATING, RecommenderData, default_num_threads, feedback_interactions, find_feedback_source,
+    load_feedback, screening_user_features, synthetic_interactions
+)
+from recommender_eval import DEFAULT_K, evaluate, holdout_matrix, lightfm_vectors, random_split, time_split
+from update_recommender import save_state
+
 # Load environment
 load_dotenv()
 
@@ -71,7 +90,9 @@ def load_config():
             'learning_rate': 0.05,
             'loss': 'warp',
             'no_components': 30,
-            'epochs': 10
+            'epochs': 10,
+            'test_fraction': 0.2,
+            'eval_k': DEFAULT_K
         }
     }
     
@@ -83,123 +104,150 @@ def load_config():
     
     return default_config
 
-def generate_synthetic_interactions(n_users=100, n_items=50):
-    """Generate synthetic user-item interactions for training"""
+def load_training_data(args, test_fraction=0.2):
+    """
+    RecommenderData from a feedback export if one is given or found under
+    data/raw, otherwise from synthetic interactions.
+
+    Feedback is split by time (events after the cutoff are held out),
+    synthetic interactions at random.
+
+    Returns:
+        (RecommenderData of the training events, CSR of held-out items or
+        None, RecommenderData of all events, timestamp of the newest event
+        or None)
+    """
+    raw_dir = Path(__file__).parent.parent / 'data' / 'raw'
+    source = Path(args.interactions) if args.interactions else find_feedback_source(raw_dir)
+
+    if source is not None and not args.synthetic:
+        print(f"Loading feedback from {source}...")
+        df = load_feedback(source)
+        newest = pd.to_datetime(df['timestamp']).max() if len(df) else None
+
+        user_features = None
+        screenings_source = find_screenings_source(raw_dir)
+        if screenings_source is not None:
+            screenings = pd.concat(iter_screening_chunks(screenings_source), ignore_index=True)
+            if {'user_hash', 'risk_level'} <= set(screenings.columns):
+                features = screening_user_features(screenings)
+                user_features = (features['user_hash'], features['feature'])
+
+        train_df, held_out = df, df.iloc[:0]
+        if test_fraction > 0 and len(df):
+            train_mask, cutoff = time_split(df['timestamp'], test_fraction)
+            train_df, held_out = df[train_mask], df[~train_mask]
+            print(f"Holding out {len(held_out)} events after {cutoff}")
+        users, items, weights = feedback_interactions(train_df)
+        print(f"Loaded {len(train_df)} feedback events ({len(users)} positive interactions)")
+
+        data = RecommenderData.build(users, items, weights, user_features=user_features)
+        if not len(held_out):
+            return data, None, data, newest
+        test_users, test_items, _ = feedback_interactions(held_out)
+        test = holdout_matrix(data, test_users, test_items)
+        full = RecommenderData.build(*feedback_interactions(df), user_features=user_features)
+        return data, test, full, newest
+
     print("Generating synthetic interactions...")
-    
-    interactions = []
-    
-    # User features (0: low risk, 1: high risk)
-    user_risk = np.random.choice([0, 1], size=n_users, p=[0.7, 0.3])
-    
-    # Item categories (0: general, 1: crisis/anxiety)
-    item_categories = np.random.choice([0, 1], size=n_items, p=[0.6, 0.4])
-    
-    for u in range(n_users):
-        # Determine number of interactions for this user
-        n_inter = np.random.randint(1, 10)
-        
-        for _ in range(n_inter):
-            i = np.random.randint(0, n_items)
-            
-            # Logic: High risk users prefer crisis items
-            if user_risk[u] == 1 and item_categories[i] == 1:
-                rating = np.random.choice([4, 5])
-            elif user_risk[u] == 0 and item_categories[i] == 0:
-                rating = np.random.choice([3, 4, 5])
-            else:
-                rating = np.random.choice([1, 2, 3])
-                
-            interactions.append({
-                'user_id': u,
-                'item_id': i,
-                'rating': rating,
-                'timestamp': datetime.now()
-            })
-            
-    return pd.DataFrame(interactions), user_risk, item_categories
+    users, items, ratings, user_risk, item_categories = synthetic_interactions(
+        args.synthetic_users, args.synthetic_items, seed=args.seed
+    )
+    print(f"Generated {len(users)} interactions")
+    user_features = (np.arange(len(user_risk)), [f"risk_{r}" for r in user_risk])
+    item_features = (np.arange(len(item_categories)), [f"cat_{c}" for c in item_categories])
+    train_mask = random_split(len(users), test_fraction, seed=args.seed)
+    data = RecommenderData.build(
+        users[train_mask], items[train_mask], ratings[train_mask],
+        user_features=user_features, item_features=item_features
+    )
+    if train_mask.all():
+        return data, None, data, None
+    # Low ratings are mismatches, only well-rated held-out items count as relevant
+    relevant = ~train_mask & (ratings >= MIN_POSITIVE_RATING)
+    test = holdout_matrix(data, users[relevant], items[relevant]) if relevant.any() else None
+    full = RecommenderData.build(users, items, ratings, user_features=user_features, item_features=item_features)
+    return data, test, full, None
+
+def fit_model(data, params, num_threads):
+    """Fit a fresh LightFM model on data; returns (model, seconds)"""
+    model = LightFM(
+        learning_rate=params.get('learning_rate', 0.05),
+        loss=params.get('loss', 'warp'),
+        no_components=params.get('no_components', 30)
+    )
+    start = time.perf_counter()
+    model.fit(
+        data.interactions,
+        user_features=data.user_features,
+        item_features=data.item_features,
+        sample_weight=data.weights,
+        epochs=params.get('epochs', 10),
+        num_threads=num_threads,
+        verbose=True
+    )
+    return model, time.perf_counter() - start
 
 def main():
+    parser = argparse.ArgumentParser(description='Train the LightFM hybrid recommender')
+    parser.add_argument('--interactions', default=None,
+                        help='RecommendationFeedback export (shard directory or file); default: data/raw')
+    parser.add_argument('--synthetic', action='store_true', help='Train on synthetic interactions')
+    parser.add_argument('--synthetic-users', type=int, default=100)
+    parser.add_argument('--synthetic-items', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=None, help='Synthetic data seed')
+
+    args = parser.parse_args()
+
     print("="*60)
     print("RECOMMENDER SYSTEM TRAINING (LightFM)")
     print("="*60)
     
     config = load_config()
     params = config['recommender']
+    num_threads = params.get('num_threads') or default_num_threads()
+    eval_k = params.get('eval_k', DEFAULT_K)
     
-    # 1. Load/Generate Data
-    # In a real scenario, load from DB. Here we generate synthetic data.
-    df_interactions, user_features_raw, item_features_raw = generate_synthetic_interactions()
-    
-    print(f"Loaded {len(df_interactions)} interactions")
-    
-    # 2. Prepare Dataset
-    dataset = Dataset()
-    
-    # Fit dataset (create mappings)
-    dataset.fit(
-        users=df_interactions['user_id'].unique(),
-        items=df_interactions['item_id'].unique(),
-        user_features=[f"risk_{r}" for r in np.unique(user_features_raw)],
-        item_features=[f"cat_{c}" for c in np.unique(item_features_raw)]
-    )
-    
-    # Build interactions matrix
-    (interactions, weights) = dataset.build_interactions(
-        (x['user_id'], x['item_id'], x['rating']) 
-        for index, x in df_interactions.iterrows()
-    )
-    
-    # Build feature matrices
-    # (Simplified for demo: mapping user ID to their risk feature)
-    user_features_list = []
-    for u_id, risk in enumerate(user_features_raw):
-        if u_id in dataset.mapping()[0]: # Check if user exists in interactions
-             user_features_list.append((u_id, [f"risk_{risk}"]))
-
-    item_features_list = []
-    for i_id, cat in enumerate(item_features_raw):
-        if i_id in dataset.mapping()[2]: # Check if item exists in interactions
-            item_features_list.append((i_id, [f"cat_{cat}"]))
-
-    user_features = dataset.build_user_features(user_features_list)
-    item_features = dataset.build_item_features(item_features_list)
-    
-    # 3. Train Model
-    model = LightFM(
-        learning_rate=params.get('learning_rate', 0.05),
-        loss=params.get('loss', 'warp'),
-        no_components=params.get('no_components', 30)
-    )
+    # 1. Load data, split and build matrices (vectorized, see recommender_data.py)
+    start = time.perf_counter()
+    data, test, full, newest = load_training_data(args, params.get('test_fraction', 0.2))
+    print(f"Built {data.shape[0]} x {data.shape[1]} interaction matrix "
+          f"({data.interactions.nnz} interactions) in {time.perf_counter() - start:.2f}s")
     
     # MLflow tracking
     mlflow.set_experiment("recommender-system")
     
     with mlflow.start_run(run_name=f"lightfm_{datetime.now().strftime('%Y%m%d_%H%M%S')}"):
-        mlflow.log_params(params)
+        mlflow.log_params({**params, 'num_threads': num_threads, 'n_interactions': full.interactions.nnz})
         
-        print("\nStarting training...")
-        model.fit(
-            interactions,
-            user_features=user_features,
-            item_features=item_features,
-            epochs=params.get('epochs', 10),
-            num_threads=2,
-            verbose=True
-        )
+        # 2. Train Model
+        print(f"\nStarting training ({num_threads} threads)...")
+        model, fit_seconds = fit_model(data, params, num_threads)
+        print(f"Training took {fit_seconds:.1f}s")
+        mlflow.log_metric("fit_seconds", fit_seconds)
         
-        # 4. Evaluate
-        print("\nEvaluating...")
-        train_precision = precision_at_k(model, interactions, k=5, user_features=user_features, item_features=item_features).mean()
-        train_auc = auc_score(model, interactions, user_features=user_features, item_features=item_features).mean()
+        # 3. Evaluate on held-out interactions (vectorized, see recommender_eval.py)
+        if test is not None and test.nnz:
+            print("\nEvaluating on held-out interactions...")
+            user_vectors, item_vectors = lightfm_vectors(model, data)
+            metrics = evaluate(user_vectors, item_vectors, test, data.interactions, k=eval_k,
+                               workers=num_threads)
+            print(f"Evaluated {metrics.pop('users')} users in {metrics.pop('seconds'):.2f}s")
+            for name, value in metrics.items():
+                print(f"Held-out {name}: {value:.4f}")
+                mlflow.log_metric(name.replace('@', '_at_'), value)
+        else:
+            print("\n⚠️  No held-out interactions; skipping evaluation")
         
-        print(f"Train Precision@5: {train_precision:.4f}")
-        print(f"Train AUC: {train_auc:.4f}")
+        # The deployed model must not miss the newest events: refit on everything
+        if full is not data:
+            print(f"\nRefitting on all {full.interactions.nnz} interactions...")
+            model, refit_seconds = fit_model(full, params, num_threads)
+            print(f"Refit took {refit_seconds:.1f}s")
+            mlflow.log_metric("refit_seconds", refit_seconds)
+            data = full
         
-        mlflow.log_metric("precision_at_k", train_precision)
-        mlflow.log_metric("auc", train_auc)
-        
-        # 5. Save Model
+        # 4. Save Model
         script_dir = Path(__file__).parent
         models_dir = script_dir.parent / 'models' / 'recommender'
         models_dir.mkdir(parents=True, exist_ok=True)
@@ -210,9 +258,11 @@ def main():
         with open(models_dir / 'model.pkl', 'wb') as f:
             pickle.dump(model, f)
             
-        # Save dataset mappings for inference
-        with open(models_dir / 'dataset.pkl', 'wb') as f:
-            pickle.dump(dataset, f)
+        # Save id mappings and feature matrices for inference
+        data.save(models_dir)
+        
+        # update_recommender.py continues from the newest event trained on
+        save_state(models_dir, {'watermark': newest.isoformat() if newest is not None else None, 'updates': 0})
             
         mlflow.log_artifacts(str(models_dir), artifact_path="model")
         
@@ -7,14 +7,19 @@ Features:
     - SHAP explainability
     - MLflow experiment tracking
     - Model artifact saving
+    - Optional parallel hyperparameter search first (--search, see
+      screening_search.py); tuned parameters from params.yaml are applied
+      per screening type over the train section
 
 Usage:
     python train_screening.py --config ../params.yaml
+    python train_screening.py --search
 """
 
 import os
 import sys
 import yaml
+import argparse
 import joblib
 import pandas as pd
 import numpy as np
@@ -30,6 +35,9 @@ import mlflow
 import mlflow.sklearn
 from dotenv import load_dotenv
 
+from processed_data import read_processed
+from screening_search import TUNED_KEYS, TUNED_SECTION, run_search
+
 # Load environment
 load_dotenv()
 
@@ -96,8 +104,8 @@ def load_data(data_type='PHQ9'):
     
     file_suffix = 'phq9' if data_type == 'PHQ9' else 'gad7'
     
-    train_df = pd.read_csv(processed_dir / f'train_{file_suffix}.csv')
-    test_df = pd.read_csv(processed_dir / f'test_{file_suffix}.csv')
+    train_df = read_processed(processed_dir / f'train_{file_suffix}')
+    test_df = read_processed(processed_dir / f'test_{file_suffix}')
     
     # Separate features and target
     y_train = train_df['severity_label']
@@ -115,6 +123,12 @@ def load_data(data_type='PHQ9'):
     return X_train, y_train, X_test, y_test
 
 
+def model_params(config, model_type):
+    """train section with this screening type's tuned parameters applied on top"""
+    tuned = (config.get(TUNED_SECTION) or {}).get(model_type) or {}
+    return {**config['train'], **tuned}
+
+
 def train_model(X_train, y_train, X_test, y_test, config, model_type='PHQ9'):
     """
     Train LightGBM classifier with MLflow tracking.
@@ -133,7 +147,7 @@ def train_model(X_train, y_train, X_test, y_test, config, model_type='PHQ9'):
     
     with mlflow.start_run(run_name=f"{model_type}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"):
         # Log parameters
-        params = config['train']
+        params = model_params(config, model_type)
         mlflow.log_params(params)
         mlflow.log_param('model_type', model_type)
         mlflow.log_param('n_train_samples', len(X_train))
@@ -147,11 +161,9 @@ def train_model(X_train, y_train, X_test, y_test, config, model_type='PHQ9'):
         model = lgb.LGBMClassifier(
             objective='multiclass',
             num_class=n_classes,
-            learning_rate=params['learning_rate'],
-            n_estimators=params['n_estimators'],
-            max_depth=params['max_depth'],
             random_state=params['random_state'],
-            verbose=-1
+            verbose=-1,
+            **{key: params[key] for key in TUNED_KEYS if key in params}
         )
         
         model.fit(X_train, y_train)
@@ -237,8 +249,24 @@ def train_model(X_train, y_train, X_test, y_test, config, model_type='PHQ9'):
 
 def main():
     """Main training pipeline"""
+    parser = argparse.ArgumentParser(description='Train screening classifiers')
+    parser.add_argument('--config', default=None, help='params.yaml path')
+    parser.add_argument('--search', action='store_true',
+                        help='Run the hyperparameter search first and train with its results')
+
+    args = parser.parse_args()
+
     # Load config
-    config = load_config()
+    config = load_config(args.config)
+
+    if args.search:
+        print("="*60)
+        print("SCREENING HYPERPARAMETER SEARCH")
+        print("="*60)
+        config_path = args.config or Path(__file__).parent.parent / 'params.yaml'
+        run_search(['PHQ9', 'GAD7'], config.get('search') or {}, config_path,
+                   report_path=Path(__file__).parent.parent / 'reports' / 'screening_search.json')
+        config = load_config(args.config)
     
     print("="*60)
     print("SCREENING CLASSIFIER TRAINING")
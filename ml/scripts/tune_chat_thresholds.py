@@ -0,0 +1,322 @@
+"""
+Tune chat risk/intent thresholds and softmax temperatures from cached logits.
+
+Features:
+    - Scores the validation split once per model version and caches the
+      raw logits (float16 .npz under data/logits, keyed by a hash of the
+      model files and the validation messages); later runs skip inference
+    - Temperature scaling per head (risk, intent) fitted by minimizing
+      validation NLL on the cached logits
+    - Vectorized threshold sweeps on the calibrated scores: precision,
+      recall and emergency-class recall of the risk score (probability of
+      high or emergency risk), and accuracy vs coverage of model intents
+    - Proposes serving thresholds under recall/precision targets and writes
+      models/serving_thresholds.json (read by serving/app.py) plus the
+      full curves to metrics/chat_threshold_curves.json
+    - Backends: chat_multitask (one model) or single_task (risk_detector +
+      intent_classifier, each on its own validation split)
+
+Usage:
+    python tune_chat_thresholds.py
+    python tune_chat_thresholds.py --min-recall 0.9 --min-emergency-recall 0.98 --min-intent-precision 0.8
+"""
+
+import sys
+import json
+import time
+import hashlib
+import argparse
+import numpy as np
+from pathlib import Path
+from scipy.optimize import minimize_scalar
+
+from chat_data import RISK_LABEL_MAP, corpus_hash, find_chats_source, load_chats, split_indices
+
+ML_DIR = Path(__file__).resolve().parent.parent
+
+# Thresholds file format and softmax are shared with serving
+sys.path.append(str(ML_DIR / 'serving'))
+from chat_thresholds import DEFAULT_THRESHOLDS, HIGH_RISK_INDICES, RISK_LEVELS, THRESHOLDS_FILE, softmax
+
+LOGIT_CACHE_DIR = ML_DIR / 'data' / 'logits'
+SCORE_BATCH_SIZE = 64
+THRESHOLD_GRID = np.round(np.arange(0.05, 0.96, 0.01), 2)
+
+# Risk labels at or above medium count for the medium threshold
+MEDIUM_INDEX = RISK_LEVELS.index('medium')
+EMERGENCY_INDEX = RISK_LEVELS.index('emergency')
+
+
+def model_version(model_dirs, messages):
+    """Hash of every model file and the scored messages"""
+    digest = hashlib.sha256(corpus_hash(messages).encode('utf-8'))
+    for model_dir in model_dirs:
+        for path in sorted(p for p in Path(model_dir).rglob('*') if p.is_file()):
+            digest.update(str(path.relative_to(model_dir)).encode('utf-8'))
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def score_in_batches(logits_fn, messages, batch_size=SCORE_BATCH_SIZE):
+    """
+    Concatenated float32 logits of logits_fn over message batches.
+
+    logits_fn returns one array per batch, or a tuple of arrays (one per
+    head), in which case a tuple is returned.
+    """
+    batches = [logits_fn(messages[i:i + batch_size]) for i in range(0, len(messages), batch_size)]
+    if isinstance(batches[0], tuple):
+        return tuple(np.concatenate(head).astype(np.float32) for head in zip(*batches))
+    return np.concatenate(batches).astype(np.float32)
+
+
+def load_backend(model_dir):
+    """
+    The chat models present, the multi-task model preferred as in serving.
+
+    Returns:
+        (backend name or None, logits functions, model dirs, intent label
+        map). The multi-task backend has one 'joint' function returning
+        (risk, intent) logits, single_task has 'risk' and 'intent'.
+    """
+    import torch
+
+    if (model_dir / 'chat_multitask').exists():
+        from multitask import MultiTaskPredictor
+        predictor = MultiTaskPredictor(model_dir / 'chat_multitask')
+
+        def joint_logits(messages):
+            return tuple(logits.numpy() for logits in predictor.logits_batch(messages))
+
+        with open(model_dir / 'chat_multitask' / 'multitask_config.json') as f:
+            intent_map = json.load(f)['intent_label_map']
+        return 'chat_multitask', {'joint': joint_logits}, [model_dir / 'chat_multitask'], intent_map
+
+    from transformers import DistilBertForSequenceClassification, DistilBertTokenizer
+
+    def sequence_logits(path):
+        tokenizer = DistilBertTokenizer.from_pretrained(path)
+        model = DistilBertForSequenceClassification.from_pretrained(path)
+        model.eval()
+
+        def logits_fn(messages):
+            inputs = tokenizer(messages, return_tensors="pt", truncation=True, padding=True)
+            with torch.inference_mode():
+                return model(**inputs).logits.numpy()
+        return logits_fn
+
+    dirs = [model_dir / 'risk_detector', model_dir / 'intent_classifier']
+    if not all(d.exists() for d in dirs):
+        return None, {}, [], {}
+    with open(dirs[1] / 'label_map.json') as f:
+        intent_map = json.load(f)
+    return 'single_task', {'risk': sequence_logits(dirs[0]), 'intent': sequence_logits(dirs[1])}, dirs, intent_map
+
+
+def cached_logits(backend, heads, model_dirs, df, intent_map, cache_dir=LOGIT_CACHE_DIR):
+    """
+    Validation logits and labels per head, from the cache or scored once.
+
+    Returns:
+        ({head: (logits, labels)}, model version, whether it was a cache hit)
+    """
+    risk_labels = df['risk_level'].map(RISK_LABEL_MAP).to_numpy()
+    intent_labels = df['intent'].map(intent_map).to_numpy()
+    _, risk_val = split_indices(risk_labels)
+    # The multi-task model is validated on the risk split, the intent classifier on its own
+    intent_val = risk_val if backend == 'chat_multitask' else split_indices(intent_labels)[1]
+    splits = {'risk': (risk_val, risk_labels), 'intent': (intent_val, intent_labels)}
+
+    messages = df['message'].astype(str).to_numpy()
+    version = model_version(model_dirs, np.concatenate([messages[risk_val], messages[intent_val]]))
+    path = Path(cache_dir) / f"{backend}-{version}.npz"
+    if path.exists():
+        cached = np.load(path)
+        return {name: (cached[f'{name}_logits'].astype(np.float32), cached[f'{name}_labels'])
+                for name in splits}, version, True
+
+    scored = {}
+    if 'joint' in heads:
+        print(f"Scoring {len(risk_val)} validation messages...")
+        logits = score_in_batches(heads['joint'], messages[risk_val].tolist())
+        scored = {name: (head_logits, splits[name][1][risk_val])
+                  for name, head_logits in zip(('risk', 'intent'), logits)}
+    else:
+        for name, (val_idx, labels) in splits.items():
+            print(f"Scoring {len(val_idx)} validation messages ({name})...")
+            scored[name] = (score_in_batches(heads[name], messages[val_idx].tolist()), labels[val_idx])
+
+    # Rounded to the cached precision so cold and warm runs agree
+    scored = {name: (logits.astype(np.float16), labels.astype(np.int16)) for name, (logits, labels) in scored.items()}
+    path.parent.mkdir(parents=True, exist_ok=True)
+    np.savez_compressed(path, **{f'{name}_logits': logits for name, (logits, _) in scored.items()},
+                        **{f'{name}_labels': labels for name, (_, labels) in scored.items()})
+    return {name: (logits.astype(np.float32), labels) for name, (logits, labels) in scored.items()}, version, False
+
+
+def fit_temperature(logits, labels):
+    """Temperature minimizing the validation negative log-likelihood"""
+    logits = np.asarray(logits, dtype=np.float64)
+    labels = np.asarray(labels)
+
+    def nll(log_temperature):
+        probs = softmax(logits, np.exp(log_temperature))
+        return -np.log(probs[np.arange(len(labels)), labels] + 1e-12).mean()
+
+    return float(np.exp(minimize_scalar(nll, bounds=(np.log(0.05), np.log(20.0)), method='bounded').x))
+
+
+def risk_curves(scores, labels, grid=THRESHOLD_GRID):
+    """
+    Sweep of the risk score threshold (one broadcast comparison).
+
+    Returns:
+        List of dicts: threshold, precision and recall for high/emergency
+        labels, emergency_recall, medium_recall (labels at or above medium)
+        and flagged (fraction of messages above the threshold)
+    """
+    above = np.asarray(scores)[None, :] > grid[:, None]
+    high = np.isin(labels, HIGH_RISK_INDICES)
+    flagged = above.sum(axis=1)
+
+    def recall(mask):
+        return above[:, mask].mean(axis=1) if mask.any() else np.full(len(grid), np.nan)
+
+    precision = np.divide(above[:, high].sum(axis=1), flagged, out=np.ones(len(grid)), where=flagged > 0)
+    return [
+        {'threshold': float(t), 'precision': float(p), 'recall': float(r), 'emergency_recall': float(e),
+         'medium_recall': float(m), 'flagged': float(f)}
+        for t, p, r, e, m, f in zip(grid, precision, recall(high), recall(labels == EMERGENCY_INDEX),
+                                    recall(labels >= MEDIUM_INDEX), flagged / len(labels))
+    ]
+
+
+def intent_curves(probs, labels, grid=THRESHOLD_GRID):
+    """
+    Sweep of the intent score threshold.
+
+    Returns:
+        List of dicts: threshold, precision (accuracy of accepted model
+        intents) and coverage (fraction of messages accepted)
+    """
+    scores = probs.max(axis=1)
+    correct = probs.argmax(axis=1) == labels
+    accepted = scores[None, :] > grid[:, None]
+    n_accepted = accepted.sum(axis=1)
+    precision = np.divide((accepted & correct).sum(axis=1), n_accepted, out=np.ones(len(grid)),
+                          where=n_accepted > 0)
+    return [{'threshold': float(t), 'precision': float(p), 'coverage': float(c)}
+            for t, p, c in zip(grid, precision, n_accepted / len(labels))]
+
+
+def highest_meeting(curve, **targets):
+    """Highest threshold whose metrics all meet their targets (NaN metrics pass), else None"""
+    meeting = [row['threshold'] for row in curve
+               if all(np.isnan(row[metric]) or row[metric] >= target for metric, target in targets.items())]
+    return max(meeting) if meeting else None
+
+
+def propose_thresholds(risk_curve, intent_curve, min_recall=0.9, min_emergency_recall=0.98,
+                       min_intent_precision=0.8):
+    """
+    Serving thresholds from the curves.
+
+    risk_high: highest threshold keeping high/emergency recall and
+    emergency recall at their targets (best precision). risk_medium:
+    highest threshold at or below it keeping recall of medium-and-above at
+    the target. intent: lowest threshold whose accepted intents reach the
+    precision target (most coverage). Defaults are kept when no threshold
+    meets a target.
+    """
+    high = highest_meeting(risk_curve, recall=min_recall, emergency_recall=min_emergency_recall)
+    risk_high = high if high is not None else DEFAULT_THRESHOLDS['risk_high']
+    medium = highest_meeting([row for row in risk_curve if row['threshold'] <= risk_high],
+                             medium_recall=min_recall)
+    risk_medium = medium if medium is not None else min(DEFAULT_THRESHOLDS['risk_medium'], risk_high)
+
+    meeting = [row['threshold'] for row in intent_curve if row['precision'] >= min_intent_precision]
+    intent = min(meeting) if meeting else DEFAULT_THRESHOLDS['intent']
+    return {'risk_high': risk_high, 'risk_medium': risk_medium, 'intent': intent}
+
+
+def curve_at(curve, threshold):
+    return min(curve, key=lambda row: abs(row['threshold'] - threshold))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tune chat thresholds and temperatures from cached logits')
+    parser.add_argument('--model-dir', default=str(ML_DIR / 'models'))
+    parser.add_argument('--input', default=None, help='Chat CSV or shard directory (default: data/raw)')
+    parser.add_argument('--min-recall', type=float, default=0.9,
+                        help='Recall target for high/emergency (risk_high) and medium+ (risk_medium)')
+    parser.add_argument('--min-emergency-recall', type=float, default=0.98, help='Emergency recall target')
+    parser.add_argument('--min-intent-precision', type=float, default=0.8,
+                        help='Accuracy target for accepted model intents')
+    parser.add_argument('--no-calibration', action='store_true', help='Keep temperature 1')
+    parser.add_argument('--curves', default=str(ML_DIR / 'metrics' / 'chat_threshold_curves.json'))
+
+    args = parser.parse_args()
+
+    model_dir = Path(args.model_dir)
+    source = Path(args.input) if args.input else find_chats_source(ML_DIR / 'data' / 'raw')
+    if not source.exists():
+        print(f"❌ No chat data found at {source} (run generate_synthetic_chats.py)")
+        return
+
+    backend, heads, model_dirs, intent_map = load_backend(model_dir)
+    if backend is None:
+        print(f"❌ No chat models found in {model_dir}")
+        return
+
+    start = time.perf_counter()
+    scored, version, hit = cached_logits(backend, heads, model_dirs, load_chats(source), intent_map)
+    print(f"{'✅ Cached' if hit else '✅ Scored'} {backend} logits (version {version}) "
+          f"in {time.perf_counter() - start:.1f}s")
+
+    # Calibration and sweeps work on the cached arrays only
+    start = time.perf_counter()
+    risk_logits, risk_labels = scored['risk']
+    intent_logits, intent_labels = scored['intent']
+    temperatures = {'risk_temperature': 1.0, 'intent_temperature': 1.0}
+    if not args.no_calibration:
+        temperatures = {'risk_temperature': fit_temperature(risk_logits, risk_labels),
+                        'intent_temperature': fit_temperature(intent_logits, intent_labels)}
+
+    risk_scores = softmax(risk_logits, temperatures['risk_temperature'])[:, HIGH_RISK_INDICES].sum(axis=1)
+    curves = {
+        'risk': risk_curves(risk_scores, risk_labels),
+        'intent': intent_curves(softmax(intent_logits, temperatures['intent_temperature']), intent_labels),
+    }
+    thresholds = propose_thresholds(curves['risk'], curves['intent'], args.min_recall,
+                                    args.min_emergency_recall, args.min_intent_precision)
+    print(f"Calibrated and swept {len(THRESHOLD_GRID)} thresholds in {time.perf_counter() - start:.3f}s")
+
+    risk_at = curve_at(curves['risk'], thresholds['risk_high'])
+    intent_at = curve_at(curves['intent'], thresholds['intent'])
+    print(f"\nTemperatures: risk {temperatures['risk_temperature']:.3f}, "
+          f"intent {temperatures['intent_temperature']:.3f}")
+    print(f"risk_high   {thresholds['risk_high']:.2f}  precision {risk_at['precision']:.3f}  "
+          f"recall {risk_at['recall']:.3f}  emergency recall {risk_at['emergency_recall']:.3f}")
+    print(f"risk_medium {thresholds['risk_medium']:.2f}  "
+          f"medium+ recall {curve_at(curves['risk'], thresholds['risk_medium'])['medium_recall']:.3f}")
+    print(f"intent      {thresholds['intent']:.2f}  precision {intent_at['precision']:.3f}  "
+          f"coverage {intent_at['coverage']:.3f}")
+
+    output_path = model_dir / THRESHOLDS_FILE
+    with open(output_path, 'w') as f:
+        json.dump({'backend': backend, 'model_version': version, **thresholds, **temperatures,
+                   'at_risk_high': risk_at, 'at_intent': intent_at}, f, indent=2)
+
+    curves_path = Path(args.curves)
+    curves_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(curves_path, 'w') as f:
+        json.dump(curves, f, indent=2)
+
+    print(f"\n✅ Thresholds saved to: {output_path}")
+    print(f"Curves saved to: {curves_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""
+Incremental recommender update from new RecommendationFeedback events.
+
+Features:
+    - Reads feedback events newer than the last applied one
+      (update_state.json in the model directory; train_recommender.py
+      resets it after a full retrain)
+    - Unseen users and items are appended to the id mappings and get new
+      identity features and freshly initialized LightFM parameters;
+      existing rows and parameters are left as they are
+    - fit_partial on just the new interactions (a few epochs), instead of
+      regenerating the data and refitting from scratch
+    - Each artifact is written to a temp file and os.replace'd, model.pkl
+      last; serving notices the new model.pkl and swaps its
+      representations in one step (serving/app.py)
+
+Usage:
+    python update_recommender.py
+    python update_recommender.py --interactions ../data/raw/recommendation_feedback --epochs 5
+"""
+
+import json
+import time
+import pickle
+import argparse
+import yaml
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+from recommender_data import (
+    RecommenderData, default_num_threads, feedback_interactions, find_feedback_source,
+    load_feedback, replace_file
+)
+
+ML_DIR = Path(__file__).resolve().parent.parent
+MODEL_DIR = ML_DIR / 'models' / 'recommender'
+STATE_FILE = 'update_state.json'
+
+DEFAULT_UPDATE_EPOCHS = 5
+
+
+def load_state(model_dir):
+    path = Path(model_dir) / STATE_FILE
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_state(model_dir, state):
+    replace_file(Path(model_dir) / STATE_FILE, lambda f: f.write(json.dumps(state, indent=2).encode('utf-8')))
+
+
+def grow_parameters(model, kind, position, n_new):
+    """
+    Insert n_new feature rows into a fitted LightFM model's parameters.
+
+    kind is 'user' or 'item'; rows are inserted at `position` (after the
+    existing identity features). Embeddings are initialized the way
+    LightFM initializes them, biases and optimizer state start fresh.
+    """
+    if n_new == 0:
+        return
+    embeddings = getattr(model, f'{kind}_embeddings')
+    no_components = embeddings.shape[1]
+    new_embeddings = ((model.random_state.rand(n_new, no_components) - 0.5) / no_components).astype(np.float32)
+    initial_gradient = 1.0 if model.learning_schedule == 'adagrad' else 0.0
+
+    for name, new_rows in (
+        (f'{kind}_embeddings', new_embeddings),
+        (f'{kind}_embedding_gradients', np.full((n_new, no_components), initial_gradient, dtype=np.float32)),
+        (f'{kind}_embedding_momentum', np.zeros((n_new, no_components), dtype=np.float32)),
+        (f'{kind}_biases', np.zeros(n_new, dtype=np.float32)),
+        (f'{kind}_bias_gradients', np.full(n_new, initial_gradient, dtype=np.float32)),
+        (f'{kind}_bias_momentum', np.zeros(n_new, dtype=np.float32)),
+    ):
+        setattr(model, name, np.ascontiguousarray(np.insert(getattr(model, name), position, new_rows, axis=0)))
+
+
+def new_events(df, since=None):
+    """Feedback rows after `since` (an ISO timestamp, or None for all) and the newest timestamp among them"""
+    timestamps = pd.to_datetime(df['timestamp'])
+    if since is not None:
+        df = df[timestamps > pd.Timestamp(since)]
+        timestamps = timestamps[df.index]
+    newest = timestamps.max() if len(df) else None
+    return df, newest
+
+
+def apply_feedback(model, data, df, epochs=DEFAULT_UPDATE_EPOCHS, num_threads=1):
+    """
+    Extend the mappings and parameters for new users/items, then fit_partial on the new events.
+
+    Returns:
+        Dict with counts of events, interactions, new users and new items
+    """
+    n_users, n_items = data.shape
+    users, items, weights = feedback_interactions(df)
+    interactions, sample_weight = data.add_events(users, items, weights)
+    new_users, new_items = data.shape[0] - n_users, data.shape[1] - n_items
+
+    grow_parameters(model, 'user', n_users, new_users)
+    grow_parameters(model, 'item', n_items, new_items)
+
+    if interactions.nnz:
+        model.fit_partial(interactions, user_features=data.user_features, item_features=data.item_features,
+                          sample_weight=sample_weight, epochs=epochs, num_threads=num_threads)
+    return {
+        'events': len(df),
+        'interactions': int(interactions.nnz),
+        'new_users': new_users,
+        'new_items': new_items,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Apply new feedback to the recommender with fit_partial')
+    parser.add_argument('--model-dir', default=str(MODEL_DIR))
+    parser.add_argument('--interactions', default=None,
+                        help='RecommendationFeedback export (shard directory or file); default: data/raw')
+    parser.add_argument('--epochs', type=int, default=None, help='fit_partial epochs (default: params.yaml)')
+
+    args = parser.parse_args()
+
+    with open(ML_DIR / 'params.yaml') as f:
+        params = (yaml.safe_load(f) or {}).get('recommender') or {}
+    epochs = args.epochs or params.get('update_epochs', DEFAULT_UPDATE_EPOCHS)
+    num_threads = params.get('num_threads') or default_num_threads()
+
+    model_dir = Path(args.model_dir)
+    if not (model_dir / 'model.pkl').exists():
+        print(f"❌ No recommender model at {model_dir}; run train_recommender.py first")
+        return
+
+    source = Path(args.interactions) if args.interactions else find_feedback_source(ML_DIR / 'data' / 'raw')
+    if source is None:
+        print("⚠️  No recommendation feedback export found. Nothing to update.")
+        return
+
+    start = time.perf_counter()
+    state = load_state(model_dir)
+    df, newest = new_events(load_feedback(source), state.get('watermark'))
+    if newest is None:
+        print(f"✅ No feedback after {state.get('watermark')}. Model unchanged.")
+        return
+
+    with open(model_dir / 'model.pkl', 'rb') as f:
+        model = pickle.load(f)
+    data = RecommenderData.load(model_dir)
+
+    stats = apply_feedback(model, data, df, epochs, num_threads)
+
+    # model.pkl last: serving reloads when it changes
+    data.save(model_dir)
+    replace_file(model_dir / 'model.pkl', lambda f: pickle.dump(model, f))
+    save_state(model_dir, {
+        'watermark': newest.isoformat(),
+        'updates': state.get('updates', 0) + 1,
+        'last_update': stats,
+    })
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ Applied {stats['events']} events ({stats['interactions']} interactions, "
+          f"{stats['new_users']} new users, {stats['new_items']} new items) in {elapsed:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,16 +3,28 @@ FastAPI ML Inference Service
 
 Endpoints:
     - POST /predict/screening: PHQ-9/GAD-7 screening prediction
-    - POST /predict/chat: Risk detection and intent classification
+    - POST /explain/screening: Per-question TreeSHAP attributions for a
+      screening (batched across requests, cached by answer vector)
+    - POST /predict/chat: Risk detection and intent classification (one joint
+      multi-task model when models/chat_multitask exists; risk/intent
+      thresholds and temperatures from models/serving_thresholds.json)
+    - POST /recommend: Top-k resource recommendations (LightFM, precomputed
+      representations, nightly top-N store when available; reloaded when
+      update_recommender.py writes a new model). Users without history are
+      served from the TF-IDF content index using their screening/intent profile
+    - POST /summarize/session: Chat session summarization (batched, optional SSE streaming,
+      incremental map-reduce mode for long sessions)
     - GET /health: Health check
     - GET /metrics: Prometheus metrics
 """
 
 import os
+import asyncio
 import joblib
 import torch
 import mlflow.pyfunc
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional, Dict
 from prometheus_client import Counter, Histogram, make_asgi_app
@@ -26,6 +38,13 @@ import re
 import re
 import random
 from collections import Counter as WordCounter
+from batching import MicroBatcher
+from multitask import MultiTaskPredictor
+from chat_thresholds import DEFAULT_THRESHOLDS, HIGH_RISK_INDICES, load_thresholds, risk_level as classify_risk
+from screening_explain import ScreeningExplainer
+from recommender import Recommender
+from content_recommender import ContentIndex, profile_terms
+from summarizer import SessionSummarizer, SummaryCache, format_transcript, parse_summary, summarize_incremental
 
 # Logging
 logging.basicConfig(level=logging.INFO)
@@ -43,12 +62,33 @@ prediction_counter = Counter('predictions_total', 'Total predictions', ['model_t
 prediction_latency = Histogram('prediction_latency_seconds', 'Prediction latency')
 high_risk_counter = Counter('high_risk_predictions', 'High risk predictions', ['model_type'])
 safety_trigger_counter = Counter('safety_triggers_total', 'Total safety layer triggers')
+summary_latency = Histogram('summary_latency_seconds', 'Session summarization latency')
+explain_cache_hits = Counter('explain_cache_hits_total', 'Screening explanations served from cache', ['model_type'])
+summary_batch_size = Histogram('summary_batch_size', 'Requests per summarization batch', buckets=(1, 2, 4, 8, 16, 32))
 
 # Global model storage
 models = {}
 tokenizers = {}
 label_maps = {}
 responses = {}
+batchers = {}
+explainers = {}
+chat_thresholds = dict(DEFAULT_THRESHOLDS)
+
+# Summarization settings
+SUMMARY_MAX_NEW_TOKENS = int(os.getenv('SUMMARY_MAX_NEW_TOKENS', '128'))
+SUMMARY_MAX_BATCH_SIZE = int(os.getenv('SUMMARY_MAX_BATCH_SIZE', '16'))
+SUMMARY_MAX_WAIT_MS = float(os.getenv('SUMMARY_MAX_WAIT_MS', '20'))
+SUMMARY_CACHE_SIZE = int(os.getenv('SUMMARY_CACHE_SIZE', '10000'))
+CHAT_MAX_BATCH_SIZE = int(os.getenv('CHAT_MAX_BATCH_SIZE', '32'))
+CHAT_MAX_WAIT_MS = float(os.getenv('CHAT_MAX_WAIT_MS', '5'))
+RECOMMENDER_RELOAD_SECONDS = float(os.getenv('RECOMMENDER_RELOAD_SECONDS', '60'))  # 0 disables
+EXPLAIN_MAX_BATCH_SIZE = int(os.getenv('EXPLAIN_MAX_BATCH_SIZE', '64'))
+EXPLAIN_MAX_WAIT_MS = float(os.getenv('EXPLAIN_MAX_WAIT_MS', '5'))
+EXPLAIN_CACHE_SIZE = int(os.getenv('EXPLAIN_CACHE_SIZE', '10000'))
+# Attach the TreeSHAP explanation to every /predict/screening response
+SCREENING_EXPLANATIONS = os.getenv('SCREENING_EXPLANATIONS', '1') == '1'
+summary_cache = SummaryCache(max_entries=SUMMARY_CACHE_SIZE)
 
 # Request/Response models
 class ScreeningRequest(BaseModel):
@@ -63,6 +103,30 @@ class ScreeningResponse(BaseModel):
     explanation: dict
     modelVersion: str
 
+class ExplanationResponse(BaseModel):
+    type: str
+    severity: str
+    probabilities: Dict[str, float]
+    baseValue: float
+    questions: List[dict]
+    features: Dict[str, float]
+    cached: bool
+    modelVersion: str
+
+class RecommendRequest(BaseModel):
+    userId: Optional[str] = None  # user_hash, as in the training exports
+    k: int = 10
+    features: Optional[List[str]] = []  # e.g. ["PHQ9_moderate"] for users without history
+    exclude: Optional[List[str]] = []  # resource ids not to recommend
+    screenings: Optional[Dict[str, str]] = {}  # latest risk level per screening type (cold start)
+    intent: Optional[str] = None  # latest chat intent (cold start)
+
+class RecommendResponse(BaseModel):
+    userId: Optional[str]
+    recommendations: List[dict]
+    source: str
+    modelVersion: str
+
 class ChatRequest(BaseModel):
     message: str
     context: Optional[dict] = {}
@@ -77,6 +141,27 @@ class ChatResponse(BaseModel):
     confidence: float
     response: str
 
+class SummaryTurn(BaseModel):
+    sender: str  # "user" or "bot"
+    message: str
+
+class SummarizeRequest(BaseModel):
+    sessionId: Optional[str] = None
+    turns: List[SummaryTurn]
+    maxNewTokens: Optional[int] = None
+    numBeams: int = 1
+    stream: bool = False
+    incremental: bool = False  # Reuse cached chunk summaries (requires sessionId)
+
+class SummarizeResponse(BaseModel):
+    sessionId: Optional[str]
+    summary: str
+    mainConcerns: List[str]
+    copingStrategies: List[str]
+    riskLevel: str
+    modelVersion: str
+    stats: Optional[dict] = None
+
 class KeywordRequest(BaseModel):
     texts: List[str]
 
@@ -142,11 +227,43 @@ async def load_models():
     except Exception as e:
         logger.error(f"❌ Failed to load screening models: {e}")
 
+    # Screening explainers (TreeSHAP via LightGBM pred_contrib, batched)
+    for model_key, screening_type in (('phq9', 'PHQ9'), ('gad7', 'GAD7')):
+        try:
+            if model_key in models:
+                explainers[model_key] = ScreeningExplainer(models[model_key], screening_type,
+                                                           cache_size=EXPLAIN_CACHE_SIZE)
+                batchers[f'explain_{model_key}'] = MicroBatcher(
+                    explainers[model_key].explain_batch,
+                    max_batch_size=EXPLAIN_MAX_BATCH_SIZE,
+                    max_wait_ms=EXPLAIN_MAX_WAIT_MS,
+                    name=f"explain_{model_key}"
+                )
+                logger.info(f"✅ {screening_type} explainer ready")
+        except Exception as e:
+            logger.error(f"❌ Failed to set up {screening_type} explainer: {e}")
+
+    # Load joint risk + intent model (replaces the two single-task models)
+    try:
+        multitask_dir = base_dir / 'chat_multitask'
+        if multitask_dir.exists():
+            logger.info("Loading multi-task chat model...")
+            models['chat_multitask'] = MultiTaskPredictor(multitask_dir)
+            batchers['chat'] = MicroBatcher(
+                models['chat_multitask'].predict_batch,
+                max_batch_size=CHAT_MAX_BATCH_SIZE,
+                max_wait_ms=CHAT_MAX_WAIT_MS,
+                name="chat"
+            )
+            logger.info("✅ Multi-task chat model loaded")
+    except Exception as e:
+        logger.error(f"❌ Failed to load multi-task chat model: {e}")
+
     # Load Risk Detector
     try:
         logger.info("Loading risk detector...")
         risk_dir = base_dir / 'risk_detector'
-        if risk_dir.exists():
+        if risk_dir.exists() and 'chat_multitask' not in models:
             models['risk'] = DistilBertForSequenceClassification.from_pretrained(risk_dir)
             tokenizers['risk'] = DistilBertTokenizer.from_pretrained(risk_dir)
             models['risk'].eval()  # Set to eval mode
@@ -158,7 +275,7 @@ async def load_models():
     try:
         logger.info("Loading intent classifier...")
         intent_dir = base_dir / 'intent_classifier'
-        if intent_dir.exists():
+        if intent_dir.exists() and 'chat_multitask' not in models:
             models['intent'] = DistilBertForSequenceClassification.from_pretrained(intent_dir)
             tokenizers['intent'] = DistilBertTokenizer.from_pretrained(intent_dir)
             models['intent'].eval()
@@ -174,6 +291,94 @@ async def load_models():
     except Exception as e:
         logger.error(f"❌ Failed to load intent classifier: {e}")
 
+    # Risk/intent thresholds and temperatures tuned for the loaded chat backend
+    try:
+        chat_backend = 'chat_multitask' if 'chat_multitask' in models else 'single_task'
+        chat_thresholds.update(load_thresholds(base_dir, chat_backend))
+        if 'chat_multitask' in models:
+            models['chat_multitask'].risk_temperature = chat_thresholds['risk_temperature']
+            models['chat_multitask'].intent_temperature = chat_thresholds['intent_temperature']
+        logger.info(f"✅ Chat thresholds: {chat_thresholds}")
+    except Exception as e:
+        logger.error(f"❌ Failed to load chat thresholds: {e}")
+
+    # Load Recommender
+    try:
+        recommender_dir = base_dir / 'recommender'
+        if (recommender_dir / 'model.pkl').exists():
+            logger.info("Loading recommender...")
+            load_recommender(base_dir)
+            if RECOMMENDER_RELOAD_SECONDS > 0:
+                asyncio.get_running_loop().create_task(watch_recommender(base_dir))
+    except Exception as e:
+        logger.error(f"❌ Failed to load recommender: {e}")
+
+    # Load content index (cold-start recommendations)
+    try:
+        content_dir = base_dir / 'content_index'
+        if content_dir.exists():
+            models['content_index'] = ContentIndex.load(content_dir)
+            logger.info(f"✅ Content index loaded ({models['content_index'].n_items} resources)")
+    except Exception as e:
+        logger.error(f"❌ Failed to load content index: {e}")
+
+    # Load Session Summarizer
+    try:
+        logger.info("Loading session summarizer...")
+        summarizer_dir = base_dir / 'summarizer'
+        if summarizer_dir.exists():
+            models['summarizer'] = SessionSummarizer(summarizer_dir, max_new_tokens=SUMMARY_MAX_NEW_TOKENS)
+            batchers['summarizer'] = MicroBatcher(
+                _summarize_batch,
+                max_batch_size=SUMMARY_MAX_BATCH_SIZE,
+                max_wait_ms=SUMMARY_MAX_WAIT_MS,
+                name="summarizer"
+            )
+            logger.info("✅ Session summarizer loaded")
+    except Exception as e:
+        logger.error(f"❌ Failed to load session summarizer: {e}")
+
+async def explain_screening_answers(model_key, answers):
+    """Cached explanation if present, otherwise one slot in the next TreeSHAP batch"""
+    explainer = explainers[model_key]
+    if len(answers) != explainer.n_questions or any(a < 0 or a > 3 for a in answers):
+        raise HTTPException(
+            status_code=422,
+            detail=f"Expected {explainer.n_questions} answers between 0 and 3"
+        )
+    cached = explainer.cached(answers)
+    if cached is not None:
+        explain_cache_hits.labels(model_type=model_key).inc()
+        return {**cached, 'cached': True}
+    return await batchers[f'explain_{model_key}'].submit(answers)
+
+def load_recommender(base_dir):
+    """Build the recommender off to the side, then swap it in with one assignment"""
+    model_path = base_dir / 'recommender' / 'model.pkl'
+    mtime = model_path.stat().st_mtime
+    recommender = Recommender.load(base_dir / 'recommender', top_n_dir=base_dir / 'recommender_top_n')
+    recommender.mtime = mtime
+    models['recommender'] = recommender
+    logger.info(f"✅ Recommender loaded ({len(recommender.user_ids)} users, {recommender.n_items} items, "
+                f"top-N store: {'yes' if recommender.top_n is not None else 'no'})")
+
+async def watch_recommender(base_dir):
+    """Reload the recommender when update_recommender.py or a retrain replaces model.pkl"""
+    model_path = base_dir / 'recommender' / 'model.pkl'
+    while True:
+        await asyncio.sleep(RECOMMENDER_RELOAD_SECONDS)
+        try:
+            current = models.get('recommender')
+            if model_path.exists() and (current is None or model_path.stat().st_mtime != current.mtime):
+                await asyncio.to_thread(load_recommender, base_dir)
+        except Exception as e:
+            # Mid-update artifacts fail the shape check; retry on the next poll
+            logger.warning(f"⚠️ Recommender reload skipped: {e}")
+
+def _summarize_batch(items):
+    summary_batch_size.observe(len(items))
+    return models['summarizer'].summarize_batch(items)
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
@@ -209,11 +414,21 @@ async def predict_screening(request: ScreeningRequest):
 
             # ML Prediction if available
             confidence = 0.95
-            if model_key in models:
-                # Prepare features (pad to match training features if needed)
-                # For now, we assume the model takes the raw answers + derived features
-                # This part would need the exact preprocessing logic from training
-                pass 
+            explanation = {"method": "rule-based-validated"}
+            if SCREENING_EXPLANATIONS and model_key in explainers:
+                # Explanations are an add-on: invalid answers or TreeSHAP errors
+                # keep the rule-based result (/explain/screening validates strictly)
+                try:
+                    result = await explain_screening_answers(model_key, request.answers)
+                    explanation = {
+                        "method": "treeshap",
+                        "modelSeverity": result['severity'],
+                        "questions": result['questions']
+                    }
+                except HTTPException as e:
+                    logger.info(f"No screening explanation: {e.detail}")
+                except Exception as e:
+                    logger.error(f"Screening explanation error: {e}")
 
             # Update metrics
             prediction_counter.labels(model_type=request.type).inc()
@@ -224,14 +439,25 @@ async def predict_screening(request: ScreeningRequest):
                 score=score,
                 riskLevel=risk_level,
                 confidence=confidence,
-                explanation={"method": "rule-based-validated"},
+                explanation=explanation,
                 modelVersion="v1.0"
             )
             
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Screening prediction error: {e}")
             raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/explain/screening", response_model=ExplanationResponse)
+async def explain_screening(request: ScreeningRequest):
+    model_key = request.type.lower()
+    if model_key not in explainers:
+        raise HTTPException(status_code=503, detail=f"No {request.type} model loaded")
+
+    result = await explain_screening_answers(model_key, request.answers)
+    return ExplanationResponse(type=request.type, modelVersion="v1.0", **result)
+
 @app.post("/predict/chat", response_model=ChatResponse)
 async def predict_chat(request: ChatRequest):
     with prediction_latency.time():
@@ -254,14 +480,20 @@ async def predict_chat(request: ChatRequest):
             # 2. Risk Detection (DistilBERT)
             risk_level = "low"
             risk_score = 0.0
-            if 'risk' in models:
+            chat_prediction = None
+            if 'chat_multitask' in models:
+                # One forward pass gives both risk and intent
+                chat_prediction = await batchers['chat'].submit(message)
+                risk_score = chat_prediction['risk_score']
+                risk_level = classify_risk(risk_score, chat_thresholds)
+            elif 'risk' in models:
                 inputs = tokenizers['risk'](message, return_tensors="pt", truncation=True, padding=True)
                 with torch.no_grad():
                     outputs = models['risk'](**inputs)
-                probs = torch.softmax(outputs.logits, dim=1)
-                risk_score = probs[0][1].item() # Assuming index 1 is 'risk'
-                if risk_score > 0.7: risk_level = "high"
-                elif risk_score > 0.4: risk_level = "medium"
+                probs = torch.softmax(outputs.logits / chat_thresholds['risk_temperature'], dim=1)
+                # Probability of high or emergency risk, as the multi-task model scores it
+                risk_score = probs[0][HIGH_RISK_INDICES].sum().item()
+                risk_level = classify_risk(risk_score, chat_thresholds)
 
             # 3. Intent Classification
             intent = "general_info"
@@ -298,16 +530,21 @@ async def predict_chat(request: ChatRequest):
                 logger.info("✅ Keyword found: small_talk")
 
             # Only use model if no specific keyword was found
-            if not keyword_found and 'intent' in models:
+            if not keyword_found and chat_prediction is not None:
+                intent_score = chat_prediction['intent_score']
+                if intent_score > chat_thresholds['intent']:
+                    intent = chat_prediction['intent']
+                    logger.info(f"Model predicted: {intent} (score: {intent_score})")
+            elif not keyword_found and 'intent' in models:
                 logger.info("Running intent model...")
                 inputs = tokenizers['intent'](message, return_tensors="pt", truncation=True, padding=True)
                 with torch.no_grad():
                     outputs = models['intent'](**inputs)
-                probs = torch.softmax(outputs.logits, dim=1)
+                probs = torch.softmax(outputs.logits / chat_thresholds['intent_temperature'], dim=1)
                 pred_idx = torch.argmax(probs).item()
                 intent_score = probs[0][pred_idx].item()
                 
-                if intent_score > 0.4: # Lower threshold since we only use it for non-keywords
+                if intent_score > chat_thresholds['intent']: # Lower threshold since we only use it for non-keywords
                     # Map index to label
                     if 'intent_rev' in label_maps:
                         intent = label_maps['intent_rev'].get(pred_idx, intent)
@@ -351,6 +588,120 @@ async def predict_chat(request: ChatRequest):
                 response="I'm having trouble processing that right now, but I'm here to listen."
             )
 
+@app.post("/recommend", response_model=RecommendResponse)
+async def recommend(request: RecommendRequest):
+    if 'recommender' not in models and 'content_index' not in models:
+        raise HTTPException(status_code=503, detail="Recommender model not loaded")
+    if request.k < 1:
+        raise HTTPException(status_code=400, detail="k must be positive")
+
+    recommender = models.get('recommender')
+    known_user = recommender is not None and request.userId in recommender.user_index
+    with prediction_latency.time():
+        if not known_user and 'content_index' in models and profile_terms(request.screenings, request.intent):
+            # Cold start: match the screening/intent profile against resource content
+            items = models['content_index'].recommend(
+                request.screenings, request.intent, request.k, request.exclude
+            )
+            source = 'content'
+        elif recommender is not None:
+            items, source = recommender.recommend(
+                request.userId, request.k, request.features, request.exclude
+            )
+        else:
+            items, source = [], 'none'
+    prediction_counter.labels(model_type='recommender').inc()
+    return RecommendResponse(
+        userId=request.userId,
+        recommendations=[{'resourceId': item_id, 'score': score} for item_id, score in items],
+        source=source,
+        modelVersion="lightfm-v1"
+    )
+
+@app.post("/summarize/session", response_model=SummarizeResponse)
+async def summarize_session(request: SummarizeRequest):
+    """
+    Summarize a chat session.
+
+    Concurrent requests are micro-batched into one generate() call. With
+    stream=true the summary is sent token by token as server-sent events
+    ("token" events, then a final "summary" event with the parsed fields);
+    streamed requests use greedy decoding and are not batched.
+
+    With incremental=true the session is split into chunks of turns that are
+    summarized once and cached, then merged hierarchically, so a checkpoint
+    on a long session only summarizes the new turns.
+    """
+    if 'summarizer' not in models:
+        raise HTTPException(status_code=503, detail="Summarizer model not loaded")
+    if not request.turns:
+        raise HTTPException(status_code=400, detail="At least one turn is required")
+    if request.incremental and (not request.sessionId or request.stream):
+        raise HTTPException(status_code=400, detail="Incremental mode requires sessionId and does not stream")
+
+    turns = [turn.dict() for turn in request.turns]
+    prediction_counter.labels(model_type='summarizer').inc()
+
+    def build_response(summary, stats=None):
+        return SummarizeResponse(
+            sessionId=request.sessionId,
+            summary=summary,
+            modelVersion="t5-small-v1",
+            stats=stats,
+            **parse_summary(summary)
+        )
+
+    if request.incremental:
+        async def summarize_texts(texts):
+            return await asyncio.gather(*[
+                batchers['summarizer'].submit({
+                    'text': text,
+                    'max_new_tokens': request.maxNewTokens,
+                    'num_beams': request.numBeams
+                })
+                for text in texts
+            ])
+
+        with summary_latency.time():
+            try:
+                summary, stats = await summarize_incremental(
+                    request.sessionId, turns, summarize_texts,
+                    models['summarizer'].count_tokens, summary_cache,
+                    max_new_tokens=request.maxNewTokens, num_beams=request.numBeams
+                )
+            except Exception as e:
+                logger.error(f"Incremental summarization error: {e}")
+                raise HTTPException(status_code=500, detail=str(e))
+
+        return build_response(summary, stats)
+
+    text = format_transcript(turns)
+
+    if request.stream:
+        def event_stream():
+            pieces = []
+            with summary_latency.time():
+                for piece in models['summarizer'].stream(text, request.maxNewTokens):
+                    pieces.append(piece)
+                    yield f"event: token\ndata: {json.dumps({'token': piece})}\n\n"
+            final = build_response("".join(pieces).strip())
+            yield f"event: summary\ndata: {final.json()}\n\n"
+
+        return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+    with summary_latency.time():
+        try:
+            summary = await batchers['summarizer'].submit({
+                'text': text,
+                'max_new_tokens': request.maxNewTokens,
+                'num_beams': request.numBeams
+            })
+        except Exception as e:
+            logger.error(f"Summarization error: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+    return build_response(summary)
+
 @app.post("/analyze/keywords", response_model=KeywordResponse)
 async def analyze_keywords(request: KeywordRequest):
     try:
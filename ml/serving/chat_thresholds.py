@@ -0,0 +1,68 @@
+"""
+Serving thresholds for chat risk levels and model intents.
+
+Features:
+    - Defaults are the former hard-coded values (risk score > 0.7 high,
+      > 0.4 medium, model intent accepted when its score > 0.4) and
+      temperature 1 (plain softmax)
+    - models/serving_thresholds.json, written by
+      scripts/tune_chat_thresholds.py, overrides them when it was tuned
+      for the chat backend that is loaded
+"""
+
+import json
+import logging
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+THRESHOLDS_FILE = 'serving_thresholds.json'
+
+DEFAULT_THRESHOLDS = {
+    'risk_high': 0.7,
+    'risk_medium': 0.4,
+    'intent': 0.4,
+    'risk_temperature': 1.0,
+    'intent_temperature': 1.0,
+}
+
+# Risk label order of the trained models (scripts/chat_data.py RISK_LABEL_MAP)
+RISK_LEVELS = ('no-risk', 'low', 'medium', 'high', 'emergency')
+HIGH_RISK_INDICES = [RISK_LEVELS.index('high'), RISK_LEVELS.index('emergency')]
+
+
+def softmax(logits, temperature=1.0):
+    """Row-wise softmax of logits / temperature"""
+    z = np.asarray(logits, dtype=np.float64) / temperature
+    z -= z.max(axis=-1, keepdims=True)
+    np.exp(z, out=z)
+    return z / z.sum(axis=-1, keepdims=True)
+
+
+def load_thresholds(base_dir, backend):
+    """
+    Thresholds from base_dir/serving_thresholds.json, defaults otherwise.
+
+    A file tuned for another backend ('chat_multitask' or 'single_task')
+    is ignored, its temperatures don't apply to this model's logits.
+    """
+    path = Path(base_dir) / THRESHOLDS_FILE
+    if not path.exists():
+        return dict(DEFAULT_THRESHOLDS)
+    with open(path) as f:
+        tuned = json.load(f)
+    if tuned.get('backend') != backend:
+        logger.warning(f"⚠️ {path} was tuned for {tuned.get('backend')}, not {backend}; using defaults")
+        return dict(DEFAULT_THRESHOLDS)
+    return {key: float(tuned.get(key, default)) for key, default in DEFAULT_THRESHOLDS.items()}
+
+
+def risk_level(risk_score, thresholds):
+    """'high', 'medium' or 'low' for a risk score (probability of high or emergency risk)"""
+    if risk_score > thresholds['risk_high']:
+        return "high"
+    if risk_score > thresholds['risk_medium']:
+        return "medium"
+    return "low"
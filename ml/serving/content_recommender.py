@@ -0,0 +1,189 @@
+"""
+Content-based resource recommendations for cold-start users.
+
+Features:
+    - Sparse TF-IDF matrix over resource title, description, category,
+      type and tags (word unigrams + bigrams, sublinear tf), rows
+      L2-normalized once when the index is built
+    - A user's latest screening risk levels and chat intent are mapped to
+      weighted topic terms and turned into one normalized query vector
+    - The whole catalog is scored with one sparse matrix product (cosine
+      similarity), top-k by argpartition
+    - Saved as vectorizer.pkl, item_vectors.npz and resources.json
+      (built by scripts/build_content_index.py)
+"""
+
+import json
+from pathlib import Path
+
+import joblib
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.preprocessing import normalize
+
+from recommender import top_k
+
+VECTORIZER_FILE = 'vectorizer.pkl'
+ITEM_VECTORS_FILE = 'item_vectors.npz'
+RESOURCES_FILE = 'resources.json'
+
+# Category and tags are repeated so short labels weigh as much as the description
+LABEL_REPEAT = 3
+
+# Topic terms per screening type and chat intent
+SCREENING_TERMS = {
+    'PHQ9': 'depression low mood sadness motivation hopelessness self care',
+    'GAD7': 'anxiety worry stress panic calm relaxation breathing',
+}
+INTENT_TERMS = {
+    'academic_stress': 'academic stress exams study grades time management',
+    'anxiety': 'anxiety worry panic calm breathing',
+    'depression': 'depression low mood sadness motivation',
+    'relationship_issues': 'relationships loneliness friends family communication',
+    'coping_strategies': 'coping strategies breathing relaxation mindfulness',
+    'sleep': 'sleep insomnia rest routine',
+}
+CRISIS_TERMS = 'crisis professional help counseling hotline emergency support'
+
+# Weight of a screening's terms by its latest risk level
+SEVERITY_WEIGHTS = {
+    'none': 0.25,
+    'minimal': 0.25,
+    'mild': 0.5,
+    'moderate': 1.0,
+    'moderately-severe': 1.5,
+    'high': 2.0,
+    'severe': 2.0,
+}
+CRISIS_LEVELS = ('moderately-severe', 'high', 'severe')
+INTENT_WEIGHT = 1.0
+
+
+def screening_type_key(screening_type):
+    """'PHQ-9' / 'phq9' -> 'PHQ9'"""
+    return str(screening_type).upper().replace('-', '')
+
+
+def resource_text(resource):
+    """Indexed text for one resource dict (title, description, category, type, tags)"""
+    tags = resource.get('tags') or []
+    labels = ' '.join([str(resource.get('category') or ''), str(resource.get('type') or '')] + list(tags))
+    return ' '.join([str(resource.get('title') or ''), str(resource.get('description') or '')] +
+                    [labels] * LABEL_REPEAT)
+
+
+def profile_terms(screenings=None, intent=None):
+    """
+    Weighted query terms for a user profile.
+
+    Args:
+        screenings: {screening type: latest risk level}, e.g. {'PHQ-9': 'moderate'}
+        intent: Latest chat intent, e.g. 'academic_stress'
+
+    Returns:
+        List of (text, weight) pairs (empty if nothing is known)
+    """
+    terms = []
+    crisis_weight = 0.0
+    for screening_type, level in (screenings or {}).items():
+        text = SCREENING_TERMS.get(screening_type_key(screening_type))
+        level = str(level).lower()
+        if text is None:
+            continue
+        weight = SEVERITY_WEIGHTS.get(level, 0.5)
+        terms.append((text, weight))
+        if level in CRISIS_LEVELS:
+            crisis_weight = max(crisis_weight, weight)
+    if crisis_weight:
+        terms.append((CRISIS_TERMS, crisis_weight))
+    if intent in INTENT_TERMS:
+        terms.append((INTENT_TERMS[intent], INTENT_WEIGHT))
+    return terms
+
+
+class ContentIndex:
+    """
+    TF-IDF resource index.
+
+    Args:
+        vectorizer: Fitted TfidfVectorizer
+        item_vectors: L2-normalized CSR matrix, one row per resource
+        resources: List of dicts with at least resource_id, in row order
+    """
+
+    def __init__(self, vectorizer, item_vectors, resources):
+        self.vectorizer = vectorizer
+        self.item_vectors = item_vectors.tocsr()
+        self.resources = list(resources)
+        self.item_ids = np.array([str(resource['resource_id']) for resource in self.resources])
+        self.item_index = {item_id: row for row, item_id in enumerate(self.item_ids)}
+
+    @classmethod
+    def build(cls, resources, min_df=1, max_features=50000):
+        """Fit the vectorizer on the catalog and precompute normalized item vectors"""
+        vectorizer = TfidfVectorizer(
+            stop_words='english', ngram_range=(1, 2), sublinear_tf=True,
+            min_df=min_df, max_features=max_features, dtype=np.float32
+        )
+        item_vectors = vectorizer.fit_transform([resource_text(resource) for resource in resources])
+        return cls(vectorizer, normalize(item_vectors, norm='l2', copy=False), resources)
+
+    @classmethod
+    def load(cls, index_dir):
+        index_dir = Path(index_dir)
+        with open(index_dir / RESOURCES_FILE) as f:
+            resources = json.load(f)
+        return cls(joblib.load(index_dir / VECTORIZER_FILE), sp.load_npz(index_dir / ITEM_VECTORS_FILE), resources)
+
+    def save(self, index_dir):
+        index_dir = Path(index_dir)
+        index_dir.mkdir(parents=True, exist_ok=True)
+        joblib.dump(self.vectorizer, index_dir / VECTORIZER_FILE)
+        sp.save_npz(index_dir / ITEM_VECTORS_FILE, self.item_vectors)
+        with open(index_dir / RESOURCES_FILE, 'w') as f:
+            json.dump(self.resources, f)
+
+    @property
+    def n_items(self):
+        return len(self.item_ids)
+
+    def query_vectors(self, profiles):
+        """
+        One L2-normalized query row per profile.
+
+        Each profile's term groups are vectorized in a single transform call,
+        normalized, weighted and summed with one sparse product.
+        """
+        texts, rows, weights = [], [], []
+        for row, (screenings, intent) in enumerate(profiles):
+            for text, weight in profile_terms(screenings, intent):
+                texts.append(text)
+                rows.append(row)
+                weights.append(weight)
+        if not texts:
+            return sp.csr_matrix((len(profiles), len(self.vectorizer.vocabulary_)), dtype=np.float32)
+
+        term_vectors = normalize(self.vectorizer.transform(texts), norm='l2')
+        combine = sp.csr_matrix((np.asarray(weights, dtype=np.float32), (rows, np.arange(len(texts)))),
+                                shape=(len(profiles), len(texts)))
+        return normalize(combine @ term_vectors, norm='l2')
+
+    def score(self, profiles):
+        """(n_profiles, n_items) cosine similarities, one sparse matrix product for the batch"""
+        return np.asarray((self.query_vectors(profiles) @ self.item_vectors.T).todense(), dtype=np.float32)
+
+    def recommend(self, screenings=None, intent=None, k=10, exclude=()):
+        """
+        Top-k resources for one profile.
+
+        Returns:
+            List of (resource id, score) pairs; empty if the profile has no terms
+        """
+        if not profile_terms(screenings, intent):
+            return []
+        scores = self.score([(screenings, intent)])[0]
+        excluded = sorted({self.item_index[item_id] for item_id in exclude if item_id in self.item_index})
+        scores[excluded] = -np.inf
+        cols = top_k(scores, min(k, self.n_items - len(excluded)))
+        return [(str(self.item_ids[c]), float(scores[c])) for c in cols]
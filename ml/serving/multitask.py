@@ -0,0 +1,162 @@
+"""
+Joint risk + intent chat model (one DistilBERT encoder, two heads).
+
+Features:
+    - Shared encoder and pre-classifier, separate risk and intent heads
+      (same head shape as DistilBertForSequenceClassification)
+    - Weighted sum of per-task cross-entropy losses, optional per-class
+      weights for the imbalanced risk labels
+    - Saved as encoder/ (save_pretrained), heads.pt and multitask_config.json
+      next to the tokenizer, loaded once by serving for both predictions
+"""
+
+import json
+from pathlib import Path
+
+import torch
+from torch import nn
+from transformers import DistilBertModel, DistilBertTokenizer
+
+CONFIG_FILE = 'multitask_config.json'
+HEADS_FILE = 'heads.pt'
+ENCODER_DIR = 'encoder'
+
+MAX_LENGTH = 128
+
+# Risk levels counted towards the serving risk score
+HIGH_RISK_LEVELS = ('high', 'emergency')
+
+
+class MultiTaskChatModel(nn.Module):
+    """
+    DistilBERT encoder with a risk head and an intent head.
+
+    forward() returns a dict with risk_logits, intent_logits and, when
+    both label tensors are given, the weighted loss, so it plugs into
+    transformers.Trainer with label_names=['risk_labels', 'intent_labels'].
+    """
+
+    def __init__(self, encoder, num_risk_labels, num_intent_labels, risk_loss_weight=1.0,
+                 intent_loss_weight=1.0, risk_class_weights=None, dropout=None):
+        super().__init__()
+        self.encoder = encoder
+        dim = encoder.config.dim
+        self.pre_classifier = nn.Linear(dim, dim)
+        self.dropout = nn.Dropout(encoder.config.seq_classif_dropout if dropout is None else dropout)
+        self.risk_head = nn.Linear(dim, num_risk_labels)
+        self.intent_head = nn.Linear(dim, num_intent_labels)
+        self.risk_loss_weight = risk_loss_weight
+        self.intent_loss_weight = intent_loss_weight
+        if risk_class_weights is not None:
+            risk_class_weights = torch.as_tensor(risk_class_weights, dtype=torch.float32)
+        self.register_buffer('risk_class_weights', risk_class_weights, persistent=False)
+
+    @classmethod
+    def from_encoder_name(cls, name, num_risk_labels, num_intent_labels, **kwargs):
+        return cls(DistilBertModel.from_pretrained(name), num_risk_labels, num_intent_labels, **kwargs)
+
+    def forward(self, input_ids, attention_mask=None, risk_labels=None, intent_labels=None):
+        hidden = self.encoder(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+        pooled = self.dropout(torch.relu(self.pre_classifier(hidden[:, 0])))
+        risk_logits = self.risk_head(pooled)
+        intent_logits = self.intent_head(pooled)
+
+        outputs = {'risk_logits': risk_logits, 'intent_logits': intent_logits}
+        if risk_labels is not None and intent_labels is not None:
+            risk_loss = nn.functional.cross_entropy(risk_logits, risk_labels, weight=self.risk_class_weights)
+            intent_loss = nn.functional.cross_entropy(intent_logits, intent_labels)
+            outputs = {'loss': self.risk_loss_weight * risk_loss + self.intent_loss_weight * intent_loss, **outputs}
+        return outputs
+
+    def heads_state_dict(self):
+        return {
+            name: module.state_dict()
+            for name, module in (('pre_classifier', self.pre_classifier), ('risk_head', self.risk_head),
+                                 ('intent_head', self.intent_head))
+        }
+
+    def save(self, model_dir, risk_label_map, intent_label_map, max_length=MAX_LENGTH):
+        """Write encoder/, heads.pt and multitask_config.json to model_dir"""
+        model_dir = Path(model_dir)
+        model_dir.mkdir(parents=True, exist_ok=True)
+        self.encoder.save_pretrained(model_dir / ENCODER_DIR)
+        torch.save(self.heads_state_dict(), model_dir / HEADS_FILE)
+        with open(model_dir / CONFIG_FILE, 'w') as f:
+            json.dump({
+                'risk_label_map': risk_label_map,
+                'intent_label_map': intent_label_map,
+                'risk_loss_weight': self.risk_loss_weight,
+                'intent_loss_weight': self.intent_loss_weight,
+                'max_length': max_length,
+            }, f, indent=2)
+
+    @classmethod
+    def load(cls, model_dir):
+        """
+        Load a saved model in eval mode.
+
+        Returns:
+            (model, config dict)
+        """
+        model_dir = Path(model_dir)
+        with open(model_dir / CONFIG_FILE) as f:
+            config = json.load(f)
+        encoder = DistilBertModel.from_pretrained(model_dir / ENCODER_DIR)
+        model = cls(encoder, len(config['risk_label_map']), len(config['intent_label_map']),
+                    config['risk_loss_weight'], config['intent_loss_weight'])
+        heads = torch.load(model_dir / HEADS_FILE, map_location='cpu')
+        for name, state in heads.items():
+            getattr(model, name).load_state_dict(state)
+        model.eval()
+        return model, config
+
+
+class MultiTaskPredictor:
+    """
+    Serving wrapper: tokenizer + multitask model saved by train_multitask.py
+
+    Logits are divided by the per-head temperatures before the softmax
+    (tuned by scripts/tune_chat_thresholds.py, 1.0 = uncalibrated).
+    """
+
+    def __init__(self, model_dir, risk_temperature=1.0, intent_temperature=1.0):
+        self.tokenizer = DistilBertTokenizer.from_pretrained(model_dir)
+        self.model, config = MultiTaskChatModel.load(model_dir)
+        self.max_length = config['max_length']
+        self.risk_labels = sorted(config['risk_label_map'], key=config['risk_label_map'].get)
+        self.intent_labels = sorted(config['intent_label_map'], key=config['intent_label_map'].get)
+        self._high_risk = [self.risk_labels.index(level) for level in HIGH_RISK_LEVELS if level in self.risk_labels]
+        self.risk_temperature = risk_temperature
+        self.intent_temperature = intent_temperature
+
+    def logits_batch(self, messages):
+        """(risk logits, intent logits) tensors for a batch of messages (one forward pass)"""
+        inputs = self.tokenizer(messages, truncation=True, padding=True, max_length=self.max_length,
+                                return_tensors="pt")
+        with torch.inference_mode():
+            outputs = self.model(input_ids=inputs['input_ids'], attention_mask=inputs['attention_mask'])
+        return outputs['risk_logits'], outputs['intent_logits']
+
+    def predict_batch(self, messages):
+        """
+        Risk and intent predictions for a batch of messages (one forward pass).
+
+        Returns:
+            List of dicts: risk_level, risk_score (probability of high or
+            emergency risk), risk_probs, intent, intent_score
+        """
+        risk_logits, intent_logits = self.logits_batch(messages)
+        risk_probs = torch.softmax(risk_logits / self.risk_temperature, dim=-1)
+        intent_probs = torch.softmax(intent_logits / self.intent_temperature, dim=-1)
+
+        results = []
+        for risk_row, intent_row in zip(risk_probs, intent_probs):
+            intent_idx = int(intent_row.argmax())
+            results.append({
+                'risk_level': self.risk_labels[int(risk_row.argmax())],
+                'risk_score': float(risk_row[self._high_risk].sum()),
+                'risk_probs': dict(zip(self.risk_labels, risk_row.tolist())),
+                'intent': self.intent_labels[intent_idx],
+                'intent_score': float(intent_row[intent_idx]),
+            })
+        return results
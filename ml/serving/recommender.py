@@ -0,0 +1,248 @@
+"""
+Resource recommendations from the LightFM model saved by train_recommender.py.
+
+Features:
+    - User and item representations are computed once at load time
+      (get_user_representations / get_item_representations) and kept as
+      float32 matrices with the item bias folded into the item vectors
+    - A request is one matrix-vector product plus argpartition for top-k
+    - Items the user already interacted with are excluded
+    - Unknown users: representation from their features (e.g. latest
+      screening risk levels) if given, otherwise items by learned bias
+    - Nightly batch mode precomputes top-N for every user into a compact
+      array store (int32/uint16 item indices, float16 scores) that serving
+      memory-maps and reads before falling back to live scoring; a store
+      built from a different model.pkl is ignored
+    - Artifacts are checked for consistent shapes on load, so a reload
+      during an incremental update (update_recommender.py) fails cleanly
+      and the previous representations stay in use
+"""
+
+import json
+import pickle
+import hashlib
+import logging
+from pathlib import Path
+
+import numpy as np
+import scipy.sparse as sp
+
+logger = logging.getLogger(__name__)
+
+# Same artifact names as scripts/recommender_data.py
+MODEL_FILE = 'model.pkl'
+MAPPINGS_FILE = 'mappings.json'
+USER_FEATURES_FILE = 'user_features.npz'
+ITEM_FEATURES_FILE = 'item_features.npz'
+INTERACTIONS_FILE = 'interactions.npz'
+
+# Precomputed top-N store
+TOP_N_ITEMS_FILE = 'top_n_items.npy'
+TOP_N_SCORES_FILE = 'top_n_scores.npy'
+TOP_N_META_FILE = 'top_n.json'
+PRECOMPUTE_BATCH_SIZE = 4096
+
+
+def model_fingerprint(model_dir):
+    """Short digest of model.pkl, recorded in the top-N store it was built from"""
+    digest = hashlib.sha1()
+    with open(Path(model_dir) / MODEL_FILE, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def top_k(scores, k):
+    """Indices of the k highest scores, best first (argpartition, then sort only those k)"""
+    k = min(k, scores.shape[-1])
+    if k <= 0:
+        return np.empty(scores.shape[:-1] + (0,), dtype=np.int64)
+    if k < scores.shape[-1]:
+        candidates = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    else:
+        candidates = np.broadcast_to(np.arange(k), scores.shape[:-1] + (k,))
+    order = np.argsort(-np.take_along_axis(scores, candidates, axis=-1), axis=-1, kind='stable')
+    return np.take_along_axis(candidates, order, axis=-1)
+
+
+class Recommender:
+    """
+    Top-k recommendations over precomputed representations.
+
+    Scores are user vector . item vector + item bias; the user bias is the
+    same for every item, so it is left out. Vectors carry the bias as an
+    extra component ([embedding, 1] . [embedding, bias]).
+
+    Args:
+        user_ids, item_ids: External ids in matrix order
+        user_vectors: (n_users, d + 1) float32
+        item_vectors: (n_items, d + 1) float32
+        feature_names: Non-identity user feature names
+        feature_vectors: (n_features, d + 1) per-feature user vectors
+        seen: Optional CSR (n_users, n_items) of training interactions
+    """
+
+    def __init__(self, user_ids, item_ids, user_vectors, item_vectors, feature_names=(),
+                 feature_vectors=None, seen=None):
+        self.user_ids = list(user_ids)
+        self.item_ids = np.asarray(item_ids)
+        self.user_index = {user_id: row for row, user_id in enumerate(self.user_ids)}
+        self.item_index = {item_id: col for col, item_id in enumerate(self.item_ids)}
+        self.user_vectors = np.ascontiguousarray(user_vectors, dtype=np.float32)
+        self.item_vectors = np.ascontiguousarray(item_vectors, dtype=np.float32)
+        self.feature_index = {name: row for row, name in enumerate(feature_names)}
+        self.feature_vectors = None if feature_vectors is None else np.asarray(feature_vectors, dtype=np.float32)
+        self.seen = seen.tocsr() if seen is not None else None
+        self.top_n = None
+        self.mtime = None  # model.pkl mtime when loaded (serving reload check)
+
+    @classmethod
+    def load(cls, model_dir, top_n_dir=None):
+        """
+        Load model.pkl and its matrices, computing all representations once.
+
+        A top-N store in top_n_dir is attached if it was built from this model.
+        """
+        model_dir = Path(model_dir)
+        with open(model_dir / MODEL_FILE, 'rb') as f:
+            model = pickle.load(f)
+        with open(model_dir / MAPPINGS_FILE) as f:
+            mappings = json.load(f)
+        user_features = sp.load_npz(model_dir / USER_FEATURES_FILE)
+        item_features = sp.load_npz(model_dir / ITEM_FEATURES_FILE)
+        seen_path = model_dir / INTERACTIONS_FILE
+        seen = sp.load_npz(seen_path) if seen_path.exists() else None
+
+        n_users = len(mappings['user_ids'])
+        if (user_features.shape != (n_users, len(model.user_embeddings)) or
+                item_features.shape != (len(mappings['item_ids']), len(model.item_embeddings))):
+            raise ValueError(f"Recommender artifacts in {model_dir} do not match model.pkl")
+
+        user_biases, user_embeddings = model.get_user_representations(user_features)
+        item_biases, item_embeddings = model.get_item_representations(item_features)
+
+        recommender = cls(
+            mappings['user_ids'], mappings['item_ids'],
+            np.column_stack([user_embeddings, np.ones(len(user_embeddings))]),
+            np.column_stack([item_embeddings, item_biases]),
+            mappings['user_feature_names'],
+            # Feature rows come after the per-user identity rows
+            np.column_stack([model.user_embeddings[n_users:], np.ones(len(model.user_embeddings) - n_users)]),
+            seen
+        )
+        if top_n_dir is not None:
+            recommender.top_n = TopNStore.load(top_n_dir, model_fingerprint(model_dir), n_users)
+        return recommender
+
+    @property
+    def n_items(self):
+        return len(self.item_ids)
+
+    def user_vector(self, user_id=None, features=None):
+        """
+        (vector, source) for a known user, a feature-described user, or
+        (None, 'popular') when there is nothing to go on.
+        """
+        if user_id in self.user_index:
+            return self.user_vectors[self.user_index[user_id]], 'collaborative'
+        rows = [self.feature_index[name] for name in features or () if name in self.feature_index]
+        if rows and self.feature_vectors is not None:
+            # Row-normalized features: the mean of the feature vectors
+            return self.feature_vectors[rows].mean(axis=0), 'features'
+        return None, 'popular'
+
+    def excluded(self, user_id=None, exclude=()):
+        cols = [self.item_index[item_id] for item_id in exclude if item_id in self.item_index]
+        if self.seen is not None and user_id in self.user_index:
+            row = self.user_index[user_id]
+            cols.extend(self.seen.indices[self.seen.indptr[row]:self.seen.indptr[row + 1]])
+        return np.unique(np.asarray(cols, dtype=np.int64))
+
+    def recommend(self, user_id=None, k=10, features=None, exclude=()):
+        """
+        Top-k items for one user.
+
+        Returns:
+            (list of (item id, score) pairs, source) where source is
+            'precomputed', 'collaborative', 'features' or 'popular'
+        """
+        excluded = self.excluded(user_id, exclude)
+
+        if self.top_n is not None and user_id in self.user_index:
+            cols, scores = self.top_n.lookup(self.user_index[user_id])
+            keep = ~np.isin(cols, excluded)
+            if keep.sum() >= min(k, self.n_items - len(excluded)):
+                pairs = zip(cols[keep][:k], scores[keep][:k])
+                return [(str(self.item_ids[c]), float(score)) for c, score in pairs], 'precomputed'
+
+        vector, source = self.user_vector(user_id, features)
+        if vector is None:
+            scores = self.item_vectors[:, -1].copy()
+        else:
+            scores = self.item_vectors @ vector
+        scores[excluded] = -np.inf
+
+        cols = top_k(scores, min(k, self.n_items - len(excluded)))
+        return [(str(self.item_ids[c]), float(scores[c])) for c in cols], source
+
+    def precompute_top_n(self, n, batch_size=PRECOMPUTE_BATCH_SIZE):
+        """
+        Top-n item indices and scores for every known user, seen items excluded.
+
+        Returns:
+            (items (n_users, n) uint16/int32 array, scores (n_users, n) float16 array)
+        """
+        n = min(n, self.n_items)
+        index_dtype = np.uint16 if self.n_items <= np.iinfo(np.uint16).max else np.int32
+        items = np.empty((len(self.user_ids), n), dtype=index_dtype)
+        scores = np.empty((len(self.user_ids), n), dtype=np.float16)
+
+        for start in range(0, len(self.user_ids), batch_size):
+            block = self.user_vectors[start:start + batch_size] @ self.item_vectors.T
+            if self.seen is not None:
+                seen = self.seen[start:start + batch_size].tocoo()
+                block[seen.row, seen.col] = -np.inf
+            cols = top_k(block, n)
+            items[start:start + len(block)] = cols
+            scores[start:start + len(block)] = np.take_along_axis(block, cols, axis=1)
+        return items, scores
+
+
+class TopNStore:
+    """Memory-mapped precomputed top-N rows (one per known user, in mapping order)"""
+
+    def __init__(self, items, scores):
+        self.items = items
+        self.scores = scores
+
+    @classmethod
+    def load(cls, store_dir, fingerprint=None, n_users=None):
+        """The store in store_dir, or None if missing or built from another model"""
+        store_dir = Path(store_dir)
+        if not (store_dir / TOP_N_META_FILE).exists():
+            return None
+        with open(store_dir / TOP_N_META_FILE) as f:
+            meta = json.load(f)
+        if (fingerprint is not None and meta.get('model') != fingerprint) or \
+                (n_users is not None and meta.get('n_users') != n_users):
+            logger.warning(f"Ignoring stale top-N store in {store_dir}")
+            return None
+        return cls(np.load(store_dir / TOP_N_ITEMS_FILE, mmap_mode='r'),
+                   np.load(store_dir / TOP_N_SCORES_FILE, mmap_mode='r'))
+
+    @staticmethod
+    def save(store_dir, items, scores, fingerprint):
+        """Write the arrays, then the metadata that marks the store as usable"""
+        store_dir = Path(store_dir)
+        store_dir.mkdir(parents=True, exist_ok=True)
+        (store_dir / TOP_N_META_FILE).unlink(missing_ok=True)
+        np.save(store_dir / TOP_N_ITEMS_FILE, items)
+        np.save(store_dir / TOP_N_SCORES_FILE, scores)
+        with open(store_dir / TOP_N_META_FILE, 'w') as f:
+            json.dump({'model': fingerprint, 'n_users': len(items), 'top_n': items.shape[1]}, f, indent=2)
+
+    def lookup(self, row):
+        # Users with fewer unseen items than N have -inf padding at the end
+        scores = np.asarray(self.scores[row], dtype=np.float32)
+        valid = np.isfinite(scores)
+        return np.asarray(self.items[row])[valid].astype(np.int64), scores[valid]
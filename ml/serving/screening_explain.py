@@ -0,0 +1,162 @@
+"""
+Per-question explanations for the LightGBM screening classifiers.
+
+Features:
+    - Feature rows built from raw answers exactly as preprocess.py does
+      (score, q1..qN, derived statistics), ordered by the model's
+      feature_name_
+    - TreeSHAP attributions from LightGBM itself (pred_contrib=True), one
+      call per batch of answer vectors, no shap dependency in serving
+    - Per-question attribution: each question's own feature plus its share
+      of the additive total-score features (score, sum_score, mean_score)
+    - Bounded LRU cache keyed by answer vector (answers are small integers,
+      so the space of distinct vectors is small and hit rates are high)
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Features that are linear in the answers; their attribution is split
+# between questions in proportion to each answer
+ADDITIVE_FEATURES = ('score', 'sum_score', 'mean_score')
+
+SEVERITY_LABELS = {
+    'PHQ9': ['none', 'mild', 'moderate', 'moderately-severe', 'severe'],
+    'GAD7': ['none', 'mild', 'moderate', 'severe'],
+}
+
+
+def screening_features(answers):
+    """
+    Model features for a batch of complete answer vectors.
+
+    Args:
+        answers: int array of shape (n_rows, n_questions), values 0-3
+
+    Returns:
+        Dict of feature name -> column (same values as preprocess.extract_features)
+    """
+    answers = np.asarray(answers, dtype=np.int16)
+    sum_score = answers.sum(axis=1)
+    max_score = answers.max(axis=1)
+    min_score = answers.min(axis=1)
+
+    features = {'score': sum_score}
+    for i in range(answers.shape[1]):
+        features[f'q{i+1}'] = answers[:, i]
+    features['sum_score'] = sum_score
+    features['mean_score'] = answers.mean(axis=1)
+    features['std_score'] = answers.std(axis=1)
+    features['max_score'] = max_score
+    features['min_score'] = min_score
+    features['range_score'] = max_score - min_score
+    features['num_zeros'] = (answers == 0).sum(axis=1)
+    features['num_threes'] = (answers == 3).sum(axis=1)
+    return features
+
+
+class ScreeningExplainer:
+    """
+    Batched TreeSHAP explanations for one screening model.
+
+    explain_batch() is the MicroBatcher process function: cache hits are
+    answered directly, the misses go through a single pred_contrib call.
+    The cache is shared with the event loop (cached()), so it is locked.
+    """
+
+    def __init__(self, model, screening_type, cache_size=10000):
+        self.model = model
+        self.screening_type = screening_type
+        self.feature_names = list(model.feature_name_)
+        self.questions = [name for name in self.feature_names if name.startswith('q')]
+        self.classes = list(model.classes_)
+        self.labels = SEVERITY_LABELS.get(screening_type, [])
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._question_idx = [self.feature_names.index(name) for name in self.questions]
+        self._additive_idx = [self.feature_names.index(name) for name in ADDITIVE_FEATURES
+                              if name in self.feature_names]
+
+    @property
+    def n_questions(self):
+        return len(self.questions)
+
+    def cached(self, answers):
+        """Cached explanation for an answer vector, or None"""
+        key = tuple(answers)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        return None
+
+    def _put(self, key, value):
+        with self._lock:
+            self._cache[key] = value
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def feature_matrix(self, answers):
+        features = screening_features(answers)
+        return pd.DataFrame({name: features[name] for name in self.feature_names})
+
+    def explain_batch(self, answer_batch):
+        """
+        Explanations for a batch of answer vectors.
+
+        Returns:
+            List of dicts: severity, probabilities, baseValue (raw score of
+            the predicted class before any feature), questions (per-question
+            answer and attribution), features (raw per-feature attributions),
+            cached
+        """
+        keys = [tuple(int(a) for a in answers) for answers in answer_batch]
+        hits = [self.cached(key) for key in keys]
+        misses = list(dict.fromkeys(key for key, hit in zip(keys, hits) if hit is None))
+
+        computed = {}
+        if misses:
+            answers = np.array(misses)
+            X = self.feature_matrix(answers)
+            probabilities = self.model.predict_proba(X)
+            contributions = np.asarray(self.model.predict_proba(X, pred_contrib=True))
+            # (rows, classes, features + bias); binary models have one raw score
+            contributions = contributions.reshape(len(misses), -1, len(self.feature_names) + 1)
+
+            for row, key in enumerate(misses):
+                computed[key] = self._explain_row(answers[row], probabilities[row], contributions[row])
+                self._put(key, computed[key])
+
+        return [{**hit, 'cached': True} if hit is not None else {**computed[key], 'cached': False}
+                for key, hit in zip(keys, hits)]
+
+    def _explain_row(self, answers, probabilities, contributions):
+        predicted = int(np.argmax(probabilities))
+        if len(contributions) > 1:
+            phi = contributions[predicted]
+        else:
+            phi = contributions[0] if predicted == 1 else -contributions[0]
+
+        # Additive features credited to questions in proportion to their answers
+        total = answers.sum()
+        shares = answers / total if total else np.full(len(answers), 1 / len(answers))
+        additive = phi[self._additive_idx].sum()
+        question_phi = phi[self._question_idx] + additive * shares
+
+        label = self.classes[predicted]
+        return {
+            'severity': self.labels[label] if 0 <= label < len(self.labels) else str(label),
+            'probabilities': {str(self.classes[i]): float(p) for i, p in enumerate(probabilities)},
+            'baseValue': float(phi[-1]),
+            'questions': [
+                {'question': name, 'answer': int(answer), 'attribution': float(value)}
+                for name, answer, value in zip(self.questions, answers, question_phi)
+            ],
+            'features': {name: float(value) for name, value in zip(self.feature_names, phi[:-1])},
+        }
@@ -0,0 +1,269 @@
+"""
+Session summarization with the fine-tuned T5 model.
+
+Features:
+    - Batched generation (one encoder pass per batch, KV-cached decoding)
+    - Greedy or beam search with a max-new-token budget
+    - Token streaming for a single request
+    - Parses "Concerns: ... Strategies: ... Risk: ..." output into fields
+    - Incremental hierarchical (map-reduce) summaries for long sessions
+"""
+
+import re
+import hashlib
+import logging
+from threading import Thread
+from collections import OrderedDict
+
+import torch
+from transformers import T5Tokenizer, T5ForConditionalGeneration, TextIteratorStreamer
+
+logger = logging.getLogger(__name__)
+
+# Same prefix and input limit as train_summarizer.py
+TASK_PREFIX = "summarize: "
+MAX_INPUT_TOKENS = 512
+
+RISK_LEVELS = ['low', 'medium', 'high', 'emergency']
+
+# Incremental mode: turns per leaf chunk and partial summaries per merge
+CHUNK_MAX_TURNS = 12
+MERGE_FAN_IN = 4
+
+
+def format_transcript(turns):
+    """Render chat turns in the "User: ... Bot: ..." training format"""
+    lines = []
+    for turn in turns:
+        speaker = "Bot" if turn.get('sender') == 'bot' else "User"
+        lines.append(f"{speaker}: {turn.get('message', '').strip()}")
+    return " ".join(lines)
+
+
+def parse_summary(text):
+    """
+    Split a generated summary into SessionSummary fields.
+
+    The summarizer is trained on targets like
+    "Concerns: Exam anxiety. Strategies: Breathing exercises. Risk: Low."
+    Missing sections come back empty rather than failing.
+    """
+    sections = {}
+    for key in ('Concerns', 'Strategies', 'Risk'):
+        match = re.search(rf"{key}:\s*(.*?)(?=\s*(?:Concerns|Strategies|Risk):|$)", text, re.IGNORECASE)
+        sections[key] = match.group(1).strip().rstrip('.') if match else ""
+
+    def split_items(value):
+        return [item.strip() for item in re.split(r"[,;]", value) if item.strip()]
+
+    risk = sections['Risk'].lower()
+    risk_level = next((level for level in RISK_LEVELS if level in risk), 'low')
+
+    return {
+        'mainConcerns': split_items(sections['Concerns']),
+        'copingStrategies': split_items(sections['Strategies']),
+        'riskLevel': risk_level
+    }
+
+
+class SessionSummarizer:
+    """Wraps the T5 summarizer saved by train_summarizer.py"""
+
+    def __init__(self, model_dir, max_new_tokens=128):
+        self.tokenizer = T5Tokenizer.from_pretrained(model_dir)
+        self.model = T5ForConditionalGeneration.from_pretrained(model_dir)
+        self.model.eval()
+        self.max_new_tokens = max_new_tokens
+
+    def _budget(self, requested):
+        return max(1, min(requested or self.max_new_tokens, self.max_new_tokens))
+
+    def count_tokens(self, text):
+        return len(self.tokenizer(text, add_special_tokens=False)['input_ids'])
+
+    def _encode(self, texts):
+        return self.tokenizer(
+            [TASK_PREFIX + text for text in texts],
+            max_length=MAX_INPUT_TOKENS,
+            truncation=True,
+            padding=True,
+            return_tensors="pt"
+        )
+
+    def summarize_batch(self, items):
+        """
+        Summarize a batch of requests.
+
+        Args:
+            items: List of dicts with 'text', 'max_new_tokens', 'num_beams'
+
+        Returns:
+            List of summary strings in input order
+
+        Items are grouped by beam width; within a group the encoder runs
+        once over the padded batch and decoding uses the KV cache. With
+        greedy decoding each sequence stops at its own EOS, so sharing the
+        group's largest token budget and trimming afterwards matches
+        per-item generation. Beam search is not budget-independent (the
+        length limit changes which beams survive), so beam items are also
+        grouped by their token budget.
+        """
+        results = [None] * len(items)
+        groups = {}
+        for idx, item in enumerate(items):
+            num_beams = max(1, item.get('num_beams', 1))
+            budget = self._budget(item.get('max_new_tokens')) if num_beams > 1 else None
+            groups.setdefault((num_beams, budget), []).append(idx)
+
+        for (num_beams, _), indices in groups.items():
+            budgets = [self._budget(items[i].get('max_new_tokens')) for i in indices]
+            inputs = self._encode([items[i]['text'] for i in indices])
+
+            with torch.inference_mode():
+                output_ids = self.model.generate(
+                    **inputs,
+                    max_new_tokens=max(budgets),
+                    num_beams=num_beams,
+                    early_stopping=num_beams > 1,
+                    use_cache=True
+                )
+
+            # T5 decoder output starts with the pad (decoder start) token
+            for row, (idx, budget) in enumerate(zip(indices, budgets)):
+                results[idx] = self.tokenizer.decode(output_ids[row, 1:budget + 1], skip_special_tokens=True).strip()
+
+        return results
+
+    def stream(self, text, max_new_tokens=None):
+        """
+        Yield decoded text pieces as they are generated (greedy, batch of one).
+
+        Generation runs in a background thread; the streamer hands tokens
+        over as soon as each decoding step finishes.
+        """
+        inputs = self._encode([text])
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+
+        def generate():
+            with torch.inference_mode():
+                self.model.generate(
+                    **inputs,
+                    max_new_tokens=self._budget(max_new_tokens),
+                    num_beams=1,
+                    use_cache=True,
+                    streamer=streamer
+                )
+
+        thread = Thread(target=generate, daemon=True)
+        thread.start()
+        for piece in streamer:
+            if piece:
+                yield piece
+        thread.join()
+
+
+class SummaryCache:
+    """Bounded LRU cache of partial summaries keyed by session and node"""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return self._entries[key]
+        return None
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _digest(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+def chunk_turns(turns, count_tokens, max_turns=CHUNK_MAX_TURNS, max_tokens=MAX_INPUT_TOKENS - 16):
+    """
+    Split turns into leaf chunks that each fit the summarizer input.
+
+    Chunks are filled greedily from the start of the session, so boundaries
+    depend only on earlier turns: appending turns never moves an existing
+    boundary and only the last chunk changes.
+    """
+    chunks, current, current_tokens = [], [], 0
+    for turn in turns:
+        tokens = count_tokens(format_transcript([turn])) + 1
+        if current and (len(current) >= max_turns or current_tokens + tokens > max_tokens):
+            chunks.append(current)
+            current, current_tokens = [], 0
+        current.append(turn)
+        current_tokens += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+async def summarize_incremental(session_id, turns, summarize_texts, count_tokens, cache,
+                                fan_in=MERGE_FAN_IN, max_turns=CHUNK_MAX_TURNS, max_new_tokens=None, num_beams=1):
+    """
+    Summarize a long session by map-reduce over cached partial summaries.
+
+    Args:
+        session_id: Cache namespace for this conversation
+        turns: All turns so far, in chronological order
+        summarize_texts: Coroutine taking a list of texts and returning their
+            summaries (the micro-batcher, so all nodes of a level run together)
+        count_tokens: Callable returning the token length of a text
+        cache: SummaryCache shared across requests
+        fan_in: Number of partial summaries merged per reduce step
+        max_turns: Maximum turns per leaf chunk
+        max_new_tokens, num_beams: Generation settings summarize_texts uses;
+            part of every cache key, so a summary is only reused under the
+            same budget and beam width
+
+    Returns:
+        (summary, stats) where stats counts computed vs cached nodes
+
+    Leaf chunks are keyed by session, chunk index and content hash, and each
+    merge node by its level, position and children, so after new turns only
+    the last leaf and the right-most path of merges are regenerated.
+    """
+    stats = {'chunks': 0, 'chunks_computed': 0, 'merges': 0, 'merges_computed': 0}
+
+    async def resolve(keys, texts):
+        summaries = [cache.get(key) for key in keys]
+        missing = [i for i, summary in enumerate(summaries) if summary is None]
+        if missing:
+            generated = await summarize_texts([texts[i] for i in missing])
+            for i, summary in zip(missing, generated):
+                cache.put(keys[i], summary)
+                summaries[i] = summary
+        return summaries, len(missing)
+
+    # Map: summarize each leaf chunk once
+    texts = [format_transcript(chunk) for chunk in chunk_turns(turns, count_tokens, max_turns)]
+    settings = (max_new_tokens, num_beams)
+    keys = [(session_id, 0, idx, settings, _digest(text)) for idx, text in enumerate(texts)]
+    level_summaries, computed = await resolve(keys, texts)
+    stats['chunks'] = len(texts)
+    stats['chunks_computed'] = computed
+
+    # Reduce: merge partial summaries level by level
+    level = 0
+    while len(level_summaries) > 1:
+        level += 1
+        groups = [level_summaries[i:i + fan_in] for i in range(0, len(level_summaries), fan_in)]
+        texts = [" ".join(group) for group in groups]
+        keys = [(session_id, level, idx, settings, _digest(text)) for idx, text in enumerate(texts)]
+        level_summaries, computed = await resolve(keys, texts)
+        stats['merges'] += len(texts)
+        stats['merges_computed'] += computed
+
+    return level_summaries[0], stats
@@ -0,0 +1,73 @@
+import pytest
+import asyncio
+import threading
+import sys
+import os
+
+# Add serving to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'serving'))
+
+from batching import MicroBatcher
+
+
+class StubBatch:
+    """process_batch stub that records every batch it is handed"""
+
+    def __init__(self, fail_on=None):
+        self.batches = []
+        self.threads = set()
+        self.fail_on = fail_on
+
+    def __call__(self, items):
+        self.batches.append(list(items))
+        self.threads.add(threading.current_thread().name)
+        if self.fail_on is not None and self.fail_on in items:
+            raise ValueError(f"bad item {self.fail_on}")
+        return [item * 10 for item in items]
+
+
+def test_concurrent_submissions_share_a_batch():
+    stub = StubBatch()
+    batcher = MicroBatcher(stub, max_batch_size=4, max_wait_ms=50, name="test")
+
+    async def main():
+        return await asyncio.gather(*[batcher.submit(i) for i in range(10)])
+
+    results = asyncio.run(main())
+
+    # Results come back in submission order, batches never exceed the cap
+    assert results == [i * 10 for i in range(10)]
+    assert [len(batch) for batch in stub.batches] == [4, 4, 2]
+    assert sum(stub.batches, []) == list(range(10))
+    # The model runs in the worker thread, not on the event loop
+    assert all(name.startswith("test") for name in stub.threads)
+
+
+def test_partial_batch_is_flushed_after_max_wait():
+    stub = StubBatch()
+    batcher = MicroBatcher(stub, max_batch_size=16, max_wait_ms=20, name="test")
+
+    async def main():
+        first = await asyncio.wait_for(batcher.submit(1), timeout=2)
+        # A later request starts a new batch rather than joining the old one
+        second = await asyncio.wait_for(batcher.submit(2), timeout=2)
+        return first, second
+
+    assert asyncio.run(main()) == (10, 20)
+    assert stub.batches == [[1], [2]]
+
+
+def test_batch_error_reaches_every_caller_and_worker_keeps_running():
+    stub = StubBatch(fail_on=3)
+    batcher = MicroBatcher(stub, max_batch_size=8, max_wait_ms=50, name="test")
+
+    async def main():
+        failed = await asyncio.gather(*[batcher.submit(i) for i in range(4)], return_exceptions=True)
+        recovered = await batcher.submit(5)
+        return failed, recovered
+
+    failed, recovered = asyncio.run(main())
+
+    assert len(failed) == 4
+    assert all(isinstance(result, ValueError) for result in failed)
+    assert recovered == 50
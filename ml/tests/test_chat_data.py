@@ -0,0 +1,160 @@
+import pytest
+import numpy as np
+import pandas as pd
+import sys
+import os
+
+# Add scripts to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+from chat_data import load_tokenized, load_chats, split_indices, cache_key
+
+
+MESSAGES = ['I feel fine today', 'hello', 'I cannot sleep at all and I am worried about work', 'Book a session']
+
+
+class WordTokenizer:
+    """Whitespace tokenizer with the Hugging Face call signature"""
+
+    pad_token_id = 0
+
+    def __init__(self, lower=True):
+        self.do_lower_case = lower
+        words = sorted({word for message in MESSAGES for word in message.split()})
+        self.vocab = {'[PAD]': 0, '[CLS]': 1, '[SEP]': 2, '[UNK]': 3}
+        self.vocab.update({word: i + 4 for i, word in enumerate(words)})
+        self.calls = 0
+
+    def get_vocab(self):
+        return dict(self.vocab)
+
+    def __call__(self, texts, truncation=True, padding=False, max_length=128):
+        self.calls += 1
+        input_ids = []
+        for text in texts:
+            words = text.lower().split() if self.do_lower_case else text.split()
+            ids = [1] + [self.vocab.get(word, 3) for word in words][:max_length - 2] + [2]
+            input_ids.append(ids)
+        return {'input_ids': input_ids, 'attention_mask': [[1] * len(ids) for ids in input_ids]}
+
+
+def test_token_cache_round_trip_and_reuse(tmp_path):
+    """Cached rows match direct tokenization; a second load does not tokenize"""
+    tokenizer = WordTokenizer()
+    expected = WordTokenizer()(MESSAGES, max_length=8)['input_ids']
+
+    corpus = load_tokenized(MESSAGES, tokenizer, max_length=8, cache_dir=tmp_path)
+    assert [corpus[i][0].tolist() for i in range(len(MESSAGES))] == expected
+    assert corpus.input_ids.dtype == np.int32
+    assert isinstance(corpus.input_ids, np.memmap)
+
+    cached = load_tokenized(MESSAGES, tokenizer, max_length=8, cache_dir=tmp_path)
+    assert tokenizer.calls == 1
+    assert cached.entry_dir == corpus.entry_dir
+
+    input_ids, attention_mask = cached.padded([1, 2])
+    assert input_ids.shape == (2, 8)
+    assert attention_mask[0].tolist() == [1, 1, 1, 0, 0, 0, 0, 0]
+    assert input_ids[0, 3:].tolist() == [0] * 5
+
+
+def test_cache_key_tracks_corpus_tokenizer_and_length():
+    key = cache_key(MESSAGES, WordTokenizer())
+    assert key == cache_key(list(MESSAGES), WordTokenizer())
+    assert key != cache_key(MESSAGES[:-1], WordTokenizer())
+    assert key != cache_key(MESSAGES, WordTokenizer(lower=False))
+    assert key != cache_key(MESSAGES, WordTokenizer(), max_length=64)
+
+
+def test_split_indices_match_direct_split():
+    """Index split selects the same rows as splitting texts and labels directly"""
+    from sklearn.model_selection import train_test_split
+
+    labels = np.repeat(np.arange(5), 40)
+    texts = [f"message {i}" for i in range(len(labels))]
+    train_texts, val_texts, _, _ = train_test_split(texts, labels, test_size=0.2, stratify=labels, random_state=42)
+    train_idx, val_idx = split_indices(labels)
+
+    assert [texts[i] for i in train_idx] == train_texts
+    assert [texts[i] for i in val_idx] == val_texts
+
+
+def test_load_chats_from_shards(tmp_path):
+    df = pd.DataFrame({'message': MESSAGES, 'risk_level': 'low', 'intent': 'support', 'timestamp': '2024-01-01'})
+    df.iloc[:2].to_parquet(tmp_path / 'part-00000.parquet')
+    df.iloc[2:].to_json(tmp_path / 'part-00001.jsonl', orient='records', lines=True)
+
+    loaded = load_chats(tmp_path)
+    assert loaded['message'].tolist() == MESSAGES
+    assert list(loaded.columns) == ['message', 'risk_level', 'intent']
+
+
+def test_pad_batch_rounds_to_multiple():
+    from chat_data import pad_batch
+
+    rows = [np.array([1, 5, 2], dtype=np.int32), np.array([1, 2], dtype=np.int32)]
+    input_ids, attention_mask = pad_batch(rows, [np.ones_like(row) for row in rows], pad_to_multiple_of=4)
+
+    assert input_ids.shape == (2, 4)
+    assert input_ids.tolist() == [[1, 5, 2, 0], [1, 2, 0, 0]]
+    assert attention_mask.sum(axis=1).tolist() == [3, 2]
+
+
+def test_length_grouped_indices_cut_padding():
+    """Every row appears once, the longest row is in the first batch, and padding drops"""
+    from chat_data import length_grouped_indices
+
+    rng = np.random.default_rng(0)
+    lengths = rng.integers(5, 120, size=1000)
+    order = length_grouped_indices(lengths, batch_size=16, rng=np.random.default_rng(1))
+
+    assert sorted(order.tolist()) == list(range(1000))
+    assert lengths.argmax() in order[:16]
+
+    def padded_tokens(order):
+        return sum(lengths[order[i:i + 16]].max() * len(order[i:i + 16]) for i in range(0, len(order), 16))
+
+    assert padded_tokens(order) < 0.75 * padded_tokens(rng.permutation(1000))
+
+
+def test_pad_batch_caps_length_and_keeps_final_token():
+    from chat_data import pad_batch
+
+    rows = [np.array([1, 5, 6, 7, 8, 2], dtype=np.int32), np.array([1, 2], dtype=np.int32)]
+    input_ids, attention_mask = pad_batch(rows, [np.ones_like(row) for row in rows], pad_to_multiple_of=8,
+                                          max_length=4)
+
+    assert input_ids.tolist() == [[1, 5, 6, 2], [1, 2, 0, 0]]
+    assert attention_mask.sum(axis=1).tolist() == [4, 2]
+
+
+def test_chat_trainer_caps_only_training_batches(tmp_path):
+    torch = pytest.importorskip('torch')
+    transformers = pytest.importorskip('transformers')
+    from chat_data import ChatTrainer, DynamicPaddingCollator
+
+    class TinyModel(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.linear = torch.nn.Linear(1, 1)
+
+        def forward(self, input_ids, attention_mask, labels=None):
+            return {'logits': self.linear(attention_mask.float().sum(dim=1, keepdim=True))}
+
+    rows = [{'input_ids': torch.arange(1, n + 1), 'attention_mask': torch.ones(n, dtype=torch.long), 'labels': 0}
+            for n in (3, 20)]
+    trainer = ChatTrainer(
+        model=TinyModel(),
+        args=transformers.TrainingArguments(
+            output_dir=str(tmp_path), per_device_train_batch_size=2, per_device_eval_batch_size=2,
+            remove_unused_columns=False, report_to='none'
+        ),
+        train_dataset=rows,
+        eval_dataset=rows,
+        data_collator=DynamicPaddingCollator(0, pad_to_multiple_of=1, max_length=8)
+    )
+
+    assert next(iter(trainer.get_train_dataloader()))['input_ids'].shape == (2, 8)
+    assert next(iter(trainer.get_eval_dataloader()))['input_ids'].shape == (2, 20)
+    assert next(iter(trainer.get_test_dataloader(rows)))['input_ids'].shape == (2, 20)
+    assert trainer.data_collator.max_length == 8
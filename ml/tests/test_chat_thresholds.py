@@ -0,0 +1,81 @@
+import pytest
+import json
+import numpy as np
+import pandas as pd
+import sys
+import os
+
+# Add scripts and serving to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'serving'))
+
+from chat_thresholds import DEFAULT_THRESHOLDS, THRESHOLDS_FILE, load_thresholds, risk_level, softmax
+from tune_chat_thresholds import (
+    cached_logits, fit_temperature, intent_curves, propose_thresholds, risk_curves
+)
+
+
+def test_defaults_match_former_hard_coded_values(tmp_path):
+    thresholds = load_thresholds(tmp_path, 'chat_multitask')
+    assert thresholds == DEFAULT_THRESHOLDS
+    assert [risk_level(s, thresholds) for s in (0.8, 0.7, 0.5, 0.4)] == ['high', 'medium', 'medium', 'low']
+
+    (tmp_path / THRESHOLDS_FILE).write_text(json.dumps({'backend': 'single_task', 'risk_high': 0.5}))
+    assert load_thresholds(tmp_path, 'chat_multitask') == DEFAULT_THRESHOLDS
+    assert load_thresholds(tmp_path, 'single_task')['risk_high'] == 0.5
+
+
+def test_fit_temperature_recovers_overconfidence():
+    rng = np.random.default_rng(0)
+    true_logits = rng.normal(size=(4000, 5)) * 2
+    labels = np.array([rng.choice(5, p=p) for p in softmax(true_logits)])
+    # A model 3x overconfident needs temperature ~3
+    assert fit_temperature(true_logits * 3, labels) == pytest.approx(3.0, rel=0.1)
+
+
+def test_curves_and_proposed_thresholds():
+    labels = np.array([0, 1, 2, 3, 4, 4])
+    scores = np.array([0.05, 0.2, 0.45, 0.6, 0.9, 0.75])
+    curve = risk_curves(scores, labels, grid=np.array([0.1, 0.5, 0.7]))
+    assert [row['recall'] for row in curve] == [1.0, 1.0, 2 / 3]
+    assert [row['emergency_recall'] for row in curve] == [1.0, 1.0, 1.0]
+    assert curve[1]['precision'] == 1.0 and curve[0]['precision'] == 0.6
+
+    probs = np.array([[0.9, 0.1], [0.6, 0.4], [0.3, 0.7], [0.45, 0.55]])
+    intents = intent_curves(probs, np.array([0, 1, 1, 0]), grid=np.array([0.5, 0.65]))
+    assert intents[0] == {'threshold': 0.5, 'precision': 0.5, 'coverage': 1.0}
+    assert intents[1] == {'threshold': 0.65, 'precision': 1.0, 'coverage': 0.5}
+
+    proposed = propose_thresholds(curve, intents, min_recall=1.0, min_emergency_recall=1.0,
+                                  min_intent_precision=0.8)
+    assert proposed == {'risk_high': 0.5, 'risk_medium': 0.1, 'intent': 0.65}
+
+
+def test_logits_are_scored_once_per_model_version(tmp_path):
+    model_dir = tmp_path / 'model'
+    model_dir.mkdir()
+    (model_dir / 'weights.bin').write_bytes(b'v1')
+    df = pd.DataFrame({
+        'message': [f"message {i}" for i in range(50)],
+        'risk_level': ['no-risk', 'low', 'medium', 'high', 'emergency'] * 10,
+        'intent': ['anxiety', 'sleep'] * 25,
+    })
+    calls = []
+
+    def joint(messages):
+        calls.append(len(messages))
+        n = len(messages)
+        return np.ones((n, 5)), np.zeros((n, 2))
+
+    args = ('chat_multitask', {'joint': joint}, [model_dir], df, {'anxiety': 0, 'sleep': 1}, tmp_path / 'cache')
+    scored, version, hit = cached_logits(*args)
+    assert not hit and sum(calls) == 10
+    assert scored['risk'][0].shape == (10, 5) and scored['intent'][0].shape == (10, 2)
+
+    cached, cached_version, hit = cached_logits(*args)
+    assert hit and cached_version == version and sum(calls) == 10
+    assert (cached['risk'][1] == scored['risk'][1]).all()
+
+    (model_dir / 'weights.bin').write_bytes(b'v2')
+    _, new_version, hit = cached_logits(*args)
+    assert not hit and new_version != version
@@ -0,0 +1,65 @@
+import pytest
+import numpy as np
+import sys
+import os
+
+# Add serving to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'serving'))
+
+from content_recommender import ContentIndex, profile_terms
+
+RESOURCES = [
+    {'resource_id': 'r1', 'title': 'Box breathing for panic', 'description': 'Calm anxiety and worry in minutes.',
+     'category': 'Anxiety', 'type': 'video', 'tags': ['anxiety', 'breathing']},
+    {'resource_id': 'r2', 'title': 'Getting out of a low mood', 'description': 'Small steps when depression saps motivation.',
+     'category': 'Depression', 'type': 'article', 'tags': ['depression', 'mood']},
+    {'resource_id': 'r3', 'title': 'Crisis hotline and counseling', 'description': 'Talk to a professional now.',
+     'category': 'General', 'type': 'website', 'tags': ['crisis', 'professional help']},
+    {'resource_id': 'r4', 'title': 'Better sleep routine', 'description': 'Fix insomnia with a wind-down routine.',
+     'category': 'Sleep', 'type': 'article', 'tags': ['sleep']},
+    {'resource_id': 'r5', 'title': 'Exam season survival', 'description': 'Study plans and time management for exams.',
+     'category': 'Stress', 'type': 'pdf', 'tags': ['academic', 'stress']},
+]
+
+
+@pytest.fixture(scope='module')
+def index():
+    return ContentIndex.build(RESOURCES)
+
+
+def test_item_vectors_are_normalized(index):
+    norms = np.sqrt(np.asarray(index.item_vectors.multiply(index.item_vectors).sum(axis=1)).ravel())
+    np.testing.assert_allclose(norms, 1.0, rtol=1e-5)
+
+
+def test_profiles_match_expected_resources(index):
+    assert index.recommend({'GAD-7': 'moderate'}, k=1)[0][0] == 'r1'
+    assert index.recommend({'PHQ9': 'mild'}, k=1)[0][0] == 'r2'
+    assert index.recommend(intent='academic_stress', k=1)[0][0] == 'r5'
+    assert index.recommend(intent='sleep', k=1)[0][0] == 'r4'
+    # Severe screenings pull in crisis resources
+    assert 'r3' in [item_id for item_id, _ in index.recommend({'PHQ9': 'severe'}, k=2)]
+    assert 'r3' not in [item_id for item_id, _ in index.recommend({'PHQ9': 'mild'}, k=2)]
+
+
+def test_batch_scores_match_single_queries(index):
+    profiles = [({'PHQ9': 'severe'}, None), ({}, 'anxiety'), ({'GAD7': 'mild'}, 'sleep')]
+    batch = index.score(profiles)
+    assert batch.shape == (3, len(RESOURCES))
+    for row, profile in enumerate(profiles):
+        np.testing.assert_allclose(batch[row], index.score([profile])[0], rtol=1e-6)
+    assert (batch <= 1.0 + 1e-6).all()
+
+
+def test_exclusions_and_empty_profile(index):
+    top = index.recommend({'GAD7': 'severe'}, k=10, exclude=['r1', 'r1'])
+    assert len(top) == len(RESOURCES) - 1
+    assert 'r1' not in [item_id for item_id, _ in top]
+    assert index.recommend({}, None) == []
+    assert profile_terms({'unknown': 'severe'}, 'not-an-intent') == []
+
+
+def test_save_and_load_round_trip(index, tmp_path):
+    index.save(tmp_path)
+    loaded = ContentIndex.load(tmp_path)
+    assert loaded.recommend({'PHQ9': 'moderate'}, 'sleep', k=3) == index.recommend({'PHQ9': 'moderate'}, 'sleep', k=3)
@@ -0,0 +1,24 @@
+import pytest
+import numpy as np
+import sys
+import os
+
+# Add scripts to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+pytest.importorskip('torch')
+
+from cpu_perf import length_cap, accumulation_steps
+
+
+def test_length_cap_from_percentile():
+    lengths = np.concatenate([np.full(990, 20), np.full(10, 120)])
+
+    assert length_cap(lengths, 99) == 24
+    assert length_cap(lengths, 0) is None
+    assert length_cap(np.full(100, 20), 99) is None
+
+
+@pytest.mark.parametrize('effective,batch,steps', [(32, 16, 2), (16, 16, 1), (8, 16, 1), (None, 16, 1), (100, 16, 6)])
+def test_accumulation_steps(effective, batch, steps):
+    assert accumulation_steps(effective, batch) == steps
@@ -0,0 +1,39 @@
+import pytest
+import pandas as pd
+import sys
+import os
+
+pytest.importorskip("matplotlib")
+pytest.importorskip("seaborn")
+
+# Add scripts to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import chat_data
+from evaluate import benchmark_chat_models, benchmark_inference, take_rows
+
+
+def test_take_rows_cycles():
+    df = pd.DataFrame({'a': [1, 2, 3]})
+    assert take_rows(df, 5)['a'].tolist() == [1, 2, 3, 1, 2]
+    assert take_rows(['x', 'y'], 3) == ['x', 'y', 'x']
+
+
+def test_benchmark_inference_warms_up_and_repeats():
+    calls = []
+    results = benchmark_inference(lambda batch: calls.append(len(batch)), list(range(10)),
+                                  batch_sizes=(1, 8, 32), warmup=2, repeats=5)
+
+    assert calls == [1] * 7 + [8] * 7 + [32] * 7
+    assert list(results) == ['1', '8', '32']
+    for row in results.values():
+        assert row['per_row_ms_p50'] <= row['per_row_ms_p95'] <= row['per_row_ms_p99']
+        assert row['rows_per_sec'] > 0
+
+
+def test_chat_benchmark_skipped_without_chat_data(tmp_path, monkeypatch, capsys):
+    (tmp_path / 'chat_multitask').mkdir()
+    monkeypatch.setattr(chat_data, 'find_chats_source', lambda raw_dir: tmp_path / 'missing.csv')
+
+    assert benchmark_chat_models(tmp_path) == {}
+    assert "No chat data found" in capsys.readouterr().out
@@ -0,0 +1,203 @@
+import pytest
+import json
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from datetime import datetime, timedelta
+import sys
+import os
+
+# Add scripts to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+pytest.importorskip('pymongo')
+pytest.importorskip('dotenv')
+pytest.importorskip('presidio_analyzer')
+
+import export_data
+from export_data import (
+    SCREENING_SCHEMA, PartitionedShardWriter, ShardWriter, consent_stages, export_collection_stream,
+    load_watermark, save_watermark, screening_pipeline, screening_records, time_window_stages
+)
+
+
+def make_docs(timestamps):
+    return [
+        {'userId': f"user{i}", 'type': 'GAD7', 'score': 7, 'answers': [1] * 7,
+         'riskLevel': 'mild', 'createdAt': timestamp}
+        for i, timestamp in enumerate(timestamps)
+    ]
+
+
+class FakeCollection:
+    """Applies the pipeline's time window the way MongoDB's $match would"""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.pipelines = []
+
+    def aggregate(self, pipeline, **kwargs):
+        self.pipelines.append(pipeline)
+        bounds = next((stage['$match']['createdAt'] for stage in pipeline
+                       if 'createdAt' in stage.get('$match', {})), {})
+        return [
+            doc for doc in self.docs
+            if ('$gt' not in bounds or doc['createdAt'] > bounds['$gt'])
+            and ('$lte' not in bounds or doc['createdAt'] <= bounds['$lte'])
+        ]
+
+
+def evaluate_expression(expr, variables):
+    """Evaluate the subset of MongoDB aggregation expressions the export pipelines use"""
+    if isinstance(expr, str) and expr.startswith('$'):
+        path = expr[2:] if expr.startswith('$$') else 'CURRENT.' + expr[1:]
+        value = variables
+        for part in path.split('.'):
+            value = value.get(part) if isinstance(value, dict) else None
+        return value
+    if isinstance(expr, dict) and '$ifNull' in expr:
+        value, default = (evaluate_expression(arg, variables) for arg in expr['$ifNull'])
+        return default if value is None else value
+    if isinstance(expr, dict) and '$map' in expr:
+        spec = expr['$map']
+        return [evaluate_expression(spec['in'], {**variables, spec['as']: item})
+                for item in evaluate_expression(spec['input'], variables)]
+    return expr
+
+
+def read_shards(shard_dir):
+    return pd.concat([pq.read_table(path).to_pandas() for path in sorted(shard_dir.rglob('part-*.parquet'))],
+                     ignore_index=True)
+
+
+def test_watermark_round_trip(tmp_path):
+    assert load_watermark(tmp_path) == {}
+    first, second = datetime(2024, 3, 1, 12, 30, 15), datetime(2024, 3, 2, 8, 0, 0)
+
+    save_watermark(tmp_path, 'screenings', first)
+    save_watermark(tmp_path, 'chat_logs', second)
+    assert load_watermark(tmp_path) == {'screenings': first, 'chat_logs': second}
+
+    save_watermark(tmp_path, 'screenings', second)
+    assert load_watermark(tmp_path)['screenings'] == second
+
+
+def test_time_window_stages():
+    since, until = datetime(2024, 1, 1), datetime(2024, 2, 1)
+    assert time_window_stages('createdAt') == []
+    assert time_window_stages('createdAt', since, until) == [{'$match': {'createdAt': {'$gt': since, '$lte': until}}}]
+    assert screening_pipeline(False, since, until)[0] == {'$match': {'createdAt': {'$gt': since, '$lte': until}}}
+
+
+def test_records_land_in_date_partitions(tmp_path):
+    docs = make_docs([datetime(2024, 1, 1, 23, 59), datetime(2024, 1, 2, 0, 1), datetime(2024, 1, 2, 12), None])
+    with PartitionedShardWriter(tmp_path, SCREENING_SCHEMA, run_id='r1') as writer:
+        writer.write(screening_records(docs))
+
+    partitions = {path.parent.name: pq.read_table(path).num_rows for path in writer.paths}
+    assert partitions == {'date=2024-01-01': 1, 'date=2024-01-02': 2, 'date=unknown': 1}
+    assert all(path.name.startswith('part-r1-') for path in writer.paths)
+
+
+def test_incremental_export_reads_only_after_watermark(tmp_path, monkeypatch):
+    first_cutoff, second_cutoff = datetime(2024, 1, 3), datetime(2024, 1, 5)
+    docs = make_docs([datetime(2024, 1, 1), first_cutoff, first_cutoff + timedelta(seconds=1),
+                      datetime(2024, 1, 4), second_cutoff + timedelta(days=1)])
+    collection = FakeCollection(docs)
+    pipeline = lambda since, until: screening_pipeline(False, since, until)
+
+    def export(cutoff):
+        monkeypatch.setattr(export_data, 'export_cutoff', lambda: cutoff)
+        return export_collection_stream(collection, pipeline, screening_records, SCREENING_SCHEMA,
+                                        tmp_path, 'screenings', incremental=True)
+
+    # First run: everything up to and including the cutoff
+    n_rows, _ = export(first_cutoff)
+    assert n_rows == 2
+    assert load_watermark(tmp_path)['screenings'] == first_cutoff
+
+    # Second run: only records after the first cutoff, added next to the old shards
+    n_rows, paths = export(second_cutoff)
+    assert n_rows == 2
+    assert all(path.name.startswith('part-20240105') for path in paths)
+    exported = read_shards(tmp_path / 'screenings')
+    assert len(exported) == 4
+    assert exported['timestamp'].is_unique
+    assert exported['timestamp'].max() <= second_cutoff
+
+
+def test_shard_writer_rolls_over_and_keeps_schema(tmp_path):
+    docs = make_docs([datetime(2024, 1, 1) + timedelta(hours=i) for i in range(8)])
+    with ShardWriter(tmp_path, SCREENING_SCHEMA, rows_per_shard=3) as writer:
+        writer.write(screening_records(docs[:4]))
+        writer.write(screening_records(docs[4:]))
+
+    assert writer.rows == 8
+    assert [path.name for path in writer.paths] == ['part-00000.parquet', 'part-00001.parquet', 'part-00002.parquet']
+    tables = [pq.read_table(path) for path in writer.paths]
+    assert [table.num_rows for table in tables] == [3, 3, 2]
+    assert all(table.schema.field('answers').type == pa.list_(pa.int8()) for table in tables)
+    assert pa.concat_tables(tables).column('user_hash').to_pylist() == [
+        record['user_hash'] for record in screening_records(docs)]
+
+
+def test_jsonl_shards_roll_over_too(tmp_path):
+    docs = make_docs([datetime(2024, 1, 1, 12, 30)] * 5)
+    with ShardWriter(tmp_path, SCREENING_SCHEMA, fmt='jsonl', rows_per_shard=2) as writer:
+        writer.write(screening_records(docs))
+
+    lines = [path.read_text().splitlines() for path in writer.paths]
+    assert [len(shard) for shard in lines] == [2, 2, 1]
+    row = json.loads(lines[0][0])
+    assert row['answers'] == [1] * 7
+    assert row['timestamp'] == '2024-01-01T12:30:00'
+
+    # Values outside the int8 answers type are rejected, not written
+    with pytest.raises(pa.ArrowInvalid):
+        ShardWriter(tmp_path / 'bad', SCREENING_SCHEMA, fmt='jsonl').write(
+            screening_records([{**docs[0], 'answers': [1000]}]))
+
+
+def test_screening_answers_map_to_ints():
+    project = screening_pipeline(consent_only=False)[-1]['$project']
+    answers = project['answers']
+
+    def mapped(doc):
+        return evaluate_expression(answers, {'CURRENT': doc})
+
+    assert mapped({'answers': [{'qid': 'q1', 'answer': 2}, {'qid': 'q2', 'answer': 0}]}) == [2, 0]
+    assert mapped({'answers': [3, 1, 0]}) == [3, 1, 0]
+    assert mapped({'answers': None}) == []
+    assert mapped({}) == []
+    assert evaluate_expression(project['riskLevel'], {'CURRENT': {}}) == 'unknown'
+
+    # The mapped answers fit the export schema
+    table = pa.Table.from_pylist(
+        screening_records([{**make_docs([datetime(2024, 1, 1)])[0],
+                            'answers': mapped({'answers': [{'qid': 'q1', 'answer': 3}]})}]),
+        schema=SCREENING_SCHEMA)
+    assert table.column('answers').to_pylist() == [[3]]
+
+
+def test_consent_filter_is_a_lookup_on_users():
+    assert consent_stages('mlDataConsent.screening.granted', consent_only=False) == []
+    assert consent_stages('mlDataConsent.screening.granted') == [
+        {'$lookup': {
+            'from': 'users',
+            'let': {'uid': '$userId'},
+            'pipeline': [
+                {'$match': {'$expr': {'$eq': ['$_id', '$$uid']}, 'mlDataConsent.screening.granted': True}},
+                {'$project': {'_id': 1}}
+            ],
+            'as': 'consent'
+        }},
+        {'$match': {'consent': {'$ne': []}}}
+    ]
+
+    # Time window first (indexed), then the consent join, then the projection
+    since, until = datetime(2024, 1, 1), datetime(2024, 2, 1)
+    pipeline = screening_pipeline(True, since, until)
+    assert [next(iter(stage)) for stage in pipeline] == ['$match', '$lookup', '$match', '$project']
+    assert pipeline[1:3] == consent_stages('mlDataConsent.screening.granted')
+    # The join result is dropped again by the projection
+    assert 'consent' not in pipeline[-1]['$project']
@@ -0,0 +1,44 @@
+import pytest
+import sys
+import os
+
+# Add serving to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'serving'))
+
+torch = pytest.importorskip('torch')
+transformers = pytest.importorskip('transformers')
+
+from multitask import MultiTaskChatModel
+
+
+def tiny_model(**kwargs):
+    config = transformers.DistilBertConfig(vocab_size=50, dim=16, hidden_dim=32, n_layers=1, n_heads=2)
+    return MultiTaskChatModel(transformers.DistilBertModel(config), 5, 3, **kwargs)
+
+
+def test_weighted_loss_combines_both_heads():
+    torch.manual_seed(0)
+    model = tiny_model(risk_loss_weight=1.0, intent_loss_weight=0.0).eval()
+    input_ids = torch.randint(1, 50, (4, 7))
+    risk_labels, intent_labels = torch.tensor([0, 1, 4, 4]), torch.tensor([0, 2, 1, 0])
+
+    outputs = model(input_ids, torch.ones_like(input_ids), risk_labels, intent_labels)
+    expected = torch.nn.functional.cross_entropy(outputs['risk_logits'], risk_labels)
+
+    assert outputs['intent_logits'].shape == (4, 3)
+    assert torch.allclose(outputs['loss'], expected)
+    assert 'loss' not in model(input_ids)
+
+
+def test_save_and_load_round_trip(tmp_path):
+    torch.manual_seed(0)
+    model = tiny_model(intent_loss_weight=0.5).eval()
+    model.save(tmp_path, {f'r{i}': i for i in range(5)}, {f'i{i}': i for i in range(3)})
+    loaded, config = MultiTaskChatModel.load(tmp_path)
+
+    input_ids = torch.randint(1, 50, (2, 5))
+    with torch.no_grad():
+        expected, actual = model(input_ids), loaded(input_ids)
+    assert config['intent_loss_weight'] == 0.5
+    assert torch.allclose(expected['risk_logits'], actual['risk_logits'])
+    assert torch.allclose(expected['intent_logits'], actual['intent_logits'])
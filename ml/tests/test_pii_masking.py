@@ -0,0 +1,76 @@
+import pytest
+import sys
+import os
+
+# Add scripts to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+from pii_masking import may_contain_pii, MaskingEngine, PRESIDIO_AVAILABLE
+
+
+@pytest.mark.parametrize('text', [
+    "Call me at 555-123-4567",
+    "my email is someone@example.com",
+    "check www.example.org",
+    "I talked to Sarah about it",
+    "i have an exam on monday",
+    "it started two weeks ago",
+    "my name is rahul sharma",
+    "i talked to john about it",
+    "i live near mumbai",
+    "i feel anxious and can't sleep",
+])
+def test_prefilter_keeps_possible_pii(text):
+    assert may_contain_pii(text)
+
+
+@pytest.mark.parametrize('text', [
+    "I don't know what to do",
+    "yes",
+    "ok i feel like that too",
+])
+def test_prefilter_skips_plain_messages(text):
+    assert not may_contain_pii(text)
+
+
+class RecordingMasker:
+    """Stands in for the Presidio masker and records what it is asked to mask"""
+
+    def __init__(self):
+        self.seen = []
+
+    def mask_batch(self, texts, batch_size):
+        self.seen.extend(texts)
+        return [f"<masked:{text}>" for text in texts]
+
+
+@pytest.mark.skipif(not PRESIDIO_AVAILABLE, reason="presidio not installed")
+def test_engine_masks_duplicates_once():
+    engine = MaskingEngine(workers=0)
+    engine._local = RecordingMasker()
+
+    texts = ["Call Sam", "i don't know", "Call Sam", None, "", "Call Sam"]
+    masked = engine.mask(texts)
+    masked_again = engine.mask(["Call Sam"])
+
+    assert masked == ["<masked:Call Sam>", "i don't know", "<masked:Call Sam>", None, "", "<masked:Call Sam>"]
+    assert masked_again == ["<masked:Call Sam>"]
+    assert engine._local.seen == ["Call Sam"]
+    assert engine.report()['prefiltered'] == 1
+
+
+@pytest.mark.skipif(not PRESIDIO_AVAILABLE, reason="presidio not installed")
+def test_engine_matches_serial_mask_pii_on_lowercase_names():
+    pytest.importorskip("pymongo")
+    pytest.importorskip("dotenv")
+    pytest.importorskip("en_core_web_lg")  # Presidio's default spaCy model
+    from export_data import mask_pii
+
+    texts = [
+        "my name is rahul sharma",
+        "i talked to john about it",
+        "i live near mumbai",
+        "i don't know what to do",
+    ]
+    with MaskingEngine(workers=0) as engine:
+        assert engine.mask(texts) == [mask_pii(text) for text in texts]
@@ -0,0 +1,194 @@
+import pytest
+import json
+import numpy as np
+import pandas as pd
+import sys
+import os
+
+# Add scripts to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+from preprocess import (
+    parse_answer_matrix, list_answer_matrix, extract_features, create_severity_labels,
+    extract_features_rowwise, create_severity_labels_rowwise, hash_split
+)
+
+
+def make_raw_screenings(n=500, seed=0):
+    """Mixed PHQ-9/GAD-7 rows in the raw export format"""
+    rng = np.random.default_rng(seed)
+    records = []
+    for i in range(n):
+        screening_type = 'PHQ9' if rng.random() < 0.5 else 'GAD7'
+        answers = rng.integers(0, 4, size=9 if screening_type == 'PHQ9' else 7).tolist()
+        records.append({
+            'user_hash': f"user_{i}",
+            'type': screening_type,
+            'score': sum(answers),
+            'answers': str(answers),
+            'risk_level': 'unknown'
+        })
+    return pd.DataFrame(records)
+
+
+def test_parse_answer_matrix_marks_invalid_rows():
+    """Unparseable or empty answer strings are dropped, like parse_answers"""
+    series = pd.Series(['[1, 2, 3]', '[]', 'garbage', np.nan, '[0]', '[1,,2]'])
+    answers, valid = parse_answer_matrix(series)
+
+    assert answers.dtype == np.int8
+    assert valid.tolist() == [True, False, False, False, True, False]
+    assert answers[0].tolist() == [1, 2, 3]
+    assert answers[4].tolist() == [0, -1, -1]
+
+
+def test_list_answers_match_string_answers():
+    """Typed list answers from export shards give the same matrix as strings"""
+    lists = pd.Series([[1, 2, 3], [], None, [0], [3, 3, 3, 3, 3, 3, 3, 3, 3]], dtype=object)
+    strings = pd.Series(['[1, 2, 3]', '[]', np.nan, '[0]', '[3, 3, 3, 3, 3, 3, 3, 3, 3]'])
+
+    list_answers, list_valid = list_answer_matrix(lists)
+    string_answers, string_valid = parse_answer_matrix(strings)
+
+    assert list_valid.tolist() == string_valid.tolist() == [True, False, False, True, True]
+    assert np.array_equal(list_answers[list_valid], string_answers[string_valid])
+
+
+def test_vectorized_features_match_rowwise():
+    """Vectorized pipeline reproduces the original per-row output"""
+    df = make_raw_screenings()
+    df.loc[3, 'answers'] = '[]'
+    df.loc[7, 'answers'] = 'not a list'
+    # Any whitespace json.loads accepts
+    df.loc[11, 'answers'] = '[1,2,0,3,1,2,0]' if df.loc[11, 'type'] == 'GAD7' else '[1,2,0,3,1,2,0,3,1]'
+    df.loc[12, 'answers'] = df.loc[12, 'answers'].replace(', ', ',\n\t ')
+    df.loc[13, 'answers'] = ' ' + df.loc[13, 'answers'].replace('[', '[\r\n ') + '\n'
+
+    expected = create_severity_labels_rowwise(extract_features_rowwise(df))
+    actual = create_severity_labels(extract_features(df))
+
+    assert len(actual) == len(df) - 2
+    pd.testing.assert_frame_equal(expected[actual.columns], actual.reset_index(drop=True), check_dtype=False)
+
+
+def test_answers_json_accepts_but_vectorized_drops_are_reported(capsys):
+    """Negative, fractional and out-of-int8 values aren't valid answers; the dropped rows are counted"""
+    df = make_raw_screenings(n=6)
+    df['answers'] = ['[1, 2, 3]', '[1, -2, 3]', '[1.5, 2]', '[1, 200]', '[0, 127]', '[1.0]']
+    assert all(extract_features_rowwise(df.iloc[[i]]).shape[0] == 1 for i in range(6))
+
+    answers, valid = parse_answer_matrix(df['answers'])
+    assert valid.tolist() == [True, False, False, False, True, False]
+    assert answers[4].tolist()[:2] == [0, 127]
+
+    features = extract_features(df)
+    assert features.index.tolist() == [0, 4]
+    assert "Dropped 4 of 6 screenings" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize('screening_type,score,label', [
+    ('PHQ9', 4, 0), ('PHQ9', 5, 1), ('PHQ9', 14, 2), ('PHQ9', 19, 3), ('PHQ9', 20, 4),
+    ('GAD7', 4, 0), ('GAD7', 9, 1), ('GAD7', 15, 3), ('GAD7', 21, 3),
+])
+def test_severity_label_boundaries(screening_type, score, label):
+    df = pd.DataFrame({'type': [screening_type], 'score': [score]})
+    assert create_severity_labels(df)['severity_label'].iloc[0] == label
+
+
+def test_hash_split_is_deterministic_per_user():
+    """Every screening of a user lands on the same side of the split"""
+    users = pd.Series([f"user_{i % 2000}" for i in range(10000)])
+    is_test = hash_split(users, test_size=0.2)
+
+    assert np.array_equal(is_test, hash_split(users, test_size=0.2))
+    per_user = pd.Series(is_test).groupby(users).nunique()
+    assert (per_user == 1).all()
+    assert 0.15 < is_test.mean() < 0.25
+
+
+@pytest.mark.parametrize('fmt', ['arrow', 'parquet', 'csv'])
+def test_processed_data_round_trip(tmp_path, fmt):
+    """Processed splits keep their values and compact dtypes in every format"""
+    from processed_data import write_processed, read_processed, processed_path
+
+    df = create_severity_labels(extract_features(make_raw_screenings(n=200)))
+    df = df[df['type'] == 'GAD7'].drop(columns=['user_hash', 'type', 'answers', 'risk_level'], errors='ignore')
+    df = df.dropna(axis=1).reset_index(drop=True)
+
+    stem = tmp_path / 'train_gad7'
+    write_processed(df.assign(score=0), stem, 'csv')
+    write_processed(df, stem, fmt)
+    loaded = read_processed(stem)
+
+    assert not processed_path(stem, 'csv').exists() or fmt == 'csv'
+    if fmt != 'csv':
+        assert loaded['q1'].dtype == np.int8
+        assert loaded['mean_score'].dtype == np.float32
+    pd.testing.assert_frame_equal(df, loaded, check_dtype=False, atol=1e-6)
+
+
+def write_raw_partition(shard_dir, date, df):
+    """One export partition (date=YYYY-MM-DD/part-*.parquet, list<int8> answers)"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    partition = shard_dir / f"date={date}"
+    partition.mkdir(parents=True)
+    table = pa.table({
+        'user_hash': df['user_hash'].tolist(),
+        'type': df['type'].tolist(),
+        'score': pa.array(df['score'].tolist(), type=pa.int16()),
+        'answers': pa.array([json.loads(a) for a in df['answers']], type=pa.list_(pa.int8())),
+        'risk_level': df['risk_level'].tolist(),
+    })
+    pq.write_table(table, partition / 'part-00000.parquet')
+
+
+def test_incremental_preprocess_appends_only_new_partitions(tmp_path, monkeypatch):
+    import preprocess
+    from processed_data import read_processed
+
+    raw_dir, processed_dir = tmp_path / 'screenings', tmp_path / 'processed'
+    processed_dir.mkdir()
+    df = make_raw_screenings(n=300)
+    df['user_hash'] = [f"user_{i}" for i in range(len(df))]
+    write_raw_partition(raw_dir, '2024-01-01', df.iloc[:100])
+    write_raw_partition(raw_dir, '2024-01-02', df.iloc[100:200])
+
+    # First run: full streaming build over both partitions
+    preprocess.preprocess_streaming(raw_dir, processed_dir, chunksize=64, workers=1)
+    preprocess.save_state(processed_dir, raw_dir, 0.2)
+    names = ('train_phq9', 'test_phq9', 'train_gad7', 'test_gad7')
+    before = {name: read_processed(processed_dir / name) for name in names}
+    assert sum(len(frame) for frame in before.values()) == 200
+
+    # Second run: one new partition, only it is read
+    write_raw_partition(raw_dir, '2024-01-03', df.iloc[200:])
+    read_sources = []
+    iter_chunks = preprocess.iter_screening_chunks
+
+    def recording_iter(source, chunksize=200000):
+        read_sources.append(source)
+        return iter_chunks(source, chunksize)
+
+    monkeypatch.setattr(preprocess, 'iter_screening_chunks', recording_iter)
+    assert preprocess.preprocess_incremental(raw_dir, processed_dir, chunksize=64, workers=1)
+    assert read_sources == [[raw_dir / 'date=2024-01-03' / 'part-00000.parquet']]
+    assert len(preprocess.load_state(processed_dir)['partitions']) == 3
+
+    expected = create_severity_labels(extract_features(df))
+    is_test = hash_split(df['user_hash'], 0.2)
+    total = 0
+    for name, previous in before.items():
+        after = read_processed(processed_dir / name)
+        total += len(after)
+        assert after['q1'].dtype == np.int8 and after['severity_label'].dtype == np.int8
+        assert after['mean_score'].dtype == np.float32
+        pd.testing.assert_frame_equal(after.iloc[:len(previous)], previous)
+    assert total == len(expected)
+    assert is_test.sum() == sum(len(read_processed(processed_dir / name)) for name in ('test_phq9', 'test_gad7'))
+
+    # Nothing new: no-op
+    read_sources.clear()
+    assert preprocess.preprocess_incremental(raw_dir, processed_dir, chunksize=64, workers=1)
+    assert read_sources == []
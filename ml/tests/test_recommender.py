@@ -0,0 +1,85 @@
+import numpy as np
+import scipy.sparse as sp
+import sys
+import os
+
+# Add serving to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'serving'))
+
+from recommender import Recommender, TopNStore, model_fingerprint, top_k
+
+
+def make_recommender(n_users=50, n_items=40, dim=8, seed=0):
+    rng = np.random.default_rng(seed)
+    user_vectors = np.column_stack([rng.normal(size=(n_users, dim)), np.ones(n_users)])
+    item_vectors = np.column_stack([rng.normal(size=(n_items, dim)), rng.normal(size=n_items)])
+    feature_vectors = np.column_stack([rng.normal(size=(2, dim)), np.ones(2)])
+    seen = sp.random(n_users, n_items, density=0.1, random_state=seed, format='csr')
+    return Recommender(
+        [f"u{i}" for i in range(n_users)], [f"r{i}" for i in range(n_items)],
+        user_vectors, item_vectors, ['PHQ9_mild', 'PHQ9_severe'], feature_vectors, seen
+    )
+
+
+def test_top_k_matches_full_sort():
+    scores = np.random.default_rng(1).normal(size=(5, 100))
+    for k in (1, 10, 100, 150):
+        expected = np.argsort(-scores, axis=1)[:, :min(k, 100)]
+        assert (top_k(scores, k) == expected).all()
+    assert top_k(scores[0], 3).tolist() == np.argsort(-scores[0])[:3].tolist()
+
+
+def test_recommend_known_user_excludes_seen():
+    recommender = make_recommender()
+    row = 3
+    items, source = recommender.recommend('u3', k=5)
+
+    assert source == 'collaborative'
+    scores = recommender.item_vectors @ recommender.user_vectors[row]
+    seen = set(recommender.seen[row].indices)
+    expected = [c for c in np.argsort(-scores) if c not in seen][:5]
+    assert [item_id for item_id, _ in items] == [f"r{c}" for c in expected]
+    assert [score for _, score in items] == sorted((score for _, score in items), reverse=True)
+
+    excluded, _ = recommender.recommend('u3', k=5, exclude=[items[0][0]])
+    assert items[0][0] not in [item_id for item_id, _ in excluded]
+
+
+def test_recommend_cold_start():
+    recommender = make_recommender()
+
+    items, source = recommender.recommend('new-user', k=3, features=['PHQ9_severe', 'unknown'])
+    assert source == 'features'
+    expected = np.argsort(-(recommender.item_vectors @ recommender.feature_vectors[1]))[:3]
+    assert [item_id for item_id, _ in items] == [f"r{c}" for c in expected]
+
+    items, source = recommender.recommend(None, k=3)
+    assert source == 'popular'
+    assert [item_id for item_id, _ in items] == [f"r{c}" for c in np.argsort(-recommender.item_vectors[:, -1])[:3]]
+
+
+def test_precomputed_store_matches_live_scoring(tmp_path):
+    recommender = make_recommender()
+    items, scores = recommender.precompute_top_n(10, batch_size=16)
+    assert items.dtype == np.uint16 and scores.dtype == np.float16
+    assert items.shape == (50, 10)
+
+    (tmp_path / 'model.pkl').write_bytes(b'model')
+    TopNStore.save(tmp_path / 'top_n', items, scores, model_fingerprint(tmp_path))
+
+    live = [recommender.recommend(f"u{i}", k=5)[0] for i in range(50)]
+    recommender.top_n = TopNStore.load(tmp_path / 'top_n', model_fingerprint(tmp_path), 50)
+    for i in range(50):
+        precomputed, source = recommender.recommend(f"u{i}", k=5)
+        assert source == 'precomputed'
+        assert [item_id for item_id, _ in precomputed] == [item_id for item_id, _ in live[i]]
+
+
+def test_stale_store_is_ignored(tmp_path):
+    recommender = make_recommender()
+    items, scores = recommender.precompute_top_n(5)
+    TopNStore.save(tmp_path, items, scores, 'old-model')
+
+    assert TopNStore.load(tmp_path, 'new-model', 50) is None
+    assert TopNStore.load(tmp_path, 'old-model', 49) is None
+    assert TopNStore.load(tmp_path, 'old-model', 50) is not None
@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+import sys
+import os
+
+# Add scripts to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+from recommender_data import (
+    RecommenderData, feature_matrix, feedback_interactions, feedback_weights, load_feedback,
+    screening_user_features, synthetic_interactions
+)
+
+
+def test_build_sums_repeated_events():
+    users = np.array(['b', 'a', 'b', 'c', 'b'])
+    items = np.array(['x', 'y', 'x', 'x', 'z'])
+    weights = np.array([1.0, 2.0, 3.0, 4.0, 5.0])
+
+    data = RecommenderData.build(users, items, weights)
+
+    assert data.user_ids.tolist() == ['a', 'b', 'c']
+    assert data.item_ids.tolist() == ['x', 'y', 'z']
+    dense = data.weights.toarray()
+    assert dense.tolist() == [[0, 2, 0], [4, 0, 5], [4, 0, 0]]
+    assert (data.interactions.toarray() == (dense > 0)).all()
+    # LightFM requires weights and interactions with identical coordinates
+    assert (data.interactions.row == data.weights.row).all()
+    assert (data.interactions.col == data.weights.col).all()
+
+
+def test_feature_matrix_matches_lightfm_defaults():
+    """Identity block first, then named features, each row summing to 1"""
+    matrix, names = feature_matrix(3, (np.array([0, 0, 2]), np.array(['risk_1', 'cat_a', 'risk_1'])))
+
+    assert names == ['cat_a', 'risk_1']
+    dense = matrix.toarray()
+    assert dense.shape == (3, 5)
+    np.testing.assert_allclose(dense.sum(axis=1), 1.0)
+    np.testing.assert_allclose(dense[0], [1 / 3, 0, 0, 1 / 3, 1 / 3])
+    np.testing.assert_allclose(dense[1], [0, 1, 0, 0, 0])
+
+
+def test_build_ignores_features_of_unknown_ids():
+    data = RecommenderData.build(
+        ['u1', 'u2'], ['i1', 'i1'], [1.0, 1.0],
+        user_features=(['u2', 'ghost'], ['risk_1', 'risk_0'])
+    )
+    assert data.user_feature_names == ['risk_1']
+    assert data.user_features.shape == (2, 3)
+
+
+def test_feedback_weights_from_export(tmp_path):
+    shard_dir = tmp_path / 'recommendation_feedback' / 'date=2026-01-01'
+    shard_dir.mkdir(parents=True)
+    pd.DataFrame({
+        'user_hash': ['u1', 'u1', 'u2', 'u2', 'u3'],
+        'resource_id': ['r1', 'r2', 'r1', 'r3', 'r1'],
+        'action': ['viewed', 'rated', 'saved', 'dismissed', 'clicked'],
+        'rating': [None, 5, None, None, None],
+        'timestamp': pd.to_datetime(['2026-01-01'] * 5),
+    }).to_parquet(shard_dir / 'part-00000.parquet')
+
+    df = load_feedback(tmp_path / 'recommendation_feedback')
+    users, items, weights = feedback_interactions(df)
+
+    assert list(zip(users, items, weights)) == [
+        ('u1', 'r1', 1.0), ('u1', 'r2', 5.0), ('u2', 'r1', 4.0), ('u3', 'r1', 2.0)
+    ]
+
+
+def test_low_ratings_are_dropped_and_never_lower_engagement():
+    weights = feedback_weights(['rated', 'rated', 'rated', 'viewed', 'saved', 'clicked', 'rated'],
+                               [1, 3, 5, None, 2, 5, None])
+
+    # Dislikes drop out; a rating on another action keeps that action's weight
+    assert weights.tolist() == [0.0, 0.0, 5.0, 1.0, 4.0, 2.0, 3.0]
+
+    users, items, _ = feedback_interactions(pd.DataFrame({
+        'user_hash': ['u1', 'u1'], 'resource_id': ['r1', 'r2'], 'action': ['rated', 'saved'], 'rating': [1, 2],
+    }))
+    assert list(zip(users, items)) == [('u1', 'r2')]
+
+
+def test_screening_user_features_keep_latest_per_type():
+    screenings = pd.DataFrame({
+        'user_hash': ['u1', 'u1', 'u1'],
+        'type': ['PHQ9', 'PHQ9', 'GAD7'],
+        'risk_level': ['severe', 'mild', 'none'],
+        'timestamp': pd.to_datetime(['2026-02-01', '2026-01-01', '2026-01-15']),
+    })
+    features = screening_user_features(screenings)
+    assert sorted(features['feature']) == ['GAD7_none', 'PHQ9_severe']
+
+
+def test_synthetic_interactions_scale():
+    users, items, ratings, user_risk, item_categories = synthetic_interactions(2000, 100, seed=0)
+
+    assert len(users) == len(items) == len(ratings)
+    assert 4 * 2000 < len(users) < 6 * 2000
+    assert ratings.min() >= 1 and ratings.max() <= 5
+    # High-risk users rate crisis items highly
+    matched = (user_risk[users] == 1) & (item_categories[items] == 1)
+    assert ratings[matched].min() >= 4
@@ -0,0 +1,77 @@
+import pytest
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+import sys
+import os
+
+# Add scripts to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+from recommender_data import RecommenderData
+from recommender_eval import evaluate, holdout_matrix, time_split
+
+
+def naive_metrics(user_vectors, item_vectors, test, train, k):
+    """Per-user loop reference"""
+    totals = {'precision': 0.0, 'recall': 0.0, 'ndcg': 0.0, 'map': 0.0}
+    recommended_items = set()
+    users = [u for u in range(test.shape[0]) if test[u].nnz]
+    for u in users:
+        scores = item_vectors @ user_vectors[u]
+        seen = set(train[u].indices)
+        ranked = [i for i in np.argsort(-scores, kind='stable') if i not in seen][:k]
+        recommended_items.update(ranked)
+        relevant = set(test[u].indices)
+        hits = [1.0 if i in relevant else 0.0 for i in ranked]
+        ideal = min(len(relevant), k)
+        totals['precision'] += sum(hits) / k
+        totals['recall'] += sum(hits) / len(relevant)
+        totals['ndcg'] += (sum(h / np.log2(r + 2) for r, h in enumerate(hits)) /
+                           sum(1 / np.log2(r + 2) for r in range(ideal)))
+        totals['map'] += sum(sum(hits[:r + 1]) / (r + 1) * h for r, h in enumerate(hits)) / ideal
+    metrics = {f"{name}@{k}": value / len(users) for name, value in totals.items()}
+    metrics[f"coverage@{k}"] = len(recommended_items) / item_vectors.shape[0]
+    return metrics
+
+
+@pytest.mark.parametrize("block_size,workers", [(7, 1), (2048, 3)])
+def test_evaluate_matches_naive_loop(block_size, workers):
+    rng = np.random.default_rng(0)
+    user_vectors = rng.normal(size=(60, 6))
+    item_vectors = rng.normal(size=(30, 6))
+    train = sp.random(60, 30, density=0.15, random_state=1, format='csr')
+    test = sp.random(60, 30, density=0.08, random_state=2, format='csr')
+    test = (test - test.multiply(train > 0)).tocsr()
+    test.eliminate_zeros()
+
+    metrics = evaluate(user_vectors, item_vectors, test, train, k=5, block_size=block_size, workers=workers)
+    expected = naive_metrics(user_vectors, item_vectors, test, train, k=5)
+
+    assert metrics['users'] == sum(1 for u in range(60) if test[u].nnz)
+    for name, value in expected.items():
+        assert metrics[name] == pytest.approx(value)
+
+
+def test_perfect_ranking_scores_one():
+    item_vectors = np.eye(4)
+    user_vectors = np.array([[1.0, 0.5, 0, 0], [0, 0, 0, 1.0]])
+    test = sp.csr_matrix(np.array([[1, 1, 0, 0], [0, 0, 0, 1]]))
+
+    metrics = evaluate(user_vectors, item_vectors, test, k=2)
+    assert metrics['ndcg@2'] == pytest.approx(1.0)
+    assert metrics['map@2'] == pytest.approx(1.0)
+    assert metrics['recall@2'] == pytest.approx(1.0)
+    assert metrics['precision@2'] == pytest.approx(0.75)
+
+
+def test_time_split_and_holdout_matrix():
+    timestamps = pd.date_range('2024-01-01', periods=10, freq='D')
+    train_mask, cutoff = time_split(timestamps, test_fraction=0.2)
+    assert train_mask.sum() == 8
+    assert (timestamps[train_mask] <= cutoff).all() and (timestamps[~train_mask] > cutoff).all()
+
+    data = RecommenderData.build(['a', 'a', 'b'], ['r1', 'r2', 'r1'], [1.0, 1.0, 1.0])
+    # Known pair, new item, new user and already-trained pair are dropped
+    test = holdout_matrix(data, ['b', 'a', 'c', 'a', 'b'], ['r2', 'r3', 'r1', 'r1', 'r2'])
+    assert test.toarray().tolist() == [[0, 0], [0, 1]]
@@ -0,0 +1,112 @@
+import pytest
+import sys
+import os
+import yaml
+
+# Add scripts to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+from run_pipeline import load_stages, build_graph, select_stages, run_pipeline
+
+
+def write_pipeline(root, stages):
+    with open(root / 'dvc.yaml', 'w') as f:
+        yaml.safe_dump({'stages': stages}, f)
+    with open(root / 'params.yaml', 'w') as f:
+        yaml.safe_dump({'train': {'lr': 0.1}}, f)
+    return root / 'dvc.yaml'
+
+
+def copy_cmd(src, dst):
+    return f"python -c \"import shutil; shutil.copy('{src}', '{dst}')\""
+
+
+@pytest.fixture
+def pipeline(tmp_path):
+    (tmp_path / 'raw.txt').write_text('raw')
+    dvc_path = write_pipeline(tmp_path, {
+        'prepare': {'cmd': copy_cmd('raw.txt', 'data/clean.txt'), 'deps': ['raw.txt'], 'outs': ['data']},
+        'train_a': {'cmd': copy_cmd('data/clean.txt', 'a.txt'), 'deps': ['data/clean.txt'],
+                    'params': ['train.lr'], 'outs': ['a.txt']},
+        'train_b': {'cmd': copy_cmd('data/clean.txt', 'b.txt'), 'deps': ['data/clean.txt'], 'outs': ['b.txt']},
+    })
+    os.makedirs(tmp_path / 'data')
+    return tmp_path, load_stages(dvc_path)
+
+
+def run(root, stages, **kwargs):
+    upstream = build_graph(stages)
+    results, _ = run_pipeline(stages, select_stages(stages, upstream), upstream, 2, {}, root, poll_interval=0.01,
+                              **kwargs)
+    return {result['stage']: result['status'] for result in results}
+
+
+def test_graph_links_outputs_to_deps(pipeline):
+    _, stages = pipeline
+    upstream = build_graph(stages)
+
+    assert upstream == {'prepare': set(), 'train_a': {'prepare'}, 'train_b': {'prepare'}}
+    assert select_stages(stages, upstream, ['train_b']) == ['prepare', 'train_b']
+    assert select_stages(stages, upstream, exclude=['train_a']) == ['prepare', 'train_b']
+
+
+def test_unchanged_stages_are_skipped(pipeline):
+    """Second run is fully cached; a param change reruns only its stage"""
+    root, stages = pipeline
+
+    assert run(root, stages) == {'prepare': 'ran', 'train_a': 'ran', 'train_b': 'ran'}
+    assert (root / 'b.txt').read_text() == 'raw'
+    assert set(run(root, stages).values()) == {'cached'}
+
+    with open(root / 'params.yaml', 'w') as f:
+        yaml.safe_dump({'train': {'lr': 0.2}}, f)
+    assert run(root, stages) == {'prepare': 'cached', 'train_a': 'ran', 'train_b': 'cached'}
+
+    (root / 'raw.txt').write_text('new raw data')
+    assert set(run(root, stages).values()) == {'ran'}
+    assert (root / 'a.txt').read_text() == 'new raw data'
+
+
+def test_failed_stage_blocks_downstream(pipeline):
+    root, stages = pipeline
+    stages['prepare']['cmd'] = 'python -c "raise SystemExit(3)"'
+
+    assert run(root, stages) == {'prepare': 'failed', 'train_a': 'blocked', 'train_b': 'blocked'}
+
+
+def test_always_changed_stage_is_never_cached(pipeline):
+    root, stages = pipeline
+    stages['prepare']['always_changed'] = True
+
+    assert set(run(root, stages).values()) == {'ran'}
+    # prepare reruns, but its output is unchanged so downstream stays cached
+    assert run(root, stages) == {'prepare': 'ran', 'train_a': 'cached', 'train_b': 'cached'}
+
+
+def test_state_is_saved_as_each_stage_finishes(pipeline):
+    root, stages = pipeline
+    check_state = ("python -c \"import json; "
+                   "raise SystemExit('prepare' not in json.load(open('.pipeline/state.json'))['stages'])\"")
+    stages['train_b']['cmd'] = check_state
+
+    # train_b sees prepare's entry on disk while the run is still going
+    assert run(root, stages) == {'prepare': 'ran', 'train_a': 'ran', 'train_b': 'ran'}
+
+
+def test_repo_pipeline_consumers_depend_on_export():
+    dvc_path = os.path.join(os.path.dirname(__file__), '..', 'dvc.yaml')
+    stages = load_stages(dvc_path)
+    upstream = build_graph(stages)
+
+    assert 'export_data' in upstream['train_recommender']
+    assert 'export_data' in upstream['build_content_index']
+    assert select_stages(stages, upstream, ['precompute_recommendations']) == [
+        'export_data', 'train_recommender', 'precompute_recommendations']
+
+
+def test_repo_screening_evaluation_does_not_need_chat_models():
+    dvc_path = os.path.join(os.path.dirname(__file__), '..', 'dvc.yaml')
+    upstream = build_graph(load_stages(dvc_path))
+
+    assert upstream['evaluate'] == {'preprocess', 'train_screening'}
+    assert {'train_risk_detector', 'train_intent_classifier', 'train_multitask'} <= upstream['benchmark_chat']
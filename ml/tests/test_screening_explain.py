@@ -0,0 +1,82 @@
+import pytest
+import numpy as np
+import pandas as pd
+import sys
+import os
+
+lgb = pytest.importorskip("lightgbm")
+
+# Add scripts and serving to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'serving'))
+
+from preprocess import extract_features, create_severity_labels, feature_columns
+from screening_explain import ScreeningExplainer, screening_features
+
+
+def make_gad7_features(n=400, seed=0):
+    """Processed GAD-7 training columns, built by preprocess.py"""
+    rng = np.random.default_rng(seed)
+    answers = rng.integers(0, 4, size=(n, 7))
+    raw = pd.DataFrame({
+        'type': 'GAD7',
+        'score': answers.sum(axis=1),
+        'answers': [str(row) for row in answers.tolist()],
+        'risk_level': 'unknown',
+    })
+    df = create_severity_labels(extract_features(raw))
+    return answers, df[feature_columns('GAD7')]
+
+
+@pytest.fixture(scope='module')
+def explainer():
+    _, df = make_gad7_features()
+    X = df.drop(['severity_label'], axis=1)
+    model = lgb.LGBMClassifier(n_estimators=30, num_leaves=7, verbose=-1)
+    model.fit(X, df['severity_label'])
+    return ScreeningExplainer(model, 'GAD7', cache_size=8)
+
+
+def test_serving_features_match_preprocess():
+    answers, df = make_gad7_features(n=50)
+    features = screening_features(answers)
+
+    for name in df.columns.drop('severity_label'):
+        np.testing.assert_allclose(features[name], df[name].to_numpy(dtype=float), err_msg=name)
+
+
+def test_attributions_add_up_to_raw_score(explainer):
+    answers = [[3, 3, 2, 2, 3, 3, 1], [0, 0, 1, 0, 0, 0, 0]]
+    results = explainer.explain_batch(answers)
+    raw = explainer.model.predict_proba(explainer.feature_matrix(answers), raw_score=True)
+
+    for row, result in enumerate(results):
+        predicted = list(result['probabilities'].values()).index(max(result['probabilities'].values()))
+        assert sum(result['features'].values()) + result['baseValue'] == pytest.approx(raw[row, predicted])
+
+        # Question attributions redistribute the score features, nothing is lost
+        other = sum(value for name, value in result['features'].items()
+                    if not name.startswith('q') and name not in ('score', 'sum_score', 'mean_score'))
+        questions = sum(q['attribution'] for q in result['questions'])
+        assert questions + other == pytest.approx(sum(result['features'].values()))
+        assert [q['answer'] for q in result['questions']] == answers[row]
+
+    assert results[0]['severity'] == 'severe'
+    assert results[1]['severity'] == 'none'
+
+
+def test_batch_matches_single_and_uses_cache(explainer):
+    answers = [[1, 1, 2, 0, 1, 0, 2], [2, 2, 2, 2, 2, 2, 2], [1, 1, 2, 0, 1, 0, 2]]
+    batch = explainer.explain_batch(answers)
+    assert batch[0] == batch[2]
+    assert not batch[0]['cached']
+
+    single = explainer.explain_batch([answers[1]])[0]
+    assert single['cached']
+    assert {**single, 'cached': False} == batch[1]
+
+
+def test_cache_is_bounded(explainer):
+    rng = np.random.default_rng(1)
+    explainer.explain_batch(rng.integers(0, 4, size=(20, 7)).tolist())
+    assert len(explainer._cache) == explainer.cache_size
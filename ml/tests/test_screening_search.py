@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import yaml
+import sys
+import os
+from pathlib import Path
+
+# Add scripts to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+from screening_search import halving_schedule, successive_halving, tuned_params, write_tuned_params
+
+PARAMS_PATH = Path(__file__).parent.parent / 'params.yaml'
+
+
+def test_halving_schedule():
+    assert halving_schedule(27, 3, 50) == [(27, 50), (9, 150), (3, 450), (1, 1350)]
+    assert halving_schedule(10, 3, 20) == [(10, 20), (3, 60), (1, 180)]
+    assert halving_schedule(1, 3, 20) == [(1, 20)]
+
+
+def test_write_tuned_params_keeps_rest_of_file(tmp_path):
+    """Rewriting the tuned section leaves every other section and comment intact"""
+    params_path = tmp_path / 'params.yaml'
+    params_path.write_text(PARAMS_PATH.read_text())
+    original = yaml.safe_load(params_path.read_text())
+
+    write_tuned_params({'PHQ9': {'learning_rate': 0.05, 'num_leaves': 31}}, params_path)
+    write_tuned_params({'PHQ9': {'learning_rate': 0.1, 'num_leaves': 15}, 'GAD7': {'max_depth': 4}}, params_path)
+    updated = yaml.safe_load(params_path.read_text())
+
+    assert updated['tuned'] == {'PHQ9': {'learning_rate': 0.1, 'num_leaves': 15}, 'GAD7': {'max_depth': 4}}
+    assert {key: value for key, value in updated.items() if key != 'tuned'} == \
+        {key: value for key, value in original.items() if key != 'tuned'}
+    assert params_path.read_text().count('# scripts/screening_search.py: best parameters') == 1
+    assert '# Training hyperparameters' in params_path.read_text()
+
+
+def test_write_tuned_params_merges_single_type_runs(tmp_path):
+    """A GAD7-only run keeps the PHQ9 parameters written before it"""
+    params_path = tmp_path / 'params.yaml'
+    params_path.write_text(PARAMS_PATH.read_text())
+
+    write_tuned_params({'PHQ9': {'learning_rate': 0.05, 'num_leaves': 31}}, params_path)
+    write_tuned_params({'GAD7': {'max_depth': 4}}, params_path)
+
+    assert yaml.safe_load(params_path.read_text())['tuned'] == {
+        'PHQ9': {'learning_rate': 0.05, 'num_leaves': 31}, 'GAD7': {'max_depth': 4}
+    }
+
+
+def test_successive_halving_finds_usable_params():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.integers(0, 4, size=(600, 7)), columns=[f'q{i}' for i in range(1, 8)])
+    y = np.digitize(X.sum(axis=1), [5, 10, 15])
+
+    best, summary = successive_halving(X, y, {'n_trials': 3, 'min_rounds': 5, 'cv_folds': 2, 'workers': 1})
+    params = tuned_params(best)
+
+    assert summary['trials'] == 4
+    assert summary['trials_per_minute'] > 0
+    assert 1 <= params['n_estimators'] <= 15
+    assert set(params) >= {'learning_rate', 'num_leaves', 'max_depth', 'min_child_samples'}
@@ -0,0 +1,125 @@
+import pytest
+import asyncio
+import json
+import sys
+import os
+
+# Add serving to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'serving'))
+
+pytest.importorskip('fastapi')
+pytest.importorskip('mlflow')
+pytest.importorskip('prometheus_client')
+pytest.importorskip('torch')
+pytest.importorskip('transformers')
+
+from fastapi import HTTPException
+
+import app as app_module
+from app import SummarizeRequest, summarize_session
+from batching import MicroBatcher
+from summarizer import SummaryCache
+
+SUMMARY = "Concerns: Exam anxiety. Strategies: Breathing, Sleep hygiene. Risk: Medium."
+
+
+class StubSummarizer:
+    """Stands in for SessionSummarizer; records what the route hands it"""
+
+    def __init__(self):
+        self.batches = []
+        self.streamed = []
+
+    def summarize_batch(self, items):
+        self.batches.append(list(items))
+        return [SUMMARY for _ in items]
+
+    def stream(self, text, max_new_tokens=None):
+        self.streamed.append((text, max_new_tokens))
+        for word in SUMMARY.split(" "):
+            yield word + " "
+
+    def count_tokens(self, text):
+        return len(text.split())
+
+
+@pytest.fixture
+def summarizer(monkeypatch):
+    stub = StubSummarizer()
+    monkeypatch.setitem(app_module.models, 'summarizer', stub)
+    monkeypatch.setitem(app_module.batchers, 'summarizer',
+                        MicroBatcher(app_module._summarize_batch, max_batch_size=16, max_wait_ms=50, name="test"))
+    monkeypatch.setattr(app_module, 'summary_cache', SummaryCache())
+    return stub
+
+
+def make_request(**kwargs):
+    turns = [{'sender': 'user', 'message': "I can't sleep before exams"},
+             {'sender': 'bot', 'message': "Let's try a breathing exercise"}]
+    return SummarizeRequest(turns=kwargs.pop('turns', turns), **kwargs)
+
+
+def test_concurrent_requests_are_batched_and_parsed(summarizer):
+    async def main():
+        return await asyncio.gather(
+            summarize_session(make_request(sessionId='a', maxNewTokens=32)),
+            summarize_session(make_request(sessionId='b', numBeams=4)),
+        )
+
+    first, second = asyncio.run(main())
+
+    assert len(summarizer.batches) == 1
+    assert [(item['max_new_tokens'], item['num_beams']) for item in summarizer.batches[0]] == [(32, 1), (None, 4)]
+    assert summarizer.batches[0][0]['text'].startswith("User: I can't sleep before exams Bot:")
+    assert (first.sessionId, second.sessionId) == ('a', 'b')
+    assert first.summary == SUMMARY
+    assert first.mainConcerns == ['Exam anxiety']
+    assert first.copingStrategies == ['Breathing', 'Sleep hygiene']
+    assert first.riskLevel == 'medium'
+
+
+def test_stream_sends_tokens_then_parsed_summary(summarizer):
+    async def main():
+        response = await summarize_session(make_request(sessionId='a', stream=True, maxNewTokens=16))
+        return [chunk async for chunk in response.body_iterator]
+
+    events = asyncio.run(main())
+
+    tokens = [e for e in events if e.startswith("event: token")]
+    assert len(tokens) == len(SUMMARY.split(" "))
+    assert events[-1].startswith("event: summary")
+    final = json.loads(events[-1].split("data: ", 1)[1])
+    assert final['summary'] == SUMMARY and final['riskLevel'] == 'medium'
+    assert summarizer.streamed[0][1] == 16
+    assert summarizer.batches == []
+
+
+def test_incremental_request_reuses_cached_chunks(summarizer):
+    async def main():
+        first = await summarize_session(make_request(sessionId='s1', incremental=True))
+        second = await summarize_session(make_request(sessionId='s1', incremental=True))
+        return first, second
+
+    first, second = asyncio.run(main())
+
+    assert first.stats['chunks_computed'] == first.stats['chunks'] >= 1
+    assert second.stats['chunks_computed'] == 0 and second.stats['merges_computed'] == 0
+    assert second.summary == first.summary == SUMMARY
+
+
+@pytest.mark.parametrize("kwargs,status", [
+    ({'turns': []}, 400),
+    ({'incremental': True}, 400),
+    ({'sessionId': 's1', 'incremental': True, 'stream': True}, 400),
+])
+def test_invalid_requests_are_rejected(summarizer, kwargs, status):
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(summarize_session(make_request(**kwargs)))
+    assert excinfo.value.status_code == status
+
+
+def test_missing_model_returns_503(monkeypatch):
+    monkeypatch.delitem(app_module.models, 'summarizer', raising=False)
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(summarize_session(make_request()))
+    assert excinfo.value.status_code == 503
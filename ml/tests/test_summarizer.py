@@ -0,0 +1,177 @@
+import pytest
+import asyncio
+import hashlib
+import queue
+import sys
+import os
+
+# Add serving to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'serving'))
+
+torch = pytest.importorskip('torch')
+transformers = pytest.importorskip('transformers')
+
+import summarizer as summarizer_module
+from summarizer import SessionSummarizer, SummaryCache, chunk_turns, format_transcript, summarize_incremental
+
+
+def make_turns(n):
+    return [{'sender': 'user' if i % 2 == 0 else 'bot', 'message': f"turn {i} " + "word " * (i % 5)}
+            for i in range(n)]
+
+
+def count_words(text):
+    return len(text.split())
+
+
+class FakeSummarizer:
+    """Records every text it is asked to summarize"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, texts):
+        self.calls.append(list(texts))
+        return [f"summary {hashlib.sha1(text.encode()).hexdigest()[:8]}" for text in texts]
+
+    @property
+    def texts(self):
+        return sum(len(call) for call in self.calls)
+
+
+class FakeTokenizer:
+    """One id per word; decode joins ids back into words"""
+
+    def __call__(self, texts, **kwargs):
+        return {'input_ids': torch.ones(len(texts), 4, dtype=torch.long)}
+
+    def decode(self, ids, skip_special_tokens=True):
+        return " ".join(f"w{int(i)}" for i in ids)
+
+
+class FakeModel:
+    """generate() emits tokens 1..max_new_tokens after the decoder start token"""
+
+    def __init__(self):
+        self.calls = []
+
+    def generate(self, input_ids, max_new_tokens, num_beams, streamer=None, **kwargs):
+        self.calls.append({'rows': input_ids.shape[0], 'max_new_tokens': max_new_tokens, 'num_beams': num_beams})
+        tokens = list(range(1, max_new_tokens + 1))
+        if streamer is not None:
+            for token in tokens:
+                streamer.put(f"w{token} ")
+            streamer.end()
+        return torch.tensor([[0] + tokens] * input_ids.shape[0])
+
+
+class FakeStreamer:
+    def __init__(self, tokenizer, **kwargs):
+        self.queue = queue.Queue()
+
+    def put(self, piece):
+        self.queue.put(piece)
+
+    def end(self):
+        self.queue.put(None)
+
+    def __iter__(self):
+        return iter(self.queue.get, None)
+
+
+def fake_session_summarizer(max_new_tokens=8):
+    model = SessionSummarizer.__new__(SessionSummarizer)
+    model.tokenizer = FakeTokenizer()
+    model.model = FakeModel()
+    model.max_new_tokens = max_new_tokens
+    return model
+
+
+def run(session_id, turns, summarizer, cache, **kwargs):
+    return asyncio.run(summarize_incremental(session_id, turns, summarizer, count_words, cache,
+                                             fan_in=2, max_turns=4, **kwargs))
+
+
+def test_chunk_boundaries_stable_when_turns_are_appended():
+    turns = make_turns(40)
+    before = chunk_turns(turns[:25], count_words, max_turns=4, max_tokens=20)
+    after = chunk_turns(turns, count_words, max_turns=4, max_tokens=20)
+
+    assert after[:len(before) - 1] == before[:-1]
+    assert after[len(before) - 1][:len(before[-1])] == before[-1]
+    assert sum(after, []) == turns
+    assert all(len(chunk) <= 4 for chunk in after)
+    assert all(sum(count_words(format_transcript([t])) + 1 for t in chunk) <= 20 or len(chunk) == 1
+               for chunk in after)
+
+
+def test_only_last_leaf_and_right_most_merges_are_recomputed():
+    summarizer, cache = FakeSummarizer(), SummaryCache()
+
+    # 38 turns -> 10 leaves (last one has 2 turns); merges: 5 + 3 + 2 + 1
+    _, stats = run('s1', make_turns(38), summarizer, cache)
+    assert stats == {'chunks': 10, 'chunks_computed': 10, 'merges': 11, 'merges_computed': 11}
+
+    # One more turn lands in the last leaf: it and one merge per level change
+    summarizer.calls.clear()
+    _, stats = run('s1', make_turns(39), summarizer, cache)
+    assert stats == {'chunks': 10, 'chunks_computed': 1, 'merges': 11, 'merges_computed': 4}
+    assert summarizer.texts == 5
+
+    # Unchanged session: everything is cached
+    _, stats = run('s1', make_turns(39), summarizer, cache)
+    assert stats['chunks_computed'] == 0 and stats['merges_computed'] == 0
+
+
+def test_generation_settings_are_part_of_the_cache_key():
+    summarizer, cache = FakeSummarizer(), SummaryCache()
+    run('s1', make_turns(10), summarizer, cache, max_new_tokens=16, num_beams=1)
+
+    _, stats = run('s1', make_turns(10), summarizer, cache, max_new_tokens=128, num_beams=4)
+    assert stats['chunks_computed'] == stats['chunks'] and stats['merges_computed'] == stats['merges']
+
+
+def test_summary_cache_evicts_least_recently_used():
+    cache = SummaryCache(max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+
+    assert len(cache) == 2
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+
+
+def test_summarize_batch_groups_by_beams_and_beam_budgets():
+    model = fake_session_summarizer(max_new_tokens=8)
+    items = [
+        {'text': 'a', 'max_new_tokens': 2, 'num_beams': 1},
+        {'text': 'b', 'max_new_tokens': 5, 'num_beams': 4},
+        {'text': 'c', 'max_new_tokens': None, 'num_beams': 1},
+        {'text': 'd', 'max_new_tokens': 100, 'num_beams': 1},
+        {'text': 'e', 'max_new_tokens': 3, 'num_beams': 4},
+        {'text': 'f', 'max_new_tokens': 5, 'num_beams': 4},
+    ]
+
+    results = model.summarize_batch(items)
+
+    # Greedy items share one generate() sized to the largest (capped) budget;
+    # beam search runs once per (beam width, budget)
+    assert model.model.calls == [
+        {'rows': 3, 'max_new_tokens': 8, 'num_beams': 1},
+        {'rows': 2, 'max_new_tokens': 5, 'num_beams': 4},
+        {'rows': 1, 'max_new_tokens': 3, 'num_beams': 4},
+    ]
+    assert results == ["w1 w2", "w1 w2 w3 w4 w5", " ".join(f"w{i}" for i in range(1, 9)),
+                       " ".join(f"w{i}" for i in range(1, 9)), "w1 w2 w3", "w1 w2 w3 w4 w5"]
+
+
+def test_stream_yields_pieces_with_greedy_decoding(monkeypatch):
+    monkeypatch.setattr(summarizer_module, 'TextIteratorStreamer', FakeStreamer)
+    model = fake_session_summarizer(max_new_tokens=8)
+
+    pieces = list(model.stream("transcript", max_new_tokens=3))
+
+    assert pieces == ["w1 ", "w2 ", "w3 "]
+    assert model.model.calls == [{'rows': 1, 'max_new_tokens': 3, 'num_beams': 1}]
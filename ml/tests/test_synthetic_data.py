@@ -0,0 +1,59 @@
+import json
+import numpy as np
+import pandas as pd
+from datetime import datetime
+import sys
+import os
+
+# Add scripts to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+from generate_synthetic_data import (
+    allocate_answers, format_answer_strings, generate_chunk,
+    PHQ9_THRESHOLDS, SEVERITY_ANSWER_CAPS
+)
+
+
+def test_allocate_answers_hits_targets_within_caps():
+    rng = np.random.default_rng(0)
+    targets = rng.integers(0, 28, size=5000)
+    caps = np.where(targets <= 4, 1, np.where(targets <= 9, 2, 3))
+
+    answers = allocate_answers(rng, targets, caps, 9)
+
+    assert answers.dtype == np.int8
+    assert np.array_equal(answers.sum(axis=1), targets)
+    assert (answers.max(axis=1) <= caps).all()
+    assert (answers >= 0).all()
+
+
+def test_format_answer_strings_matches_str_list():
+    answers = np.array([[0, 1, 2, 3, 0, 1, 2], [3, 3, 3, 3, 3, 3, 3]], dtype=np.int8)
+    assert format_answer_strings(answers).tolist() == [str(row.tolist()) for row in answers]
+
+
+def test_generate_chunk_is_deterministic_and_consistent():
+    now = pd.Timestamp('2026-01-01')
+    first = generate_chunk(np.random.default_rng(7), 0, 2000, 2000, 0.5, now).to_pandas()
+    second = generate_chunk(np.random.default_rng(7), 0, 2000, 2000, 0.5, now).to_pandas()
+    pd.testing.assert_frame_equal(first, second)
+
+    phq9 = first[first['type'] == 'PHQ9']
+    assert len(phq9) == 1000
+    low = phq9['risk_level'].map(lambda level: PHQ9_THRESHOLDS[level][0])
+    high = phq9['risk_level'].map(lambda level: PHQ9_THRESHOLDS[level][1])
+    assert phq9['score'].between(low, high).all()
+
+    none_answers = phq9.loc[phq9['risk_level'] == 'none', 'answers']
+    assert all(max(json.loads(answers)) <= SEVERITY_ANSWER_CAPS['none'] for answers in none_answers)
+
+
+def test_chat_shards_are_seeded_and_keep_category_counts():
+    from generate_synthetic_chats import generate_shard_records, category_counts, DEFAULT_DISTRIBUTION
+
+    now = datetime(2026, 1, 1)
+    first = generate_shard_records(np.random.default_rng(3), 1000, DEFAULT_DISTRIBUTION, now=now)
+    second = generate_shard_records(np.random.default_rng(3), 1000, DEFAULT_DISTRIBUTION, now=now)
+
+    assert first['message'] == second['message']
+    assert pd.Series(first['risk_level']).value_counts().to_dict() == category_counts(1000, DEFAULT_DISTRIBUTION)
@@ -0,0 +1,67 @@
+import pytest
+import pandas as pd
+import sys
+import os
+from types import SimpleNamespace
+
+# Add scripts to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+pytest.importorskip('lightfm')
+pytest.importorskip('mlflow')
+pytest.importorskip('dotenv')
+
+import train_recommender
+from train_recommender import load_training_data
+
+
+def write_feedback(path, n_events=10):
+    pd.DataFrame({
+        'user_hash': [f"u{i % 3}" for i in range(n_events)],
+        'resource_id': [f"r{i}" for i in range(n_events)],
+        'action': ['clicked'] * n_events,
+        'rating': [None] * n_events,
+        'timestamp': pd.date_range('2024-01-01', periods=n_events, freq='D'),
+    }).to_csv(path, index=False)
+    return path
+
+
+def args_for(path):
+    return SimpleNamespace(interactions=str(path), synthetic=False, synthetic_users=10, synthetic_items=5, seed=0)
+
+
+@pytest.fixture(autouse=True)
+def no_screenings(monkeypatch):
+    monkeypatch.setattr(train_recommender, 'find_screenings_source', lambda raw_dir: None)
+
+
+def test_held_out_events_are_kept_for_the_saved_model(tmp_path):
+    args = args_for(write_feedback(tmp_path / 'feedback.csv'))
+
+    data, test, full, newest = load_training_data(args, test_fraction=0.2)
+
+    # Evaluation trains on the older 80%, the deployed model on everything
+    assert data.interactions.nnz == 8
+    assert test is not None
+    assert full.interactions.nnz == 10
+    assert set(full.item_ids) == {f"r{i}" for i in range(10)}
+    assert newest == pd.Timestamp('2024-01-10')
+
+
+def test_without_holdout_the_training_data_is_all_data(tmp_path):
+    args = args_for(write_feedback(tmp_path / 'feedback.csv'))
+
+    data, test, full, newest = load_training_data(args, test_fraction=0)
+
+    assert test is None
+    assert full is data and data.interactions.nnz == 10
+    assert newest == pd.Timestamp('2024-01-10')
+
+
+def test_synthetic_full_data_includes_held_out_interactions():
+    args = SimpleNamespace(interactions=None, synthetic=True, synthetic_users=30, synthetic_items=10, seed=0)
+
+    data, test, full, newest = load_training_data(args, test_fraction=0.2)
+
+    assert data.interactions.nnz < full.interactions.nnz
+    assert newest is None
@@ -0,0 +1,107 @@
+import pytest
+import numpy as np
+import pandas as pd
+import sys
+import os
+from types import SimpleNamespace
+
+# Add scripts to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+from recommender_data import RecommenderData, extend_identity_features, synthetic_interactions
+from update_recommender import apply_feedback, grow_parameters, new_events
+
+
+def make_data():
+    return RecommenderData.build(
+        ['u1', 'u2', 'u2'], ['r1', 'r1', 'r2'], [1.0, 2.0, 4.0],
+        user_features=(['u1', 'u2'], ['PHQ9_mild', 'PHQ9_severe'])
+    )
+
+
+def test_extend_identity_features_keeps_existing_rows():
+    data = make_data()
+    extended = extend_identity_features(data.user_features, 2).toarray()
+    original = data.user_features.toarray()
+
+    assert extended.shape == (4, 6)
+    # Existing rows: identity block, two new zero columns, then named features
+    np.testing.assert_allclose(extended[:2, :2], original[:, :2])
+    np.testing.assert_allclose(extended[:2, 2:4], 0)
+    np.testing.assert_allclose(extended[:2, 4:], original[:, 2:])
+    np.testing.assert_allclose(extended[2:], [[0, 0, 1, 0, 0, 0], [0, 0, 0, 1, 0, 0]])
+
+
+def test_add_events_extends_mappings_and_interactions(tmp_path):
+    data = make_data()
+    interactions, weights = data.add_events(['u2', 'u3', 'u3'], ['r3', 'r1', 'r1'], [1.0, 2.0, 3.0])
+
+    assert data.user_ids.tolist() == ['u1', 'u2', 'u3']
+    assert data.item_ids.tolist() == ['r1', 'r2', 'r3']
+    assert data.shape == (3, 3)
+    assert weights.toarray().tolist() == [[0, 0, 0], [0, 0, 1], [5, 0, 0]]
+    assert interactions.nnz == 2
+    assert data.interactions.toarray().tolist() == [[1, 0, 0], [1, 1, 1], [1, 0, 0]]
+    assert data.user_features.shape == (3, 5)
+    assert data.item_features.shape == (3, 3)
+
+    data.save(tmp_path)
+    loaded = RecommenderData.load(tmp_path)
+    assert loaded.user_ids.tolist() == data.user_ids.tolist()
+    assert (loaded.user_features != data.user_features).nnz == 0
+    assert (loaded.interactions.toarray() == data.interactions.toarray()).all()
+    assert not list(tmp_path.glob('.*.tmp'))
+
+
+def test_grow_parameters_inserts_after_identity_rows():
+    rng = np.random.RandomState(0)
+    model = SimpleNamespace(random_state=rng, learning_schedule='adagrad')
+    for kind in ('user', 'item'):
+        setattr(model, f'{kind}_embeddings', np.arange(12, dtype=np.float32).reshape(4, 3))
+        setattr(model, f'{kind}_embedding_gradients', np.full((4, 3), 7, dtype=np.float32))
+        setattr(model, f'{kind}_embedding_momentum', np.zeros((4, 3), dtype=np.float32))
+        setattr(model, f'{kind}_biases', np.arange(4, dtype=np.float32))
+        setattr(model, f'{kind}_bias_gradients', np.full(4, 7, dtype=np.float32))
+        setattr(model, f'{kind}_bias_momentum', np.zeros(4, dtype=np.float32))
+
+    grow_parameters(model, 'user', 2, 3)
+
+    assert model.user_embeddings.shape == (7, 3)
+    np.testing.assert_array_equal(model.user_embeddings[:2], np.arange(6).reshape(2, 3))
+    np.testing.assert_array_equal(model.user_embeddings[5:], np.arange(6, 12).reshape(2, 3))
+    assert np.abs(model.user_embeddings[2:5]).max() <= 0.5 / 3
+    assert model.user_biases.tolist() == [0, 1, 0, 0, 0, 2, 3]
+    assert model.user_bias_gradients.tolist() == [7, 7, 1, 1, 1, 7, 7]
+    assert model.item_embeddings.shape == (4, 3)
+
+
+def test_new_events_after_watermark():
+    df = pd.DataFrame({'timestamp': pd.to_datetime(['2026-01-01', '2026-01-03', '2026-01-02']), 'x': [1, 2, 3]})
+
+    recent, newest = new_events(df, '2026-01-01T00:00:00')
+    assert recent['x'].tolist() == [2, 3]
+    assert newest == pd.Timestamp('2026-01-03')
+
+    assert new_events(df, '2026-01-03T00:00:00')[1] is None
+    assert len(new_events(df)[0]) == 3
+
+
+def test_fit_partial_after_extension():
+    lightfm = pytest.importorskip("lightfm")
+
+    users, items, ratings, _, _ = synthetic_interactions(50, 20, seed=0)
+    data = RecommenderData.build(users, items, ratings)
+    model = lightfm.LightFM(no_components=4, random_state=0)
+    model.fit(data.interactions, user_features=data.user_features, item_features=data.item_features,
+              sample_weight=data.weights, epochs=2)
+
+    feedback = pd.DataFrame({
+        'user_hash': ['new-user', '3'], 'resource_id': ['new-item', '5'],
+        'action': ['saved', 'clicked'], 'rating': [None, None],
+    })
+    stats = apply_feedback(model, data, feedback, epochs=1)
+
+    assert stats == {'events': 2, 'interactions': 2, 'new_users': 1, 'new_items': 1}
+    scores = model.predict(np.array([50]), np.array([20]), user_features=data.user_features,
+                           item_features=data.item_features)
+    assert np.isfinite(scores).all()